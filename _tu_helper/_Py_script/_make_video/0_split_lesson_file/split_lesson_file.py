@@ -14,12 +14,15 @@ r"""
    и от хвостовой пунктуации (точки, запятые, подчёркивания, тире и т.п.).
  - OUTPUT.output_root: если не задан — писать рядом с исходником; если задан — зеркальная структура внутри него.
  - ADVANCED.delete_source_after = true — удалить исходный файл после успешной генерации выходных.
+ - ADVANCED.workers — сколько файлов разбирать параллельно (процессы, ../_common/pool_runner.py);
+   0 — по числу ядер, 1 — последовательно. Лог каждого файла выводится целиком и по порядку.
 
 Запуск: python split_lesson_file.py
 """
 
 import os
 import re
+import sys
 from typing import List, Dict, Tuple, Optional
 
 # tomllib для Python 3.11+, иначе tomli
@@ -28,6 +31,9 @@ try:
 except ModuleNotFoundError:  # pragma: no cover
     import tomli as tomllib
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "_common"))
+import pool_runner  # noqa: E402
+
 # -------------------------------
 # Регулярки и константы
 # -------------------------------
@@ -115,6 +121,7 @@ def load_config(path: str = "config.toml") -> dict:
     source_encoding = str(adv.get("source_encoding", "utf-8"))
     output_encoding = str(adv.get("output_encoding", "utf-8"))
     delete_source_after = bool(adv.get("delete_source_after", False))
+    workers = int(adv.get("workers", 0) or 0)
 
     # BLOCKS
     blocks_cfg_in = data.get("BLOCKS", {}).get("rules", [])
@@ -150,6 +157,7 @@ def load_config(path: str = "config.toml") -> dict:
         "source_encoding": source_encoding,
         "output_encoding": output_encoding,
         "delete_source_after": delete_source_after,
+        "workers": workers,
         "blocks": blocks,
     }
 
@@ -491,9 +499,7 @@ def main():
     log("BLOCKS: " + ", ".join([b["name"] for b in cfg["blocks"]]))
     log("FILTERS: include=" + str(cfg["include_suffixes"]) + "  exclude=" + str(cfg["exclude_suffixes"]))
 
-    created_total: List[str] = []
-    total_files = 0
-
+    jobs: List[Tuple[str, dict, str]] = []
     for src_root in cfg["input_dirs"]:
         files = iter_files(
             root=src_root,
@@ -504,10 +510,17 @@ def main():
             exclude_suffixes=cfg["exclude_suffixes"],
         )
         files.sort()
-        total_files += len(files)
         log(f"[scan] найдено файлов в «{src_root}»: {len(files)}")
-        for f in files:
-            created_total += process_file(f, cfg, rel_root=src_root)
+        jobs += [(f, cfg, src_root) for f in files]
+    total_files = len(jobs)
+
+    workers = pool_runner.resolve_workers(cfg["workers"], len(jobs))
+    if workers > 1:
+        log(f"WORKERS: {workers}")
+    created_total: List[str] = []
+    for res in pool_runner.run_jobs(process_file, jobs, workers):
+        if not isinstance(res, pool_runner.JobFailed):
+            created_total += res
 
     log(f"Готово. Создано файлов: {len(created_total)} из {total_files} исходных.")
     if not created_total:
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+bench_lang.py — замер определения языка фраз: langdetect на каждую фразу (как было) против
+../_common/lang_classify.py (письменность -> langdetect для неоднозначных -> LRU и memo на диске).
+
+Корпус — уроки целиком (по умолчанию ../English Story/*.txt): текст режется на фразы тем же путём, что и
+в tts_batch_reader (фильтры, маркеры, разделители из tts_config.toml); берутся фразы без маркера языка.
+Печатаются время на корпус, фраз/с, сколько фраз дошло до langdetect, расхождения со старым способом
+(в ключах языков конфига) и сколько фраз старый способ без seed определил по-разному в двух прогонах.
+
+Запуск:
+    python bench_lang.py
+    python bench_lang.py "D:/lessons/*.txt" --repeat 5
+"""
+
+import argparse
+import tempfile
+import time
+from glob import glob
+from pathlib import Path
+
+import tts_batch_reader as tbr
+import lang_classify
+
+try:
+    from langdetect import DetectorFactory, detect
+except ImportError:
+    DetectorFactory = detect = None
+
+
+def load_phrases(files, cfg) -> list:
+    regexes, _ = tbr._compile_skip_regexes(cfg)
+    out = []
+    for p in files:
+        raw = Path(p).read_text(encoding="utf-8", errors="ignore")
+        raw = tbr._apply_skip_filters(raw, regexes, []) if regexes else raw
+        out += [text for text, forced, _v, _nl, _i in tbr.build_phrases_with_lang_and_voice(raw, cfg)
+                if text and not forced]
+    return out
+
+
+def old_way(phrases, seed) -> list:
+    DetectorFactory.seed = seed
+    codes = []
+    for text in phrases:
+        try:
+            codes.append(detect(text))
+        except Exception:
+            codes.append("en")
+    DetectorFactory.seed = 0
+    return codes
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    res = fn()
+    return time.perf_counter() - t0, res
+
+
+def main():
+    here = Path(__file__).resolve().parent
+    ap = argparse.ArgumentParser(description="Бенчмарк определения языка фраз")
+    ap.add_argument("corpus", nargs="*", default=[str(here.parent / "English Story" / "*.txt")])
+    ap.add_argument("--repeat", type=int, default=1, help="сколько раз прогнать корпус (имитация повторов)")
+    args = ap.parse_args()
+
+    cfg = tbr.load_config_toml(here / "tts_config.toml")
+    files = sorted({f for pat in args.corpus for f in glob(pat, recursive=True)})
+    if not files:
+        raise SystemExit("Корпус пуст — укажите файлы или маски.")
+    phrases = load_phrases(files, cfg) * max(1, args.repeat)
+
+    langs_cfg = tbr.get_languages_cfg(cfg)
+    detect_map = tbr.build_detect_map(langs_cfg)
+    default_lang = next(iter(langs_cfg.keys()), "en")
+    ld = cfg.get("lang_detect", {})
+
+    def to_keys(codes):
+        return [tbr.map_detect_to_lang(c or "en", detect_map, default_lang) for c in codes]
+
+    print(f"\nфайлов: {len(files)}, фраз без маркера: {len(phrases)}")
+    print(f"{'способ':>26} {'сек':>8} {'фраз/с':>9} {'langdetect':>11} {'расхождений':>12}")
+
+    base = None
+    if detect is not None:
+        sec, old = timed(lambda: old_way(phrases, None))
+        base = to_keys(old)
+        print(f"{'langdetect на фразу':>26} {sec:>8.3f} {len(phrases) / sec:>9.0f} {len(phrases):>11} {'—':>12}")
+        again = to_keys(old_way(phrases, None))
+        unstable = sum(a != b for a, b in zip(base, again))
+    else:
+        print("langdetect не установлен — сравнение со старым способом пропущено")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memo = Path(tmp) / "lang_memo.json"
+        for title in ("lang_classify, холодный", "lang_classify, memo"):
+            clf = lang_classify.LangClassifier(candidates=list(detect_map), memo_path=memo,
+                                               script_ratio=float(ld.get("script_ratio", 0.8)),
+                                               lru_size=int(ld.get("lru_size", 20000)))
+            sec, codes = timed(lambda: [clf.classify(t) for t in phrases])
+            clf.save()
+            keys = to_keys(codes)
+            diff = f"{sum(a != b for a, b in zip(base, keys)):>12}" if base else f"{'—':>12}"
+            print(f"{title:>26} {sec:>8.3f} {len(phrases) / max(sec, 1e-9):>9.0f} {clf.stats['detect']:>11} {diff}")
+
+    if base:
+        print(f"\nlangdetect без seed: разный ответ в двух прогонах у {unstable} фраз из {len(phrases)}")
+        diffs = sorted({(t, a, b) for t, a, b in zip(phrases, base, keys) if a != b})
+        for t, a, b in diffs[:10]:
+            print(f"  было {a:>3} -> стало {b:>3}: {t[:70]}")
+
+
+if __name__ == "__main__":
+    main()
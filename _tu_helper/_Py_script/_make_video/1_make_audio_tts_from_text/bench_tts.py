@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+bench_tts.py — замер пропускной способности синтеза tts_batch_reader на локальном stub-сервере TTS.
+
+Сервер (asyncio, HTTP/1.0 на 127.0.0.1) отвечает с задержкой --latency-ms «MP3» из валидных кадров
+MPEG-1 Layer III (число кадров зависит от текста и голоса — длительность детерминирована),
+а при более чем --max-inflight одновременных запросах отдаёт 429 — так проверяется повтор с паузой.
+tts_batch_reader.tts_render_bytes на время замера подменяется клиентом этого сервера.
+
+Для каждого значения concurrency обрабатываются одни и те же файлы (кэш фраз выключен); MP3 и .sli
+сравниваются с результатом concurrency=1 (последовательный режим) — должны совпадать байт в байт.
+
+Затем — кэш фраз: холодный прогон, прогон после правки одной строки (в TTS должна уйти только она)
+и прогон multi_en_outputs (не-EN куски синтезируются один раз на все EN-голоса).
+
+Запуск:
+    python bench_tts.py
+    python bench_tts.py --files 4 --lines 25 --latency-ms 200 --concurrency 1,4,8,16 --max-inflight 10
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import shutil
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import tts_batch_reader as tbr
+
+# MPEG-1 Layer III, 128 кбит/с, 44.1 кГц: 417 байт на кадр (~26 мс)
+_FRAME_HDR = bytes([0xFF, 0xFB, 0x90, 0x44])
+_FRAME_LEN = 417
+
+
+class StubHTTPError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"stub TTS: HTTP {status}")
+        self.status = status
+
+
+class StubServer:
+    def __init__(self, latency_ms: int, max_inflight: int):
+        self.latency = latency_ms / 1000.0
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.requests = 0
+        self.rejected = 0
+        self.port = 0
+        self._server = None
+
+    @staticmethod
+    def fake_mp3(text: str, voice: str) -> bytes:
+        seed = zlib.crc32(f"{voice}|{text}".encode("utf-8"))
+        frames = 8 + len(text) // 2 + seed % 5
+        body = bytearray()
+        for i in range(frames):
+            fill = bytes([(seed + i) & 0xFF]) * (_FRAME_LEN - len(_FRAME_HDR))
+            body += _FRAME_HDR + fill
+        return bytes(body)
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            req = json.loads((await reader.readexactly(length)).decode("utf-8"))
+            self.requests += 1
+            if self.inflight >= self.max_inflight:
+                self.rejected += 1
+                writer.write(b"HTTP/1.0 429 Too Many Requests\r\nContent-Length: 0\r\n\r\n")
+                return
+            self.inflight += 1
+            try:
+                await asyncio.sleep(self.latency)
+                data = self.fake_mp3(req["text"], req["voice"])
+            finally:
+                self.inflight -= 1
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: audio/mpeg\r\n"
+                         + f"Content-Length: {len(data)}\r\n\r\n".encode("ascii") + data)
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+            except Exception:
+                pass
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def client(self):
+        async def render(text: str, voice: str, rate: int) -> bytes:
+            body = json.dumps({"text": text, "voice": voice, "rate": rate}).encode("utf-8")
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+            writer.write(b"POST /tts HTTP/1.0\r\nContent-Type: application/json\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+            await writer.drain()
+            resp = await reader.read()
+            writer.close()
+            head, _, data = resp.partition(b"\r\n\r\n")
+            status = int(head.split(b" ", 2)[1])
+            if status != 200:
+                raise StubHTTPError(status)
+            return data
+        return render
+
+
+def make_inputs(root: Path, n_files: int, n_lines: int) -> list:
+    words = ("apple", "river", "green", "table", "window", "morning", "quiet", "simple", "light", "story")
+    files = []
+    for f in range(n_files):
+        lines = []
+        for i in range(n_lines):
+            phrase = " ".join(words[(f * 7 + i * 3 + k) % len(words)] for k in range(3 + (i % 5)))
+            lines.append(f"[EN] {phrase} {f * n_lines + i}.")
+        p = root / f"lesson_{f:02d}_en.txt"
+        p.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        files.append(p)
+    return files
+
+
+def bench_config(concurrency: int, cache_dir: str = "") -> dict:
+    return {
+        "multi_en_outputs": False,
+        "enable_languages": ["en", "ru"],
+        "rate": -10,
+        "languages": {"en": {"voice": "en-GB-SoniaNeural", "alt_voices": [], "markers": ["[en]"],
+                             "detect_prefixes": ["en"], "suffix_filter": {"enabled": True, "suffix": "_en"}},
+                      "ru": {"voice": "ru-RU-DmitryNeural", "alt_voices": [], "markers": ["[ru]"],
+                             "detect_prefixes": ["ru"]}},
+        "pauses": {"between_phrases_ms": 600, "newline_pause": {"enabled": True, "ms_per_newline": 600}},
+        "filters": {"debug_dump": False},
+        "synthesis": {"concurrency": concurrency, "rate_limit_retries": 8, "backoff_ms": 50},
+        "cache": {"enabled": bool(cache_dir), "dir": cache_dir, "max_mb": 50},
+    }
+
+
+def digest(files: list) -> dict:
+    out = {}
+    for p in files:
+        for ext in (".mp3", ".sli"):
+            q = p.with_suffix(ext)
+            out[q.name] = hashlib.sha1(q.read_bytes()).hexdigest() if q.exists() else None
+    return out
+
+
+async def run_once(server: StubServer, files: list, cfg: dict) -> float:
+    t0 = time.perf_counter()
+    await tbr.process_files(files, cfg, tbr.TTSSynth(cfg))
+    return time.perf_counter() - t0
+
+
+async def bench_cache(server: StubServer, root: Path, files: list) -> list:
+    cache_dir = str(root / "cache")
+    rows = []
+
+    async def step(title, cfg, fs):
+        server.requests = server.rejected = 0
+        sec = await run_once(server, fs, cfg)
+        rows.append((title, sec, server.requests - server.rejected))
+
+    cfg = bench_config(8, cache_dir)
+    await step("холодный кэш", cfg, files)
+    await step("без изменений", cfg, files)
+    lines = files[0].read_text(encoding="utf-8").splitlines()
+    lines[len(lines) // 2] = "[EN] a completely new sentence."
+    files[0].write_text("\n".join(lines) + "\n", encoding="utf-8")
+    await step("правка 1 строки", cfg, files)
+
+    ml = root / "multi_lesson.txt"
+    ml.write_text("".join(f"[EN] line number {i}.\n[RU] строка номер {i}.\n" for i in range(10)), encoding="utf-8")
+    multi = dict(bench_config(8, str(root / "cache_multi")), multi_en_outputs=True)
+    multi["languages"] = dict(multi["languages"], en=dict(multi["languages"]["en"], alt_voices=[f"en-X-Voice{i}Neural" for i in range(5)]))
+    await step("multi_en, 5 голосов", multi, [ml])
+    return rows
+
+
+async def amain(args) -> None:
+    server = StubServer(args.latency_ms, args.max_inflight)
+    await server.start()
+    tbr.tts_render_bytes = server.client()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_tts_"))
+    try:
+        files = make_inputs(tmp, args.files, args.lines)
+        levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+        if 1 not in levels:
+            levels.insert(0, 1)
+        pieces = args.files * args.lines
+
+        rows = []
+        reference = None
+        for c in levels:
+            server.requests = server.rejected = 0
+            sec = await run_once(server, files, bench_config(c))
+            dig = digest(files)
+            if c == 1:
+                reference = dig
+            rows.append((c, sec, server.requests, server.rejected, dig == reference))
+
+        base = rows[0][1]
+        print(f"\nфайлов: {args.files}, кусков: {pieces}, задержка сервера: {args.latency_ms} мс, "
+              f"лимит сервера: {args.max_inflight} одновременных")
+        print(f"{'concurrency':>11} {'сек':>8} {'кусков/с':>9} {'ускорение':>10} {'запросов':>9} {'429':>5}  совпадает")
+        for c, sec, req, rej, same in rows:
+            print(f"{c:>11} {sec:>8.2f} {pieces / sec:>9.1f} {base / sec:>9.1f}x {req:>9} {rej:>5}  {'да' if same else 'НЕТ'}")
+
+        cache_rows = await bench_cache(server, tmp, files)
+        print("\nкэш фраз (concurrency=8):")
+        print(f"{'прогон':>22} {'сек':>8} {'запросов к TTS':>15}")
+        for title, sec, req in cache_rows:
+            print(f"{title:>22} {sec:>8.2f} {req:>15}")
+    finally:
+        await server.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Бенчмарк параллельного синтеза TTS на stub-сервере")
+    ap.add_argument("--files", type=int, default=3)
+    ap.add_argument("--lines", type=int, default=20)
+    ap.add_argument("--latency-ms", type=int, default=150)
+    ap.add_argument("--max-inflight", type=int, default=6)
+    ap.add_argument("--concurrency", default="1,2,4,8,16")
+    asyncio.run(amain(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
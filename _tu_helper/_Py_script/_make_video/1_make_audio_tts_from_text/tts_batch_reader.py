@@ -10,22 +10,55 @@ v16.3:
   • Fallback/strict для каждого языка, multi_en_outputs.
   • Исправление «голых пауз»: паузы всегда пришиваются к следующему тексту (не отправляем в TTS отдельно).
   • slides.txt считает ДЛИТЕЛЬНОСТЬ ПО СТРОКАМ ИСХОДНИКА (пустые строки игнорируем).
+
+v16.4:
+  • Один event loop на все файлы: куски синтезируются параллельно (не больше [synthesis] concurrency
+    запросов одновременно), при ответе 429 — повтор с удвоением паузы, без перехода на запасной голос.
+  • Склейка — строго в исходном порядке кусков: MP3 и .sli байт в байт как при concurrency = 1.
+
+v16.5:
+  • Кэш фраз на диске ([cache]): ключ — (нормализованный текст, голос, rate, пауза-префикс),
+    хранится MP3 + длительность; LRU по времени доступа с лимитом размера; статистика в конце прогона.
+    После правки одной строки в TTS уходит только она. Одинаковые куски в работе синтезируются один раз
+    (multi_en_outputs: не-EN куски общие для всех EN-голосов).
+
+v16.6:
+  • [synthesis] workers — сколько файлов в работе одновременно (0 — все сразу). Файлы не разносятся по
+    процессам: узкое место — сеть, а общий лимит запросов и общий кэш живут в одном event loop.
+  • Лог каждого файла копится и печатается целиком, в порядке файлов (OrderedOutput из ../_common/pool_runner.py).
+v16.7:
+  • MP3 склеивается по кадрам (../_common/mp3_stream.py): заголовки MPEG разбираются по мере записи,
+    длительности в .sli — по числу кадров (не расходятся с файлом), в начале файла — заголовок Xing/Info
+    (точная длительность и перемотка без сканирования), опционально индекс кадров <имя>.mp3.idx ([mp3]).
+    Куски пишутся в файл по мере готовности (по порядку, OrderedOutput) — в памяти только ещё не записанные.
+v16.8:
+  • Паузы между фразами — тихие MPEG-кадры с параметрами голоса, вклеенные при склейке ([pauses] engine = "silence"):
+    в TTS уходит только текст (короче запрос, чаще попадание в кэш), длина паузы кратна кадру, в .sli — точно.
+    engine = "commas" — прежние запятые в тексте. Паузы за пробелы (space_pause) остаются запятыми внутри фразы.
+v16.9:
+  • Язык фразы без маркера — ../_common/lang_classify.py ([lang_detect]): сначала по письменности
+    (кириллица/латиница, і/ї/є/ґ — uk, ы/э/ъ/ё — ru), langdetect — только для неоднозначных строк, с фиксированным
+    seed и выбором среди detect_prefixes; ответы запоминаются (LRU + .lang_memo.json).
 Зависимости:
-    pip install edge-tts langdetect mutagen
+    pip install edge-tts langdetect
 Python 3.11+:
     конфиг читается стандартным модулем tomllib.
 """
 
 import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import random
 import re
+import struct
 import sys
 from glob import glob
-from io import BytesIO
 from pathlib import Path
 from typing import List, Tuple, Dict, Set, Optional
 
 import edge_tts
-from langdetect import detect
 
 # --- TOML loader ---
 try:
@@ -33,11 +66,10 @@ try:
 except Exception:  # fallback на tomli, если вдруг нужно
     import tomli as tomllib
 
-# длительность mp3-кусочка
-try:
-    from mutagen.mp3 import MP3
-except Exception:
-    MP3 = None
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "_common"))
+import pool_runner  # noqa: E402
+import mp3_stream  # noqa: E402
+import lang_classify  # noqa: E402
 
 
 # =============================================================================
@@ -551,6 +583,26 @@ def build_phrases_with_lang_and_voice(text: str, cfg: Dict) -> List[Tuple[str, O
 
     return phrases
 
+_lang_clf: Optional[lang_classify.LangClassifier] = None
+
+def lang_classifier(cfg: Dict) -> lang_classify.LangClassifier:
+    """Один классификатор на прогон: кандидаты — detect_prefixes всех языков, настройки — [lang_detect]."""
+    global _lang_clf
+    if _lang_clf is None:
+        ld = cfg.get("lang_detect", {}) if isinstance(cfg.get("lang_detect", {}), dict) else {}
+        memo_path = None
+        if bool(ld.get("memo", True)):
+            memo_path = Path(str(ld.get("memo_file", "") or "").strip() or ".lang_memo.json")
+            if not memo_path.is_absolute():
+                memo_path = script_dir() / memo_path
+        _lang_clf = lang_classify.LangClassifier(
+            candidates=list(build_detect_map(get_languages_cfg(cfg))) or None,
+            script_ratio=float(ld.get("script_ratio", 0.8)),
+            memo_path=memo_path,
+            lru_size=int(ld.get("lru_size", 20000)),
+        )
+    return _lang_clf
+
 def group_phrases_by_language(
     phrases: List[Tuple[str, Optional[str], Optional[str], int, int]],
     cfg: Dict
@@ -561,6 +613,7 @@ def group_phrases_by_language(
     langs_cfg = get_languages_cfg(cfg)
     detect_map = build_detect_map(langs_cfg)
     default_lang = next(iter(langs_cfg.keys()), "en")
+    clf = lang_classifier(cfg)
 
     blocks: List[Tuple[str, List[Tuple[str, Optional[str], Optional[str], int, int]]]] = []
     curr_lang_key: Optional[str] = None
@@ -570,10 +623,7 @@ def group_phrases_by_language(
         if forced_lang:
             lang_key = forced_lang
         else:
-            try:
-                code = detect(text)
-            except Exception:
-                code = "en"
+            code = clf.classify(text) or "en"
             lang_key = map_detect_to_lang(code, detect_map, default_lang)
 
         if curr_lang_key is None:
@@ -639,13 +689,18 @@ async def tts_render_bytes(text: str, voice: str, rate: int) -> bytes:
     return bytes(buf)
 
 def mp3_duration_from_bytes(mp3_bytes: bytes) -> float:
-    if MP3 is None or not mp3_bytes:
-        return 0.0
-    try:
-        audio = MP3(BytesIO(mp3_bytes))
-        return float(audio.info.length or 0.0)
-    except Exception:
+    """Длительность куска по числу MPEG-кадров (как её посчитает склейка)."""
+    if not mp3_bytes:
         return 0.0
+    return mp3_stream.scan_bytes(mp3_bytes)[1]
+
+def is_rate_limited(err: Exception) -> bool:
+    """Ответ сервиса «слишком много запросов» (HTTP 429) — повторяем тем же голосом позже."""
+    status = getattr(err, "status", None) or getattr(err, "status_code", None)
+    if status == 429:
+        return True
+    text = str(err).lower()
+    return "429" in text or "too many requests" in text or "rate limit" in text
 
 async def tts_render_with_fallback_to_bytes(text: str,
                                             chosen_voice: str,
@@ -656,7 +711,8 @@ async def tts_render_with_fallback_to_bytes(text: str,
         b = await tts_render_bytes(text, chosen_voice, rate)
         return chosen_voice, b
     except Exception as first_err:
-        if strict:
+        # при rate limit не уходим на другой голос: результат должен совпадать с последовательным режимом
+        if strict or is_rate_limited(first_err):
             raise first_err
         last_err = first_err
         tried = {chosen_voice.lower()}
@@ -667,58 +723,282 @@ async def tts_render_with_fallback_to_bytes(text: str,
                 b = await tts_render_bytes(text, v, rate)
                 return v, b
             except Exception as e:
+                if is_rate_limited(e):
+                    raise
                 last_err = e
         raise last_err
 
 
+class PhraseCache:
+    """
+    Кэш синтезированных кусков на диске: <dir>/<2 символа ключа>/<sha256>.bin = заголовок (magic, длительность)
+    + байты MP3. Общего индекса нет (несколько процессов не мешают друг другу): время доступа — mtime файла,
+    обновляется при попадании; при превышении max_mb удаляются самые давние записи (до 90% лимита).
+    """
+
+    _HDR = struct.Struct("<4sd")
+    _MAGIC = b"TTS1"
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max(1, int(max_bytes))
+        self.evicted = 0
+        self._total: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> Optional["PhraseCache"]:
+        c = cfg.get("cache", {}) if isinstance(cfg.get("cache", {}), dict) else {}
+        if not bool(c.get("enabled", True)):
+            return None
+        d = str(c.get("dir", "") or "").strip()
+        root = Path(d) if d else Path(".tts_cache")
+        if not root.is_absolute():
+            root = script_dir() / root
+        try:
+            root.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            return None
+        return cls(root, int(float(c.get("max_mb", 500)) * 1024 * 1024))
+
+    @staticmethod
+    def key(text: str, voice: str, rate: int) -> str:
+        # пауза-префикс (запятые, пришитые к началу куска) — отдельным полем, текст — без лишних пробелов
+        prefix = re.match(r"[\s,]*", text).group(0)
+        body = " ".join(text[len(prefix):].split())
+        raw = json.dumps([body, voice, int(rate), prefix.count(",")], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.bin"
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        p = self._path(key)
+        try:
+            data = p.read_bytes()
+        except OSError:
+            return None
+        if len(data) <= self._HDR.size:
+            return None
+        magic, duration = self._HDR.unpack_from(data)
+        if magic != self._MAGIC:
+            return None
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        return data[self._HDR.size:], duration
+
+    def put(self, key: str, mp3_bytes: bytes, duration: float) -> None:
+        p = self._path(key)
+        tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+        try:
+            p.parent.mkdir(exist_ok=True)
+            tmp.write_bytes(self._HDR.pack(self._MAGIC, float(duration)) + mp3_bytes)
+            os.replace(tmp, p)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return
+        self._account(self._HDR.size + len(mp3_bytes))
+
+    def _scan(self) -> List[Tuple[float, int, Path]]:
+        out = []
+        for p in self.root.glob("*/*.bin"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return out
+
+    def _account(self, size: int) -> None:
+        if self._total is None:
+            self._total = sum(sz for _m, sz, _p in self._scan())    # один обход каталога за прогон
+        else:
+            self._total += size
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(self._scan())
+        total = sum(sz for _m, sz, _p in entries)
+        target = int(self.max_bytes * 0.9)
+        for _mtime, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+                self.evicted += 1
+            except OSError:
+                pass
+        self._total = total
+
+
+class TTSSynth:
+    """
+    Общий на все файлы ограничитель запросов к TTS:
+      • не больше concurrency одновременных синтезов;
+      • при rate limit — лимит уменьшается на 1 (после серии удачных ответов растёт обратно),
+        а кусок повторяется после паузы backoff_ms·2^попытка со случайным разбросом
+        (чтобы отклонённые запросы не вернулись к сервису все одновременно).
+    """
+
+    def __init__(self, cfg: Dict, cache: Optional[PhraseCache] = None):
+        syn = cfg.get("synthesis", {}) if isinstance(cfg.get("synthesis", {}), dict) else {}
+        self.cache = cache if cache is not None else PhraseCache.from_config(cfg)
+        self.hits = 0          # взято из кэша на диске
+        self.shared = 0        # такой же кусок уже синтезировался в этом прогоне — дождались его
+        self.misses = 0        # реально ушло в TTS
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.concurrency = max(1, int(syn.get("concurrency", 4)))
+        self.retries = max(0, int(syn.get("rate_limit_retries", 5)))
+        self.backoff_ms = max(0, int(syn.get("backoff_ms", 1000)))
+        self.limit = self.concurrency
+        self._active = 0
+        self._ok_streak = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+    async def _acquire(self) -> None:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+
+    async def _release(self, rate_limited: bool) -> None:
+        async with self._cond:
+            self._active -= 1
+            if rate_limited:
+                self.limit = max(1, self.limit - 1)
+                self._ok_streak = 0
+            else:
+                self._ok_streak += 1
+                if self.limit < self.concurrency and self._ok_streak >= self.limit:
+                    self.limit += 1
+                    self._ok_streak = 0
+            self._cond.notify_all()
+
+    async def render(self, text: str, voice: str, alts: List[str], strict: bool, rate: int,
+                     fallback: bool = True) -> Tuple[str, bytes, float]:
+        """(голос, mp3_bytes, длительность): кэш -> уже идущий синтез того же куска -> TTS."""
+        key = PhraseCache.key(text, voice, rate)
+        if self.cache is not None:
+            hit = self.cache.get(key)
+            if hit is not None:
+                self.hits += 1
+                return voice, hit[0], hit[1]
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.shared += 1
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            used, mp3_bytes = await self._render_limited(text, voice, alts, strict, rate, fallback)
+            duration = mp3_duration_from_bytes(mp3_bytes)
+            self.misses += 1
+            if self.cache is not None:
+                # при fallback кладём под фактический голос: для исходного голоса в следующий раз попробуем снова
+                self.cache.put(PhraseCache.key(text, used, rate), mp3_bytes, duration)
+            fut.set_result((used, mp3_bytes, duration))
+            return used, mp3_bytes, duration
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                fut.cancel()
+            else:
+                fut.set_exception(e)
+                fut.exception()      # ошибку получат ожидающие; без них — не шуметь в лог
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats_line(self) -> str:
+        total = self.hits + self.shared + self.misses
+        line = f"Кэш TTS: кусков {total}, из кэша {self.hits}, повторов в прогоне {self.shared}, синтезировано {self.misses}"
+        if self.cache is not None and self.cache.evicted:
+            line += f", вытеснено старых записей {self.cache.evicted}"
+        return line
+
+    async def _render_limited(self, text: str, voice: str, alts: List[str], strict: bool, rate: int,
+                              fallback: bool) -> Tuple[str, bytes]:
+        attempt = 0
+        while True:
+            await self._acquire()
+            limited = False
+            try:
+                if fallback:
+                    return await tts_render_with_fallback_to_bytes(text, voice, alts, strict, rate)
+                return voice, await tts_render_bytes(text, voice, rate)
+            except Exception as e:
+                limited = is_rate_limited(e)
+                if not limited or attempt >= self.retries:
+                    raise
+            finally:
+                await self._release(limited)
+            await asyncio.sleep(self.backoff_ms * (2 ** attempt) / 1000.0 * random.uniform(0.5, 1.0))
+            attempt += 1
+
+
 # =============================================================================
 # 7) Склейка пауз (паузы пришиваем к следующему тексту)
 # =============================================================================
 
+def pause_engine(cfg: Dict) -> str:
+    """[pauses] engine: "silence" — тихие MPEG-кадры вклеиваются между кусками; "commas" — запятые в тексте TTS."""
+    engine = str(cfg.get("pauses", {}).get("engine", "silence")).lower()
+    return engine if engine in ("silence", "commas") else "silence"
+
 def glue_block_text(
     frs: List[Tuple[str, Optional[str], Optional[str], int, int]],
     cfg: Dict
-) -> List[Tuple[str, Optional[str], int]]:
+) -> List[Tuple[str, Optional[str], int, int]]:
     """
-    Возвращаем список (text_piece, voice_alias_or_id, line_idx),
-    паузы НЕ отправляем отдельными кусками — «пришиваем» в начало следующего текста.
+    Возвращаем список (text_piece, voice_alias_or_id, line_idx, pause_ms),
+    паузы НЕ отправляем отдельными кусками — они идут перед следующим текстом:
+      engine = "silence" — pause_ms (склейка вставит тишину точной длины, текст в TTS без пауз);
+      engine = "commas"  — запятые в начале текста (pause_ms = 0), как раньше.
     """
     pauses = cfg.get("pauses", {})
     base_ms = int(pauses.get("between_phrases_ms", 600))
     np_enabled = bool(pauses.get("newline_pause", {}).get("enabled", True))
     np_ms = int(pauses.get("newline_pause", {}).get("ms_per_newline", 400))
     start_line_ms = int(pauses.get("start_of_line_extra_pause_ms", 0))
+    commas = pause_engine(cfg) == "commas"
 
-    out: List[Tuple[str, Optional[str], int]] = []
+    out: List[Tuple[str, Optional[str], int, int]] = []
     first = True
-    pending_prefix = ""
 
     for text, _forced_lang, voice_alias, nlcount, line_idx in frs:
         if not text:
             continue
 
         if first:
-            out.append((text, voice_alias, line_idx))
+            out.append((text, voice_alias, line_idx, 0))
             first = False
             continue
 
+        parts_ms = []
         if base_ms > 0:
-            pending_prefix += " " + make_pause_commas(base_ms) + " "
+            parts_ms.append(base_ms)
         if np_enabled and nlcount > 0 and np_ms > 0:
-            pending_prefix += " " + make_pause_commas(nlcount * np_ms) + " "
+            parts_ms.append(nlcount * np_ms)
         if nlcount > 0 and start_line_ms > 0:
-            pending_prefix += " " + make_pause_commas(start_line_ms) + " "
-
-        if pending_prefix:
-            text = pending_prefix + text
-            pending_prefix = ""
+            parts_ms.append(start_line_ms)
 
-        out.append((text, voice_alias, line_idx))
+        if commas:
+            prefix = "".join(" " + make_pause_commas(ms) + " " for ms in parts_ms)
+            out.append((prefix + text, voice_alias, line_idx, 0))
+        else:
+            out.append((text, voice_alias, line_idx, sum(parts_ms)))
 
     if out:
-        last_text, last_voice, last_line = out[-1]
+        last_text, last_voice, last_line, last_pause = out[-1]
         if last_text and not re.search(r"[.!?;]\s*$", last_text):
-            out[-1] = (finalize_phrase_text(last_text), last_voice, last_line)
+            out[-1] = (finalize_phrase_text(last_text), last_voice, last_line, last_pause)
     return out
 
 
@@ -726,11 +1006,75 @@ def glue_block_text(
 # 8) Рендеринг (single / multi-EN) + запись slides по НЕПУСТЫМ строкам
 # =============================================================================
 
+def _skip_piece(piece: str) -> bool:
+    # пустые и чистые «паузные» куски (только запятые) не озвучиваем
+    return not piece.strip() or len(piece.strip().replace(",", "")) == 0
+
+async def assemble_output(out_path: Path, slides_path: Path, jobs: List[Tuple[str, int, object, int]],
+                          cfg: Optional[Dict] = None, indent: str = "    ") -> None:
+    """
+    jobs — [(метка, line_idx, корутина синтеза -> (голос, mp3_bytes, длительность), пауза_мс)] в порядке текста.
+    Синтез идёт параллельно, а запись — строго по порядку jobs (pool_runner.OrderedOutput): готовый кусок
+    пишется, как только записаны все предыдущие, и сразу отпускается — в памяти держатся только куски,
+    обогнавшие ещё не готовый. Упавшие части пропускаются (вместе с паузой).
+    Куски склеиваются по MPEG-кадрам (../_common/mp3_stream.py): длительность в .sli — по числу записанных
+    кадров, в начало файла — заголовок Xing/Info, по [mp3] frame_index — индекс кадров <имя>.mp3.idx.
+    Пауза перед куском — тихие кадры с параметрами этого куска (частота/битрейт голоса), кратные кадру;
+    в .sli она входит в строку куска.
+    """
+    mp3_cfg = (cfg or {}).get("mp3", {})
+    mp3_cfg = mp3_cfg if isinstance(mp3_cfg, dict) else {}
+
+    async def numbered(i: int, coro):
+        try:
+            return i, await coro
+        except Exception as e:
+            return i, e
+
+    # суммируем длительности по индексу исходной строки (только для строк, где что-то прозвучало)
+    durations_by_line: Dict[int, float] = {}
+    with out_path.open("wb") as f:
+        writer = mp3_stream.Mp3Writer(f, xing=bool(mp3_cfg.get("xing_header", True)))
+
+        def write_piece(item) -> None:
+            (label, line_idx, _coro, pause_ms), res = item
+            if isinstance(res, BaseException):
+                print(f"{indent}! Ошибка части ({label}): {res} — пропуск части.")
+                return
+            _used, mp3_bytes, _d = res
+            d = writer.add_silence(pause_ms, mp3_stream.first_frame(mp3_bytes)) if pause_ms else 0.0
+            d += writer.add_stream(mp3_bytes)
+            durations_by_line[line_idx] = durations_by_line.get(line_idx, 0.0) + d
+
+        ordered = pool_runner.OrderedOutput(write_piece)
+        for done in asyncio.as_completed([numbered(i, job[2]) for i, job in enumerate(jobs)]):
+            i, res = await done
+            ordered.put(i, (jobs[i], res))
+        writer.close()
+
+    idx_path = mp3_stream.index_path(out_path)
+    if bool(mp3_cfg.get("frame_index", False)) and writer.write_index(idx_path):
+        print(f"{indent}Индекс кадров: {idx_path}")
+    elif idx_path.exists():
+        try:
+            idx_path.unlink()      # индекс от прошлой версии файла
+        except OSError:
+            pass
+
+    # Пишем ТОЛЬКО строки, где реально что-то озвучено (пустые строки исходника игнорируем всегда)
+    if durations_by_line:
+        lines = [f"{durations_by_line[i]:.3f}" for i in sorted(durations_by_line.keys())]
+        slides_path.write_text("\n".join(lines), encoding="utf-8")
+        print(f"  Тайминги (по строкам): {slides_path}")
+    print(f"  Готово: {out_path}")
+
 async def render_single_output(in_path: Path,
                                blocks: List[Tuple[str, List[Tuple[str, Optional[str], Optional[str], int, int]]]],
                                cfg: Dict,
-                               active_langs: Set[str]) -> None:
+                               active_langs: Set[str],
+                               synth: Optional[TTSSynth] = None) -> None:
     rate = int(cfg.get("rate", -10))
+    synth = synth or TTSSynth(cfg)
     blocks = [(lang, frs) for (lang, frs) in blocks if lang in active_langs]
     if not blocks:
         print("  После выбора активных языков блоков не осталось — пропуск.")
@@ -739,48 +1083,31 @@ async def render_single_output(in_path: Path,
     out_path = in_path.with_suffix(".mp3")
     # slides_path = in_path.with_suffix(".slides.txt")
     slides_path = in_path.with_suffix(".sli")
-    out_path.write_bytes(b"")
 
-    # суммируем длительности по индексу исходной строки (только для строк, где что-то прозвучало)
-    durations_by_line: Dict[int, float] = {}
+    jobs: List[Tuple[str, int, object, int]] = []
+    for i, (lang_key, frs) in enumerate(blocks, start=1):
+        text_pieces = glue_block_text(frs, cfg)  # [(text_part, voice_alias_or_id, line_idx, pause_ms)]
+        if not text_pieces:
+            continue
 
-    with out_path.open("ab") as f:
-        for i, (lang_key, frs) in enumerate(blocks, start=1):
-            text_pieces = glue_block_text(frs, cfg)  # [(text_part, voice_alias_or_id, line_idx)]
-            if not text_pieces:
+        print(f"  [Блок {i}/{len(blocks)}] lang={lang_key}, частей={len(text_pieces)}")
+        for idx, (piece, voice_alias, line_idx, pause_ms) in enumerate(text_pieces, start=1):
+            if _skip_piece(piece):
                 continue
+            chosen_voice, alts, strict = choose_voice_for_part(lang_key, voice_alias, cfg)
+            jobs.append((f"{lang_key} #{idx}", line_idx, synth.render(piece, chosen_voice, alts, strict, rate),
+                         pause_ms))
 
-            print(f"  [Блок {i}/{len(blocks)}] lang={lang_key}, частей={len(text_pieces)}")
-            for idx, (piece, voice_alias, line_idx) in enumerate(text_pieces, start=1):
-                if not piece.strip():
-                    continue
-                # защита: пропускаем чистые «паузные» куски (на всякий случай)
-                if len(piece.strip().replace(",", "")) == 0:
-                    continue
-
-                chosen_voice, alts, strict = choose_voice_for_part(lang_key, voice_alias, cfg)
-                try:
-                    used, mp3_bytes = await tts_render_with_fallback_to_bytes(piece, chosen_voice, alts, strict, rate)
-                    f.write(mp3_bytes)
-                    d = mp3_duration_from_bytes(mp3_bytes)
-                    durations_by_line[line_idx] = durations_by_line.get(line_idx, 0.0) + d
-                except Exception as e:
-                    print(f"    ! Ошибка части ({lang_key} #{idx}): {e} — пропуск части.")
-
-    # Пишем ТОЛЬКО строки, где реально что-то озвучено (пустые строки исходника игнорируем всегда)
-    if durations_by_line:
-        lines = [f"{durations_by_line[i]:.3f}" for i in sorted(durations_by_line.keys())]
-        slides_path.write_text("\n".join(lines), encoding="utf-8")
-        print(f"  Тайминги (по строкам): {slides_path}")
-
-    print(f"  Готово: {out_path}")
+    await assemble_output(out_path, slides_path, jobs, cfg)
 
 async def render_multi_en_outputs(in_path: Path,
                                   blocks: List[Tuple[str, List[Tuple[str, Optional[str], Optional[str], int, int]]]],
                                   cfg: Dict,
-                                  active_langs: Set[str]) -> None:
+                                  active_langs: Set[str],
+                                  synth: Optional[TTSSynth] = None) -> None:
     langs_cfg = get_languages_cfg(cfg)
     rate = int(cfg.get("rate", -10))
+    synth = synth or TTSSynth(cfg)
 
     if "en" not in langs_cfg:
         print("  multi_en_outputs=true, но язык 'en' не найден — пропуск.")
@@ -802,44 +1129,30 @@ async def render_multi_en_outputs(in_path: Path,
         return
 
     stem = in_path.stem
+    outputs = []
     for en_voice in alt_en:
         out_path = in_path.with_name(f"{stem}__{en_voice}.mp3")
         slides_path = in_path.with_name(f"{stem}__{en_voice}.sli")
-        out_path.write_bytes(b"")
-        durations_by_line: Dict[int, float] = {}
 
         print(f"\n  → Генерация EN-варианта голосом: {en_voice}")
-        with out_path.open("ab") as f:
-            for i, (lang_key, frs) in enumerate(blocks, start=1):
-                text_pieces = glue_block_text(frs, cfg)  # [(text, voice_alias, line_idx)]
-                if not text_pieces:
+        jobs: List[Tuple[str, int, object, int]] = []
+        for i, (lang_key, frs) in enumerate(blocks, start=1):
+            text_pieces = glue_block_text(frs, cfg)  # [(text, voice_alias, line_idx, pause_ms)]
+            if not text_pieces:
+                continue
+            print(f"    [Блок {i}/{len(blocks)}] lang={lang_key}, частей={len(text_pieces)}")
+            for idx, (piece, voice_alias, line_idx, pause_ms) in enumerate(text_pieces, start=1):
+                if _skip_piece(piece):
                     continue
-                print(f"    [Блок {i}/{len(blocks)}] lang={lang_key}, частей={len(text_pieces)}")
-                for idx, (piece, voice_alias, line_idx) in enumerate(text_pieces, start=1):
-                    if not piece.strip():
-                        continue
-                    if len(piece.strip().replace(",", "")) == 0:
-                        continue
-                    try:
-                        if lang_key == "en":
-                            mp3_bytes = await tts_render_bytes(piece, en_voice, rate)
-                            f.write(mp3_bytes)
-                            d = mp3_duration_from_bytes(mp3_bytes)
-                            durations_by_line[line_idx] = durations_by_line.get(line_idx, 0.0) + d
-                        else:
-                            chosen_voice, alts, strict = choose_voice_for_part(lang_key, voice_alias, cfg)
-                            used, mp3_bytes = await tts_render_with_fallback_to_bytes(piece, chosen_voice, alts, strict, rate)
-                            f.write(mp3_bytes)
-                            d = mp3_duration_from_bytes(mp3_bytes)
-                            durations_by_line[line_idx] = durations_by_line.get(line_idx, 0.0) + d
-                    except Exception as e:
-                        print(f"      ! Ошибка части ({lang_key} #{idx}): {e} — пропуск.")
-
-        if durations_by_line:
-            lines = [f"{durations_by_line[i]:.3f}" for i in sorted(durations_by_line.keys())]
-            slides_path.write_text("\n".join(lines), encoding="utf-8")
-            print(f"  Тайминги (по строкам): {slides_path}")
-        print(f"  Готово: {out_path}")
+                if lang_key == "en":
+                    coro = synth.render(piece, en_voice, [], True, rate, fallback=False)
+                else:
+                    chosen_voice, alts, strict = choose_voice_for_part(lang_key, voice_alias, cfg)
+                    coro = synth.render(piece, chosen_voice, alts, strict, rate)
+                jobs.append((f"{lang_key} #{idx}", line_idx, coro, pause_ms))
+        outputs.append(assemble_output(out_path, slides_path, jobs, cfg, indent="      "))
+
+    await asyncio.gather(*outputs)
 
 
 # =============================================================================
@@ -863,7 +1176,7 @@ def pick_active_languages_for_file(stem: str, cfg: Dict) -> Set[str]:
 # 10) Основной цикл
 # =============================================================================
 
-async def process_one_file(path: Path, cfg: Dict) -> None:
+async def process_one_file(path: Path, cfg: Dict, synth: Optional[TTSSynth] = None) -> None:
     print(f"\n=== Файл: {path}")
 
     raw_text = path.read_text(encoding="utf-8", errors="ignore")
@@ -912,9 +1225,65 @@ async def process_one_file(path: Path, cfg: Dict) -> None:
         return
 
     if bool(cfg.get("multi_en_outputs", False)):
-        await render_multi_en_outputs(path, blocks, cfg, active_langs)
+        await render_multi_en_outputs(path, blocks, cfg, active_langs, synth)
     else:
-        await render_single_output(path, blocks, cfg, active_langs)
+        await render_single_output(path, blocks, cfg, active_langs, synth)
+
+# буфер вывода задачи текущего файла (None — печатать сразу)
+_task_out: contextvars.ContextVar = contextvars.ContextVar("tts_task_out", default=None)
+
+
+class _TaskStdout:
+    """sys.stdout на время process_files: print из задачи файла (и её подзадач) уходит в буфер этого файла."""
+
+    def __init__(self, real):
+        self.real = real
+
+    def write(self, s: str) -> int:
+        buf = _task_out.get()
+        if buf is None:
+            return self.real.write(s)
+        buf.append(s)
+        return len(s)
+
+    def flush(self) -> None:
+        self.real.flush()
+
+
+async def process_files(files: List[Path], cfg: Dict, synth: Optional[TTSSynth] = None) -> None:
+    """Все файлы в одном event loop: куски всех файлов делят общий лимит параллельных запросов."""
+    synth = synth or TTSSynth(cfg)
+    syn = cfg.get("synthesis", {}) if isinstance(cfg.get("synthesis", {}), dict) else {}
+    workers = max(0, int(syn.get("workers", 0) or 0))
+    gate = asyncio.Semaphore(workers) if workers else None
+
+    real = sys.stdout
+    ordered = pool_runner.OrderedOutput(lambda text: (real.write(text), real.flush()))
+
+    async def one(i: int, p: Path) -> None:
+        buf: List[str] = []
+        _task_out.set(buf)   # контекст задачи копируется в её подзадачи — их print попадает сюда же
+        try:
+            if gate:
+                async with gate:
+                    await process_one_file(p, cfg, synth)
+            else:
+                await process_one_file(p, cfg, synth)
+        except Exception as e:
+            print(f"  Ошибка при обработке {p.name}: {e}")
+        finally:
+            ordered.put(i, "".join(buf))
+
+    if len(files) > 1:
+        sys.stdout = _TaskStdout(real)
+    try:
+        await asyncio.gather(*(one(i, p) for i, p in enumerate(files)))
+    finally:
+        sys.stdout = real
+    print("\n" + synth.stats_line())
+    if _lang_clf is not None:
+        print(_lang_clf.stats_line())
+        _lang_clf.save()
 
 def main():
     cfg_path = script_dir() / "tts_config.toml"
@@ -960,11 +1329,7 @@ def main():
         print("Файлы не найдены (проверьте 'input_dirs', 'recurse' и 'extensions').")
         sys.exit(1)
 
-    for p in files:
-        try:
-            asyncio.run(process_one_file(p, cfg))
-        except Exception as e:
-            print(f"  Ошибка при обработке {p.name}: {e}")
+    asyncio.run(process_files(files, cfg))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -12,7 +12,9 @@
 - фон: color | gradient | image
 - формат: png/jpg/webp (+jpeg_quality)
 - политика конфликтов: skip/overwrite/rename
-- dry_run, лог в файл (опционально), многопоточность (workers>1)
+- фон один на весь конфиг: рисуется и кодируется один раз, в выходы пишутся готовые байты
+  (output_mode: copy | hardlink | virtual — один общий файл на папку, его берёт шаг 4)
+- dry_run, лог в файл (опционально)
 
 Требуется: Python 3.11+ (tomllib) и Pillow (PIL).
 Установка Pillow:  pip install Pillow
@@ -21,10 +23,9 @@
 from __future__ import annotations
 
 import io
-import traceback
+import os
 from pathlib import Path
 from typing import Dict, Any, List, Tuple, Optional
-from dataclasses import dataclass
 
 # --- TOML (Python 3.11+) ---
 try:
@@ -35,13 +36,11 @@ except Exception:
 
 # --- Pillow ---
 try:
-    from PIL import Image, ImageDraw
+    from PIL import Image
 except Exception:
     print("❌ Не установлен Pillow (PIL). Установите: pip install Pillow")
     raise
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
 
 # =========================
 # УТИЛИТЫ
@@ -136,27 +135,19 @@ def make_gradient_image(
     rgba_to: Tuple[int, int, int, int],
     direction: str
 ) -> Image.Image:
-    base = Image.new("RGBA", (w, h), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(base)
-
-    if (direction or "vertical").lower() == "horizontal":
-        for x in range(w):
-            t = x / max(1, (w - 1))
-            r = int(rgba_from[0] + (rgba_to[0] - rgba_from[0]) * t)
-            g = int(rgba_from[1] + (rgba_to[1] - rgba_from[1]) * t)
-            b = int(rgba_from[2] + (rgba_to[2] - rgba_from[2]) * t)
-            a = int(rgba_from[3] + (rgba_to[3] - rgba_from[3]) * t)
-            draw.line([(x, 0), (x, h)], fill=(r, g, b, a))
-    else:
-        for y in range(h):
-            t = y / max(1, (h - 1))
-            r = int(rgba_from[0] + (rgba_to[0] - rgba_from[0]) * t)
-            g = int(rgba_from[1] + (rgba_to[1] - rgba_from[1]) * t)
-            b = int(rgba_from[2] + (rgba_to[2] - rgba_from[2]) * t)
-            a = int(rgba_from[3] + (rgba_to[3] - rgba_from[3]) * t)
-            draw.line([(0, y), (w, y)], fill=(r, g, b, a))
-
-    return base
+    """
+    Линейный градиент: цвета считаются один раз для полоски в 1 px (по строке/столбцу),
+    полоска растягивается на весь кадр без интерполяции (NEAREST) — пиксели те же, что при
+    построчном рисовании, но без цикла по кадру.
+    """
+    horizontal = (direction or "vertical").lower() == "horizontal"
+    n = w if horizontal else h
+    strip = bytearray()
+    for i in range(n):
+        t = i / max(1, (n - 1))
+        strip += bytes(int(c0 + (c1 - c0) * t) for c0, c1 in zip(rgba_from, rgba_to))
+    line = Image.frombytes("RGBA", (n, 1) if horizontal else (1, n), bytes(strip))
+    return line.resize((w, h), Image.NEAREST)
 
 
 def fit_background(img: Image.Image, canvas_w: int, canvas_h: int, mode: str) -> Image.Image:
@@ -381,40 +372,16 @@ def compute_output_path(in_file: Path, cfg: Dict[str, Any], image_format: str) -
 # СОХРАНЕНИЕ
 # =========================
 
-def save_image(
-    img: Image.Image,
-    path: Path,
-    image_format: str,
-    jpeg_quality: int,
-    conflicts: str,
-    dry_run: bool,
-    log_fp: Optional[io.TextIOBase]
-):
-    """Сохранение с учётом политики конфликтов."""
+def encode_image(img: Image.Image, image_format: str, jpeg_quality: int) -> bytes:
+    """Закодировать картинку в байты файла (один раз на прогон — дальше байты только пишутся)."""
     image_format = image_format.upper()
-    conflicts = (conflicts or "skip").lower()
-
-    target = path
-    if target.exists():
-        if conflicts == "skip":
-            log_print(f"⏭️  Уже существует, пропускаем: {target}", log_fp)
-            return
-        if conflicts == "rename":
-            target = safe_name_with_suffix(target)
-        elif conflicts == "overwrite":
-            pass
-        else:
-            log_print(f"⚠️  Неизвестная политика conflicts='{conflicts}', считаем как 'skip'", log_fp)
-            return
-
-    if dry_run:
-        log_print(f"[dry-run] Сохранили бы: {target}", log_fp)
-        return
+    if image_format == "JPG":
+        image_format = "JPEG"
 
     # Конвертация для форматов без альфы
     save_kwargs = {}
     to_save = img
-    if image_format in ("JPG", "JPEG", "WEBP"):
+    if image_format in ("JPEG", "WEBP"):
         save_kwargs["quality"] = max(1, min(95, int(jpeg_quality)))
         if to_save.mode not in ("RGB", "L"):
             bg = Image.new("RGB", to_save.size, (255, 255, 255))
@@ -422,39 +389,95 @@ def save_image(
             bg.paste(to_save, mask=to_save_alpha)
             to_save = bg
 
-    to_save.save(target, format=image_format, **save_kwargs)
-    log_print(f"💾 Сохранено: {target}", log_fp)
+    buf = io.BytesIO()
+    to_save.save(buf, format=image_format, **save_kwargs)
+    return buf.getvalue()
 
 
-# =========================
-# ОСНОВНАЯ ЛОГИКА
-# =========================
+def resolve_target(path: Path, conflicts: str, log_fp: Optional[io.TextIOBase]) -> Optional[Path]:
+    """Путь для записи с учётом политики конфликтов; None — пропустить."""
+    conflicts = (conflicts or "skip").lower()
+    if not path.exists():
+        return path
+    if conflicts == "skip":
+        log_print(f"⏭️  Уже существует, пропускаем: {path}", log_fp)
+        return None
+    if conflicts == "rename":
+        return safe_name_with_suffix(path)
+    if conflicts == "overwrite":
+        return path
+    log_print(f"⚠️  Неизвестная политика conflicts='{conflicts}', считаем как 'skip'", log_fp)
+    return None
+
+
+class BackgroundWriter:
+    """
+    Раскладывает одни и те же байты фона по выходным путям.
+    copy     — каждый файл пишется из памяти (без повторного кодирования);
+    hardlink — первый файл пишется, остальные — жёсткие ссылки на него (другой диск/ФС без ссылок → copy).
+               Осторожно: правка такого файла «на месте» (overwrite на шаге 3) меняет все копии;
+    virtual  — в каждую папку пишется один общий <shared_name>.<формат>, отдельных файлов нет:
+               шаг 4 берёт его для аудио без своей картинки ([input] fallback_image).
+    """
+
+    def __init__(self, data: bytes, mode: str, shared_name: str, conflicts: str, dry_run: bool,
+                 log_fp: Optional[io.TextIOBase]):
+        self.data = data
+        self.mode = mode
+        self.shared_name = shared_name
+        self.conflicts = conflicts
+        self.dry_run = dry_run
+        self.log_fp = log_fp
+        self.master: Optional[Path] = None
+        self.shared: set = set()
+
+    def _write(self, target: Path):
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(self.data)
+        os.replace(tmp, target)
+
+    def _link(self, target: Path) -> bool:
+        if self.master is None or not self.master.exists() or target == self.master:
+            return False
+        try:
+            if target.exists():
+                target.unlink()
+            os.link(self.master, target)
+            return True
+        except OSError:
+            return False
 
-@dataclass
-class Job:
-    in_file: Path
-    out_file: Path
+    def place(self, out_file: Path):
+        if self.mode == "virtual":
+            shared = out_file.with_name(f"{self.shared_name}{out_file.suffix}")
+            if shared not in self.shared:
+                if self.dry_run:
+                    log_print(f"[dry-run] Общий фон: {shared}", self.log_fp)
+                elif not (shared.exists() and shared.read_bytes() == self.data):
+                    self._write(shared)
+                    log_print(f"💾 Общий фон: {shared}", self.log_fp)
+                self.shared.add(shared)
+            log_print(f"🔗 {out_file.name} → общий фон {shared.name}", self.log_fp)
+            return
 
+        target = resolve_target(out_file, self.conflicts, self.log_fp)
+        if target is None:
+            return
+        if self.dry_run:
+            log_print(f"[dry-run] Сохранили бы: {target}", self.log_fp)
+            return
+        if self.mode == "hardlink" and self._link(target):
+            log_print(f"🔗 Ссылка: {target}", self.log_fp)
+            return
+        self._write(target)
+        if self.mode == "hardlink":
+            self.master = target
+        log_print(f"💾 Сохранено: {target}", self.log_fp)
 
-def process_one(job: Job, cfg_img: Dict[str, Any], conflicts: str, dry_run: bool, log_fp: Optional[io.TextIOBase]):
-    """Обработка одного аудиофайла: сгенерировать фон и сохранить."""
-    try:
-        img = make_background(cfg_img)
-        save_image(
-            img=img,
-            path=job.out_file,
-            image_format=str(cfg_img.get("format", "png")),
-            jpeg_quality=int(cfg_img.get("jpeg_quality", 90)),
-            conflicts=conflicts,
-            dry_run=dry_run,
-            log_fp=log_fp
-        )
-        return True, None
-    except Exception:
-        tb = traceback.format_exc()
-        log_print(f"❌ Ошибка для {job.in_file}:\n{tb}", log_fp)
-        return False, None
 
+# =========================
+# ОСНОВНАЯ ЛОГИКА
+# =========================
 
 def main():
     cfg = load_config()
@@ -462,7 +485,6 @@ def main():
     # Верхнеуровневые настройки
     dry_run = bool(cfg.get("dry_run", False))
     conflicts = str(cfg.get("conflicts", "skip"))
-    workers = int(cfg.get("workers", 0))
     log_file = (cfg.get("log_file") or "").strip()
 
     # Лог
@@ -491,32 +513,33 @@ def main():
             log_fp.close()
         return
 
-    # Задачи
+    # Фон один на весь прогон: рисуем, вписываем и кодируем один раз
     image_format = str(cfg_img.get("format", "png"))
-    jobs: List[Job] = []
+    try:
+        data = encode_image(make_background(cfg_img), image_format, int(cfg_img.get("jpeg_quality", 90)))
+    except Exception as e:
+        log_print(f"❌ Не удалось построить фон: {e}", log_fp)
+        if log_fp:
+            log_fp.close()
+        raise SystemExit(1)
+
+    output_mode = str(cfg.get("output_mode", "copy")).lower()
+    if output_mode not in ("copy", "hardlink", "virtual"):
+        log_print(f"⚠️  Неизвестный output_mode='{output_mode}', используем 'copy'", log_fp)
+        output_mode = "copy"
+    writer = BackgroundWriter(data, output_mode, str(cfg.get("shared_name") or "_background"),
+                              conflicts, dry_run, log_fp)
+    log_print(f"Старт. Всего файлов: {len(files)} | dry_run={dry_run} | output_mode={output_mode} "
+              f"| фон: {len(data) // 1024} КБ", log_fp)
+
+    ok = fail = 0
     for f in files:
-        out = compute_output_path(f, cfg, image_format=image_format)
-        jobs.append(Job(in_file=f, out_file=out))
-
-    # Информация о запуске
-    log_print(f"Старт. Всего задач: {len(jobs)} | dry_run={dry_run} | workers={workers}", log_fp)
-
-    # Обработка
-    ok = 0
-    fail = 0
-
-    if workers and workers > 1:
-        with ThreadPoolExecutor(max_workers=workers) as ex:
-            futures = {ex.submit(process_one, job, cfg_img, conflicts, dry_run, log_fp): job for job in jobs}
-            for fut in as_completed(futures):
-                success, _ = fut.result()
-                ok += 1 if success else 0
-                fail += 0 if success else 1
-    else:
-        for job in jobs:
-            success, _ = process_one(job, cfg_img, conflicts, dry_run, log_fp)
-            ok += 1 if success else 0
-            fail += 0 if success else 1
+        try:
+            writer.place(compute_output_path(f, cfg, image_format=image_format))
+            ok += 1
+        except Exception as e:
+            log_print(f"❌ Ошибка для {f}: {e}", log_fp)
+            fail += 1
 
     # Итог
     log_print(f"Готово. Успешно: {ok} | Ошибок: {fail}", log_fp)
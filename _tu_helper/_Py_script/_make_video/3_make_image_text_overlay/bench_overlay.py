@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+bench_overlay.py — замер раскладки текста image_text_overlay: прежний подбор (шаг −1 px, truetype и
+textbbox на каждое слово) против бисекции с кэшем шрифтов и ширин слов.
+
+Для каждого текста (режим full_text — весь урок одним блоком, самый тяжёлый случай) вызывается
+layout_text_block для пустого кадра; считаются время, вызовы ImageFont.truetype и
+ImageDraw.textbbox, и сверяется результат: размер шрифта и строки переноса должны совпасть с прежними.
+
+Запуск:
+    python bench_overlay.py --font /path/to/font.ttf
+    python bench_overlay.py --font font.ttf --texts ../data --size 1920x1080 --repeat 3
+Без --texts генерируются синтетические длинные уроки.
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+import image_text_overlay as ito
+
+
+# =========================
+# Прежний алгоритм (эталон для сравнения)
+# =========================
+
+def legacy_wrap(text: str, font, draw, max_w: int) -> List[str]:
+    lines: List[str] = []
+    for raw in text.splitlines():
+        if raw.strip() == "" and raw != "":
+            lines.append("")
+            continue
+        cur = ""
+        for w in raw.split(" "):
+            cand = (cur + " " + w).strip() if cur else w
+            bb = draw.textbbox((0, 0), cand, font=font, stroke_width=0)
+            if bb[2] - bb[0] <= max_w or not cur:
+                cur = cand
+            else:
+                lines.append(cur); cur = w
+        if cur != "":
+            lines.append(cur)
+    return lines
+
+
+def legacy_block(lines: List[str], font, draw, line_spacing: float, stroke_width: int) -> Tuple[int, int]:
+    max_w, total_h, prev_h = 0, 0, 0
+    for i, line in enumerate(lines):
+        bb = draw.textbbox((0, 0), line if line else " ", font=font, stroke_width=stroke_width)
+        h = bb[3] - bb[1]
+        max_w = max(max_w, bb[2] - bb[0])
+        total_h += h if i == 0 else int(prev_h * line_spacing)
+        prev_h = h
+    return max_w, total_h
+
+
+def legacy_layout(text: str, cfg: dict, W: int, H: int) -> Tuple[int, List[str]]:
+    draw = ImageDraw.Draw(Image.new("RGBA", (W, H)), "RGBA")
+    max_w = int(W * cfg["max_width_pct"]); max_h = int(H * cfg["max_height_pct"])
+    min_font, sw, ls = cfg["min_font_size"], cfg["stroke_width"], cfg["line_spacing"]
+    fs = max(int(H * 0.07), min_font)
+    font = ImageFont.truetype(cfg["font_path"], fs)
+    wrapped = legacy_wrap(text, font, draw, max_w)
+    bh = legacy_block(wrapped, font, draw, ls, sw)[1]
+    while bh > max_h and fs > min_font:
+        fs -= 1; font = ImageFont.truetype(cfg["font_path"], fs)
+        wrapped = legacy_wrap(text, font, draw, max_w)
+        bh = legacy_block(wrapped, font, draw, ls, sw)[1]
+    if bh > max_h:
+        while wrapped and legacy_block(wrapped, font, draw, ls, sw)[1] > max_h:
+            wrapped = wrapped[:-1]
+        if wrapped: wrapped[-1] = (wrapped[-1] + "…").rstrip()
+    return fs, wrapped
+
+
+# =========================
+# Новый алгоритм (тот же путь, что в render_text_block_on_image)
+# =========================
+
+def new_layout(text: str, cfg: dict, W: int, H: int) -> Tuple[int, List[str]]:
+    layer = ito.layout_text_block((W, H), text.splitlines(), cfg)
+    return layer.m.font.size, [line for _x, _y, line in layer.items]
+
+
+# =========================
+# Счётчики и входные данные
+# =========================
+
+class Counters:
+    def __init__(self):
+        self.truetype = 0
+        self.textbbox = 0
+        self._tt = ImageFont.truetype
+        self._bb = ImageDraw.ImageDraw.textbbox
+
+    def __enter__(self):
+        c = self
+
+        def truetype(*a, **kw):
+            c.truetype += 1
+            return c._tt(*a, **kw)
+
+        def textbbox(self_, *a, **kw):
+            c.textbbox += 1
+            return c._bb(self_, *a, **kw)
+
+        ImageFont.truetype = truetype
+        ImageDraw.ImageDraw.textbbox = textbbox
+        return self
+
+    def __exit__(self, *exc):
+        ImageFont.truetype = self._tt
+        ImageDraw.ImageDraw.textbbox = self._bb
+
+
+def synthetic_texts(n: int, lines: int) -> List[Tuple[str, str]]:
+    rnd = random.Random(42)
+    en = "the quick brown fox jumps over lazy dog while morning light falls on quiet river banks".split()
+    ru = "урок начинается с простых фраз которые потом складываются в длинные предложения".split()
+    out = []
+    for t in range(n):
+        rows = []
+        for _ in range(lines):
+            words = en if rnd.random() < 0.5 else ru
+            rows.append(" ".join(rnd.choice(words) for _ in range(rnd.randint(4, 18))))
+        out.append((f"synthetic_{t:02d}", "\n".join(rows)))
+    return out
+
+
+def folder_texts(root: Path) -> List[Tuple[str, str]]:
+    return [(p.name, p.read_text(encoding="utf-8", errors="replace"))
+            for p in sorted(root.rglob("*.txt"))]
+
+
+def run(fn, texts, cfg, W, H, repeat):
+    results, best = None, None
+    with Counters() as c:
+        for _ in range(repeat):
+            ito.get_font.cache_clear(); ito.get_metrics.cache_clear()
+            t0 = time.perf_counter()
+            results = [fn(text, cfg, W, H) for _name, text in texts]
+            sec = time.perf_counter() - t0
+            best = sec if best is None else min(best, sec)
+    return results, best, c.truetype // repeat, c.textbbox // repeat
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Бенчмарк раскладки текста image_text_overlay")
+    ap.add_argument("--font", required=True, help="путь к .ttf/.otf")
+    ap.add_argument("--texts", default="", help="папка с .txt (по умолчанию — синтетические уроки)")
+    ap.add_argument("--count", type=int, default=3, help="синтетических текстов")
+    ap.add_argument("--lines", type=int, default=12, help="строк в синтетическом тексте")
+    ap.add_argument("--size", default="1920x1080")
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+
+    W, H = (int(x) for x in args.size.lower().split("x"))
+    texts = folder_texts(Path(args.texts)) if args.texts else synthetic_texts(args.count, args.lines)
+    if not texts:
+        raise SystemExit("нет .txt для замера")
+    cfg = {"font_path": args.font, "font_size": "auto", "min_font_size": 14,
+           "max_width_pct": 0.9, "max_height_pct": 0.5, "line_spacing": 1.2,
+           "stroke_width": 2, "readability_style": "both"}
+
+    old, old_sec, old_tt, old_bb = run(legacy_layout, texts, cfg, W, H, args.repeat)
+    new, new_sec, new_tt, new_bb = run(new_layout, texts, cfg, W, H, args.repeat)
+
+    print(f"\nтекстов: {len(texts)}, кадр {W}x{H}, шрифт {Path(args.font).name}")
+    print(f"{'':>12} {'сек':>8} {'truetype':>9} {'textbbox':>9}")
+    print(f"{'прежний':>12} {old_sec:>8.3f} {old_tt:>9} {old_bb:>9}")
+    print(f"{'бисекция':>12} {new_sec:>8.3f} {new_tt:>9} {new_bb:>9}")
+    print(f"ускорение: {old_sec / new_sec:.1f}x")
+
+    same_fs = sum(1 for a, b in zip(old, new) if a[0] == b[0])
+    same_lines = sum(1 for a, b in zip(old, new) if a == b)
+    print(f"размер шрифта совпал: {same_fs}/{len(texts)}, перенос совпал: {same_lines}/{len(texts)}")
+    for (name, _t), a, b in zip(texts, old, new):
+        if a != b:
+            print(f"  {name}: прежний {a[0]}px/{len(a[1])} строк, новый {b[0]}px/{len(b[1])} строк")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,14 +27,24 @@ TXT → ищем картинки рядом → накладываем текс
 - target_images: all/first
 - индексация выходов при циклах
 - безопасное удаление исходника — один раз после обработки всех блоков для этой картинки
+- workers: TXT обрабатываются параллельно в процессах (../_common/pool_runner.py; 0 — по числу ядер,
+  1 — последовательно); TXT, которым достаются одни и те же картинки, идут в одной задаче по порядку
+- compose_mode: full (открыть/наложить/сохранить каждый раз) | cached (картинка декодируется один раз,
+  на копию накладывается плитка с текстом) | layers (только слой текста PNG + .overlay.json — кадр собирает шаг 4)
+- подбор размера шрифта — бисекцией; шрифты и ширины слов кэшируются на (путь, размер, контур),
+  перенос считается префиксными суммами ширин (замер: bench_overlay.py)
 - Python 3.11+ (tomllib), Pillow
 """
 
+import os
 import sys
+import json
 import logging
 from typing import List, Tuple, Optional, Iterable, Dict, Any
 from pathlib import Path
 import re
+from bisect import bisect_right
+from functools import lru_cache
 
 try:
     import tomllib  # Python 3.11+
@@ -44,6 +54,9 @@ except Exception:
 
 from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageColor
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "_common"))
+import pool_runner  # noqa: E402
+
 
 # =========================
 # Конфиг/логирование
@@ -122,65 +135,161 @@ def compute_anchor_xy(anchor: str, W: int, H: int, bw: int, bh: int, mx: int, my
     return x, y
 
 
-def wrap_text_to_width(text: str, font: ImageFont.FreeTypeFont, draw: ImageDraw.ImageDraw, max_w: int) -> List[str]:
+# =========================
+# Раскладка: кэш шрифтов и метрик
+# =========================
+
+@lru_cache(maxsize=64)
+def get_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    """FreeTypeFont на (путь, размер): файл шрифта читается один раз на процесс."""
+    return ImageFont.truetype(font_path, size)
+
+
+class TextMetrics:
+    """
+    Метрики одного шрифта (путь, размер, контур) с мемоизацией:
+    - word(w)  — ширина продвижения слова (getlength), из них префиксными суммами считается ширина строки;
+    - width(s) — ширина bbox строки без контура (точная проверка переноса);
+    - box(s)   — (ширина, высота) bbox строки с контуром — для размеров блока и рисования;
+    - bbox(s)  — сам bbox строки с контуром от (0, 0) — границы чернил для слоя текста.
+    Каждый словарь — не больше MEMO_MAX записей: при переполнении очищается (длинная пачка не копит строки
+    всех файлов; строки одного файла между собой повторяются, им хватает).
+    """
+
+    MEMO_MAX = 4096
+
+    def __init__(self, font: ImageFont.FreeTypeFont, stroke_width: int):
+        self.font = font
+        self.stroke_width = stroke_width
+        self.draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)), "RGBA")
+        self._words: Dict[str, float] = {}
+        self._widths: Dict[str, int] = {}
+        self._bboxes: Dict[str, Tuple[int, int, int, int]] = {}
+        self.space = self.word(" ")
+
+    def _remember(self, memo: dict, key: str, value):
+        if len(memo) >= self.MEMO_MAX:
+            memo.clear()
+        memo[key] = value
+        return value
+
+    def word(self, w: str) -> float:
+        v = self._words.get(w)
+        if v is None:
+            v = self._remember(self._words, w, self.font.getlength(w))
+        return v
+
+    def width(self, line: str) -> int:
+        v = self._widths.get(line)
+        if v is None:
+            bb = self.draw.textbbox((0, 0), line, font=self.font, stroke_width=0)
+            v = self._remember(self._widths, line, bb[2] - bb[0])
+        return v
+
+    def bbox(self, line: str) -> Tuple[int, int, int, int]:
+        v = self._bboxes.get(line)
+        if v is None:
+            v = self._remember(self._bboxes, line, tuple(self.draw.textbbox(
+                (0, 0), line if line else " ", font=self.font, stroke_width=self.stroke_width)))
+        return v
+
+    def box(self, line: str) -> Tuple[int, int]:
+        bb = self.bbox(line)
+        return bb[2] - bb[0], bb[3] - bb[1]
+
+
+@lru_cache(maxsize=64)
+def get_metrics(font_path: str, size: int, stroke_width: int) -> TextMetrics:
+    return TextMetrics(get_font(font_path, size), stroke_width)
+
+
+def wrap_text_to_width(text: str, m: TextMetrics, max_w: int) -> List[str]:
+    """
+    Жадный перенос по словам. Ширина «w[i] … w[j-1]» ≈ key[j] − key[i] − space, где key — префиксные суммы
+    (ширина слова + пробел), поэтому конец строки ищется бисекцией. Кернинг и выносы глифов суммы не учитывают —
+    оценка уточняется textbbox-ом на границе (обычно два вызова на строку вместо одного на каждое слово),
+    так что переносы совпадают с посимвольным измерением.
+    """
     lines: List[str] = []
     for raw in text.splitlines():
         if raw.strip() == "" and raw != "":
             lines.append("")
             continue
-        words = raw.split(" ")
-        if not words:
-            lines.append("")
-            continue
-        cur = ""
+        words = [w for w in raw.split(" ") if w]
+        key = [0.0]
         for w in words:
-            cand = (cur + " " + w).strip() if cur else w
-            bb = draw.textbbox((0, 0), cand, font=font, stroke_width=0)
-            width = bb[2] - bb[0]
-            if width <= max_w or not cur:
-                cur = cand
-            else:
-                lines.append(cur); cur = w
-        if cur != "":
-            lines.append(cur)
+            key.append(key[-1] + m.word(w) + m.space)
+        i, n = 0, len(words)
+        while i < n:
+            j = max(i + 1, min(n, bisect_right(key, key[i] + m.space + max_w) - 1))
+            while j < n and m.width(" ".join(words[i:j + 1])) <= max_w:
+                j += 1
+            while j - i > 1 and m.width(" ".join(words[i:j])) > max_w:
+                j -= 1
+            lines.append(" ".join(words[i:j]))
+            i = j
     return lines
 
 
-def text_block_bbox(lines: List[str], font: ImageFont.FreeTypeFont, draw: ImageDraw.ImageDraw,
-                    line_spacing: float, stroke_width: int) -> Tuple[int, int]:
-    max_w, total_h, prev_h = 0, 0, 0
-    for i, line in enumerate(lines):
-        bb = draw.textbbox((0,0), line if line else " ", font=font, stroke_width=stroke_width)
-        w = bb[2]-bb[0]; h = bb[3]-bb[1]
-        max_w = max(max_w, w)
-        total_h += h if i == 0 else int(prev_h * line_spacing)
+def _line_heights_total(heights: List[int], line_spacing: float) -> int:
+    total, prev_h = 0, 0
+    for i, h in enumerate(heights):
+        total += h if i == 0 else int(prev_h * line_spacing)
         prev_h = h
-    return max_w, total_h
+    return total
 
 
-def draw_multiline_text(img: Image.Image, xy: Tuple[int,int], lines: List[str],
-                        font: ImageFont.FreeTypeFont, color: Tuple[int,int,int,int], align: str,
-                        line_spacing: float, readability_style: str, stroke_width: int,
-                        stroke_fill: Tuple[int,int,int,int], background_box_fill: Tuple[int,int,int,int]):
-    draw = ImageDraw.Draw(img, "RGBA")
-    bw, bh = text_block_bbox(lines, font, draw, line_spacing, stroke_width)
-    x, y = xy
-    if readability_style in ("box", "both"):
-        box = Image.new("RGBA", (bw, bh), background_box_fill)
-        img.alpha_composite(box, dest=(x, y))
+def text_block_bbox(lines: List[str], m: TextMetrics, line_spacing: float) -> Tuple[int, int]:
+    boxes = [m.box(line) for line in lines]
+    return max((w for w, _h in boxes), default=0), _line_heights_total([h for _w, h in boxes], line_spacing)
 
-    prev_h = 0; ly = y
-    for i, line in enumerate(lines):
-        bb = draw.textbbox((0,0), line if line else " ", font=font, stroke_width=stroke_width)
-        lw = bb[2]-bb[0]; lh = bb[3]-bb[1]
-        ly = y if i == 0 else (ly + int(prev_h * line_spacing))
-        prev_h = lh
-        if align == "left": lx = x
-        elif align == "right": lx = x + (bw - lw)
-        else: lx = x + (bw - lw)//2
-        draw.text((lx, ly), line, font=font, fill=color,
-                  stroke_width=stroke_width if readability_style in ("stroke","both") else 0,
-                  stroke_fill=stroke_fill)
+
+class TextLayer:
+    """
+    Разложенный текст в координатах кадра W×H: подложка (если есть) и строки с позициями.
+    paint(img) рисует прямо на кадре; tile() — только слой текста на прозрачной плитке по границам
+    чернил (+ её смещение в кадре): для наложения на готовую картинку или фильтром overlay в ffmpeg.
+    """
+
+    def __init__(self, size: Tuple[int, int], m: TextMetrics, items: List[Tuple[int, int, str]],
+                 box: Optional[Tuple[int, int, int, int]], box_fill: Tuple[int,int,int,int],
+                 color: Tuple[int,int,int,int], stroke_width: int, stroke_fill: Tuple[int,int,int,int]):
+        self.size = size
+        self.m = m
+        self.items = items            # (x, y, строка)
+        self.box = box                # (x, y, w, h) подложки или None
+        self.box_fill = box_fill
+        self.color = color
+        self.stroke_width = stroke_width
+        self.stroke_fill = stroke_fill
+
+    def paint(self, img: Image.Image, dx: int = 0, dy: int = 0):
+        if self.box:
+            x, y, w, h = self.box
+            img.alpha_composite(Image.new("RGBA", (w, h), self.box_fill), dest=(x - dx, y - dy))
+        draw = ImageDraw.Draw(img, "RGBA")
+        for x, y, line in self.items:
+            draw.text((x - dx, y - dy), line, font=self.m.font, fill=self.color,
+                      stroke_width=self.stroke_width, stroke_fill=self.stroke_fill)
+
+    def bounds(self) -> Tuple[int, int, int, int]:
+        """Границы подложки и чернил всех строк (контур учтён), обрезанные по кадру."""
+        rects = [(x + bb[0], y + bb[1], x + bb[2], y + bb[3])
+                 for x, y, line in self.items for bb in (self.m.bbox(line),)]
+        if self.box:
+            x, y, w, h = self.box
+            rects.append((x, y, x + w, y + h))
+        W, H = self.size
+        if not rects:
+            return 0, 0, 0, 0
+        return (max(0, min(r[0] for r in rects)), max(0, min(r[1] for r in rects)),
+                min(W, max(r[2] for r in rects)), min(H, max(r[3] for r in rects)))
+
+    def tile(self) -> Tuple[Image.Image, Tuple[int, int]]:
+        x0, y0, x1, y1 = self.bounds()
+        tile = Image.new("RGBA", (max(1, x1 - x0), max(1, y1 - y0)), (0, 0, 0, 0))
+        self.paint(tile, x0, y0)
+        return tile, (x0, y0)
 
 
 # =========================
@@ -369,33 +478,44 @@ def filter_lines_by_markers(lines: List[str], markers: List[str], drop_lines: bo
 # Рендеринг текста
 # =========================
 
-def fit_single_line_to_box(text_line: str, font_path: str, font_size: int, min_font_size: int,
-                           draw: ImageDraw.ImageDraw, max_w: int, max_h: int,
-                           stroke_width: int) -> Tuple[ImageFont.FreeTypeFont, str, int, int]:
-    size = font_size
-    font = ImageFont.truetype(font_path, size)
-
-    def bbox(line: str) -> Tuple[int,int]:
-        bb = draw.textbbox((0,0), line if line else " ", font=font, stroke_width=stroke_width)
-        return bb[2]-bb[0], bb[3]-bb[1]
+def _largest_fitting(lo: int, hi: int, fits) -> Optional[int]:
+    """Наибольший size из [lo, hi], для которого fits(size) — бисекцией (fits монотонна по размеру)."""
+    best = None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            best, lo = mid, mid + 1
+        else:
+            hi = mid - 1
+    return best
 
-    bw, bh = bbox(text_line)
-    while (bw > max_w or bh > max_h) and size > min_font_size:
-        size -= 1; font = ImageFont.truetype(font_path, size); bw, bh = bbox(text_line)
 
-    if bw > max_w:
-        ell = "…"; base = text_line
-        while base and (draw.textbbox((0,0), base+ell, font=font, stroke_width=stroke_width)[2] >
-                        max_w):
-            base = base[:-1]
-        text_line = (base+ell) if base else ell
-        bw, bh = bbox(text_line)
-    return font, text_line, bw, bh
+def fit_single_line_to_box(text_line: str, font_path: str, font_size: int, min_font_size: int,
+                           max_w: int, max_h: int,
+                           stroke_width: int) -> Tuple[TextMetrics, str, int, int]:
+    def fits(size: int) -> bool:
+        bw, bh = get_metrics(font_path, size, stroke_width).box(text_line)
+        return bw <= max_w and bh <= max_h
 
+    size = font_size
+    if not fits(size) and size > min_font_size:
+        size = _largest_fitting(min_font_size, size - 1, fits) or min_font_size
+    m = get_metrics(font_path, size, stroke_width)
+    bw, bh = m.box(text_line)
 
-def render_text_block_on_image(img: Image.Image, text_lines: List[str], cfg: dict) -> Image.Image:
-    if img.mode != "RGBA": img = img.convert("RGBA")
-    W,H = img.size
+    if bw > max_w:
+        # самый длинный префикс, который с «…» влезает по правому краю
+        ell = "…"
+        def right(k: int) -> int:
+            return m.draw.textbbox((0,0), text_line[:k]+ell, font=m.font, stroke_width=stroke_width)[2]
+        k = _largest_fitting(1, len(text_line), lambda k: right(k) <= max_w) or 0
+        text_line = (text_line[:k]+ell) if k else ell
+        bw, bh = m.box(text_line)
+    return m, text_line, bw, bh
+
+
+def layout_text_block(size: Tuple[int, int], text_lines: List[str], cfg: dict) -> TextLayer:
+    W,H = size
     max_w = int(W*float(cfg.get("max_width_pct",0.9)))
     max_h = int(H*float(cfg.get("max_height_pct",0.5)))
     mx = int(cfg.get("margin_x",32)); my = int(cfg.get("margin_y",32))
@@ -415,34 +535,61 @@ def render_text_block_on_image(img: Image.Image, text_lines: List[str], cfg: dic
     min_font = int(cfg.get("min_font_size",14))
     font_size_cfg = cfg.get("font_size","auto")
 
-    draw = ImageDraw.Draw(img, "RGBA")
     fs = int(font_size_cfg) if isinstance(font_size_cfg,int) else max(int(H*0.07), min_font)
-    font = ImageFont.truetype(font_path, fs)
-
-    wrapped = wrap_text_to_width("\n".join(text_lines), font, draw, max_w)
-    bw,bh = text_block_bbox(wrapped, font, draw, line_spacing, stroke_width)
-    while bh > max_h and fs > min_font:
-        fs -= 1; font = ImageFont.truetype(font_path, fs)
-        wrapped = wrap_text_to_width("\n".join(text_lines), font, draw, max_w)
-        bw,bh = text_block_bbox(wrapped, font, draw, line_spacing, stroke_width)
+    text = "\n".join(text_lines)
+    layouts: Dict[int, Tuple[List[str], int, int]] = {}
+
+    def layout(size: int) -> Tuple[List[str], int, int]:
+        if size not in layouts:
+            m = get_metrics(font_path, size, stroke_width)
+            wrapped = wrap_text_to_width(text, m, max_w)
+            layouts[size] = (wrapped,) + text_block_bbox(wrapped, m, line_spacing)
+        return layouts[size]
+
+    # наибольший размер, при котором блок влезает по высоте (раньше — перебор вниз по 1 px)
+    if layout(fs)[2] > max_h and fs > min_font:
+        fs = _largest_fitting(min_font, fs - 1, lambda size: layout(size)[2] <= max_h) or min_font
+    m = get_metrics(font_path, fs, stroke_width)
+    wrapped, bw, bh = layout(fs)
 
     if bh > max_h and fs == min_font:
         logging.warning("Блок не помещается даже при min_font_size=%d — будет усечён.", min_font)
-        while wrapped and text_block_bbox(wrapped, font, draw, line_spacing, stroke_width)[1] > max_h:
-            wrapped = wrapped[:-1]
+        heights = [m.box(line)[1] for line in wrapped]
+        n = len(wrapped)
+        while n and _line_heights_total(heights[:n], line_spacing) > max_h:
+            n -= 1
+        wrapped = wrapped[:n]
         if wrapped: wrapped[-1] = (wrapped[-1] + "…").rstrip()
-        bw,bh = text_block_bbox(wrapped, font, draw, line_spacing, stroke_width)
+        bw,bh = text_block_bbox(wrapped, m, line_spacing)
 
+    full_w = bw
     bw = min(bw, max_w); bh = min(bh, max_h)
     x,y = compute_anchor_xy(anchor, W,H, bw,bh, mx,my)
-    draw_multiline_text(img,(x,y), wrapped, font, color, align, line_spacing,
-                        readability_style, stroke_width, stroke_fill, background_box_fill)
-    return img
+
+    # строки — как раньше рисовались по блоку ширины full_w, начиная с (x, y)
+    items: List[Tuple[int, int, str]] = []
+    prev_h = 0; ly = y
+    for i, line in enumerate(wrapped):
+        lw, lh = m.box(line)
+        ly = y if i == 0 else (ly + int(prev_h * line_spacing))
+        prev_h = lh
+        if align == "left": lx = x
+        elif align == "right": lx = x + (full_w - lw)
+        else: lx = x + (full_w - lw)//2
+        items.append((lx, ly, line))
+    box = (x, y) + text_block_bbox(wrapped, m, line_spacing) if readability_style in ("box","both") else None
+    return TextLayer((W, H), m, items, box, background_box_fill, color,
+                     stroke_width if readability_style in ("stroke","both") else 0, stroke_fill)
 
 
-def render_single_line_on_image(img: Image.Image, line: str, cfg: dict) -> Image.Image:
+def render_text_block_on_image(img: Image.Image, text_lines: List[str], cfg: dict) -> Image.Image:
     if img.mode != "RGBA": img = img.convert("RGBA")
-    W,H = img.size
+    layout_text_block(img.size, text_lines, cfg).paint(img)
+    return img
+
+
+def layout_single_line(size: Tuple[int, int], line: str, cfg: dict) -> TextLayer:
+    W,H = size
     max_w = int(W*float(cfg.get("max_width_pct",0.9)))
     max_h = int(H*float(cfg.get("max_height_pct",0.5)))
     mx = int(cfg.get("margin_x",32)); my = int(cfg.get("margin_y",32))
@@ -460,44 +607,99 @@ def render_single_line_on_image(img: Image.Image, line: str, cfg: dict) -> Image
     min_font = int(cfg.get("min_font_size",14))
     font_size_cfg = cfg.get("font_size","auto")
 
-    draw = ImageDraw.Draw(img, "RGBA")
     base_size = int(font_size_cfg) if isinstance(font_size_cfg,int) else max(int(H*0.07), min_font)
-    font, line_fit, bw, bh = fit_single_line_to_box(line, font_path, base_size, min_font,
-                                                    draw, max_w, max_h, stroke_width)
+    m, line_fit, bw, bh = fit_single_line_to_box(line, font_path, base_size, min_font,
+                                                 max_w, max_h, stroke_width)
     x,y = compute_anchor_xy(anchor, W,H, bw,bh, mx,my)
-    if readability_style in ("box","both"):
-        box = Image.new("RGBA", (bw,bh), background_box_fill)
-        img.alpha_composite(box, dest=(x,y))
-    ImageDraw.Draw(img, "RGBA").text((x,y), line_fit, font=font, fill=color,
-                                     stroke_width=stroke_width if readability_style in ("stroke","both") else 0,
-                                     stroke_fill=stroke_fill)
+    box = (x, y, bw, bh) if readability_style in ("box","both") else None
+    return TextLayer((W, H), m, [(x, y, line_fit)], box, background_box_fill, color,
+                     stroke_width if readability_style in ("stroke","both") else 0, stroke_fill)
+
+
+def render_single_line_on_image(img: Image.Image, line: str, cfg: dict) -> Image.Image:
+    if img.mode != "RGBA": img = img.convert("RGBA")
+    layout_single_line(img.size, line, cfg).paint(img)
     return img
 
 
+def layout_for_mode(size: Tuple[int, int], mode: str, block_lines: Optional[List[str]], cfg: dict) -> TextLayer:
+    if mode == "single_line":
+        return layout_single_line(size, block_lines[0] if block_lines else "", cfg)
+    return layout_text_block(size, block_lines or [""], cfg)
+
+
 # =========================
 # Сохранение/удаление
 # =========================
 
+LAYER_SIDECAR = ".overlay.json"   # рядом со слоем текста: {"base": картинка, "x": .., "y": ..} — читает шаг 4
+
+
+def compose_mode_of(cfg: dict) -> str:
+    mode = str(cfg.get("compose_mode", "full")).lower()
+    return mode if mode in ("full", "cached", "layers") else "full"
+
+
+def open_base_image(img_path: Path, cfg: dict) -> Tuple[Image.Image, bool]:
+    """Картинка с учётом EXIF-ориентации; второй элемент — была ли она повёрнута."""
+    img = Image.open(img_path)
+    rotated = False
+    if cfg.get("respect_exif_orientation", True):
+        rotated = img.getexif().get(0x0112, 1) not in (0, 1)
+        img = ImageOps.exif_transpose(img)
+    return img, rotated
+
+
+def save_text_layer(tile: Image.Image, xy: Tuple[int, int], img_path: Path, out_path: Path, size: Tuple[int, int]):
+    ensure_dir(out_path.parent)
+    tile.save(out_path, format="PNG", compress_level=1)
+    try:
+        base = os.path.relpath(img_path, out_path.parent)
+    except ValueError:  # другой диск (Windows)
+        base = str(img_path)
+    meta = {"base": base.replace(os.sep, "/"), "x": xy[0], "y": xy[1], "width": size[0], "height": size[1]}
+    out_path.with_name(out_path.stem + LAYER_SIDECAR).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
 def process_one_image(img_path: Path, cfg: dict, mode: str,
                       block_lines: Optional[List[str]], dry_run: bool,
-                      indexing_kwargs: Optional[dict]=None) -> Tuple[bool, Optional[Path]]:
+                      indexing_kwargs: Optional[dict]=None,
+                      base_cache: Optional[Dict[Path, Tuple[Image.Image, bool]]]=None) -> Tuple[bool, Optional[Path]]:
+    """
+    compose_mode:
+      full   — открыть, наложить текст, сохранить (каждый раз заново);
+      cached — картинка декодируется один раз на base_cache, на её копию накладывается плитка слоя текста;
+      layers — сохраняется только слой текста (PNG) + LAYER_SIDECAR со смещением; кадр собирает ffmpeg на шаге 4.
+    """
     try:
-        img = Image.open(img_path)
-        if cfg.get("respect_exif_orientation", True):
-            img = ImageOps.exif_transpose(img)
-
+        compose = compose_mode_of(cfg)
         if dry_run:
             preview = "\\n".join(block_lines or [])
             logging.info("[DRY RUN] %s → режим=%s, строк(в блоке)=%d; пример: %r",
                          img_path.name, mode, len(block_lines or []), preview[:80])
             return True, None
 
-        if mode == "single_line":
-            img = render_single_line_on_image(img, block_lines[0] if block_lines else "", cfg)
+        if compose == "full":
+            img, rotated = open_base_image(img_path, cfg)
         else:
-            img = render_text_block_on_image(img, block_lines or [""], cfg)
+            if base_cache is None:
+                base_cache = {}
+            if img_path not in base_cache:
+                base, rotated = open_base_image(img_path, cfg)
+                base_cache[img_path] = (base.convert("RGBA") if base.mode != "RGBA" else base, rotated)
+            img, rotated = base_cache[img_path]
+
+        layer = layout_for_mode(img.size, mode, block_lines, cfg)
+        if compose != "full":
+            tile, xy = layer.tile()
 
         save_format, save_ext = normalize_format_and_ext(img_path, cfg.get("save_format",""))
+        as_layer = compose == "layers" and not rotated
+        if compose == "layers" and rotated:
+            # ffmpeg не поворачивает картинки по EXIF — смещение слоя не совпадёт, собираем кадр здесь
+            logging.info("EXIF-поворот у %s — слой текста наложен сразу (layers → cached).", img_path.name)
+        if as_layer:
+            save_format, save_ext = "PNG", ".png"
         kw = indexing_kwargs or {}
         out_path = choose_output_path(
             src_img=img_path,
@@ -511,6 +713,21 @@ def process_one_image(img_path: Path, cfg: dict, mode: str,
             logging.info("Пропуск сохранения (skip_if_exists): %s", img_path.name)
             return True, None
 
+        if as_layer:
+            if out_path.resolve() == img_path.resolve():
+                logging.warning("layers: слой совпал бы с исходником %s (output_naming) — кадр собран целиком.", img_path.name)
+            else:
+                save_text_layer(tile, xy, img_path, out_path, img.size)
+                logging.info("Слой текста: %s (+%d,%d)", out_path, xy[0], xy[1])
+                return True, out_path
+
+        if compose == "full":
+            if img.mode != "RGBA": img = img.convert("RGBA")
+            layer.paint(img)
+        else:
+            img = img.copy()
+            img.alpha_composite(tile, dest=xy)
+
         params = {}
         img_to_save = img
         if save_format == "JPEG":
@@ -539,6 +756,8 @@ def try_delete_original(original_path: Path, out_path: Optional[Path], cfg: dict
     if not bool(cfg.get("delete_original_after_success", False)): return
     if bool(cfg.get("dry_run", False)): return
     if out_path is None: return
+    if out_path.with_name(out_path.stem + LAYER_SIDECAR).exists():
+        return  # compose_mode="layers": исходник — фон для слоя текста, его наложит шаг 4
     try:
         if original_path.resolve() == out_path.resolve(): return
     except Exception:
@@ -637,22 +856,8 @@ def build_blocks_from_patterns(folder: Path, base: str, patterns: List[str], cfg
 # Верхний уровень
 # =========================
 
-def main():
-    cfg_path = Path(__file__).with_name("config.toml")
-    if not cfg_path.exists():
-        print("Не найден config.toml рядом со скриптом.", file=sys.stderr)
-        sys.exit(2)
-
-    cfg = load_config(cfg_path)
-    setup_logging(cfg.get("logging_level","INFO"), bool(cfg.get("log_to_file",False)), str(cfg.get("log_file","overlay.log")))
-    logging.info("Старт. Конфиг: %s", cfg_path)
-
-    recursive = bool(cfg.get("recursive", True))
-    text_files = collect_texts(cfg.get("input_dirs", []), cfg.get("input_files", []), recursive)
-    if not text_files:
-        logging.warning("TXT-файлы не найдены.")
-        return
-
+def run_options(cfg: dict) -> Dict[str, Any]:
+    """Проверенные параметры раздачи текста (предупреждения — один раз, в главном процессе)."""
     image_exts = [e.lower() for e in cfg.get("image_extensions", [".jpg",".jpeg",".png",".webp"])]
     match_mode = str(cfg.get("image_match_mode", "prefix")).lower()
     if match_mode not in ("exact","prefix"):
@@ -669,165 +874,216 @@ def main():
         logging.warning("Неизвестный target_images: %s → 'all'", target_images)
         target_images = "all"
 
-    include_empty_lines = bool(cfg.get("include_empty_lines", False))
     lines_per_image = int(cfg.get("lines_per_image", 1))
     if lines_per_image < 1:
         logging.warning("lines_per_image<1 → 1")
         lines_per_image = 1
 
-    cycle_indexing = bool(cfg.get("cycle_output_indexing", False))
-    cycle_index_start = int(cfg.get("cycle_index_start", 1))
-    cycle_index_pad = int(cfg.get("cycle_index_pad", 0))
-    cycle_tpl = str(cfg.get("cycle_index_name_template", "{stem}_{i}{suffix}{ext}"))
-
-    patterns: List[str] = cfg.get("multi_sources_patterns", []) or []
-    ms_enabled = len(patterns) > 0
-
-    total_txt = len(text_files)
-    total_images = 0
-    processed = 0
-    skipped = 0
-    no_images = 0
-
-    processed_bases: set[Tuple[Path, str]] = set()
-
-    # Односоставный режим: базовые настройки фильтрации
-    text_encoding = cfg.get("text_encoding","utf-8") or "utf-8"
-    remove_markers: List[str] = cfg.get("remove_markers", []) or []
-    drop_lines_with_markers = bool(cfg.get("drop_lines_with_markers", False))
-
-    for txt in text_files:
-        folder = txt.parent
-
-        if ms_enabled:
-            base = _detect_base_by_patterns(txt.name, patterns)
-            if base:
-                key = (folder, base)
-                if key in processed_bases:
-                    continue
-                processed_bases.add(key)
-
-                blocks, primary_txt = build_blocks_from_patterns(folder, base, patterns, cfg)
-                if not blocks:
-                    logging.info("Нет данных (multi-sources) для base='%s' в %s", base, folder)
-                    continue
-
-                anchor_txt = primary_txt if primary_txt else (folder / (base + _extract_suffix(patterns[0]) + ".txt"))
-                images = find_images_for_text(anchor_txt, image_exts, match_mode=match_mode)
-                if not images:
-                    no_images += 1
-                    logging.info("Нет подходящих картинок для %s — пропуск.", anchor_txt.name)
-                    continue
-
-                if target_images == "first":
-                    images = images[:1]
-                total_images += len(images)
-
-                n_images = len(images)
-                use_count: Dict[Path, int] = {p: 0 for p in images}
-                last_out: Dict[Path, Optional[Path]] = {p: None for p in images}
-
-                if per_image_text_mode == "full_text":
-                    merged: List[str] = []
-                    for b in blocks: merged.extend(b)
-                    for img_path in images:
-                        ok, out_path = process_one_image(img_path, cfg, "full_text", merged, bool(cfg.get("dry_run",False)), None)
-                        if ok: processed += 1; last_out[img_path] = out_path
-                        else: skipped += 1
-                    for p in images:
-                        try_delete_original(p, last_out[p], cfg)
-                else:
-                    # line_by_line_cycle: каждый блок → одна картинка (циклично)
-                    for i, block in enumerate(blocks):
-                        img_path = images[i % n_images]
-                        use_count[img_path] += 1
-                        idx_for = use_count[img_path] - 1 + cycle_index_start
-                        mode = "single_line" if len(block) == 1 else "line_block"
-                        idx_kwargs = {}
-                        if cycle_indexing:
-                            idx_kwargs = dict(index=idx_for, cycle_indexing=True,
-                                              cycle_index_start=cycle_index_start,
-                                              cycle_index_pad=cycle_index_pad,
-                                              cycle_tpl=cycle_tpl)
-                        ok, out_path = process_one_image(img_path, cfg, mode, block, bool(cfg.get("dry_run",False)), idx_kwargs)
-                        if ok: processed += 1; last_out[img_path] = out_path
-                        else: skipped += 1
-                    for p in images:
-                        try_delete_original(p, last_out[p], cfg)
-                continue  # к следующему TXT
-
-            # иначе — этот TXT не попал под паттерны → обработаем в одиночном режиме ниже
-
-        # ---- ОДИНОЧНЫЙ РЕЖИМ (как раньше) ----
-        try:
-            raw_text = txt.read_text(encoding=text_encoding)
-        except Exception as e:
-            logging.error("Не удалось прочитать текст %s: %s", txt, e)
-            skipped += 1
-            continue
+    return dict(
+        image_exts=image_exts, match_mode=match_mode,
+        per_image_text_mode=per_image_text_mode, target_images=target_images,
+        include_empty_lines=bool(cfg.get("include_empty_lines", False)),
+        lines_per_image=lines_per_image,
+        cycle_indexing=bool(cfg.get("cycle_output_indexing", False)),
+        cycle_index_start=int(cfg.get("cycle_index_start", 1)),
+        cycle_index_pad=int(cfg.get("cycle_index_pad", 0)),
+        cycle_tpl=str(cfg.get("cycle_index_name_template", "{stem}_{i}{suffix}{ext}")),
+        patterns=cfg.get("multi_sources_patterns", []) or [],
+        # Односоставный режим: базовые настройки фильтрации
+        text_encoding=cfg.get("text_encoding","utf-8") or "utf-8",
+        remove_markers=cfg.get("remove_markers", []) or [],
+        drop_lines_with_markers=bool(cfg.get("drop_lines_with_markers", False)),
+    )
 
-        # чистим по маркерам (с поддержкой вайлдкардов)
-        filtered = filter_text_by_markers_raw(raw_text, remove_markers, drop_lines_with_markers, include_empty=True)
 
-        images = find_images_for_text(txt, image_exts, match_mode=match_mode)
+def _cycle_blocks(blocks: List[List[str]], images: List[Path], cfg: dict, o: Dict[str, Any]) -> Tuple[int, int]:
+    """line_by_line_cycle: каждый блок → одна картинка (циклично). Возвращает (успешно, ошибок)."""
+    processed = skipped = 0
+    n_images = len(images)
+    use_count: Dict[Path, int] = {p: 0 for p in images}
+    last_out: Dict[Path, Optional[Path]] = {p: None for p in images}
+    base_cache: Dict[Path, Tuple[Image.Image, bool]] = {}
+    for i, block in enumerate(blocks):
+        img_path = images[i % n_images]
+        use_count[img_path] += 1
+        idx_for = use_count[img_path] - 1 + o["cycle_index_start"]
+        mode = "single_line" if len(block) == 1 else "line_block"
+        idx_kwargs = {}
+        if o["cycle_indexing"]:
+            idx_kwargs = dict(index=idx_for, cycle_indexing=True,
+                              cycle_index_start=o["cycle_index_start"],
+                              cycle_index_pad=o["cycle_index_pad"],
+                              cycle_tpl=o["cycle_tpl"])
+        ok, out_path = process_one_image(img_path, cfg, mode, block, bool(cfg.get("dry_run",False)), idx_kwargs, base_cache)
+        if ok: processed += 1; last_out[img_path] = out_path
+        else: skipped += 1
+    for p in images:
+        try_delete_original(p, last_out[p], cfg)
+    return processed, skipped
+
+
+def process_text(txt: Path, base: Optional[str], cfg: dict, o: Dict[str, Any]) -> List[int]:
+    """
+    Один TXT (или группа multi-sources с общей base). Возвращает счётчики
+    [найдено картинок, успешно, ошибок, без картинок].
+    """
+    folder = txt.parent
+    dry_run = bool(cfg.get("dry_run",False))
+
+    if base is not None:
+        patterns = o["patterns"]
+        blocks, primary_txt = build_blocks_from_patterns(folder, base, patterns, cfg)
+        if not blocks:
+            logging.info("Нет данных (multi-sources) для base='%s' в %s", base, folder)
+            return [0, 0, 0, 0]
+
+        anchor_txt = primary_txt if primary_txt else (folder / (base + _extract_suffix(patterns[0]) + ".txt"))
+        images = find_images_for_text(anchor_txt, o["image_exts"], match_mode=o["match_mode"])
         if not images:
-            no_images += 1
-            logging.info("Нет подходящих картинок для %s — пропуск.", txt.name)
-            continue
+            logging.info("Нет подходящих картинок для %s — пропуск.", anchor_txt.name)
+            return [0, 0, 0, 1]
 
-        if target_images == "first":
+        if o["target_images"] == "first":
             images = images[:1]
-        total_images += len(images)
 
-        if per_image_text_mode == "full_text":
-            lines_full = filtered.splitlines()
-            if not include_empty_lines:
-                lines_full = [ln for ln in lines_full if ln.strip() != ""]
+        if o["per_image_text_mode"] == "full_text":
+            processed = skipped = 0
+            last_out: Dict[Path, Optional[Path]] = {p: None for p in images}
+            merged: List[str] = []
+            for b in blocks: merged.extend(b)
             for img_path in images:
-                ok, out_path = process_one_image(img_path, cfg, "full_text", lines_full, bool(cfg.get("dry_run",False)), None)
-                if ok: processed += 1; try_delete_original(img_path, out_path, cfg)
+                ok, out_path = process_one_image(img_path, cfg, "full_text", merged, dry_run, None)
+                if ok: processed += 1; last_out[img_path] = out_path
                 else: skipped += 1
+            for p in images:
+                try_delete_original(p, last_out[p], cfg)
         else:
-            raw_lines = filtered.splitlines()
-            lines = filter_lines_by_markers(raw_lines, remove_markers, drop_lines_with_markers)
-            if not include_empty_lines:
-                lines = [ln for ln in lines if ln.strip() != ""]
-            if not lines:
-                logging.info("TXT %s пуст после фильтра — пропуск.", txt.name)
+            processed, skipped = _cycle_blocks(blocks, images, cfg, o)
+        return [len(images), processed, skipped, 0]
+
+    # ---- ОДИНОЧНЫЙ РЕЖИМ (как раньше) ----
+    try:
+        raw_text = txt.read_text(encoding=o["text_encoding"])
+    except Exception as e:
+        logging.error("Не удалось прочитать текст %s: %s", txt, e)
+        return [0, 0, 1, 0]
+
+    # чистим по маркерам (с поддержкой вайлдкардов)
+    filtered = filter_text_by_markers_raw(raw_text, o["remove_markers"], o["drop_lines_with_markers"], include_empty=True)
+
+    images = find_images_for_text(txt, o["image_exts"], match_mode=o["match_mode"])
+    if not images:
+        logging.info("Нет подходящих картинок для %s — пропуск.", txt.name)
+        return [0, 0, 0, 1]
+
+    if o["target_images"] == "first":
+        images = images[:1]
+
+    processed = skipped = 0
+    if o["per_image_text_mode"] == "full_text":
+        lines_full = filtered.splitlines()
+        if not o["include_empty_lines"]:
+            lines_full = [ln for ln in lines_full if ln.strip() != ""]
+        for img_path in images:
+            ok, out_path = process_one_image(img_path, cfg, "full_text", lines_full, dry_run, None)
+            if ok: processed += 1; try_delete_original(img_path, out_path, cfg)
+            else: skipped += 1
+        return [len(images), processed, skipped, 0]
+
+    raw_lines = filtered.splitlines()
+    lines = filter_lines_by_markers(raw_lines, o["remove_markers"], o["drop_lines_with_markers"])
+    if not o["include_empty_lines"]:
+        lines = [ln for ln in lines if ln.strip() != ""]
+    if not lines:
+        logging.info("TXT %s пуст после фильтра — пропуск.", txt.name)
+        return [len(images), 0, 0, 0]
+
+    # Разбивка по lines_per_image (ТОЛЬКО для одиночного режима)
+    blocks: List[List[str]] = []
+    curr: List[str] = []
+    for ln in lines:
+        curr.append(ln)
+        if len(curr) == o["lines_per_image"]:
+            blocks.append(curr); curr = []
+    if curr: blocks.append(curr)
+
+    processed, skipped = _cycle_blocks(blocks, images, cfg, o)
+    return [len(images), processed, skipped, 0]
+
+
+def process_text_group(items: List[Tuple[Path, Optional[str]]], cfg: dict, o: Dict[str, Any]) -> List[int]:
+    """Задача пула: TXT с пересекающимися наборами картинок — последовательно, в исходном порядке."""
+    total = [0, 0, 0, 0]
+    for txt, base in items:
+        for k, v in enumerate(process_text(txt, base, cfg, o)):
+            total[k] += v
+    return total
+
+
+def group_text_jobs(text_files: List[Path], o: Dict[str, Any]) -> List[List[Tuple[Path, Optional[str]]]]:
+    """
+    TXT → задачи для пула. Картинки ищутся по префиксу, и два TXT могут делить (и удалять) одни картинки —
+    такие TXT попадают в одну задачу. Группа multi-sources (folder, base) обрабатывается один раз.
+    """
+    groups: List[List[Tuple[int, Path, Optional[str]]]] = []
+    owner: Dict[Path, int] = {}
+    processed_bases: set[Tuple[Path, str]] = set()
+    for n, txt in enumerate(text_files):
+        base = _detect_base_by_patterns(txt.name, o["patterns"]) if o["patterns"] else None
+        # иначе — этот TXT не попал под паттерны → одиночный режим
+        if base:
+            key = (txt.parent, base)
+            if key in processed_bases:
                 continue
+            processed_bases.add(key)
+        # по base — надмножество картинок любого TXT группы
+        imgs = find_images_for_text(txt.with_name((base or txt.stem) + ".txt"), o["image_exts"], o["match_mode"])
+        touched = sorted({owner[p] for p in imgs if p in owner})
+        gi = touched[0] if touched else len(groups)
+        if not touched:
+            groups.append([])
+        for other in touched[1:]:
+            groups[gi].extend(groups[other]); groups[other] = []
+            for p, g in owner.items():
+                if g == other: owner[p] = gi
+        groups[gi].append((n, txt, base))
+        for p in imgs:
+            owner[p] = gi
+    return [[(txt, base) for _n, txt, base in sorted(g, key=lambda t: t[0])] for g in groups if g]
 
-            # Разбивка по lines_per_image (ТОЛЬКО для одиночного режима)
-            blocks: List[List[str]] = []
-            curr: List[str] = []
-            for ln in lines:
-                curr.append(ln)
-                if len(curr) == lines_per_image:
-                    blocks.append(curr); curr = []
-            if curr: blocks.append(curr)
-
-            n_images = len(images)
-            use_count: Dict[Path, int] = {p: 0 for p in images}
-            last_out: Dict[Path, Optional[Path]] = {p: None for p in images}
 
-            for i, block in enumerate(blocks):
-                img_path = images[i % n_images]
-                use_count[img_path] += 1
-                idx_for = use_count[img_path] - 1 + cycle_index_start
-                mode = "single_line" if len(block) == 1 else "line_block"
-                idx_kwargs = {}
-                if cycle_indexing:
-                    idx_kwargs = dict(index=idx_for, cycle_indexing=True,
-                                      cycle_index_start=cycle_index_start,
-                                      cycle_index_pad=cycle_index_pad,
-                                      cycle_tpl=cycle_tpl)
-                ok, out_path = process_one_image(img_path, cfg, mode, block, bool(cfg.get("dry_run",False)), idx_kwargs)
-                if ok: processed += 1; last_out[img_path] = out_path
-                else: skipped += 1
-            for p in images:
-                try_delete_original(p, last_out[p], cfg)
+def main():
+    cfg_path = Path(__file__).with_name("config.toml")
+    if not cfg_path.exists():
+        print("Не найден config.toml рядом со скриптом.", file=sys.stderr)
+        sys.exit(2)
+
+    cfg = load_config(cfg_path)
+    setup_logging(cfg.get("logging_level","INFO"), bool(cfg.get("log_to_file",False)), str(cfg.get("log_file","overlay.log")))
+    logging.info("Старт. Конфиг: %s", cfg_path)
+
+    recursive = bool(cfg.get("recursive", True))
+    text_files = collect_texts(cfg.get("input_dirs", []), cfg.get("input_files", []), recursive)
+    if not text_files:
+        logging.warning("TXT-файлы не найдены.")
+        return
+
+    opts = run_options(cfg)
+    groups = group_text_jobs(text_files, opts)
+    workers = pool_runner.resolve_workers(cfg.get("workers", 0), len(groups))
+    logging.info("Задач: %d; workers: %d", len(groups), workers)
+
+    total = [0, 0, 0, 0]
+    for res in pool_runner.run_jobs(process_text_group, [(g, cfg, opts) for g in groups], workers):
+        if isinstance(res, pool_runner.JobFailed):
+            total[2] += 1
+            continue
+        for k, v in enumerate(res):
+            total[k] += v
+    total_images, processed, skipped, no_images = total
 
     logging.info("Готово. TXT: %d; найдено картинок: %d; успешно: %d; без картинок: %d; ошибок: %d",
-                 total_txt, total_images, processed, no_images, skipped)
+                 len(text_files), total_images, processed, no_images, skipped)
 
 
 if __name__ == "__main__":
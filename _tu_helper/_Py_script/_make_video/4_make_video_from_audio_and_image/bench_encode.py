@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+bench_encode.py — замер профилей кодирования слайдшоу: standard (fps кадров в секунду, -tune stillimage)
+против still (низкая постоянная частота, длинный GOP, ключевые кадры на границах слайдов).
+
+Генерируются слайды (картинки с текстом, Pillow) и тон нужной длины (ffmpeg lavfi); каждый профиль
+собирает ролик тем же путём, что и основной скрипт (filter и/или segments). Печатаются время кодирования,
+размер файла и соотношение к standard.
+
+Запуск:
+    python bench_encode.py
+    python bench_encode.py --ffmpeg C:/ffmpeg/bin/ffmpeg.exe --slides 20 --sec 6 --size 1920x1080
+    python bench_encode.py --assembly filter segments --still-fps 2 5 10
+"""
+
+import argparse
+import logging
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+import make_video_from_audio_and_image as mv
+
+
+def make_slides(folder: Path, n: int, W: int, H: int) -> list[Path]:
+    rnd = random.Random(7)
+    out = []
+    for i in range(n):
+        img = Image.new("RGB", (W, H), (rnd.randint(0, 80), rnd.randint(0, 80), rnd.randint(40, 120)))
+        d = ImageDraw.Draw(img)
+        for k in range(6):
+            y = H // 8 + k * H // 9
+            d.rectangle((W // 10, y, W // 10 + rnd.randint(W // 4, W * 3 // 4), y + H // 18), fill=(230, 230, 230))
+        d.text((W // 20, H // 20), f"slide {i + 1}", fill=(255, 255, 0))
+        p = folder / f"lesson_{i + 1:03d}.png"
+        img.save(p)
+        out.append(p)
+    return out
+
+
+def make_audio(ffmpeg: str, path: Path, sec: float) -> None:
+    subprocess.run([ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-f", "lavfi",
+                    "-i", f"sine=frequency=440:duration={sec:.3f}", "-c:a", "libmp3lame", "-b:a", "64k", str(path)],
+                   check=True)
+
+
+def render(ffmpeg: str, assembly: str, images, per_sec, audio, out_path, fps, gop, W, H, seg_root) -> float:
+    enc = dict(vcodec="libx264", preset="veryfast", crf=18, pix_fmt="yuv420p",
+               acodec="aac", abitrate="128k", movflags="+faststart", threads=None, gop=gop)
+    vf = mv.build_vfilter(W, H, "fit", "#000000", fps)
+    t0 = time.perf_counter()
+    if assembly == "segments":
+        cache = mv.SegmentCache(seg_root, 1 << 40)
+        code = mv.run_ffmpeg_slideshow_segments(ffmpeg, images, per_sec, audio, out_path, vf, fps, cache, **enc)
+    else:
+        code = mv.run_ffmpeg_slideshow_equal(ffmpeg, images, per_sec, audio, out_path, vf, **enc, fps=fps)
+    if code != 0:
+        raise SystemExit(f"ffmpeg завершился с кодом {code} ({assembly}, fps={fps})")
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Бенчмарк профилей кодирования standard / still")
+    ap.add_argument("--ffmpeg", default="ffmpeg")
+    ap.add_argument("--slides", type=int, default=10)
+    ap.add_argument("--sec", type=float, default=5.0, help="средняя длительность слайда, с")
+    ap.add_argument("--size", default="1280x720")
+    ap.add_argument("--fps", type=int, default=30, help="fps профиля standard")
+    ap.add_argument("--still-fps", type=int, nargs="+", default=[5])
+    ap.add_argument("--gop-sec", type=float, default=10.0)
+    ap.add_argument("--assembly", nargs="+", default=["filter"], choices=["filter", "segments"])
+    ap.add_argument("--keep", action="store_true", help="не удалять рабочую папку")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    W, H = (int(x) for x in args.size.lower().split("x"))
+    work = Path(tempfile.mkdtemp(prefix="bench_encode_"))
+    try:
+        images = make_slides(work, args.slides, W, H)
+        rnd = random.Random(3)
+        per_sec = [args.sec * rnd.uniform(0.5, 1.5) for _ in images]
+        audio = work / "lesson.mp3"
+        make_audio(args.ffmpeg, audio, sum(per_sec))
+
+        profiles = [("standard", args.fps, None)]
+        profiles += [(f"still@{f}", f, max(1, round(args.gop_sec * f))) for f in args.still_fps]
+
+        print(f"\nслайдов: {len(images)}, ролик {sum(per_sec):.1f} с, кадр {W}x{H}")
+        print(f"{'сборка':>9} {'профиль':>10} {'сек':>8} {'МБ':>8} {'время':>7} {'размер':>7}")
+        for assembly in args.assembly:
+            base = None
+            for name, fps, gop in profiles:
+                out = work / f"{assembly}_{name.replace('@', '_')}.mp4"
+                sec = render(args.ffmpeg, assembly, images, per_sec, audio, out, fps, gop, W, H,
+                             work / f"seg_{name.replace('@', '_')}")
+                size = out.stat().st_size
+                base = base or (sec, size)
+                print(f"{assembly:>9} {name:>10} {sec:>8.2f} {size / 1048576:>8.2f} "
+                      f"{sec / base[0]:>6.2f}x {size / base[1]:>6.2f}x")
+        if args.keep:
+            print(f"файлы: {work}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,13 +16,33 @@
     * суффиксы в именах изображений: *_t3.5s.png.
     * Политика подгонки длительностей к длине аудио: stretch_last | scale_all | clip.
 - Новое: slideshow.delete_images_after — удалять использованные картинки после успешного рендера.
+- encode.workers — сколько ffmpeg запускать параллельно (процессы, ../_common/pool_runner.py);
+  0 — число ядер / encode.threads (при threads = 0 — по 4 потока на ffmpeg). Лог каждого аудио — по порядку.
+  Картинки и имена роликов подбираются в родителе до запуска пула (plan_audio: задачи не выберут одно имя),
+  картинки удаляются после всех задач — и только те, что отрендерили все использовавшие их задачи.
+- slideshow.assembly = "segments": каждый слайд кодируется один раз в отдельный сегмент (кэш по содержимому
+  картинки, числу кадров и параметрам кодирования), ролик склеивается concat-демультиплексором с -c copy
+  и одним проходом по звуку — после правки одного слайда или тайминга перекодируется только его сегмент.
+- encode.profile = "still": статичные слайды кодируются с низкой постоянной частотой (still_fps), длинным GOP
+  (still_gop_sec) без ключевых кадров по смене сцены и с ключевыми кадрами ровно на границах слайдов
+  (из тех же таймингов); H.264 + yuv420p + AAC + faststart — как в standard, ролик годится для YouTube.
+- Длительность аудио — ../_common/media_probe.py: ffprobe не больше раза на файл (кэш в памяти и на диске),
+  .mp3/.wav читаются по заголовку без ffprobe; перед слайдшоу вся пачка разбирается в пуле потоков.
+- [input] fallback_image — общий фон шага 2 (output_mode = "virtual") для аудио без своей картинки.
+- Слои текста шага 3 (compose_mode = "layers"): картинка с <stem>.overlay.json рядом — прозрачный PNG с текстом,
+  он накладывается на указанный фон фильтром overlay; сам фон в слайды не попадает.
 
 """
 
 from __future__ import annotations
 
+import os
 import sys
 import re
+import json
+import hashlib
+import math
+import tempfile
 import subprocess
 import logging
 from pathlib import Path
@@ -34,6 +54,10 @@ except Exception as e:
     print("Нужен Python 3.11+ (tomllib) или установить tomli. Ошибка:", e)
     sys.exit(1)
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "_common"))
+import pool_runner  # noqa: E402
+import media_probe  # noqa: E402
+
 
 # =========================
 # Утилиты
@@ -174,6 +198,77 @@ def find_candidate_images(audio_path: Path, image_exts: set[str], extra_dirs: li
     return items
 
 
+def find_fallback_image(audio_path: Path, image_exts: set[str], extra_dirs: list[Path], name: str) -> Path | None:
+    """Общий фон (<name>.<ext>, шаг 2 с output_mode = "virtual") — для аудио без своей картинки."""
+    for d in [audio_path.parent] + [d for d in extra_dirs if d != audio_path.parent]:
+        for ext in sorted(image_exts):
+            p = d / f"{name}.{ext}"
+            if p.is_file():
+                return p
+    return None
+
+
+LAYER_SIDECAR = ".overlay.json"
+
+
+def load_overlay(img: Path) -> tuple[Path, int, int] | None:
+    """Слой текста шага 3: <stem>.overlay.json → (фон, x, y); None — обычная картинка."""
+    meta_path = img.with_name(img.stem + LAYER_SIDECAR)
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        base = Path(str(meta["base"]))
+        if not base.is_absolute():
+            base = img.parent / base
+        return base, int(meta.get("x", 0)), int(meta.get("y", 0))
+    except Exception as e:
+        logging.warning("  Не удалось прочитать %s: %s", meta_path.name, e)
+        return None
+
+
+def split_overlays(images: list[Path]) -> tuple[list[Path], dict[Path, tuple[Path, int, int]]]:
+    """Слои текста → {слой: (фон, x, y)}; фоны слоёв из списка картинок убираются."""
+    overlays: dict[Path, tuple[Path, int, int]] = {}
+    broken: set[Path] = set()
+    for p in images:
+        ov = load_overlay(p)
+        if ov is None:
+            continue
+        if not ov[0].exists():
+            logging.warning("  Нет фона %s для слоя %s -> слой пропущен", ov[0], p.name)
+            broken.add(p)
+            continue
+        overlays[p] = ov
+    bases = {ov[0].resolve() for ov in overlays.values()}
+    kept = [p for p in images if p not in broken and p.resolve() not in bases]
+    return kept, overlays
+
+
+def delete_used_images(images: list[Path], overlays: dict[Path, tuple[Path, int, int]]) -> None:
+    """
+    Удалить отрендеренные картинки; для слоёв — ещё их .overlay.json, а фон — когда отрендерены
+    все его слои (overlays — все слои этого аудио).
+    """
+    done = set(images)
+    victims: list[Path] = []
+    for img in images:
+        victims.append(img)
+        if img in overlays:
+            victims.append(img.with_name(img.stem + LAYER_SIDECAR))
+    for base in dict.fromkeys(ov[0] for ov in overlays.values()):
+        if all(img in done for img, ov in overlays.items() if ov[0] == base):
+            victims.append(base)
+    for p in victims:
+        try:
+            p.unlink()
+            logging.info("  Удалена картинка: %s", p)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning("  Не удалось удалить %s: %s", p, e)
+
+
 # =========================
 # FFmpeg / фильтры
 # =========================
@@ -184,31 +279,78 @@ def build_vfilter(width: int, height: int, scale_mode: str, pad_color: str, fps:
     color = pad_color.strip()
     return f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color={color},fps={fps}"
 
-def choose_output_path(base_dir: Path, stem: str, ext: str, on_exists: str) -> Path | None:
+def video_codec_args(vcodec: str, preset: str, crf: int, pix_fmt: str, gop: int | None = None,
+                     keys: list[float] | None = None) -> list[str]:
+    """
+    Параметры видеокодека. gop — профиль still: длинная группа кадров (-g) без ключевых кадров по смене сцены;
+    keys — моменты смены слайдов (с), на них ставятся ключевые кадры (-force_key_frames).
+    """
+    args = ["-c:v", vcodec, "-preset", preset, "-crf", str(crf), "-pix_fmt", pix_fmt, "-tune", "stillimage"]
+    if gop:
+        args += ["-g", str(gop), "-sc_threshold", "0"]
+    if keys:
+        args += ["-force_key_frames", ",".join(f"{t:.3f}" for t in keys)]
+    return args
+
+def choose_output_path(base_dir: Path, stem: str, ext: str, on_exists: str,
+                       taken: set[Path] | None = None) -> Path | None:
+    """
+    Путь ролика по on_exists (overwrite | skip | rename). taken — пути, уже выданные в этом запуске:
+    занятыми считаются всегда (overwrite для них ведёт себя как rename — два ffmpeg не пишут в один файл);
+    выбранный путь добавляется в taken.
+    """
+    taken = taken if taken is not None else set()
     out = base_dir / f"{stem}.{ext}"
-    if not out.exists():
-        return out
     on_exists = on_exists.lower()
-    if on_exists == "overwrite":
+    if out in taken:
+        if on_exists == "skip":
+            return None
+    elif not out.exists() or on_exists == "overwrite":
+        taken.add(out)
         return out
-    if on_exists == "skip":
+    elif on_exists == "skip":
         return None
     i = 1
     while True:
         c = base_dir / f"{stem}-{i}.{ext}"
-        if not c.exists():
+        if c not in taken and not c.exists():
+            taken.add(c)
             return c
         i += 1
 
+def image_inputs(image: Path, overlay: tuple[Path, int, int] | None, sec: float | None = None,
+                 framerate: int | None = None) -> list[str]:
+    """Входы ffmpeg для одной картинки: сама картинка или фон + слой текста (два входа)."""
+    loop = ["-f", "image2", "-loop", "1"] + (["-t", f"{sec:.6f}"] if sec is not None else [])
+    if framerate:
+        loop += ["-framerate", str(framerate)]
+    if overlay is None:
+        return loop + ["-i", str(image)]
+    return loop + ["-i", str(overlay[0])] + loop + ["-i", str(image)]
+
+
+def image_chain(i: int, overlay: tuple[Path, int, int] | None, vf: str) -> tuple[str, int]:
+    """Цепочка filter_complex для картинки с входа i (без выходной метки) и число занятых входов."""
+    if overlay is None:
+        return f"[{i}:v]{vf}", 1
+    return f"[{i}:v][{i + 1}:v]overlay={overlay[1]}:{overlay[2]},{vf}", 2
+
+
 def run_ffmpeg_still(ffmpeg: Path | str, image: Path, audio: Path, out_path: Path, vf: str,
                      vcodec: str, preset: str, crf: int, pix_fmt: str,
-                     acodec: str, abitrate: str, movflags: str | None, threads: int | None) -> int:
+                     acodec: str, abitrate: str, movflags: str | None, threads: int | None,
+                     overlay: tuple[Path, int, int] | None = None, gop: int | None = None) -> int:
+    if overlay is None:
+        video = ["-vf", vf]
+    else:
+        chain, n = image_chain(0, overlay, vf)
+        video = ["-filter_complex", f"{chain}[vc]", "-map", "[vc]", "-map", f"{n}:a:0"]
     cmd = [
         str(ffmpeg), "-hide_banner", "-loglevel", "error", "-y",
-        "-f", "image2", "-loop", "1", "-i", str(image),
+        *image_inputs(image, overlay),
         "-i", str(audio),
-        "-c:v", vcodec, "-preset", preset, "-crf", str(crf), "-pix_fmt", pix_fmt, "-tune", "stillimage",
-        "-vf", vf, "-vsync", "cfr",
+        *video_codec_args(vcodec, preset, crf, pix_fmt, gop),
+        *video, "-vsync", "cfr",
         "-c:a", acodec, "-b:a", abitrate,
         "-shortest",
     ]
@@ -227,54 +369,61 @@ def run_ffmpeg_still(ffmpeg: Path | str, image: Path, audio: Path, out_path: Pat
         logging.exception("Ошибка FFmpeg (still): %s", e)
         return 1
 
-def ffprobe_duration_seconds(ffmpeg_path_or_name: str | Path, audio_path: Path) -> float | None:
-    candidates = []
+def ffprobe_near(ffmpeg_path_or_name: str | Path) -> str:
+    """ffprobe рядом с ffmpeg (если указан путь), иначе из PATH."""
     if isinstance(ffmpeg_path_or_name, Path) and ffmpeg_path_or_name.name.lower().startswith("ffmpeg"):
-        probe = ffmpeg_path_or_name.parent / "ffprobe.exe"
-        if probe.exists():
-            candidates.append(str(probe))
-    candidates.append("ffprobe")
-    for exe in candidates:
-        try:
-            out = subprocess.check_output(
-                [exe, "-v", "error", "-show_entries", "format=duration", "-of", "default=nk=1:nw=1", str(audio_path)],
-                stderr=subprocess.PIPE
-            )
-            val = float(out.decode("utf-8", "ignore").strip())
-            if val > 0:
-                return val
-        except Exception:
-            continue
-    return None
+        for name in ("ffprobe.exe", "ffprobe"):
+            probe = ffmpeg_path_or_name.parent / name
+            if probe.is_file():
+                return str(probe)
+    return "ffprobe"
+
+def ffprobe_duration_seconds(ffmpeg_path_or_name: str | Path, audio_path: Path) -> float | None:
+    """Длительность аудио через ../_common/media_probe (кэш; .mp3/.wav — по заголовку, без ffprobe)."""
+    return media_probe.duration(audio_path, ffprobe_near(ffmpeg_path_or_name))
 
 def run_ffmpeg_slideshow_equal(ffmpeg: Path | str, images: list[Path], per_sec: list[float], audio: Path, out_path: Path,
                                vf_one: str, vcodec: str, preset: str, crf: int, pix_fmt: str,
-                               acodec: str, abitrate: str, movflags: str | None, threads: int | None) -> int:
+                               acodec: str, abitrate: str, movflags: str | None, threads: int | None,
+                               overlays: dict[Path, tuple[Path, int, int]] | None = None,
+                               gop: int | None = None, fps: int | None = None) -> int:
     """
     Слайдшоу без переходов, индивидуальные длительности per_sec[i].
-    Каждую картинку подаём как -f image2 -loop 1 -t <sec>.
+    Каждую картинку подаём как -f image2 -loop 1 -t <sec> (слой текста — вместе со своим фоном, overlay).
     filter_complex: [i:v] vf -> [vi]; concat=n=N:v=1:a=0 [vc]
     map [vc] + аудио.
+    Профиль still (gop задан): длительности выравниваются по кадрам fps (frame_counts), ключевые кадры —
+    ровно на границах слайдов.
     """
     assert len(images) == len(per_sec)
+    overlays = overlays or {}
+    keys = None
+    if gop and fps:
+        per_sec = [n / fps for n in frame_counts(per_sec, fps)]
+        keys, acc = [], 0.0
+        for sec in per_sec[:-1]:
+            acc += sec
+            keys.append(acc)
     cmd = [str(ffmpeg), "-hide_banner", "-loglevel", "error", "-y"]
 
-    for img, sec in zip(images, per_sec):
+    fc = []
+    n_in = 0
+    for k, (img, sec) in enumerate(zip(images, per_sec)):
         sec = max(0.001, float(sec))
-        cmd += ["-f", "image2", "-loop", "1", "-t", f"{sec:.6f}", "-i", str(img)]
+        cmd += image_inputs(img, overlays.get(img), sec, framerate=fps if keys is not None else None)
+        chain, used = image_chain(n_in, overlays.get(img), vf_one)
+        fc.append(f"{chain}[v{k}]")
+        n_in += used
     cmd += ["-i", str(audio)]
 
-    fc = []
-    for i in range(len(images)):
-        fc.append(f"[{i}:v]{vf_one}[v{i}]")
     fc.append("".join(f"[v{i}]" for i in range(len(images))) + f"concat=n={len(images)}:v=1:a=0[vc]")
     filter_complex = ";".join(fc)
 
     cmd += [
         "-filter_complex", filter_complex,
         "-map", "[vc]",
-        "-map", f"{len(images)}:a:0",
-        "-c:v", vcodec, "-preset", preset, "-crf", str(crf), "-pix_fmt", pix_fmt, "-vsync", "cfr", "-tune", "stillimage",
+        "-map", f"{n_in}:a:0",
+        *video_codec_args(vcodec, preset, crf, pix_fmt, gop, keys), "-vsync", "cfr",
         "-c:a", acodec, "-b:a", abitrate,
         "-shortest",
     ]
@@ -295,6 +444,195 @@ def run_ffmpeg_slideshow_equal(ffmpeg: Path | str, images: list[Path], per_sec:
         return 1
 
 
+# =========================
+# Слайдшоу из сегментов
+# =========================
+
+class SegmentCache:
+    """
+    Сегменты слайдов на диске: <dir>/<2 символа ключа>/<sha1>.mp4, ключ — содержимое картинки (и слоя),
+    число кадров и параметры кодирования. Время доступа — mtime (обновляется при попадании);
+    при превышении max_mb удаляются самые давние сегменты (до 90% лимита).
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max(1, int(max_bytes))
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.mp4"
+
+    def hit(self, key: str) -> Path | None:
+        p = self.path(key)
+        if not p.is_file():
+            return None
+        try:
+            os.utime(p)
+        except OSError:
+            pass
+        return p
+
+    def prune(self) -> None:
+        items = []
+        for p in self.root.glob("*/*.mp4"):
+            try:
+                s = p.stat()
+            except OSError:
+                continue
+            items.append((s.st_mtime, s.st_size, p))
+        total = sum(sz for _m, sz, _p in items)
+        if total <= self.max_bytes:
+            return
+        for _m, sz, p in sorted(items):
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= sz
+            if total <= self.max_bytes * 0.9:
+                break
+
+
+def _file_digest(p: Path) -> str:
+    h = hashlib.sha1()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def frame_counts(per_sec: list[float], fps: int) -> list[int]:
+    """
+    Кадры на слайд по накопленным границам: граница i = round(сумма длительностей до неё * fps), не меньше
+    предыдущей + 1. Ошибка не накапливается — каждая граница не дальше полукадра от точного времени.
+    """
+    out, acc, prev = [], 0.0, 0
+    for sec in per_sec:
+        acc += max(0.001, float(sec))
+        edge = max(prev + 1, int(round(acc * fps)))
+        out.append(edge - prev)
+        prev = edge
+    return out
+
+
+def segment_frame_counts(per_sec: list[float], fps: int) -> list[int]:
+    """
+    Кадры на слайд для режима сегментов: округляется длительность слайда плюс остаток дробной части
+    от предыдущих, остаток переносится дальше — расхождение с таймингами меньше кадра на всём слайдшоу.
+    Правка тайминга на целое число кадров меняет число кадров (и ключ сегмента) только у этого слайда.
+    Последний слайд округляется вверх: видео не короче звука, лишнее отрезает -shortest.
+    """
+    out, carry = [], 0.0
+    for i, sec in enumerate(per_sec):
+        exact = max(0.001, float(sec)) * fps + carry
+        n = max(1, int(math.ceil(exact - 1e-9)) if i == len(per_sec) - 1 else int(round(exact)))
+        out.append(n)
+        carry = exact - n
+    return out
+
+
+def segment_key(image: Path, overlay: tuple[Path, int, int] | None, frames: int, fps: int, vf: str,
+                vcodec: str, preset: str, crf: int, pix_fmt: str, gop: int | None = None) -> str:
+    parts = [_file_digest(image), str(frames), str(fps), vf, vcodec, preset, str(crf), pix_fmt]
+    if gop:
+        parts.append(f"gop={gop}")
+    if overlay is not None:
+        parts += [_file_digest(overlay[0]), str(overlay[1]), str(overlay[2])]
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def encode_segment(ffmpeg: Path | str, image: Path, overlay: tuple[Path, int, int] | None, frames: int, fps: int,
+                   out_path: Path, vf: str, vcodec: str, preset: str, crf: int, pix_fmt: str,
+                   threads: int | None, gop: int | None = None) -> int:
+    """Один слайд → сегмент из frames кадров (без звука). Пишется во временный файл и переименовывается."""
+    chain, _n = image_chain(0, overlay, vf)
+    tmp = out_path.with_name(f"{out_path.stem}.{os.getpid()}.tmp.mp4")
+    cmd = [str(ffmpeg), "-hide_banner", "-loglevel", "error", "-y",
+           *image_inputs(image, overlay, framerate=fps),
+           "-filter_complex", f"{chain}[vc]", "-map", "[vc]", "-frames:v", str(frames),
+           *video_codec_args(vcodec, preset, crf, pix_fmt, gop),
+           "-video_track_timescale", str(fps * 1000), "-an"]
+    if threads and threads > 0:
+        cmd += ["-threads", str(threads)]
+    cmd += [str(tmp)]
+    logging.debug("FFmpeg (segment): %s", " ".join(cmd))
+    try:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        code = subprocess.run(cmd, check=False).returncode
+        if code == 0:
+            os.replace(tmp, out_path)
+        return code
+    except FileNotFoundError:
+        logging.error("Не найден ffmpeg. Проверьте encode.ffmpeg_path или PATH.")
+        return 1
+    except Exception as e:
+        logging.exception("Ошибка FFmpeg (segment): %s", e)
+        return 1
+    finally:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def run_ffmpeg_slideshow_segments(ffmpeg: Path | str, images: list[Path], per_sec: list[float], audio: Path,
+                                  out_path: Path, vf_one: str, fps: int, cache: SegmentCache,
+                                  vcodec: str, preset: str, crf: int, pix_fmt: str,
+                                  acodec: str, abitrate: str, movflags: str | None, threads: int | None,
+                                  overlays: dict[Path, tuple[Path, int, int]] | None = None,
+                                  gop: int | None = None) -> int:
+    """
+    Слайдшоу из закэшированных сегментов: недостающие сегменты кодируются по одному (один декодер на раз),
+    затем concat-демультиплексор склеивает их с -c copy и добавляет звук.
+    Каждый сегмент начинается с ключевого кадра — границы слайдов совпадают с ключевыми кадрами сами.
+    """
+    assert len(images) == len(per_sec)
+    overlays = overlays or {}
+    segments: list[Path] = []
+    encoded = 0
+    for img, frames in zip(images, segment_frame_counts(per_sec, fps)):
+        ov = overlays.get(img)
+        key = segment_key(img, ov, frames, fps, vf_one, vcodec, preset, crf, pix_fmt, gop)
+        seg = cache.hit(key)
+        if seg is None:
+            seg = cache.path(key)
+            code = encode_segment(ffmpeg, img, ov, frames, fps, seg, vf_one, vcodec, preset, crf, pix_fmt, threads,
+                                  gop)
+            if code != 0:
+                logging.error("  Ошибка FFmpeg (segment) для %s, код=%s", img.name, code)
+                return code
+            encoded += 1
+        segments.append(seg)
+    logging.info("  Сегменты: %d из кэша, %d закодировано", len(segments) - encoded, encoded)
+
+    fd, list_path = tempfile.mkstemp(prefix="concat_", suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for seg in segments:
+            f.write("file '" + seg.resolve().as_posix().replace("'", "'\\''") + "'\n")
+    cmd = [str(ffmpeg), "-hide_banner", "-loglevel", "error", "-y",
+           "-f", "concat", "-safe", "0", "-i", list_path, "-i", str(audio),
+           "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy",
+           "-c:a", acodec, "-b:a", abitrate, "-shortest"]
+    if movflags:
+        cmd += ["-movflags", movflags]
+    cmd += [str(out_path)]
+    logging.debug("FFmpeg (concat): %s", " ".join(cmd))
+    try:
+        return subprocess.run(cmd, check=False).returncode
+    except FileNotFoundError:
+        logging.error("Не найден ffmpeg. Проверьте encode.ffmpeg_path или PATH.")
+        return 1
+    except Exception as e:
+        logging.exception("Ошибка FFmpeg (concat): %s", e)
+        return 1
+    finally:
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+        cache.prune()
+
+
 # =========================
 # Парсинг таймингов
 # =========================
@@ -408,6 +746,164 @@ def fill_and_fit_durations(per_in: list[float | None], audio_dur: float, min_ima
 # Основной процесс
 # =========================
 
+def plan_audio(audio: Path, st: dict, taken: set[Path]) -> dict:
+    """
+    В родителе, до запуска пула: картинки аудио (с разбором слоёв) и пути роликов.
+    taken — пути, выданные предыдущим аудио (см. choose_output_path). Пишет только в taken, не в лог:
+    сообщения печатает process_audio — лог каждого аудио остаётся одним блоком.
+    """
+    plan: dict = dict(found=False, shared=None, images=[], overlays={}, outputs=[])
+    images = find_candidate_images(audio, st["image_exts"], st["image_dirs"], st["suffixes"], st["order"])
+    if not images and st["fallback_image"]:
+        shared = find_fallback_image(audio, st["image_exts"], st["image_dirs"], st["fallback_image"])
+        if shared:
+            # общий фон нужен и другим аудио: не удаляется, имя ролика — по аудио
+            plan["shared"] = shared
+            images = [shared]
+    if not images:
+        return plan
+    plan["found"] = True
+    images, overlays = split_overlays(images)
+    plan["images"], plan["overlays"] = images, overlays
+    if not images:
+        return plan
+
+    # Папка вывода
+    if st["out_dir"]:
+        base_out = st["out_dir"]
+        ensure_dir(base_out)
+    else:
+        base_out = audio.parent
+
+    # (стем, путь ролика или None = skip): ролик на каждую картинку или одно слайдшоу
+    if not st["slideshow_enabled"] or len(images) == 1:
+        stems = [audio.stem if plan["shared"] else img.stem for img in images]
+    else:
+        stems = [audio.stem]
+    plan["outputs"] = [(stem, choose_output_path(base_out, stem, st["out_ext"], st["on_exists"], taken))
+                       for stem in stems]
+    plan["base_out"] = base_out
+    return plan
+
+
+def process_audio(idx: int, total: int, audio: Path, plan: dict, st: dict) -> tuple[int, list[Path]]:
+    """
+    Один аудиофайл → ролик(и) по плану plan_audio (задача пула, см. main).
+    Возвращает (число созданных видео, отрендеренные картинки — их удаляет main после всех задач).
+    """
+    ffmpeg = st["ffmpeg"]
+    enc = dict(vcodec=st["vcodec"], preset=st["preset"], crf=st["crf"], pix_fmt=st["pix_fmt"],
+               acodec=st["acodec"], abitrate=st["abitrate"], movflags=st["movflags"], threads=st["threads"],
+               gop=st["gop"])
+    out_ext = st["out_ext"]
+    made = 0
+    rendered: list[Path] = []
+    try:
+        logging.info("(%d/%d) Аудио: %s", idx, total, audio)
+        shared = plan["shared"]
+        if shared:
+            logging.info("  Своей картинки нет -> общий фон %s", shared)
+        if not plan["found"]:
+            logging.warning("  Картинка не найдена -> пропуск")
+            return 0, rendered
+        images, overlays = plan["images"], plan["overlays"]
+        if not images:
+            logging.warning("  Нет картинок, кроме фонов слоёв -> пропуск")
+            return 0, rendered
+        base_out = plan["base_out"]
+
+        if not st["slideshow_enabled"] or len(images) == 1:
+            # --------- Обычный режим: ролик на каждую картинку ---------
+            for img, (stem, out_path) in zip(images, plan["outputs"]):
+                if out_path is None:
+                    logging.info("  Уже существует (skip): %s", (base_out / f"{stem}.{out_ext}").name)
+                    continue
+
+                logging.info("  Картинка: %s -> Видео: %s", img, out_path.name)
+                code = run_ffmpeg_still(ffmpeg, img, audio, out_path, st["vf_common"], **enc,
+                                        overlay=overlays.get(img))
+                if code == 0:
+                    made += 1
+                    if not shared:
+                        rendered.append(img)
+                else:
+                    logging.error("  Ошибка FFmpeg (still), код=%s", code)
+            return made, rendered
+
+        # --------- СЛАЙДШОУ: один ролик ---------
+        (stem, out_path), = plan["outputs"]
+        if out_path is None:
+            logging.info("  Уже существует (skip): %s", (base_out / f"{stem}.{out_ext}").name)
+            return 0, rendered
+
+        audio_dur = ffprobe_duration_seconds(ffmpeg if isinstance(ffmpeg, Path) else Path("ffmpeg"), audio)
+        if not audio_dur or audio_dur <= 0:
+            logging.warning("  Не удалось получить длительность аудио; примем 1.0 с/кадр.")
+            audio_dur = 1.0 * len(images)
+
+        # Источник таймингов
+        source = st["source"]
+        per_list: list[float | None] | None = None
+        if source in ("file", "auto", "auto_equal"):
+            timings_file = audio.with_name(f"{audio.stem}{st['timings_ext']}")
+            per_list = parse_timings_file(timings_file, images)
+        if (per_list is None) and (source in ("suffix", "auto")):
+            per_list = durations_from_suffixes(images)
+        if per_list is None:
+            per_list = [None] * len(images)
+
+        per_final = fill_and_fit_durations(per_list, audio_dur, st["min_image_sec"], st["fill_policy"])
+
+        logging.info("  Слайдшоу: кадров=%d, policy=%s, sum=%.3fs, итог: %s",
+                     len(images), st["fill_policy"], sum(per_final), out_path.name)
+
+        if st["segment_cache"] is not None:
+            code = run_ffmpeg_slideshow_segments(
+                ffmpeg=ffmpeg, images=images, per_sec=per_final, audio=audio,
+                out_path=out_path, vf_one=st["vf_common"], fps=st["fps"], cache=st["segment_cache"],
+                **enc, overlays=overlays
+            )
+        else:
+            code = run_ffmpeg_slideshow_equal(
+                ffmpeg=ffmpeg, images=images, per_sec=per_final, audio=audio,
+                out_path=out_path, vf_one=st["vf_common"], **enc, overlays=overlays, fps=st["fps"]
+            )
+        if code == 0:
+            made += 1
+            rendered = list(images)
+        else:
+            logging.error("  Ошибка FFmpeg (slideshow), код=%s", code)
+
+    except Exception as e:
+        logging.exception("Ошибка при обработке %s: %s", audio, e)
+    return made, rendered
+
+
+def delete_after_jobs(plans: list[dict], results: list) -> None:
+    """
+    После всех задач: удалить картинки, которые отрендерили ВСЕ использовавшие их аудио
+    (картинка может подойти нескольким аудио — пока одно не отрендерило её, она нужна).
+    """
+    users: dict[Path, int] = {}
+    done: dict[Path, int] = {}
+    overlays: dict[Path, tuple[Path, int, int]] = {}
+    for plan, res in zip(plans, results):
+        if plan["shared"]:
+            continue
+        overlays.update(plan["overlays"])
+        for img in dict.fromkeys(plan["images"]):
+            users[img] = users.get(img, 0) + 1
+        if not isinstance(res, pool_runner.JobFailed):
+            for img in dict.fromkeys(res[1]):
+                done[img] = done.get(img, 0) + 1
+    ready = [img for img, n in users.items() if done.get(img, 0) == n]
+    kept = len(done) - len(ready)
+    if kept:
+        logging.info("Оставлено картинок, нужных не отрендеренным роликам: %d", kept)
+    # фон слоя удаляется, когда отрендерены все его слои (delete_used_images)
+    delete_used_images(ready, overlays)
+
+
 def main() -> None:
     script_path = Path(__file__).resolve()
     script_dir = script_path.parent
@@ -421,9 +917,6 @@ def main() -> None:
     enc = cfg.get("encode", {})
     slide = cfg.get("slideshow", {})
 
-    audio_exts = normalize_exts(input_cfg.get("audio_exts", []))
-    image_exts = normalize_exts(input_cfg.get("image_exts", []))
-
     image_dirs: list[Path] = []
     for d in input_cfg.get("image_search_dirs", []):
         p = Path(str(d))
@@ -431,137 +924,95 @@ def main() -> None:
             p = (script_dir / p).resolve()
         image_dirs.append(p)
 
-    suffixes = [str(s) for s in input_cfg.get("image_suffixes", ["*"])]
-
-    # Слайдшоу/тайминги/удаление
-    slideshow_enabled = bool(slide.get("enabled", True))
-    order = str(slide.get("order", "name")).lower()
-    source = str(slide.get("source", "auto")).lower()              # auto|file|suffix|auto_equal
-    timings_ext = str(slide.get("timings_file_ext", ".slides.txt"))
-    min_image_sec = float(slide.get("min_image_sec", 0.3))
-    fill_policy = str(slide.get("fill_policy", "stretch_last")).lower()
-    delete_images_after = bool(slide.get("delete_images_after", False))
-
     # Выход
     out_dir_cfg = str(output_cfg.get("dir", "")).strip()
-    on_exists = str(output_cfg.get("on_exists", "rename")).lower()
-    out_ext = str(output_cfg.get("ext", "mp4")).strip().lstrip(".") or "mp4"
-
-    # Кодеки/параметры
-    width = int(enc.get("width", 1920))
-    height = int(enc.get("height", 1080))
-    fps = int(enc.get("fps", 30))
-    scale_mode = str(enc.get("scale_mode", "fit")).lower()
-    pad_color = str(enc.get("pad_color", "#000000"))
-    vcodec = str(enc.get("vcodec", "libx264"))
-    preset = str(enc.get("preset", "veryfast"))
-    crf = int(enc.get("crf", 18))
-    pix_fmt = str(enc.get("pix_fmt", "yuv420p"))
-    acodec = str(enc.get("acodec", "aac"))
-    abitrate = str(enc.get("abitrate", "192k"))
-    movflags = enc.get("movflags", "+faststart") or None
-    threads = int(enc.get("threads", 0)) or None
+    out_dir = None
+    if out_dir_cfg:
+        out_dir = Path(out_dir_cfg)
+        if not out_dir.is_absolute():
+            out_dir = (script_dir / out_dir).resolve()
 
     # ffmpeg
     ffmpeg_path = str(enc.get("ffmpeg_path", "")).strip()
-    ffmpeg = Path(ffmpeg_path) if ffmpeg_path else "ffmpeg"
+
+    # Профиль кодирования: standard (fps из конфига) | still (низкая частота, длинный GOP, ключи на слайдах)
+    profile = str(enc.get("profile", "standard")).lower()
+    fps, gop = int(enc.get("fps", 30)), None
+    if profile == "still":
+        fps = max(1, int(enc.get("still_fps", 5)))
+        gop = max(1, int(round(float(enc.get("still_gop_sec", 10)) * fps)))
+        logging.info("Профиль still: %d кадр/с, GOP до %d кадров", fps, gop)
+    elif profile != "standard":
+        logging.warning("Неизвестный encode.profile=%s -> standard", profile)
+
+    st = dict(
+        image_exts=normalize_exts(input_cfg.get("image_exts", [])),
+        image_dirs=image_dirs,
+        suffixes=[str(s) for s in input_cfg.get("image_suffixes", ["*"])],
+        fallback_image=str(input_cfg.get("fallback_image", "") or "").strip(),
+        # Слайдшоу/тайминги/удаление
+        slideshow_enabled=bool(slide.get("enabled", True)),
+        order=str(slide.get("order", "name")).lower(),
+        source=str(slide.get("source", "auto")).lower(),              # auto|file|suffix|auto_equal
+        timings_ext=str(slide.get("timings_file_ext", ".slides.txt")),
+        min_image_sec=float(slide.get("min_image_sec", 0.3)),
+        fill_policy=str(slide.get("fill_policy", "stretch_last")).lower(),
+        delete_images_after=bool(slide.get("delete_images_after", False)),
+        out_dir=out_dir,
+        on_exists=str(output_cfg.get("on_exists", "rename")).lower(),
+        out_ext=str(output_cfg.get("ext", "mp4")).strip().lstrip(".") or "mp4",
+        # Кодеки/параметры
+        vcodec=str(enc.get("vcodec", "libx264")),
+        preset=str(enc.get("preset", "veryfast")),
+        crf=int(enc.get("crf", 18)),
+        pix_fmt=str(enc.get("pix_fmt", "yuv420p")),
+        acodec=str(enc.get("acodec", "aac")),
+        abitrate=str(enc.get("abitrate", "192k")),
+        movflags=enc.get("movflags", "+faststart") or None,
+        ffmpeg=Path(ffmpeg_path) if ffmpeg_path else "ffmpeg",
+        fps=fps,
+        gop=gop,
+        segment_cache=None,
+        vf_common=build_vfilter(int(enc.get("width", 1920)), int(enc.get("height", 1080)),
+                                str(enc.get("scale_mode", "fit")).lower(), str(enc.get("pad_color", "#000000")),
+                                fps),
+    )
+
+    # Сборка слайдшоу: filter (один filter_complex на все слайды) | segments (кэш сегментов + concat)
+    assembly = str(slide.get("assembly", "filter")).lower()
+    if assembly == "segments":
+        seg_dir = Path(str(slide.get("segments_dir", "") or ".segments"))
+        if not seg_dir.is_absolute():
+            seg_dir = script_dir / seg_dir
+        st["segment_cache"] = SegmentCache(seg_dir, int(float(slide.get("segments_max_mb", 2000)) * 1024 * 1024))
+        logging.info("Слайдшоу из сегментов, кэш: %s", seg_dir)
+    elif assembly != "filter":
+        logging.warning("Неизвестный slideshow.assembly=%s -> filter", assembly)
 
     # Аудио
-    audios = collect_audios_by_mode(cfg, script_dir, audio_exts)
+    audios = collect_audios_by_mode(cfg, script_dir, normalize_exts(input_cfg.get("audio_exts", [])))
     if not audios:
         logging.warning("Аудио не найдено.")
         return
     logging.info("Найдено аудио-файлов: %d", len(audios))
-
-    vf_common = build_vfilter(width, height, scale_mode, pad_color, fps)
-
-    total_video = 0
-    for idx, audio in enumerate(audios, 1):
-        try:
-            logging.info("(%d/%d) Аудио: %s", idx, len(audios), audio)
-            images = find_candidate_images(audio, image_exts, image_dirs, suffixes, order)
-            if not images:
-                logging.warning("  Картинка не найдена -> пропуск")
-                continue
-
-            # Папка вывода
-            if out_dir_cfg:
-                base_out = Path(out_dir_cfg)
-                if not base_out.is_absolute():
-                    base_out = (script_dir / base_out).resolve()
-                ensure_dir(base_out)
-            else:
-                base_out = audio.parent
-
-            if not slideshow_enabled or len(images) == 1:
-                # --------- Обычный режим: ролик на каждую картинку ---------
-                for img in images:
-                    out_path = choose_output_path(base_out, img.stem, out_ext, on_exists)
-                    if out_path is None:
-                        logging.info("  Уже существует (skip): %s", (base_out / f"{img.stem}.{out_ext}").name)
-                        continue
-
-                    logging.info("  Картинка: %s -> Видео: %s", img, out_path.name)
-                    code = run_ffmpeg_still(ffmpeg, img, audio, out_path, vf_common,
-                                            vcodec, preset, crf, pix_fmt, acodec, abitrate, movflags, threads)
-                    if code == 0:
-                        total_video += 1
-                        if delete_images_after:
-                            try:
-                                img.unlink()
-                                logging.info("  Удалена картинка: %s", img)
-                            except Exception as e:
-                                logging.warning("  Не удалось удалить %s: %s", img, e)
-                    else:
-                        logging.error("  Ошибка FFmpeg (still), код=%s", code)
-                continue
-
-            # --------- СЛАЙДШОУ: один ролик ---------
-            out_path = choose_output_path(base_out, audio.stem, out_ext, on_exists)
-            if out_path is None:
-                logging.info("  Уже существует (skip): %s", (base_out / f"{audio.stem}.{out_ext}").name)
-                continue
-
-            audio_dur = ffprobe_duration_seconds(ffmpeg if isinstance(ffmpeg, Path) else Path("ffmpeg"), audio)
-            if not audio_dur or audio_dur <= 0:
-                logging.warning("  Не удалось получить длительность аудио; примем 1.0 с/кадр.")
-                audio_dur = 1.0 * len(images)
-
-            # Источник таймингов
-            per_list: list[float | None] | None = None
-            if source in ("file", "auto", "auto_equal"):
-                timings_file = audio.with_name(f"{audio.stem}{timings_ext}")
-                per_list = parse_timings_file(timings_file, images)
-            if (per_list is None) and (source in ("suffix", "auto")):
-                per_list = durations_from_suffixes(images)
-            if per_list is None:
-                per_list = [None] * len(images)
-
-            per_final = fill_and_fit_durations(per_list, audio_dur, min_image_sec, fill_policy)
-
-            logging.info("  Слайдшоу: кадров=%d, policy=%s, sum=%.3fs, итог: %s",
-                         len(images), fill_policy, sum(per_final), out_path.name)
-
-            code = run_ffmpeg_slideshow_equal(
-                ffmpeg=ffmpeg, images=images, per_sec=per_final, audio=audio,
-                out_path=out_path, vf_one=vf_common,
-                vcodec=vcodec, preset=preset, crf=crf, pix_fmt=pix_fmt,
-                acodec=acodec, abitrate=abitrate, movflags=movflags, threads=threads
-            )
-            if code == 0:
-                total_video += 1
-                if delete_images_after:
-                    for img in images:
-                        try:
-                            img.unlink()
-                            logging.info("  Удалена картинка: %s", img)
-                        except Exception as e:
-                            logging.warning("  Не удалось удалить %s: %s", img, e)
-            else:
-                logging.error("  Ошибка FFmpeg (slideshow), код=%s", code)
-
-        except Exception as e:
-            logging.exception("Ошибка при обработке %s: %s", audio, e)
+    if st["slideshow_enabled"]:
+        # длительности всей пачки — в потоках; воркеры пула берут их из дискового кэша media_probe
+        media_probe.probe_many(audios, ffprobe_near(st["ffmpeg"]))
+
+    # Несколько ffmpeg параллельно: workers = 0 → ядра / потоки одного ffmpeg (threads)
+    workers, threads = pool_runner.ffmpeg_workers(enc.get("workers", 0), int(enc.get("threads", 0) or 0), len(audios))
+    st["threads"] = threads or None
+    if workers > 1:
+        logging.info("Параллельно ffmpeg: %d (потоков на каждый: %d)", workers, threads)
+
+    # картинки и имена роликов — здесь, до пула: параллельные задачи не делят имя выхода
+    taken: set[Path] = set()
+    plans = [plan_audio(audio, st, taken) for audio in audios]
+    jobs = [(idx, len(audios), audio, plan, st) for idx, (audio, plan) in enumerate(zip(audios, plans), 1)]
+    results = pool_runner.run_jobs(process_audio, jobs, workers)
+    total_video = sum(r[0] for r in results if not isinstance(r, pool_runner.JobFailed))
+    if st["delete_images_after"]:
+        delete_after_jobs(plans, results)
 
     logging.info("Готово. Создано видео: %d", total_video)
 
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Проверка кадров и ключей сегментов слайдшоу: правка одного слайда меняет ключ только его сегмента, без дрейфа."""
+
+from make_video_from_audio_and_image import frame_counts, segment_frame_counts, segment_key
+
+FPS = 5
+VF = "scale=1920:1080,fps=5"
+
+
+def keys_for(images, per_sec):
+    return [segment_key(img, None, frames, FPS, VF, "libx264", "veryfast", 18, "yuv420p")
+            for img, frames in zip(images, segment_frame_counts(per_sec, FPS))]
+
+
+def test_retime_one_slide_changes_one_key(tmp_path):
+    images = []
+    for i in range(17):
+        p = tmp_path / f"slide_{i:02d}.png"
+        p.write_bytes(b"img%d" % i)
+        images.append(p)
+    per_sec = [2.13 + 0.37 * i for i in range(17)]
+    before = keys_for(images, per_sec)
+    for k in (0, 5, 16):
+        retimed = list(per_sec)
+        retimed[k] += 0.4            # ровно 2 кадра при fps 5
+        after = keys_for(images, retimed)
+        assert [i for i, (a, b) in enumerate(zip(before, after)) if a != b] == [k]
+
+
+def test_video_not_shorter_than_timings():
+    per_sec = [0.29] * 40            # 1.45 кадра -> 1: округление вниз на каждом слайде
+    assert sum(segment_frame_counts(per_sec, FPS)) >= sum(per_sec) * FPS
+
+
+def test_no_drift():
+    per_sec = [100 / 30] * 30        # 16.67 кадра на слайд при fps 5
+    for counts in (frame_counts(per_sec, FPS), segment_frame_counts(per_sec, FPS)):
+        total = 0
+        for i, n in enumerate(counts):
+            total += n
+            assert abs(total - sum(per_sec[:i + 1]) * FPS) < 1
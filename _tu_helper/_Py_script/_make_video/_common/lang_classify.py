@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+lang_classify.py — определение языка фразы для TTS (шаг 1) и split_lang_files (подключается из ../_common).
+
+- Быстрый путь — по письменности: доля кириллических / латинских букв >= script_ratio решает сразу.
+  Кириллица: і ї є ґ — uk, ы э ъ ё — ru; латиница — en. Среди candidates (разрешённых кодов) берётся
+  единственный язык этой письменности; фраза без букв -> None. any_cyrillic — любая кириллическая буква
+  делает строку кириллической (split_lang_files: строка «word — перевод» идёт к переводу).
+- langdetect — только для неоднозначных строк (смешанная письменность, кириллица без отличительных букв
+  при ru и uk среди candidates), с фиксированным seed: результат один и тот же от прогона к прогону.
+  Ответ ограничен candidates (detect_langs по убыванию вероятности): «Привет мир» не станет «mk».
+- Память: LRU на lru_size фраз; ответы langdetect — ещё и на диске (memo_path, JSON), save() в конце прогона.
+  Запасные ответы (langdetect не установлен или упал на строке) в memo не попадают — только в LRU прогона.
+
+    clf = LangClassifier(candidates=["en", "ru", "uk"], memo_path=Path(".lang_memo.json"))
+    clf.classify("The capital is London.")  # -> "en"
+    clf.save()
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    from langdetect import DetectorFactory, detect_langs  # необязательно: без него — по большинству букв
+    DetectorFactory.seed = 0
+except Exception:
+    detect_langs = None
+
+_CYR_RE = re.compile(r"[\u0400-\u04FF]")
+_LAT_RE = re.compile(r"[A-Za-z\u00C0-\u024F]")
+_UK_ONLY = frozenset("іїєґІЇЄҐ")
+_RU_ONLY = frozenset("ыэъёЫЭЪЁ")
+
+# письменность -> языки по умолчанию (первый — если отличить не удалось)
+_SCRIPT_LANGS = {"cyr": ("ru", "uk"), "lat": ("en",)}
+_MEMO_VERSION = 1
+
+
+def script_counts(text: str) -> Tuple[int, int]:
+    """(кириллических букв, латинских букв)."""
+    return len(_CYR_RE.findall(text)), len(_LAT_RE.findall(text))
+
+
+def cyrillic_lang(text: str) -> Optional[str]:
+    """uk/ru по отличительным буквам; None, если их нет (или есть и те и другие)."""
+    chars = set(text)
+    uk, ru = bool(chars & _UK_ONLY), bool(chars & _RU_ONLY)
+    if uk != ru:
+        return "uk" if uk else "ru"
+    return None
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+class LangClassifier:
+    """
+    classify(text) -> код языка (ISO 639-1, как у langdetect) или None (в тексте нет букв).
+    candidates — разрешённые коды (None — любые); script_ratio — порог доли одной письменности (> 0.5).
+    """
+
+    def __init__(self, candidates: Optional[Iterable[str]] = None, script_ratio: float = 0.8,
+                 memo_path: Optional[Path] = None, lru_size: int = 20000, any_cyrillic: bool = False):
+        self.candidates = tuple(dict.fromkeys(str(c).lower() for c in candidates)) if candidates else None
+        self.script_ratio = min(1.0, max(0.51, float(script_ratio)))
+        self.memo_path = Path(memo_path) if memo_path else None
+        self.lru_size = max(0, int(lru_size))
+        self.any_cyrillic = bool(any_cyrillic)
+        self.stats = {"fast": 0, "lru": 0, "memo": 0, "detect": 0}
+        self._lru: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._memo: Dict[str, str] = {}
+        self._dirty = False
+        self._memo_section = ",".join(self.candidates or ("*",))
+        self._load_memo()
+
+    # ---------------- диск ----------------
+
+    def _load_memo(self) -> None:
+        if self.memo_path is None or not self.memo_path.is_file():
+            return
+        try:
+            data = json.loads(self.memo_path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("version") == _MEMO_VERSION:
+            section = (data.get("sections") or {}).get(self._memo_section)
+            if isinstance(section, dict):
+                self._memo = {str(k): str(v) for k, v in section.items()}
+
+    def save(self) -> None:
+        """Дописать ответы langdetect в memo_path (другие наборы candidates в файле сохраняются)."""
+        if self.memo_path is None or not self._dirty:
+            return
+        data = {}
+        try:
+            data = json.loads(self.memo_path.read_text(encoding="utf-8"))
+        except Exception:
+            pass
+        if not isinstance(data, dict) or data.get("version") != _MEMO_VERSION:
+            data = {"version": _MEMO_VERSION}
+        sections = data.setdefault("sections", {})
+        sections[self._memo_section] = {**(sections.get(self._memo_section) or {}), **self._memo}
+        tmp = self.memo_path.with_name(f"{self.memo_path.name}.{os.getpid()}.tmp")
+        try:
+            self.memo_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.memo_path)
+            self._dirty = False
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    # ---------------- определение ----------------
+
+    def _allowed(self, script: str) -> Tuple[str, ...]:
+        langs = _SCRIPT_LANGS[script]
+        if self.candidates is None:
+            return langs
+        return tuple(c for c in self.candidates if any(c.startswith(lang) for lang in langs))
+
+    def _fast(self, text: str) -> Tuple[Optional[str], bool]:
+        """(код, решено). Не решено — нужен langdetect; код тогда — запасной ответ."""
+        cyr, lat = script_counts(text)
+        total = cyr + lat
+        if not total:
+            return None, True
+        script = "cyr" if cyr >= lat or (cyr and self.any_cyrillic) else "lat"
+        allowed = self._allowed(script) or _SCRIPT_LANGS[script]
+        fallback = allowed[0]
+        if max(cyr, lat) < total * self.script_ratio and not (cyr and self.any_cyrillic):
+            return fallback, False
+        if len(allowed) == 1:
+            return fallback, True
+        if script == "cyr":
+            code = cyrillic_lang(text)
+            if code and any(a.startswith(code) for a in allowed):
+                return next(a for a in allowed if a.startswith(code)), True
+        return fallback, False
+
+    def _detect(self, text: str, fallback: Optional[str]) -> Tuple[Optional[str], bool]:
+        """(код, ответ langdetect). False — langdetect нет или он не справился: код — запасной."""
+        if detect_langs is None:
+            return fallback, False
+        try:
+            ranked = detect_langs(text)
+        except Exception:
+            return fallback, False
+        for guess in ranked:
+            code = str(guess.lang).lower()
+            if self.candidates is None:
+                return code, True
+            for c in self.candidates:
+                if code.startswith(c) or c.startswith(code):
+                    return c, True
+        return fallback, True
+
+    def classify(self, text: str) -> Optional[str]:
+        key = _norm(text)
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.stats["lru"] += 1
+            return self._lru[key]
+
+        code, done = self._fast(key)
+        if done:
+            self.stats["fast"] += 1
+        elif key in self._memo:
+            code = self._memo[key]
+            self.stats["memo"] += 1
+        else:
+            code, detected = self._detect(key, code)
+            self.stats["detect"] += 1
+            if detected and code is not None and self.memo_path is not None:
+                self._memo[key] = code
+                self._dirty = True
+
+        if self.lru_size:
+            self._lru[key] = code
+            if len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+        return code
+
+    def stats_line(self) -> str:
+        s = self.stats
+        return (f"Язык фраз: по письменности {s['fast']}, из памяти {s['lru']}, "
+                f"из memo {s['memo']}, langdetect {s['detect']}")
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+media_probe.py — метаданные медиафайлов для скриптов _make_video (подключается из ../_common, как pool_runner).
+
+- probe(path, ffprobe) -> dict в формате `ffprobe -show_format -show_streams -of json` ({"format", "streams"});
+  ffprobe запускается не больше одного раза на файл: ответ хранится в памяти и на диске
+  (<cache_dir>/<sha1>.json, ключ — путь + размер + mtime; изменили файл — ключ другой).
+- .wav и .mp3 (выход TTS шага 1) разбираются по заголовкам без подпроцесса: WAV — RIFF-чанки fmt/data,
+  MP3 — индекс кадров шага 1 (<имя>.mp3.idx, mp3_stream), иначе mutagen, иначе подсчёт кадров.
+- probe_many(paths, ffprobe, workers) — пакетный разбор в пуле потоков (ffprobe — внешний процесс).
+  Дисковый кэш общий для процессов: родитель заполняет его, воркеры pool_runner читают готовое.
+- duration(path, ffprobe) -> float | None, has_audio(path, ffprobe) -> bool
+- set_cache_dir(path) — каталог дискового кэша (по умолчанию .probe_cache рядом с модулем; "" — без диска)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import mp3_stream
+
+try:
+    from mutagen.mp3 import MP3  # необязательно: без mutagen .mp3 считается по кадрам (mp3_stream)
+except Exception:
+    MP3 = None
+
+_cache_dir: Optional[Path] = Path(__file__).resolve().parent / ".probe_cache"
+_mem: Dict[Tuple[str, int, int], dict] = {}
+_mem_lock = threading.Lock()
+
+# WAVE_FORMAT -> codec_name как у ffprobe (для extensible берётся подформат)
+_WAV_CODECS = {1: "pcm_s{bits}le", 3: "pcm_f{bits}le", 6: "pcm_alaw", 7: "pcm_mulaw"}
+
+
+def set_cache_dir(path: str | Path | None) -> None:
+    global _cache_dir
+    _cache_dir = Path(path) if path else None
+
+
+def _stat_key(path: Path) -> Optional[Tuple[str, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.normcase(os.path.abspath(path)), st.st_size, st.st_mtime_ns)
+
+
+def _disk_path(sk: Tuple[str, int, int]) -> Optional[Path]:
+    if _cache_dir is None:
+        return None
+    key = hashlib.sha1("\n".join(map(str, sk)).encode("utf-8")).hexdigest()
+    return _cache_dir / f"{key}.json"
+
+
+def _disk_load(sk: Tuple[str, int, int]) -> Optional[dict]:
+    p = _disk_path(sk)
+    if p is None or not p.is_file():
+        return None
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _disk_store(sk: Tuple[str, int, int], data: dict) -> None:
+    p = _disk_path(sk)
+    if p is None:
+        return
+    tmp = p.with_name(f"{p.stem}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, p)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+# =========================
+# Разбор заголовков
+# =========================
+
+def _audio_only(fmt_name: str, codec: str, sr: int, channels: int, dur: float, size: int, bit_rate: int = 0) -> dict:
+    stream = {"index": 0, "codec_type": "audio", "codec_name": codec, "sample_rate": str(int(sr)),
+              "channels": int(channels), "duration": f"{dur:.6f}"}
+    if bit_rate:
+        stream["bit_rate"] = str(int(bit_rate))
+    return {"format": {"format_name": fmt_name, "duration": f"{dur:.6f}", "size": str(size), "nb_streams": 1},
+            "streams": [stream], "source": "header"}
+
+
+def _probe_wav(path: Path) -> Optional[dict]:
+    """RIFF/WAVE: fmt — частота, каналы, байт/с; data — размер. Длительность = data / байт_в_секунду."""
+    size = path.stat().st_size
+    with path.open("rb") as f:
+        head = f.read(12)
+        if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            ch = f.read(8)
+            if len(ch) < 8:
+                return None
+            cid, clen = ch[:4], struct.unpack("<I", ch[4:])[0]
+            if cid == b"fmt ":
+                body = f.read(clen)
+                if len(body) < 16:
+                    return None
+                tag, channels, sr, byte_rate, _align, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == 0xFFFE and len(body) >= 26:
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (tag, channels, sr, byte_rate, bits)
+                f.seek(clen & 1, 1)
+            elif cid == b"data":
+                if fmt is None or not fmt[3]:
+                    return None
+                tag, channels, sr, byte_rate, bits = fmt
+                data_len = min(clen, size - f.tell())   # 0xFFFFFFFF у потоковой записи
+                codec = _WAV_CODECS.get(tag, "").format(bits=bits)
+                if not codec:
+                    return None
+                return _audio_only("wav", codec, sr, channels, data_len / byte_rate, size, byte_rate * 8)
+            else:
+                f.seek(clen + (clen & 1), 1)
+
+
+def _probe_mp3(path: Path) -> Optional[dict]:
+    """Индекс кадров шага 1 (<имя>.mp3.idx) -> mutagen (Xing/Info или оценка) -> подсчёт кадров."""
+    size = path.stat().st_size
+    idx = mp3_stream.read_index(path)
+    if idx is not None and idx.frames:
+        with path.open("rb") as f:
+            f.seek(idx.offsets[0])
+            fr = mp3_stream.parse_header(f.read(4))
+        if fr is not None:
+            return _audio_only("mp3", "mp3", idx.sample_rate, 1 if fr.mono else 2, idx.duration, size,
+                               size * 8 / idx.duration if idx.duration else 0)
+    if MP3 is not None:
+        info = MP3(str(path)).info
+        if not info.length:
+            return None
+        return _audio_only("mp3", "mp3", info.sample_rate, info.channels, float(info.length),
+                           size, getattr(info, "bitrate", 0))
+    frames, sec, fr = mp3_stream.scan_bytes(path.read_bytes())
+    if not frames or fr is None:
+        return None
+    return _audio_only("mp3", "mp3", fr.sample_rate, 1 if fr.mono else 2, sec, size, size * 8 / sec if sec else 0)
+
+
+_HEADER_PARSERS = {".wav": _probe_wav, ".mp3": _probe_mp3}
+
+
+def _probe_header(path: Path) -> Optional[dict]:
+    fn = _HEADER_PARSERS.get(path.suffix.lower())
+    if fn is None:
+        return None
+    try:
+        return fn(path)
+    except Exception:
+        return None
+
+
+def _run_ffprobe(ffprobe: str, path: Path) -> Optional[dict]:
+    try:
+        cp = subprocess.run([ffprobe, "-v", "error", "-show_format", "-show_streams", "-of", "json", str(path)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    except Exception:
+        return None
+    if cp.returncode != 0:
+        return None
+    try:
+        data = json.loads(cp.stdout.decode("utf-8", "ignore") or "{}")
+    except Exception:
+        return None
+    return data if isinstance(data, dict) and (data.get("format") or data.get("streams")) else None
+
+
+# =========================
+# Публичные функции
+# =========================
+
+def probe(path: str | Path, ffprobe: str | Path = "ffprobe") -> dict:
+    """Метаданные файла ({} при неудаче). Порядок: память -> диск -> заголовок (.wav/.mp3) -> ffprobe."""
+    path = Path(path)
+    sk = _stat_key(path)
+    if sk is None:
+        return {}
+    with _mem_lock:
+        hit = _mem.get(sk)
+    if hit is not None:
+        return hit
+    data = _disk_load(sk)
+    if data is None:
+        data = _probe_header(path) or _run_ffprobe(str(ffprobe or "ffprobe"), path)
+        if data is None:
+            return {}   # неудачу не кэшируем: ffprobe мог быть не найден
+        _disk_store(sk, data)
+    with _mem_lock:
+        _mem[sk] = data
+    return data
+
+
+def duration(path: str | Path, ffprobe: str | Path = "ffprobe") -> Optional[float]:
+    """format.duration, иначе максимум duration по потокам; None, если узнать не удалось."""
+    data = probe(path, ffprobe)
+    fmt_dur = _to_float((data.get("format") or {}).get("duration"))
+    if fmt_dur > 0:
+        return fmt_dur
+    best = max([_to_float(s.get("duration")) for s in data.get("streams") or []] or [0.0])
+    return best if best > 0 else None
+
+
+def _to_float(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def has_audio(path: str | Path, ffprobe: str | Path = "ffprobe") -> bool:
+    return any(s.get("codec_type") == "audio" for s in probe(path, ffprobe).get("streams") or [])
+
+
+def probe_many(paths: Iterable[str | Path], ffprobe: str | Path = "ffprobe",
+               workers: int = 0) -> Dict[Path, dict]:
+    """Разбор списка файлов в пуле потоков (workers = 0 — по числу ядер ×2, не больше 8)."""
+    items: List[Path] = [Path(p) for p in paths]
+    if not items:
+        return {}
+    n = workers or min(8, (os.cpu_count() or 2) * 2)
+    n = max(1, min(int(n), len(items)))
+    if n == 1:
+        return {p: probe(p, ffprobe) for p in items}
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        return dict(zip(items, ex.map(lambda p: probe(p, ffprobe), items)))
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+mp3_stream.py — потоковая склейка MP3 по кадрам (шаг 1 пишет, media_probe и шаг 4 читают индекс).
+
+- Mp3Writer(f, xing=True): байты подаются по мере прихода (feed) или целыми потоками (add_stream —
+  кусок TTS); заголовки MPEG-кадров разбираются на лету, кадры пишутся в файл и считаются —
+  длительность = сумма сэмплов кадров / частота, без оценок по битрейту.
+  ID3v2 и кадры Xing/Info/VBRI внутри кусков выбрасываются (иначе в середине файла оказались бы «тихие»
+  служебные кадры); неполный хвост куска отбрасывается.
+- close(): первым кадром файла записывается заголовок Xing (VBR) / Info (CBR) — число кадров, размер и TOC;
+  ffprobe, mutagen и плееры берут длительность и позицию перемотки из него, не сканируя файл.
+- write_index(path): файл-спутник <имя>.mp3.idx — частота, сэмплов в кадре, размер MP3 и смещения кадров;
+  read_index() -> FrameIndex (duration, offset_at(sec)) — длительность и перемотка без ffprobe.
+- add_silence(ms, like) — пауза из тихих кадров с параметрами голоса (частота, битрейт, каналы), длина кратна
+  кадру (576 сэмплов при 24 кГц = 24 мс); silent_frame(fr), first_frame(data) — шаблон и кадр по байтам.
+- scan_bytes(data) -> (кадров, секунд, первый кадр) — подсчёт по кадрам для готовых байтов.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, Optional, Tuple
+
+# битрейты, кбит/с: (MPEG-1?, слой) -> индексы 1..14
+_BITRATES = {
+    (True, 1): (32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# биты версии -> частоты (0 — MPEG-2.5, 2 — MPEG-2, 3 — MPEG-1)
+_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+INDEX_MAGIC = b"MP3X"
+_INDEX_HDR = struct.Struct("<4sHHIIQQ")   # magic, версия, 0, частота, сэмплов/кадр, кадров, размер MP3
+_XING_PAYLOAD = 120                       # "Xing" + флаги + кадры + байты + TOC[100] + качество
+
+
+class Frame(NamedTuple):
+    version: int        # биты версии: 0 — 2.5, 2 — MPEG-2, 3 — MPEG-1
+    layer: int          # 1..3
+    bitrate: int        # кбит/с
+    sample_rate: int
+    samples: int        # сэмплов в кадре
+    length: int         # байт в кадре
+    mono: bool
+
+
+def parse_header(b: bytes | bytearray | memoryview, pos: int = 0) -> Optional[Frame]:
+    """Заголовок MPEG-аудиокадра в b[pos:pos+4] или None."""
+    if len(b) - pos < 4 or b[pos] != 0xFF or (b[pos + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = b[pos + 1], b[pos + 2], b[pos + 3]
+    version, layer_bits = (b1 >> 3) & 3, (b1 >> 1) & 3
+    br_idx, sr_idx = b2 >> 4, (b2 >> 2) & 3
+    if version == 1 or layer_bits == 0 or br_idx in (0, 15) or sr_idx == 3:
+        return None
+    layer = 4 - layer_bits
+    v1 = version == 3
+    bitrate = _BITRATES[(v1, layer)][br_idx - 1]
+    sr = _RATES[version][sr_idx]
+    samples = 384 if layer == 1 else (1152 if (layer == 2 or v1) else 576)
+    fr = Frame(version, layer, bitrate, sr, samples, 0, (b3 >> 6) == 3)
+    return fr._replace(length=frame_length(fr, (b2 >> 1) & 1))
+
+
+def frame_length(fr: Frame, pad: int) -> int:
+    """Длина кадра (байт) с параметрами fr и битом заполнения pad."""
+    if fr.layer == 1:
+        return (12 * fr.bitrate * 1000 // fr.sample_rate + pad) * 4
+    return (144 if fr.samples == 1152 else 72) * fr.bitrate * 1000 // fr.sample_rate + pad
+
+
+def _side_info(fr: Frame) -> int:
+    if fr.version == 3:
+        return 17 if fr.mono else 32
+    return 9 if fr.mono else 17
+
+
+def is_info_frame(b: bytes | bytearray | memoryview, pos: int, fr: Frame) -> bool:
+    """Служебный кадр Xing/Info/VBRI (не звук) — при склейке не копируется."""
+    if fr.layer != 3:
+        return False
+    off = pos + 4 + _side_info(fr)
+    return bytes(b[off:off + 4]) in (b"Xing", b"Info") or bytes(b[pos + 36:pos + 40]) == b"VBRI"
+
+
+def silent_frame(fr: Frame) -> bytes:
+    """
+    Тихий кадр с параметрами fr (версия, слой, частота, битрейт, моно/стерео): заголовок без CRC и нули —
+    нулевая side info / распределение бит декодируются в тишину, main_data_begin = 0 (резервуар не нужен).
+    """
+    br_idx = _BITRATES[(fr.version == 3, fr.layer)].index(fr.bitrate) + 1
+    sr_idx = _RATES[fr.version].index(fr.sample_rate)
+    out = bytearray(frame_length(fr, 0))     # без бита заполнения
+    out[:4] = bytes((0xFF, 0xE0 | (fr.version << 3) | ((4 - fr.layer) << 1) | 1,
+                     (br_idx << 4) | (sr_idx << 2), 0xC0 if fr.mono else 0x40))
+    return bytes(out)
+
+
+def first_frame(data: bytes | bytearray) -> Optional[Frame]:
+    """Первый кадр в начале MP3-байтов (после ID3v2), подтверждённый следующим заголовком."""
+    pos = _id3v2_size(data, 0)
+    for i in range(pos, min(len(data) - 3, pos + (1 << 16))):
+        fr = parse_header(data, i)
+        if fr is not None and (i + fr.length + 4 > len(data) or parse_header(data, i + fr.length) is not None):
+            return fr
+    return None
+
+
+def _id3v2_size(b: bytes | bytearray, pos: int) -> int:
+    if len(b) - pos < 10 or bytes(b[pos:pos + 3]) != b"ID3":
+        return 0
+    s = b[pos + 6:pos + 10]
+    size = (s[0] << 21) | (s[1] << 14) | (s[2] << 7) | s[3]
+    return 10 + size + (10 if b[pos + 5] & 0x10 else 0)
+
+
+class Mp3Writer:
+    """
+    Склейка MP3 в открытый файл (wb, с seek). Кадры принимаются, если после кадра идёт следующий заголовок
+    (или параметры совпадают с предыдущим кадром) — случайные 0xFFE в мусоре не сбивают синхронизацию.
+    """
+
+    def __init__(self, f: BinaryIO, xing: bool = True):
+        self.f = f
+        self.xing = xing
+        self.frames = 0
+        self.seconds = 0.0
+        self.sample_rate = 0
+        self.samples_per_frame = 0      # 0 — кадры разной длины/частоты (индекс не пишется)
+        self.offsets = array("Q")       # смещения звуковых кадров в файле
+        self._first: Optional[Tuple[Frame, int]] = None     # (кадр, байт 3 заголовка) — для кадра Xing
+        self._bitrates: set[int] = set()
+        self._tag_len = 0
+        self._pos = 0
+        self._buf = bytearray()
+        self._lead = True               # начало куска: здесь может быть ID3v2
+        self._prev: Optional[Frame] = None
+        self._last: Optional[Frame] = None       # последний записанный кадр — шаблон для пауз
+
+    # ---- приём байтов
+
+    def feed(self, data: bytes) -> float:
+        """Очередные байты потока; возвращает длительность кадров, принятых за этот вызов (с)."""
+        self._buf += data
+        return self._drain(final=False)
+
+    def end_stream(self) -> float:
+        """Конец самостоятельного потока (куска): дописать последний полный кадр, неполный хвост — отбросить."""
+        sec = self._drain(final=True)
+        self._buf.clear()
+        self._lead = True
+        self._prev = None
+        return sec
+
+    def add_stream(self, data: bytes) -> float:
+        """Целый MP3-кусок; возвращает его точную длительность по кадрам (с)."""
+        return self.feed(data) + self.end_stream()
+
+    def add_silence(self, ms: float, like: Optional[Frame] = None) -> float:
+        """
+        Пауза из тихих кадров: round(ms / длительность кадра) кадров с параметрами like (обычно — первый кадр
+        следующего куска), иначе последнего записанного кадра. Возвращает точную длительность паузы (с).
+        """
+        fr = like or self._last
+        if fr is None or ms <= 0:
+            return 0.0
+        n = int(round(ms / 1000.0 * fr.sample_rate / fr.samples))
+        if n <= 0:
+            return 0.0
+        self.end_stream()
+        frame = silent_frame(fr)
+        sil = parse_header(frame)
+        sec = 0.0
+        for _ in range(n):
+            sec += self._write_frame(sil, frame, 0, len(frame))
+        self.seconds += sec
+        return sec
+
+    def _drain(self, final: bool) -> float:
+        b, pos, n, sec = self._buf, 0, len(self._buf), 0.0
+        while True:
+            if self._lead:
+                skip = _id3v2_size(b, pos)
+                if skip and pos + skip > n and not final:
+                    break                               # тег ещё не пришёл целиком
+                if skip:
+                    pos = min(n, pos + skip)
+                    continue
+            if n - pos < 4:
+                break
+            fr = parse_header(b, pos)
+            if fr is None:
+                pos += 1
+                continue
+            end = pos + fr.length
+            if end > n:
+                break                                   # кадр не пришёл целиком (в конце куска — отбросится)
+            prev = self._prev
+            if prev is None or (prev.version, prev.layer, prev.sample_rate) != (fr.version, fr.layer, fr.sample_rate):
+                # первый кадр или смена параметров: нужен следующий заголовок сразу за кадром
+                if n - end >= 4:
+                    if parse_header(b, end) is None:
+                        pos += 1                        # ложная синхронизация
+                        continue
+                elif not final:
+                    break                               # подтвердим, когда придут следующие байты
+            self._lead = False
+            self._prev = fr
+            if not is_info_frame(b, pos, fr):
+                sec += self._write_frame(fr, b, pos, end)
+            pos = end
+        del b[:pos]
+        self.seconds += sec
+        return sec
+
+    def _write_frame(self, fr: Frame, b: bytearray, pos: int, end: int) -> float:
+        if self._first is None:
+            self._first = (fr, b[pos + 3])
+            self.sample_rate, self.samples_per_frame = fr.sample_rate, fr.samples
+            if self.xing and fr.layer == 3:
+                tag = self._tag_frame(0, 0, b"")
+                if tag:
+                    self._tag_len = len(tag)
+                    self.f.write(tag)
+                    self._pos += len(tag)
+        elif (fr.sample_rate, fr.samples) != (self.sample_rate, self.samples_per_frame):
+            self.samples_per_frame = 0
+        self._last = fr
+        self.offsets.append(self._pos)
+        self.f.write(b[pos:end])
+        self._pos += end - pos
+        self.frames += 1
+        self._bitrates.add(fr.bitrate)
+        return fr.samples / fr.sample_rate
+
+    # ---- Xing/Info
+
+    def _tag_frame(self, frames: int, total: int, toc: bytes) -> bytes:
+        """Кадр Xing/Info с параметрами первого звукового кадра и минимальным битрейтом, куда влезает тег."""
+        fr, b3 = self._first
+        need = 4 + _side_info(fr) + _XING_PAYLOAD
+        table = _BITRATES[(fr.version == 3, 3)]
+        for idx, br in enumerate(table, start=1):
+            length = frame_length(fr._replace(layer=3, bitrate=br), 0)
+            if length >= need:
+                break
+        else:
+            return b""
+        sr_idx = _RATES[fr.version].index(fr.sample_rate)
+        head = bytes((0xFF, 0xE0 | (fr.version << 3) | (1 << 1) | 1, (idx << 4) | (sr_idx << 2), b3 & 0xC0))
+        out = bytearray(length)
+        out[:4] = head
+        off = 4 + _side_info(fr)
+        name = b"Info" if len(self._bitrates) <= 1 else b"Xing"
+        out[off:off + 16] = name + struct.pack(">III", 0x0F, frames, total)
+        out[off + 16:off + 116] = toc.ljust(100, b"\0")
+        return bytes(out)
+
+    def _toc(self, total: int) -> bytes:
+        toc = bytearray(100)
+        if not self.frames or not total:
+            return bytes(toc)
+        for i in range(100):
+            k = min(self.frames - 1, i * self.frames // 100)   # кадры равной длины — доля кадров = доля времени
+            toc[i] = min(255, self.offsets[k] * 256 // total)
+        return bytes(toc)
+
+    def close(self) -> None:
+        """Дописать заголовок Xing/Info (файл остаётся открытым — его закрывает вызывающий)."""
+        self.end_stream()
+        if not self._tag_len:
+            return
+        total = self._pos
+        tag = self._tag_frame(self.frames, total, self._toc(total))
+        self.f.seek(0)
+        self.f.write(tag)
+        self.f.seek(self._pos)
+
+    # ---- индекс кадров
+
+    def write_index(self, path: Path) -> bool:
+        """Файл-спутник со смещениями кадров; False — кадры разной частоты/длины или их нет."""
+        if not self.frames or not self.samples_per_frame or self._pos >= 1 << 32:
+            return False
+        offs = array("I", self.offsets)
+        if sys.byteorder != "little":
+            offs.byteswap()
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with tmp.open("wb") as f:
+                f.write(_INDEX_HDR.pack(INDEX_MAGIC, 1, 0, self.sample_rate, self.samples_per_frame,
+                                        self.frames, self._pos))
+                f.write(offs.tobytes())
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return False
+        return True
+
+
+def index_path(mp3_path: Path) -> Path:
+    return mp3_path.with_name(mp3_path.name + ".idx")
+
+
+@dataclass
+class FrameIndex:
+    sample_rate: int
+    samples_per_frame: int
+    file_size: int
+    offsets: array
+
+    @property
+    def frames(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def duration(self) -> float:
+        return self.frames * self.samples_per_frame / self.sample_rate
+
+    def offset_at(self, sec: float) -> int:
+        """Смещение кадра, содержащего момент sec (для перемотки/нарезки без сканирования файла)."""
+        k = int(max(0.0, sec) * self.sample_rate // self.samples_per_frame)
+        return self.offsets[min(k, self.frames - 1)] if self.frames else 0
+
+
+def read_index(mp3_path: Path) -> Optional[FrameIndex]:
+    """Индекс <mp3>.idx, если он есть и относится к текущему файлу (размер совпал, индекс не старше MP3)."""
+    ip = index_path(mp3_path)
+    try:
+        st_mp3, st_idx = mp3_path.stat(), ip.stat()
+        if st_idx.st_mtime_ns < st_mp3.st_mtime_ns:
+            return None
+        data = ip.read_bytes()
+    except OSError:
+        return None
+    if len(data) < _INDEX_HDR.size:
+        return None
+    magic, ver, _r, sr, spf, n, size = _INDEX_HDR.unpack_from(data)
+    if magic != INDEX_MAGIC or ver != 1 or size != st_mp3.st_size or not sr or not spf:
+        return None
+    offs = array("I")
+    offs.frombytes(data[_INDEX_HDR.size:_INDEX_HDR.size + 4 * n])
+    if sys.byteorder != "little":
+        offs.byteswap()
+    if len(offs) != n:
+        return None
+    return FrameIndex(sr, spf, size, offs)
+
+
+class _Null:
+    def write(self, _b) -> None:
+        pass
+
+    def seek(self, _p) -> None:
+        pass
+
+
+def scan_bytes(data: bytes) -> Tuple[int, float, Optional[Frame]]:
+    """(кадров, секунд, первый звуковой кадр) для готовых MP3-байтов — тот же разбор, что при склейке, без записи."""
+    w = Mp3Writer(_Null(), xing=False)  # type: ignore[arg-type]
+    sec = w.add_stream(data)
+    return w.frames, sec, (w._first[0] if w._first else None)
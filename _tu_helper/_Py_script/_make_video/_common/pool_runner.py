@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+pool_runner.py — общий пул процессов для шагов _make_video (шаги 0–4 подключают его из ../_common).
+
+- run_jobs(fn, jobs, workers, on_output=None) -> результаты в порядке jobs
+  * workers <= 1 или одна задача — последовательно в текущем процессе (вывод идёт как есть);
+  * иначе — ProcessPoolExecutor: вывод задачи (print и logging) копится в дочернем процессе и
+    воспроизводится в родителе строго в порядке задач — лог читается так же, как при последовательном запуске;
+  * исключение в задаче не роняет остальные: её результат — JobFailed;
+  * падение процесса-исполнителя (segfault, OOM, os._exit) ломает весь пул: готовые результаты сохраняются,
+    незавершённые задачи перезапускаются в новом пуле; если пул ломается без единого готового результата —
+    следующая задача запускается одна, и JobFailed получает только та, что роняет процесс.
+  fn должна быть функцией верхнего уровня модуля, аргументы — picklable (на Windows процессы стартуют через spawn).
+- resolve_workers(value, n_jobs) — 0/пусто → число ядер; не больше числа задач
+- ffmpeg_workers(value, threads, n_jobs) -> (workers, threads) — для шагов с ffmpeg: ядра / потоки одного ffmpeg
+- OrderedOutput — выдача текстов по порядку номеров (для asyncio-цикла TTS, где задачи — не процессы)
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# потоков на один ffmpeg, если [encode] threads = 0: x264 на 1080p дальше 4 потоков масштабируется плохо,
+# выгоднее несколько кодирований параллельно
+FFMPEG_AUTO_THREADS = 4
+
+
+@dataclass
+class JobFailed:
+    """Результат задачи, завершившейся исключением (error — traceback)."""
+    error: str
+
+    def __bool__(self) -> bool:
+        return False
+
+
+def cpu_count() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except Exception:
+        return max(1, os.cpu_count() or 1)
+
+
+def resolve_workers(value: Any, n_jobs: int) -> int:
+    """workers из конфига: 0/пусто/мусор → число ядер; всегда 1..n_jobs."""
+    try:
+        w = int(value or 0)
+    except (TypeError, ValueError):
+        w = 0
+    if w <= 0:
+        w = cpu_count()
+    return max(1, min(w, n_jobs))
+
+
+def ffmpeg_workers(value: Any, threads: int, n_jobs: int) -> Tuple[int, int]:
+    """
+    Число параллельных ffmpeg и потоков на каждый.
+    workers = 0 → ядра // threads (threads = 0 → FFMPEG_AUTO_THREADS).
+    Если параллельных ffmpeg больше одного, а threads не задан — делим ядра поровну, чтобы не было переподписки.
+    """
+    try:
+        w = int(value or 0)
+    except (TypeError, ValueError):
+        w = 0
+    threads = max(0, int(threads or 0))
+    cores = cpu_count()
+    if w <= 0:
+        w = max(1, cores // (threads or FFMPEG_AUTO_THREADS))
+    w = max(1, min(w, n_jobs))
+    if w > 1 and threads == 0:
+        threads = max(1, cores // w)
+    return w, threads
+
+
+# =========================
+# Захват вывода в дочернем процессе
+# =========================
+
+class _EventWriter(io.TextIOBase):
+    def __init__(self, events: list):
+        self.events = events
+
+    def write(self, s: str) -> int:
+        if s:
+            self.events.append(("out", 0, s))
+        return len(s)
+
+
+class _EventHandler(logging.Handler):
+    def __init__(self, events: list):
+        super().__init__()
+        self.events = events
+
+    def emit(self, record: logging.LogRecord) -> None:
+        msg = record.getMessage()
+        if record.exc_info:
+            msg += "\n" + "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        self.events.append(("log", record.levelno, msg))
+
+
+def _call_captured(fn: Callable, args: Tuple, log_level: int):
+    events: list = []
+    root = logging.getLogger()
+    old_handlers, old_level = root.handlers[:], root.level
+    root.handlers = [_EventHandler(events)]
+    root.setLevel(log_level)
+    out = _EventWriter(events)
+    try:
+        with redirect_stdout(out), redirect_stderr(out):
+            try:
+                return True, fn(*args), events
+            except BaseException:
+                return False, traceback.format_exc(), events
+    finally:
+        root.handlers = old_handlers
+        root.setLevel(old_level)
+
+
+def _replay(events: list, on_output: Callable[[str], None]) -> None:
+    text: List[str] = []
+    for kind, level, payload in events:
+        if kind == "out":
+            text.append(payload)
+            continue
+        if text:
+            on_output("".join(text)); text = []
+        logging.getLogger().log(level, "%s", payload)
+    if text:
+        on_output("".join(text))
+
+
+# =========================
+# Запуск
+# =========================
+
+def run_jobs(fn: Callable, jobs: Sequence[Tuple], workers: int,
+             on_output: Optional[Callable[[str], None]] = None) -> List[Any]:
+    """fn(*job) для каждого job; возвращает результаты (или JobFailed) в порядке jobs."""
+    jobs = list(jobs)
+    on_output = on_output or (lambda s: (sys.stdout.write(s), sys.stdout.flush()))
+    results: List[Any] = []
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                results.append(fn(*job))
+            except Exception:
+                tb = traceback.format_exc()
+                logging.error("Задача %s завершилась ошибкой:\n%s", _job_title(job), tb)
+                results.append(JobFailed(tb))
+        return results
+
+    level = logging.getLogger().getEffectiveLevel()
+    done: Dict[int, tuple] = {}   # номер задачи -> (ok, значение или traceback, события вывода)
+
+    def emit() -> None:
+        # вывод задачи i печатается только после вывода 0..i-1
+        while len(results) in done:
+            i = len(results)
+            ok, value, events = done.pop(i)
+            _replay(events, on_output)
+            if ok:
+                results.append(value)
+            else:
+                logging.error("Задача %s завершилась ошибкой:\n%s", _job_title(jobs[i]), value)
+                results.append(JobFailed(value))
+
+    pending = list(range(len(jobs)))
+    isolate = False
+    while pending:
+        batch = pending[:1] if isolate else pending
+        crash = _run_pool(fn, jobs, batch, min(workers, len(batch)), level, done, emit)
+        if crash is not None and isolate:
+            # задача была в пуле одна — процесс роняет именно она
+            done[batch[0]] = (False, crash, [])
+            emit()
+        progressed = any(i < len(results) or i in done for i in batch)
+        if crash is not None and pending[1:]:
+            logging.warning("Процесс-исполнитель упал — незавершённые задачи перезапускаются в новом пуле")
+        isolate = crash is not None and not progressed
+        pending = [i for i in pending if i >= len(results) and i not in done]
+    return results
+
+
+def _run_pool(fn: Callable, jobs: List[Tuple], batch: List[int], workers: int, level: int,
+              done: Dict[int, tuple], emit: Callable[[], None]) -> Optional[str]:
+    """
+    Задачи batch в новом пуле; результаты — в done (emit() после каждого).
+    Пул сломался (упал процесс-исполнитель) → traceback; незавершённые задачи остаются без результата.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {i: ex.submit(_call_captured, fn, tuple(jobs[i]), level) for i in batch}
+        for i in batch:
+            try:
+                done[i] = futures[i].result()
+            except BrokenProcessPool:
+                crash = traceback.format_exc()
+                # результаты, пришедшие до падения, не теряем
+                for j, fut in futures.items():
+                    if j not in done and fut.done() and not fut.cancelled() and fut.exception() is None:
+                        done[j] = fut.result()
+                emit()
+                return crash
+            except Exception:
+                # результат не передался (например, не picklable)
+                done[i] = (False, traceback.format_exc(), [])
+            emit()
+    return None
+
+
+def _job_title(job: Iterable) -> str:
+    for a in job:
+        if isinstance(a, (str, os.PathLike)):
+            return os.path.basename(str(a))
+    return "?"
+
+
+class OrderedOutput:
+    """put(i, text): печатает всё, что готово подряд начиная с номера 0 — вывод идёт в порядке номеров."""
+
+    def __init__(self, write: Optional[Callable[[str], Any]] = None):
+        self._write = write or sys.stdout.write
+        self._next = 0
+        self._ready: dict = {}
+
+    def put(self, index: int, text: str) -> None:
+        self._ready[index] = text
+        while self._next in self._ready:
+            self._write(self._ready.pop(self._next))
+            self._next += 1
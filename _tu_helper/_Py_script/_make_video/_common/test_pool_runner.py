@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Проверка pool_runner.run_jobs: падение одного процесса-исполнителя не трогает остальные задачи."""
+
+import os
+import time
+
+from pool_runner import JobFailed, run_jobs
+
+
+def square_or_crash(n: int, crash: bool) -> int:
+    print(f"job {n}")
+    if crash:
+        os._exit(1)
+    time.sleep(0.05)
+    return n * n
+
+
+def test_worker_crash_fails_only_its_job():
+    jobs = [(n, n == 3) for n in range(6)]
+    out = []
+    results = run_jobs(square_or_crash, jobs, workers=3, on_output=out.append)
+    assert isinstance(results[3], JobFailed)
+    assert [r for i, r in enumerate(results) if i != 3] == [0, 1, 4, 16, 25]
+    # вывод — по порядку задач, у упавшей его нет
+    assert "".join(out) == "".join(f"job {n}\n" for n in (0, 1, 2, 4, 5))
+
+
+def test_crash_first_job():
+    results = run_jobs(square_or_crash, [(0, True), (1, False), (2, False)], workers=2, on_output=lambda s: None)
+    assert isinstance(results[0], JobFailed) and results[1:] == [1, 4]
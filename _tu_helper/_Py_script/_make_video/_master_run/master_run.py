@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 # (shortened) — includes corrected to_toml_literal using TOML literal strings
-import os, sys, re, subprocess, shutil
+import os, sys, re, subprocess, shutil, json, hashlib, tempfile, glob
 from pathlib import Path
 try:
     import tomllib
@@ -110,6 +110,341 @@ def run_script(python_exe: str, script_path: Path, args, env):
     except FileNotFoundError as e:
         print(f'[ERROR] Launch failed {script_path}: {e}'); return 127
 
+# ---------------------------------------------------------------------------
+# Incremental build (step type = "build"): make/ninja-like rebuild of lessons.
+# One unit = one voiced section S (e.g. "001_02 Title_en") next to its .txt:
+#   split   lesson .txt           -> section files           (step 0, whole pass)
+#   tts     S.txt                 -> S.mp3 + S.sli           (step 1; multi_en_outputs: S__<voice>.mp3/.sli, not built further)
+#   bg      S.mp3                 -> S_bg.png                (step 2, intermediate)
+#   overlay S_bg.png + texts      -> S_bg_1.png ...          (step 3, intermediate)
+#   video   S.mp3 + overlay pngs  -> S.mp4                   (step 4)
+# Node key = sha1(step config hash + input file hashes + upstream key). The manifest keeps
+# the key and outputs of every node; stale nodes are rebuilt by running the step script
+# with its input keys temporarily narrowed to the stale units only. Intermediates deleted
+# by steps 3/4 are rebuilt only when something downstream actually needs them.
+# ---------------------------------------------------------------------------
+BUILD_STAGES = {
+    'split':   ('0_split_lesson_file/split_lesson_file.py', 'config.toml'),
+    'tts':     ('1_make_audio_tts_from_text/tts_batch_reader.py', 'tts_config.toml'),
+    'bg':      ('2_make_image_to_audio/make_image_to_audio.py', 'config.toml'),
+    'overlay': ('3_make_image_text_overlay/image_text_overlay.py', 'config.toml'),
+    'video':   ('4_make_video_from_audio_and_image/make_video_from_audio_and_image.py', 'config.toml'),
+}
+# keys that only select inputs / logging — they do not change what an artifact looks like
+BUILD_IGNORED_KEYS = {
+    'split':   {'INPUT.input_dirs', 'ADVANCED.workers'},
+    'tts':     {'input_dirs', 'synthesis', 'cache'},
+    'bg':      {'input_dir', 'input_dirs', 'input_files', 'log_file', 'workers', 'dry_run', 'output_mode'},
+    'overlay': {'input_dirs', 'input_files', 'logging_level', 'log_to_file', 'log_file', 'dry_run', 'workers'},
+    'video':   {'input.mode', 'input.input_dirs', 'input.file_list_path', 'logging', 'encode.workers'},
+}
+IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.webp'}
+MANIFEST_VERSION = 1
+
+def _bracket_depth(s: str) -> int:
+    depth, quote = 0, ''
+    for ch in s:
+        if quote:
+            if ch == quote: quote = ''
+        elif ch in '\'"': quote = ch
+        elif ch == '#': break
+        elif ch == '[': depth += 1
+        elif ch == ']': depth -= 1
+    return depth
+
+TOML_HEADER_RE = re.compile(r'^\s*\[\[?\s*([^\[\]#]+?)\s*\]\]?\s*(?:#.*)?$')
+TOML_KEY_RE = re.compile(r'^(\s*)([A-Za-z0-9_-]+)\s*=\s*(.*)$')
+
+def replace_toml_value(toml_text: str, key: str, new_value):
+    """Replace `key = ...` (multi-line arrays included) with a literal of new_value.
+    key is 'name' for a top-level key (before the first [table]) or 'table.name' for a key
+    inside [table]; the same name in other tables is left alone."""
+    table, _, name = key.rpartition('.')
+    lines = toml_text.splitlines(keepends=True)
+    current, i = '', 0
+    while i < len(lines):
+        line = lines[i].rstrip('\r\n')
+        h = TOML_HEADER_RE.match(line)
+        if h:
+            current = '.'.join(part.strip() for part in h.group(1).split('.'))
+            i += 1; continue
+        m = TOML_KEY_RE.match(line)
+        if not m:
+            i += 1; continue
+        # a value spanning several lines: its continuation lines are not headers/keys
+        j, depth = i, _bracket_depth(m.group(3))
+        while depth > 0 and j + 1 < len(lines):
+            j += 1; depth += _bracket_depth(lines[j])
+        if current == table and m.group(2) == name:
+            eol = '\r\n' if lines[i].endswith('\r\n') else '\n'
+            lines[i:j + 1] = [f'{m.group(1)}{name} = {to_toml_literal(new_value)}{eol}']
+            return ''.join(lines), True
+        i = j + 1
+    return toml_text, False
+
+def _drop_keys(data, ignored, prefix=''):
+    if not isinstance(data, dict): return data
+    out = {}
+    for k, v in data.items():
+        dotted = f'{prefix}{k}'
+        if dotted in ignored: continue
+        out[k] = _drop_keys(v, ignored, dotted + '.')
+    return out
+
+def config_hash(cfg_path: Path, ignored) -> str:
+    data = _drop_keys(load_toml_bytes(cfg_path), ignored)
+    return hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+def node_key(*parts) -> str:
+    return hashlib.sha1('\0'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+class BuildManifest:
+    """build_manifest.json: file hash cache (by size+mtime) and key/outputs of every node."""
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = {'version': MANIFEST_VERSION, 'files': {}, 'split': {}, 'units': {}}
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+            if data.get('version') == MANIFEST_VERSION: self.data.update(data)
+        except FileNotFoundError: pass
+        except Exception as e: print(f'[WARN] build: manifest ignored ({e})')
+
+    def file_hash(self, p: Path) -> str:
+        """sha1 of the file contents, '' if missing; unchanged files are not re-read."""
+        try: st = p.stat()
+        except OSError: return ''
+        rec = self.data['files'].get(str(p))
+        if rec and rec[0] == st.st_size and rec[1] == st.st_mtime_ns: return rec[2]
+        h = hashlib.sha1()
+        with p.open('rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''): h.update(chunk)
+        self.data['files'][str(p)] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def node(self, unit: str, stage: str) -> dict:
+        return self.data['units'].get(unit, {}).get(stage) or {}
+
+    def fresh(self, unit: str, stage: str, key: str) -> bool:
+        rec = self.node(unit, stage)
+        outs = rec.get('outputs') or []
+        return rec.get('key') == key and bool(outs) and all(Path(o).is_file() for o in outs)
+
+    def record(self, unit: str, stage: str, key: str, outputs):
+        self.data['units'].setdefault(unit, {})[stage] = {'key': key, 'outputs': sorted(outputs)}
+
+    def save(self):
+        files = {k: v for k, v in self.data['files'].items() if Path(k).exists()}
+        self.data['files'] = files
+        atomic_write_text(self.path, json.dumps(self.data, ensure_ascii=False, indent=1), backup=False)
+
+def _snapshot(dirs) -> dict:
+    snap = {}
+    for d in dirs:
+        try: entries = list(d.iterdir())
+        except OSError: continue
+        for p in entries:
+            try:
+                if p.is_file():
+                    st = p.stat(); snap[str(p)] = (st.st_size, st.st_mtime_ns)
+            except OSError: pass
+    return snap
+
+def _changed(before: dict, after: dict):
+    return [Path(p) for p, sig in after.items() if before.get(p) != sig]
+
+def run_stage(python_exe, project_root: Path, stage: str, overrides: dict):
+    """Run the stage script with config keys temporarily overridden; the config is restored after."""
+    script_rel, cfg_name = BUILD_STAGES[stage]
+    spath = (project_root / script_rel).resolve()
+    cpath = spath.with_name(cfg_name)
+    original = cpath.read_bytes()
+    text = original.decode('utf-8')
+    for k, v in overrides.items():
+        text, ok = replace_toml_value(text, k, v)
+        if not ok and k != 'input_dir': print(f'[WARN] build: key {k} not found in {cpath}')
+    try:
+        if overrides: atomic_write_text(cpath, text, backup=False)
+        return run_script(python_exe, spath, [], env=None)
+    finally:
+        if overrides:
+            tmp = cpath.with_suffix(cpath.suffix + '.tmp')
+            tmp.write_bytes(original); os.replace(tmp, cpath)
+
+def _split_sources(cfg: dict):
+    inp = cfg.get('INPUT', {}) or {}
+    exts = {str(e).lower() for e in inp.get('extensions', ['.txt'])}
+    inc = [str(s) for s in inp.get('include_suffixes', [])]
+    exc = [str(s) for s in inp.get('exclude_suffixes', [])]
+    ignore_hidden = bool((cfg.get('ADVANCED', {}) or {}).get('ignore_hidden', True))
+    pattern = '**/*' if inp.get('recursive', True) else '*'
+    res = []
+    for d in inp.get('input_dirs', []):
+        root = Path(str(d))
+        cands = [root] if root.is_file() else (root.glob(pattern) if root.is_dir() else [])
+        for p in cands:
+            stem = p.stem
+            if not p.is_file() or p.suffix.lower() not in exts: continue
+            if ignore_hidden and p.name.startswith('.'): continue
+            if inc and not any(stem.endswith(s) for s in inc): continue
+            if exc and any(stem.endswith(s) for s in exc): continue
+            res.append(p.resolve())
+    return sorted(set(res))
+
+def _unit_roots(cfg: dict):
+    roots = [Path(str(d)) for d in (cfg.get('INPUT', {}) or {}).get('input_dirs', [])]
+    out_root = str((cfg.get('OUTPUT', {}) or {}).get('output_root', '') or '').strip()
+    if out_root: roots.append(Path(out_root))
+    return roots
+
+def _find_units(roots, suffixes):
+    res = set()
+    for root in roots:
+        cands = [root] if root.is_file() else (root.rglob('*.txt') if root.is_dir() else [])
+        for p in cands:
+            if p.is_file() and p.suffix.lower() == '.txt' and any(p.stem.endswith(s) for s in suffixes):
+                res.add(p.resolve())
+    return sorted(res)
+
+def _overlay_texts(txt: Path, patterns):
+    """Text files step 3 reads for this unit (multi_sources_patterns by base), else the txt itself."""
+    name = txt.stem
+    for pat in patterns:
+        if '{base}' not in pat or not pat.endswith('.txt'): continue
+        sfx = pat.split('{base}', 1)[1][:-4]
+        if sfx and '*' not in sfx and '?' not in sfx and name.endswith(sfx) and len(name) > len(sfx):
+            base = name[:-len(sfx)]
+            return [txt.with_name(p.replace('{base}', base)) for p in patterns if '{base}' in p]
+    return [txt]
+
+def run_build(python_exe: str, project_root: Path, master_dir: Path, build_cfg: dict, globals_map: dict,
+              dry_run: bool) -> int:
+    stage_cfg = {}
+    for stage, (script_rel, cfg_name) in BUILD_STAGES.items():
+        cpath = (project_root / script_rel).resolve().with_name(cfg_name)
+        if not cpath.exists():
+            print('[ERROR] build: config not found:', cpath); return 5
+        stage_cfg[stage] = (load_toml_bytes(cpath), config_hash(cpath, BUILD_IGNORED_KEYS[stage]))
+    manifest = BuildManifest(master_dir / str(build_cfg.get('manifest') or 'build_manifest.json'))
+    suffixes = list(build_cfg.get('unit_suffixes') or globals_map.get('include_suffixes') or ['_en', '_di'])
+
+    # --- split: cheap text pass, rerun as a whole when any lesson file or its config changed
+    split_cfg, split_hash = stage_cfg['split']
+    sources = _split_sources(split_cfg)
+    split_keys = {str(p): node_key(split_hash, manifest.file_hash(p)) for p in sources}
+    stale = [p for p, k in split_keys.items() if manifest.data['split'].get(p) != k]
+    print(f'[BUILD] split: {len(stale)} of {len(sources)} lesson files changed')
+    if stale and not dry_run:
+        code = run_stage(python_exe, project_root, 'split', {})
+        if code != 0: return code
+        # sections written next to lessons may themselves match the lesson filters
+        manifest.data['split'] = {str(p): node_key(split_hash, manifest.file_hash(p)) for p in _split_sources(split_cfg)}
+        manifest.save()
+
+    # --- tts: one unit per voiced section
+    units = _find_units(_unit_roots(split_cfg), suffixes)
+    tts_hash = stage_cfg['tts'][1]
+    tts_keys = {str(t): node_key(tts_hash, manifest.file_hash(t)) for t in units}
+    tts_stale = [t for t in units if not manifest.fresh(str(t.with_suffix('')), 'tts', tts_keys[str(t)])]
+    print(f'[BUILD] tts: {len(tts_stale)} of {len(units)} sections stale')
+    for t in tts_stale: print('   ', t.name)
+    if tts_stale and not dry_run:
+        folders = {t.parent for t in tts_stale}
+        before = _snapshot(folders)
+        code = run_stage(python_exe, project_root, 'tts', {'input_dirs': [glob.escape(str(t)) for t in tts_stale]})
+        if code != 0: return code
+        changed = _changed(before, _snapshot(folders))
+        for t in tts_stale:
+            # multi_en_outputs: one S__<voice>.mp3/.sli per EN voice instead of S.mp3
+            outs = [p for p in changed if (p.stem == t.stem or p.stem.startswith(t.stem + '__'))
+                    and p.suffix.lower() in ('.mp3', '.sli')]
+            if any(p.suffix.lower() == '.mp3' for p in outs):
+                manifest.record(str(t.with_suffix('')), 'tts', tts_keys[str(t)], [str(p) for p in outs])
+            else:
+                print('[WARN] build: no audio produced for', t.name)
+        manifest.save()
+
+    # --- bg -> overlay -> video: demand-driven from the final video
+    bg_hash, ov_hash = stage_cfg['bg'][1], stage_cfg['overlay'][1]
+    vid_cfg, vid_hash = stage_cfg['video']
+    patterns = stage_cfg['overlay'][0].get('multi_sources_patterns', []) or []
+    timings_ext = str((vid_cfg.get('slideshow', {}) or {}).get('timings_file_ext', '.slides.txt'))
+    tts_pending = {str(t) for t in tts_stale} if dry_run else set()
+    plan = {'bg': [], 'overlay': [], 'video': []}
+    keys = {}
+    for t in units:
+        unit, mp3 = str(t.with_suffix('')), t.with_suffix('.mp3')
+        if not mp3.is_file() and str(t) not in tts_pending:
+            # multi_en_outputs: the voices are S__<voice>.mp3, the downstream stages only take S.mp3
+            voices = [Path(o).name for o in manifest.node(unit, 'tts').get('outputs') or []
+                      if Path(o).suffix.lower() == '.mp3' and Path(o).is_file()]
+            print(f'[WARN] build: no {mp3.name} for {t.name}, bg/overlay/video skipped'
+                  + (f' (voice outputs: {", ".join(voices)})' if voices else ''))
+            continue
+        mp3_h = manifest.file_hash(mp3) if str(t) not in tts_pending else 'pending'
+        kb = node_key(bg_hash, mp3_h)
+        ko = node_key(ov_hash, kb, *[manifest.file_hash(p) for p in _overlay_texts(t, patterns)])
+        kv = node_key(vid_hash, ko, mp3_h, manifest.file_hash(t.with_suffix('.sli')),
+                      manifest.file_hash(t.with_name(t.stem + timings_ext)))
+        keys[unit] = {'bg': kb, 'overlay': ko, 'video': kv}
+        if manifest.fresh(unit, 'video', kv): continue
+        plan['video'].append(t)
+        if manifest.fresh(unit, 'overlay', ko): continue
+        plan['overlay'].append(t)
+        if not manifest.fresh(unit, 'bg', kb): plan['bg'].append(t)
+    for stage in ('bg', 'overlay', 'video'):
+        print(f'[BUILD] {stage}: {len(plan[stage])} of {len(keys)} sections stale')
+    if dry_run: return 0
+
+    out_dirs = {}
+    for stage, section, key in (('bg', None, 'output_dir'), ('video', 'output', 'dir')):
+        cfg = stage_cfg[stage][0]
+        val = str(((cfg.get(section, {}) or {}) if section else cfg).get(key, '') or '').strip()
+        if val:
+            p = Path(val)
+            out_dirs[stage] = p if p.is_absolute() else (project_root / BUILD_STAGES[stage][0]).parent / p
+    vid_ext = '.' + (str((vid_cfg.get('output', {}) or {}).get('ext', 'mp4')).strip().lstrip('.') or 'mp4')
+    stage_exts = {'bg': IMAGE_EXTS, 'overlay': IMAGE_EXTS, 'video': {vid_ext.lower()}}
+
+    for stage in ('bg', 'overlay', 'video'):
+        todo = plan[stage]
+        if not todo: continue
+        # previous outputs of a stale node would be picked up as extra slides or renamed around
+        for t in todo:
+            for o in manifest.node(str(t.with_suffix('')), stage).get('outputs') or []:
+                try: Path(o).unlink()
+                except OSError: pass
+        if stage == 'bg':
+            overrides = {'input_dir': '', 'input_dirs': [], 'input_files': [str(t.with_suffix('.mp3')) for t in todo]}
+            if str(stage_cfg['bg'][0].get('output_mode', 'copy')).lower() == 'virtual':
+                # the build tracks a background per section; a shared file has no owner to record
+                print('[WARN] build: bg output_mode=virtual is not tracked, using copy')
+                overrides['output_mode'] = 'copy'
+        elif stage == 'overlay':
+            overrides = {'input_dirs': [], 'input_files': [str(t) for t in todo]}
+        else:
+            fd, list_path = tempfile.mkstemp(prefix='build_audio_', suffix='.txt')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(str(t.with_suffix('.mp3')) for t in todo) + '\n')
+            overrides = {'input.mode': 'file_list', 'input.file_list_path': list_path}
+        folders = {t.parent for t in todo}
+        if stage in out_dirs: folders.add(out_dirs[stage])
+        before = _snapshot(folders)
+        try: code = run_stage(python_exe, project_root, stage, overrides)
+        finally:
+            if stage == 'video':
+                try: os.remove(list_path)
+                except OSError: pass
+        if code != 0: return code
+        changed = [p for p in _changed(before, _snapshot(folders)) if p.suffix.lower() in stage_exts[stage]]
+        bg_outs = {o for t in todo for o in manifest.node(str(t.with_suffix('')), 'bg').get('outputs') or []}
+        for t in todo:
+            unit = str(t.with_suffix(''))
+            outs = [str(p) for p in changed if p.name.startswith(t.stem) and str(p) not in bg_outs]
+            if outs: manifest.record(unit, stage, keys[unit][stage], outs)
+            else: print(f'[WARN] build: {stage} produced nothing for', t.name)
+        manifest.save()
+    return 0
+
 def main():
     root = Path(__file__).resolve().parent
     project_root = root.parent
@@ -144,9 +479,19 @@ def main():
             if halt_after: print('[INFO] halt_after=true with skip — stopping'); break
             continue
 
-        if stype not in {'set_params','run_script','set_params_and_run'}:
+        if stype not in {'set_params','run_script','set_params_and_run','build'}:
             print('[WARN] unknown step type, skipping'); continue
 
+        if stype == 'build':
+            code = run_build(python_exe, project_root, root, data.get('build', {}) or {}, globals_map, dry_run)
+            if code != 0:
+                print('[ERROR] build failed, exit code', code)
+                if not continue_on_error: sys.exit(code)
+            else:
+                print('[OK] build finished')
+            if halt_after: print('[INFO] halt_after=true — stopping pipeline'); break
+            continue
+
         targets = step.get('targets', []) or []
         explicit_params = step.get('params', []) or []
         only_keys = step.get('only_keys', None)
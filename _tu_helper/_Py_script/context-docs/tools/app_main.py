@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 Точка входа. Запускает Tk-приложение Context Docs Viewer.
+    python app_main.py [запрос] [--watch]   (--watch — сразу следить за изменениями .md)
 """
 
 import sys
@@ -9,9 +10,10 @@ import tkinter as tk
 from ui_app import App
 
 def main():
-    initial = sys.argv[1] if len(sys.argv) > 1 else ""
+    args = [a for a in sys.argv[1:] if a != "--watch"]
+    initial = args[0] if args else ""
     root = tk.Tk()
-    app = App(root, initial_query=initial)
+    app = App(root, initial_query=initial, watch="--watch" in sys.argv[1:])
     root.mainloop()
 
 if __name__ == "__main__":
@@ -11,6 +11,8 @@ from typing import List
 DOC_ROOTS_FILE = Path(__file__).resolve().parent / "doc_roots.txt"
 # Запасной путь по умолчанию
 DEFAULT_FALLBACK_DOCS = (Path(__file__).resolve().parent.parent / "docs")
+# Кэши на диске (полнотекстовый индекс и т.п.) — рядом с модулем
+CACHE_DIR = Path(__file__).resolve().parent / ".cache"
 
 def read_doc_roots() -> List[Path]:
     """Возвращает список существующих папок-корней документации."""
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Полнотекстовый поиск по телу секций (markdown вместе с кодовыми блоками) — ранжирование BM25.
+
+- Токены: слова \\w+ любых алфавитов в нижнем регистре, основа — stemming.stem (RU/EN);
+  идентификаторы из кода дополнительно режутся на части: 'res_partner' -> res, partner;
+  'getElementById' -> get, element, by, id. Слова ключа секции учитываются с весом KEY_BOOST.
+- Индекс строится по файлам по очереди: для файла — частоты термов его секций.
+  Частоты сохраняются на диск (pickle в CACHE_DIR) с размером и mtime файла;
+  при следующем запуске неизменённые файлы берутся из кэша без повторной токенизации.
+- search(query) -> [Hit]: секции по убыванию BM25, у каждой — фрагмент текста с позициями совпадений.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import pickle
+import re
+import tempfile
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config_roots import CACHE_DIR
+from models import Section
+from stemming import stem
+
+WORD_RE = re.compile(r"\w+")
+# части идентификатора: ABCWord -> ABC, Word; camelCase -> camel, Case; числа отдельно
+IDENT_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+|[^\W\d_a-zA-Z]+")
+
+FULLTEXT_CACHE = CACHE_DIR / "fulltext.pkl"
+CACHE_VERSION = 1
+
+K1 = 1.2
+B = 0.75
+KEY_BOOST = 3
+SNIPPET_WIDTH = 160
+
+def word_terms(word: str) -> List[str]:
+    """Термы одного слова: основа целиком + основы частей идентификатора (если слово составное)."""
+    low = word.lower()
+    out = [stem(low)]
+    if "_" in word or (not word.islower() and not word.isupper()):
+        for part in IDENT_PART_RE.findall(word):
+            t = stem(part.lower())
+            if len(t) > 1 and t not in out:
+                out.append(t)
+    return out
+
+def text_terms(text: str) -> List[str]:
+    out: List[str] = []
+    for m in WORD_RE.finditer(text or ""):
+        out.extend(word_terms(m.group(0)))
+    return out
+
+def query_terms(query: str) -> List[str]:
+    return list(dict.fromkeys(text_terms(query)))
+
+def match_spans(text: str, terms: Iterable[str]) -> List[Tuple[int, int]]:
+    """Позиции (начало, конец) слов text, у которых есть терм из terms."""
+    want = set(terms)
+    return [(m.start(), m.end()) for m in WORD_RE.finditer(text or "") if want.intersection(word_terms(m.group(0)))]
+
+def make_snippet(text: str, terms: Iterable[str], width: int = SNIPPET_WIDTH) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Фрагмент text шириной ~width вокруг места, где совпадений больше всего,
+    и позиции совпадений внутри фрагмента (для подсветки). Переводы строк заменяются пробелами.
+    """
+    text = text or ""
+    spans = match_spans(text, terms)
+    if not spans:
+        cut = text[:width]
+        return cut.replace("\n", " ") + ("…" if len(text) > width else ""), []
+    # окно, накрывающее больше всего совпадений (два указателя по началам)
+    best_i, best_n, j = 0, 0, 0
+    for i, (s, _e) in enumerate(spans):
+        while j < len(spans) and spans[j][1] - s <= width:
+            j += 1
+        if j - i > best_n:
+            best_i, best_n = i, j - i
+    first = spans[best_i][0]
+    start = max(0, first - width // 4)
+    ws = text.rfind(" ", 0, start)
+    if start > 0 and ws >= 0 and start - ws < 20:
+        start = ws + 1
+    end = min(len(text), start + width)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if end < len(text) else ""
+    snippet = prefix + text[start:end].replace("\n", " ") + suffix
+    shift = len(prefix) - start
+    marks = [(s + shift, e + shift) for s, e in spans if s >= start and e <= end]
+    return snippet, marks
+
+@dataclass
+class Hit:
+    """Результат полнотекстового поиска: секция, оценка BM25, фрагмент и позиции совпадений в нём."""
+    section: Section
+    score: float
+    snippet: str
+    marks: List[Tuple[int, int]] = field(default_factory=list)
+
+def section_tf(s: Section) -> Dict[str, int]:
+    """Частоты термов секции: тело (markdown с кодом) + ключ/алиасы с весом KEY_BOOST."""
+    tf = Counter(text_terms(s.markdown))
+    for t in text_terms(" ".join([s.display_key] + s.aliases)):
+        tf[t] += KEY_BOOST
+    return dict(tf)
+
+def _file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _load_cache(path: Path) -> Dict[str, dict]:
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return {}
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("files") or {}
+
+def _save_cache(path: Path, files: Dict[str, dict]) -> None:
+    # временный файл с уникальным именем: параллельные сборки (и потоки одного процесса) не пишут в один
+    tmp: Optional[Path] = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=path.parent, prefix=path.name + ".", suffix=".tmp",
+                                         delete=False) as f:
+            tmp = Path(f.name)
+            pickle.dump({"version": CACHE_VERSION, "files": files}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp is not None:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+class FullTextIndex:
+    """
+    Инвертированный индекс терм -> [(номер секции, частота)] и длины секций для BM25.
+    Строится через FullTextIndex.build(sections).
+    """
+    def __init__(self):
+        self.docs: List[Section] = []
+        self.doc_len: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.avg_len: float = 0.0
+        self.stats = {"files": 0, "cached": 0, "tokenized": 0}
+
+    def _add(self, s: Section, tf: Dict[str, int]) -> None:
+        doc = len(self.docs)
+        self.docs.append(s)
+        self.doc_len.append(sum(tf.values()))
+        for term, n in tf.items():
+            self.postings[term].append((doc, n))
+
+    @classmethod
+    def build(cls, sections: Iterable[Section], cache_path: Optional[Path] = FULLTEXT_CACHE) -> "FullTextIndex":
+        """
+        sections — секции подряд по файлам (как их отдаёт md_parser), можно генератором.
+        cache_path=None — без дискового кэша.
+        """
+        ix = cls()
+        old = _load_cache(cache_path) if cache_path else {}
+        new: Dict[str, dict] = {}
+        for path, group in groupby(sections, key=lambda s: s.file_path):
+            group = list(group)
+            ident = [(s.key, s.start_line) for s in group]
+            name = str(Path(path).resolve())
+            stamp = _file_stamp(path)
+            entry = old.get(name)
+            if entry and stamp and entry["stamp"] == stamp and entry["sections"] == ident:
+                ix.stats["cached"] += 1
+            else:
+                entry = {"stamp": stamp, "sections": ident, "tf": [section_tf(s) for s in group]}
+                ix.stats["tokenized"] += 1
+            ix.stats["files"] += 1
+            new[name] = entry
+            for s, tf in zip(group, entry["tf"]):
+                ix._add(s, tf)
+        ix.avg_len = (sum(ix.doc_len) / len(ix.doc_len)) if ix.doc_len else 0.0
+        ix.postings = dict(ix.postings)
+        if cache_path and (ix.stats["tokenized"] or set(new) != set(old)):
+            _save_cache(cache_path, new)
+        return ix
+
+    def search(self, query: str, limit: int = 50) -> List[Hit]:
+        terms = query_terms(query)
+        if not terms or not self.docs:
+            return []
+        n_docs = len(self.docs)
+        scores: Dict[int, float] = defaultdict(float)
+        for t in terms:
+            plist = self.postings.get(t)
+            if not plist:
+                continue
+            idf = math.log(1.0 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc, tf in plist:
+                norm = K1 * (1.0 - B + B * self.doc_len[doc] / (self.avg_len or 1.0))
+                scores[doc] += idf * tf * (K1 + 1.0) / (tf + norm)
+        top = heapq.nlargest(limit, scores.items(), key=lambda it: it[1])
+        hits = []
+        for doc, score in top:
+            s = self.docs[doc]
+            snippet, marks = make_snippet(s.markdown, terms)
+            hits.append(Hit(s, score, snippet, marks))
+        return hits
+
+    def terms_for(self, query: str) -> Set[str]:
+        """Термы запроса (для подсветки в открытой секции: match_spans(text, terms))."""
+        return set(query_terms(query))
@@ -5,7 +5,7 @@
 
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 
 import re
 from models import Section
@@ -127,17 +127,22 @@ def parse_md_file(md_path: Path) -> List[Section]:
 
     return sections
 
+def iter_md_files(root: Path) -> Iterator[Path]:
+    """Файлы *.md корня по алфавиту, кроме лежащих в IGNORE_DIRS."""
+    for p in sorted(root.rglob("*.md")):
+        if any(part in IGNORE_DIRS for part in p.parts):
+            continue
+        yield p
+
 def collect_sections_from_roots(roots: List[Path]) -> Tuple[List[Path], List[Section]]:
     """
     Идёт по всем корневым папкам, собирает *.md (кроме IGNORE_DIRS), парсит секции.
-    Возвращает (список файлов, список секций).
+    Возвращает (список файлов, список секций). С кэшем на диске — section_cache.SectionStore.
     """
     files: List[Path] = []
     sections: List[Section] = []
     for root in roots:
-        for p in sorted(root.rglob("*.md")):
-            if any(part in IGNORE_DIRS for part in p.parts):
-                continue
+        for p in iter_md_files(root):
             files.append(p)
             sections.extend(parse_md_file(p))
     return files, sections
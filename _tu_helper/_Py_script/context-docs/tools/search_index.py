@@ -1,13 +1,46 @@
 # -*- coding: utf-8 -*-
 """
 Индекс и логика подсказок/поиска по ключам, алиасам и токенам.
+
+Термы (ключи, алиасы, токены) один раз раскладываются на триграммы ("\\x02" + терм + "\\x03", по 3 символа)
+в обратный индекс триграмма -> номера термов. На запрос:
+  - подстрока: пересечение списков по триграммам запроса (от самого короткого), проверка `q in терм`;
+  - запрос из 1–2 символов: префиксы по отсортированному списку термов (bisect);
+  - fuzzy: термы с общими триграммами, лучшие по доле общих проверяются difflib (cutoff 0.7).
+Ранжирование (RANK): точное > префикс > слово ключа (токен целиком) > подстрока > fuzzy; при равенстве —
+ключ > алиас > токен, раньше вхождение в ключ, короче ключ. Лучшие limit ключей — heapq.nsmallest.
 """
 
 import difflib
-from typing import Dict, List, Optional, Set
+import heapq
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
 from models import Section
 from utils import normalize_key, tokenize
 
+# уровни совпадения и источники терма (меньше — лучше)
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+FROM_KEY, FROM_ALIAS, FROM_TOKEN = range(3)
+
+# (уровень, источник) -> место в выдаче: токен — часть ключа, его точное совпадение — «слово» ключа
+RANK = {
+    (EXACT, FROM_KEY): 0, (EXACT, FROM_ALIAS): 0,
+    (PREFIX, FROM_KEY): 1, (PREFIX, FROM_ALIAS): 1,
+    (EXACT, FROM_TOKEN): 2,
+    (SUBSTRING, FROM_KEY): 3, (SUBSTRING, FROM_ALIAS): 3, (PREFIX, FROM_TOKEN): 3,
+    (SUBSTRING, FROM_TOKEN): 4,
+    (FUZZY, FROM_KEY): 5, (FUZZY, FROM_ALIAS): 5, (FUZZY, FROM_TOKEN): 5,
+}
+
+FUZZY_CUTOFF = 0.7
+FUZZY_CHECK = 200   # сколько кандидатов с наибольшим числом общих триграмм проверять difflib
+
+def trigrams(s: str) -> Set[str]:
+    """Триграммы строки с маркерами начала/конца: 'ul' -> {'\\x02ul', 'ul\\x03'}."""
+    s = f"\x02{s}\x03"
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
 class SearchIndex:
     """
     Простой индекс:
@@ -15,77 +48,144 @@ class SearchIndex:
       - alias_to_key: алиас -> ключ
       - token_to_keys: токен -> множество ключей
       - universe: множество строк (для fuzzy)
+    и триграммный индекс по universe (см. описание модуля).
     """
     def __init__(self, sections: List[Section]):
         self.by_key: Dict[str, Section] = {}
         self.alias_to_key: Dict[str, str] = {}
         self.token_to_keys: Dict[str, Set[str]] = {}
         self.universe: Set[str] = set()
+        # терм -> {ключ: лучший источник (FROM_*)}
+        term_keys: Dict[str, Dict[str, int]] = {}
+
+        def add_term(term: str, key: str, origin: int) -> None:
+            self.universe.add(term)
+            keys = term_keys.setdefault(term, {})
+            if origin < keys.get(key, FROM_TOKEN + 1):
+                keys[key] = origin
 
         for s in sections:
             if s.key not in self.by_key:
                 self.by_key[s.key] = s
-            self.universe.add(s.key)
+            add_term(s.key, s.key, FROM_KEY)
 
             for t in tokenize(s.key):
                 self.token_to_keys.setdefault(t, set()).add(s.key)
-                self.universe.add(t)
+                add_term(t, s.key, FROM_TOKEN)
 
             for a in s.aliases:
                 self.alias_to_key[a] = s.key
-                self.universe.add(a)
+                add_term(a, s.key, FROM_ALIAS)
                 for t in tokenize(a):
                     self.token_to_keys.setdefault(t, set()).add(s.key)
-                    self.universe.add(t)
+                    add_term(t, s.key, FROM_TOKEN)
+
+        # термы по алфавиту: номер терма = позиция, префиксы — непрерывный диапазон
+        self._terms: List[str] = sorted(term_keys)
+        # пары (ключ, источник) терма: сначала ключи/алиасы, потом токены (токен бывает у тысяч ключей)
+        self._term_named: List[List[Tuple[str, int]]] = []
+        self._term_tokens: List[List[Tuple[str, int]]] = []
+        for t in self._terms:
+            pairs = term_keys[t].items()
+            self._term_named.append([(k, o) for k, o in pairs if o != FROM_TOKEN])
+            self._term_tokens.append([(k, o) for k, o in pairs if o == FROM_TOKEN])
+        self._term_grams: List[int] = []
+        self._grams: Dict[str, List[int]] = {}
+        for i, term in enumerate(self._terms):
+            grams = trigrams(term)
+            self._term_grams.append(len(grams))
+            for g in grams:
+                self._grams.setdefault(g, []).append(i)
+        self._sorted_keys: List[str] = sorted(self.by_key)
+
+    # ---------------- кандидаты ----------------
+
+    def _prefix_ids(self, q: str) -> range:
+        lo = bisect_left(self._terms, q)
+        hi = bisect_left(self._terms, q + "\U0010ffff", lo)
+        return range(lo, hi)
+
+    def _substring_ids(self, q: str) -> List[int]:
+        """Термы, содержащие q (len(q) >= 3): пересечение списков по триграммам + проверка."""
+        grams = {q[i:i + 3] for i in range(len(q) - 2)}
+        posting = sorted((self._grams.get(g, []) for g in grams), key=len)
+        if not posting or not posting[0]:
+            return []
+        ids = set(posting[0])
+        for p in posting[1:]:
+            ids.intersection_update(p)
+            if not ids:
+                return []
+        return [i for i in ids if q in self._terms[i]]
+
+    def _fuzzy_ids(self, q: str) -> List[Tuple[float, int]]:
+        """(похожесть, терм) для термов, похожих на q не меньше FUZZY_CUTOFF."""
+        grams = trigrams(q)
+        shared: Counter = Counter()
+        for g in grams:
+            shared.update(self._grams.get(g, ()))
+        if not shared:
+            return []
+        # коэффициент Дайса по триграммам — дешёвый отбор перед difflib
+        n = len(grams)
+        best = heapq.nlargest(FUZZY_CHECK, shared.items(),
+                              key=lambda it: 2.0 * it[1] / (n + self._term_grams[it[0]]))
+        out = []
+        for i, _cnt in best:
+            sm = difflib.SequenceMatcher(None, q, self._terms[i])
+            if sm.real_quick_ratio() >= FUZZY_CUTOFF and sm.quick_ratio() >= FUZZY_CUTOFF:
+                r = sm.ratio()
+                if r >= FUZZY_CUTOFF:
+                    out.append((r, i))
+        return out
+
+    # ---------------- подсказки ----------------
 
     def suggest(self, q: str, limit: int = 50) -> List[str]:
         """
         Список КЛЮЧЕЙ для Combobox.
-        Порядок: точное → подстроки (ключи/алиасы/токены) → fuzzy, уникально, до limit.
+        Порядок: точное → префикс → подстрока (ключи/алиасы/токены) → fuzzy, уникально, до limit.
         """
         q = normalize_key(q)
-        results: List[str] = []
-
         if not q:
-            return sorted(self.by_key.keys())[:limit]
+            return self._sorted_keys[:limit]
 
-        # точное
-        if q in self.by_key:
-            results.append(q)
-
-        # подстроки по ключам
-        subs_keys = [k for k in self.by_key if q in k and k not in results]
-        subs_keys.sort(key=lambda k: (k.find(q), len(k)))
-        results.extend(subs_keys)
-
-        # подстроки по алиасам
-        for a, k in self.alias_to_key.items():
-            if q in a and k not in results:
-                results.append(k)
-
-        # подстроки по токенам
-        for t, keys in self.token_to_keys.items():
-            if q in t:
-                for k in keys:
-                    if k not in results:
-                        results.append(k)
-
-        # fuzzy
-        if len(results) < limit:
-            near = difflib.get_close_matches(q, list(self.universe), n=limit, cutoff=0.7)
-            for s in near:
-                if s in self.by_key and s not in results:
-                    results.append(s)
-                elif s in self.alias_to_key:
-                    k = self.alias_to_key[s]
-                    if k not in results:
-                        results.append(k)
-                elif s in self.token_to_keys:
-                    for k in self.token_to_keys[s]:
-                        if k not in results:
-                            results.append(k)
-
-        return results[:limit]
+        best: Dict[str, tuple] = {}
+
+        def offer(term_id: int, level: int, similarity: float = 0.0, tokens: bool = True) -> None:
+            pairs = self._term_named[term_id] + self._term_tokens[term_id] if tokens else self._term_named[term_id]
+            for key, origin in pairs:
+                pos = key.find(q)
+                score = (RANK[level, origin], -similarity, origin, pos if pos >= 0 else len(key), len(key), key)
+                old = best.get(key)
+                if old is None or score < old:
+                    best[key] = score
+
+        def level_of(term_id: int) -> int:
+            term = self._terms[term_id]
+            return EXACT if term == q else (PREFIX if term.startswith(q) else SUBSTRING)
+
+        if len(q) < 3:
+            # ключи/алиасы с этого префикса идут выше любых токенов — токены, только если их не хватило
+            prefix = self._prefix_ids(q)
+            for i in prefix:
+                offer(i, level_of(i), tokens=False)
+            if len(best) < limit:
+                for i in prefix:
+                    offer(i, level_of(i))
+            if len(best) < limit:
+                # короткий запрос без префиксных совпадений — подстрока полным проходом
+                for i, term in enumerate(self._terms):
+                    if term.find(q) > 0:
+                        offer(i, SUBSTRING)
+        else:
+            for i in self._substring_ids(q):
+                offer(i, level_of(i))
+            if len(best) < limit:
+                for similarity, i in self._fuzzy_ids(q):
+                    offer(i, FUZZY, similarity)
+
+        return [key for key, _score in heapq.nsmallest(limit, best.items(), key=lambda it: it[1])]
 
     def find_best(self, q: str) -> Optional[Section]:
         """
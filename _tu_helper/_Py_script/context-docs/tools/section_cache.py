@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш разобранных секций на диске и инкрементальное обновление.
+
+- SectionStore(roots): секции всех корней; на каждый корень — pickle в CACHE_DIR
+  (путь файла -> (mtime, размер, секции)). load()/refresh() обходят корни (rglob), но разбирают
+  parse_md_file только новые и изменённые файлы; удалённые выбрасываются. Возвращают Changes.
+- DocsWatcher(store, on_change, interval) — фоновый поток: раз в interval секунд store.refresh(),
+  при изменениях вызывает on_change(changes) (из своего потока — Tk трогать только через очередь/after).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config_roots import CACHE_DIR
+from md_parser import iter_md_files, parse_md_file
+from models import Section
+
+CACHE_VERSION = 1
+
+Stamp = Tuple[int, int]   # (mtime_ns, размер)
+
+@dataclass
+class Changes:
+    """Что изменилось при обновлении: списки путей .md."""
+    added: List[Path] = field(default_factory=list)
+    changed: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def touched(self) -> List[Path]:
+        return self.added + self.changed + self.removed
+
+def _stamp(path: Path) -> Optional[Stamp]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class SectionStore:
+    """
+    Секции по файлам в порядке обхода (корни по порядку, внутри — sorted rglob, как collect_sections_from_roots).
+    files[path] = (stamp, [Section]).
+    """
+    def __init__(self, roots: List[Path], cache_dir: Optional[Path] = CACHE_DIR):
+        self.roots = list(roots)
+        self.cache_dir = cache_dir
+        self.files: Dict[Path, Tuple[Stamp, List[Section]]] = {}
+        self.stats = {"files": 0, "cached": 0, "parsed": 0}
+        self._lock = threading.Lock()
+
+    # ---------------- диск ----------------
+
+    def _cache_path(self, root: Path) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        h = hashlib.sha1(str(root.resolve()).encode("utf-8")).hexdigest()[:12]
+        return self.cache_dir / f"sections_{h}.pkl"
+
+    def _load_root(self, root: Path) -> Dict[Path, Tuple[Stamp, List[Section]]]:
+        p = self._cache_path(root)
+        if p is None or not p.is_file():
+            return {}
+        try:
+            with open(p, "rb") as f:
+                data = pickle.load(f)
+        except Exception:
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return {}
+        return data.get("files") or {}
+
+    def _save_root(self, root: Path, files: Dict[Path, Tuple[Stamp, List[Section]]]) -> None:
+        p = self._cache_path(root)
+        if p is None:
+            return
+        tmp: Optional[Path] = None
+        try:
+            p.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("wb", dir=p.parent, prefix=p.name + ".", suffix=".tmp",
+                                             delete=False) as f:
+                tmp = Path(f.name)
+                pickle.dump({"version": CACHE_VERSION, "root": str(root), "files": files}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, p)
+        except OSError:
+            if tmp is not None:
+                try:
+                    tmp.unlink()
+                except OSError:
+                    pass
+
+    # ---------------- обход ----------------
+
+    def _scan(self, known: Dict[Path, Tuple[Stamp, List[Section]]]) -> Tuple[Dict, Changes, Dict[Path, bool]]:
+        """Новый files (в порядке обхода), изменения относительно known и «какие корни поменялись»."""
+        files: Dict[Path, Tuple[Stamp, List[Section]]] = {}
+        changes = Changes()
+        dirty: Dict[Path, bool] = {}
+        self.stats = {"files": 0, "cached": 0, "parsed": 0}
+        for root in self.roots:
+            dirty[root] = False
+            for p in iter_md_files(root):
+                stamp = _stamp(p)
+                if stamp is None:
+                    continue
+                old = known.get(p)
+                if old is not None and old[0] == stamp:
+                    files[p] = old
+                    self.stats["cached"] += 1
+                else:
+                    files[p] = (stamp, parse_md_file(p))
+                    self.stats["parsed"] += 1
+                    (changes.changed if old is not None else changes.added).append(p)
+                    dirty[root] = True
+                self.stats["files"] += 1
+        changes.removed = [p for p in known if p not in files]
+        for p in changes.removed:
+            for root in self.roots:
+                if root in p.parents:
+                    dirty[root] = True
+        return files, changes, dirty
+
+    def _commit(self, files, dirty, force_save: bool = False) -> None:
+        with self._lock:
+            self.files = files
+        for root in self.roots:
+            if dirty.get(root) or force_save:
+                self._save_root(root, {p: v for p, v in files.items() if root in p.parents})
+
+    def load(self) -> Changes:
+        """Первая загрузка: кэш с диска + разбор изменённых с прошлого запуска файлов."""
+        known: Dict[Path, Tuple[Stamp, List[Section]]] = {}
+        for root in self.roots:
+            known.update(self._load_root(root))
+        files, changes, dirty = self._scan(known)
+        self._commit(files, dirty)
+        return changes
+
+    def refresh(self) -> Changes:
+        """Повторный обход: разбираются только новые/изменённые файлы."""
+        with self._lock:
+            known = dict(self.files)
+        files, changes, dirty = self._scan(known)
+        if changes:
+            self._commit(files, dirty)
+        return changes
+
+    # ---------------- данные ----------------
+
+    def all_files(self) -> List[Path]:
+        with self._lock:
+            return list(self.files)
+
+    def sections(self) -> List[Section]:
+        with self._lock:
+            return [s for _stamp, secs in self.files.values() for s in secs]
+
+    def sections_of(self, path: Path) -> List[Section]:
+        with self._lock:
+            entry = self.files.get(path)
+        return list(entry[1]) if entry else []
+
+class DocsWatcher:
+    """Опрос корней раз в interval секунд (без внешних зависимостей: работает везде, где работает rglob)."""
+    def __init__(self, store: SectionStore, on_change: Callable[[Changes], None], interval: float = 2.0):
+        self.store = store
+        self.on_change = on_change
+        self.interval = max(0.2, float(interval))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="docs-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive() and not self._stop.is_set())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                changes = self.store.refresh()
+            except Exception:
+                continue
+            if changes and not self._stop.is_set():
+                self.on_change(changes)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Лёгкий стемминг для полнотекстового поиска: русские и английские слова приводятся к общей основе
+отбрасыванием окончаний (без словарей). «модели», «моделью», «модель» -> «модел»; «fields», «field» -> «field».
+Слова с цифрами и короткие (< 4 символов) не трогаем.
+"""
+
+import re
+
+CYR_RE = re.compile(r"[а-яё]")
+LAT_ONLY_RE = re.compile(r"^[a-z]+$")
+
+# окончания русских слов (прилагательные, причастия, глаголы, существительные), длинные — первыми
+RU_ENDINGS = sorted({
+    # деепричастия / возвратные формы
+    "ившись", "ывшись", "вшись", "ивши", "ывши", "вши",
+    # прилагательные и причастия
+    "ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой",
+    "ем", "им", "ым", "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+    "ующий", "ющий", "ащий", "ящий", "вший", "нный", "анный", "енный",
+    # глаголы (короткие «-ла/-ли/-ет» не берём: «модели», «пакет»)
+    "ете", "ите", "йте", "ешь", "ишь", "ует", "уют", "ить", "ыть", "ать", "ять", "еть", "уть",
+    "ила", "ыла", "ена", "или", "ыли", "ило", "ыло", "ено", "ют", "ят", "ть",
+    # существительные
+    "иями", "ями", "ами", "ией", "иям", "ием", "иях", "ев", "ов", "ье", "еи", "ии", "ям", "ам",
+    "ах", "ях", "ию", "ью", "ия", "ья", "а", "е", "и", "й", "о", "у", "ы", "ь", "ю", "я",
+}, key=len, reverse=True)
+
+# возвратные формы глаголов: отрезаем «ся»/«сь» («запись» — не глагол)
+RU_REFLEXIVE = ("ся", "лась", "лось", "лись", "тесь", "ясь", "ась")
+
+RU_MIN_STEM = 3
+
+def stem_ru(word: str) -> str:
+    word = word.replace("ё", "е")
+    if len(word) < 4:
+        return word
+    if word.endswith(RU_REFLEXIVE) and len(word) - 2 >= RU_MIN_STEM:
+        word = word[:-2]
+    for end in RU_ENDINGS:
+        if word.endswith(end) and len(word) - len(end) >= RU_MIN_STEM:
+            word = word[: -len(end)]
+            break
+    if word.endswith("ь") and len(word) - 1 >= RU_MIN_STEM:
+        word = word[:-1]
+    return word
+
+def stem_en(word: str) -> str:
+    if len(word) < 4:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("sses"):
+        return word[:-2]
+    for end in ("ing", "ed"):
+        if word.endswith(end) and len(word) - len(end) >= 3 and not word.endswith("eed"):
+            word = word[: -len(end)]
+            # «running» -> «runn» -> «run»
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            return word
+    if word.endswith("ly") and len(word) > 5:
+        return word[:-2]
+    if word.endswith(("ches", "shes", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    # «compute» / «computes» / «computed» -> «comput»
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+def stem(word: str) -> str:
+    """Основа слова (word — в нижнем регистре): кириллица — stem_ru, латиница — stem_en, иначе как есть."""
+    if CYR_RE.search(word):
+        return stem_ru(word)
+    if LAT_ONLY_RE.match(word):
+        return stem_en(word)
+    return word
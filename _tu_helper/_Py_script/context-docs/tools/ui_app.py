@@ -3,35 +3,140 @@
 """
 Tkinter-интерфейс: одно дерево категорий, справа markdown+путь и кодовые блоки,
 сверху поиск через Combobox + кнопки истории (◀ ▶).
+Поиск по тексту секций (BM25, fulltext_index) — вкладка «Найдено в тексте» слева, совпадения подсвечены.
+
+Окно появляется сразу: секции (кэш section_cache) и индексы строятся в фоновом потоке, результаты
+приходят в Tk-поток через очередь (_poll_events). «Следить за файлами» — DocsWatcher: изменённые .md
+перечитываются, их узлы в дереве заменяются, индексы пересобираются в фоне — по одной сборке за раз,
+изменения за время сборки копятся в одну следующую. Исключение в фоне приходит событием "error"
+(статус + сообщение), флаг сборки сбрасывается.
 """
 
 from __future__ import annotations
+import queue
+import threading
 import webbrowser
-from typing import Dict, Optional, List
+from pathlib import Path
+from typing import Dict, Optional, List, Set
 
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tkinter.scrolledtext import ScrolledText
 
 from config_roots import read_doc_roots
-from md_parser import collect_sections_from_roots
+from section_cache import Changes, DocsWatcher, SectionStore
 from search_index import SearchIndex
+from fulltext_index import FullTextIndex, match_spans
 from ui_tree import add_section_to_tree
 from models import Section
-from utils import normalize_key
 
 APP_TITLE = "Context Docs Viewer"
+WATCH_INTERVAL_SEC = 2.0
+EVENTS_POLL_MS = 100
 
 class App:
-    def __init__(self, root: tk.Tk, initial_query: str = ""):
+    def __init__(self, root: tk.Tk, initial_query: str = "", watch: bool = False):
         self.root = root
         root.title(APP_TITLE)
         root.geometry("1150x780")
         root.minsize(900, 600)
 
-        # корни и секции
+        # корни и секции: секции (кэш на диске) и индексы готовятся в фоне — окно показывается сразу
         self.doc_roots = read_doc_roots()
-        self.all_files, self.sections = collect_sections_from_roots(self.doc_roots)
+        self.store = SectionStore(self.doc_roots)
+        self.all_files: List[Path] = []
+        self.sections: List[Section] = []
+        self.by_key: Dict[str, Section] = {}
+        # индексы: ключи (подсказки) и текст секций (BM25); None — ещё строятся
+        self.index: Optional[SearchIndex] = None
+        self.fulltext: Optional[FullTextIndex] = None
+        self._index_gen = 0                      # номер последней запрошенной сборки индексов
+        self._index_busy = True                  # сборка идёт (первая — в _load_worker)
+        self._index_queued = False               # за время сборки были изменения — собрать ещё раз
+        self._events: "queue.Queue[tuple]" = queue.Queue()
+        self._pending_open = False               # Enter до готовности индекса — открыть, когда соберётся
+        self._tree_items: Dict[Path, List[str]] = {}   # файл -> iid его секций в дереве
+
+        self.watcher = DocsWatcher(self.store, lambda ch: self._events.put(("changed", ch)), WATCH_INTERVAL_SEC)
+
+        # состояние: текущая секция и ИСТОРИЯ поиска/открытий
+        self.current_section: Optional[Section] = None
+        self.history: List[str] = []     # храним КЛЮЧИ
+        self.hist_idx: int = -1          # -1 = пусто
+        self._last_query: Optional[str] = None   # подсказки уже построены для этого текста
+
+        self.watch_var = tk.BooleanVar(value=watch)
+        self.status_var = tk.StringVar(value="Загрузка секций…")
+        self._build_topbar()
+        ttk.Label(self.root, textvariable=self.status_var, anchor="w", padding=(8, 2)).pack(side=tk.BOTTOM, fill=tk.X)
+        self._build_body()
+
+        if initial_query:
+            self.search_combo.set(initial_query)
+            self._pending_open = True    # откроется, когда будет готов индекс (это добавит запись в историю)
+
+        threading.Thread(target=self._load_worker, name="docs-load", daemon=True).start()
+        self.root.after(EVENTS_POLL_MS, self._poll_events)
+
+    # ---------------- фоновая загрузка и события ----------------
+    def _load_worker(self) -> None:
+        """Фон: секции из кэша (разбор только изменённых .md), затем индексы. Ошибка — событие "error"."""
+        try:
+            self.store.load()
+            files, sections = self.store.all_files(), self.store.sections()
+        except Exception as e:
+            self._events.put(("error", "загрузка секций", f"{e.__class__.__name__}: {e}"))
+            return
+        self._events.put(("sections", files, sections, dict(self.store.stats)))
+        self._build_indexes(sections, 0)
+
+    def _build_indexes(self, sections: List[Section], gen: int) -> None:
+        try:
+            index = SearchIndex(sections)
+            fulltext = FullTextIndex.build(sections)
+        except Exception as e:
+            self._events.put(("error", "сборка индекса", f"{e.__class__.__name__}: {e}"))
+            return
+        self._events.put(("index", gen, index, fulltext))
+
+    def _rebuild_indexes(self) -> None:
+        """Сборки по одной: пока идёт сборка, следующая только помечается и стартует после неё по свежим секциям."""
+        self._index_gen += 1
+        if self._index_busy:
+            self._index_queued = True
+            return
+        self._index_busy = True
+        threading.Thread(target=self._build_indexes, args=(list(self.sections), self._index_gen),
+                         name="docs-index", daemon=True).start()
+
+    def _poll_events(self) -> None:
+        """Tk-поток: применить всё, что пришло из фоновых потоков."""
+        try:
+            while True:
+                ev = self._events.get_nowait()
+                if ev[0] == "sections":
+                    self._on_sections_loaded(*ev[1:])
+                elif ev[0] == "index":
+                    self._on_index_ready(*ev[1:])
+                elif ev[0] == "changed":
+                    self._apply_changes(ev[1])
+                elif ev[0] == "error":
+                    self._on_worker_error(*ev[1:])
+        except queue.Empty:
+            pass
+        self.root.after(EVENTS_POLL_MS, self._poll_events)
+
+    def _set_sections(self, files: List[Path], sections: List[Section]) -> None:
+        self.all_files, self.sections = files, sections
+        self.by_key = {}
+        for s in sections:
+            self.by_key.setdefault(s.key, s)
+
+    def _on_sections_loaded(self, files: List[Path], sections: List[Section], stats: Dict[str, int]) -> None:
+        self._set_sections(files, sections)
+        self._fill_categories_tree()
+        self.status_var.set(f"Файлов: {len(files)}, секций: {len(sections)} "
+                            f"(из кэша {stats['cached']}, разобрано {stats['parsed']}) · строится индекс…")
 
         if not self.all_files:
             messagebox.showwarning(
@@ -44,22 +149,59 @@ class App:
                 f"Найдено .md файлов: {len(self.all_files)}, но секции не распознаны.\n"
                 "Проверьте, что заголовки начинаются с '#' или '##'."
             )
-
-        # индекс
-        self.index = SearchIndex(self.sections)
-
-        # состояние: текущая секция и ИСТОРИЯ поиска/открытий
-        self.current_section: Optional[Section] = None
-        self.history: List[str] = []     # храним КЛЮЧИ
-        self.hist_idx: int = -1          # -1 = пусто
-
-        self._build_topbar()
-        self._build_body()
-        self._fill_categories_tree()
-
-        if initial_query:
-            self.search_combo.set(initial_query)
-            self.open_best_from_combo()  # это добавит запись в историю
+        if self.watch_var.get():
+            self.watcher.start()
+
+    def _on_index_ready(self, gen: int, index: SearchIndex, fulltext: FullTextIndex) -> None:
+        # сборки идут по одной, так что это самый свежий готовый индекс — берём, даже если уже есть изменения
+        self.index, self.fulltext = index, fulltext
+        self._last_query = None
+        self._index_busy = False
+        if self._index_queued:
+            self._index_queued = False
+            self._rebuild_indexes()
+        if gen != self._index_gen:
+            return      # статус «пересобирается» остаётся до следующей сборки
+        self.status_var.set(f"Файлов: {len(self.all_files)}, секций: {len(self.sections)} · индекс готов"
+                            + (" · слежение за файлами" if self.watcher.running else ""))
+        if self._pending_open:
+            self._pending_open = False
+            self.open_best_from_combo()
+
+    def _on_worker_error(self, what: str, err: str) -> None:
+        # фоновая сборка завершилась (неудачно) — следующая может стартовать, накопленные изменения — собрать
+        self._index_busy = False
+        self.status_var.set(f"Ошибка: {what} — {err}")
+        messagebox.showerror("Ошибка", f"Не удалось: {what}\n\n{err}")
+        if self._index_queued:
+            self._index_queued = False
+            self._rebuild_indexes()
+
+    def _apply_changes(self, ch: Changes) -> None:
+        """Изменения от DocsWatcher: заменить секции изменённых файлов в дереве, пересобрать индексы."""
+        self._set_sections(self.store.all_files(), self.store.sections())
+        for p in ch.changed + ch.removed:
+            self._remove_file_from_tree(p)
+        for p in ch.added + ch.changed:
+            self._add_file_to_tree(p, self.store.sections_of(p))
+
+        # открытая секция — из изменённого файла: показать новую версию (по ключу)
+        cur = self.current_section
+        if cur is not None and cur.file_path in ch.touched:
+            fresh = next((s for s in self.store.sections_of(cur.file_path) if s.key == cur.key), None)
+            if fresh is not None:
+                self.open_section(fresh, add_to_history=False)
+
+        names = ", ".join(p.name for p in ch.touched[:3]) + ("…" if len(ch.touched) > 3 else "")
+        self.status_var.set(f"Обновлено: {names} · секций: {len(self.sections)} · пересобирается индекс…")
+        self._rebuild_indexes()
+
+    def _toggle_watch(self) -> None:
+        if self.watch_var.get():
+            if self.all_files or self.store.files:
+                self.watcher.start()
+        else:
+            self.watcher.stop()
 
     # ---------------- верхняя панель (поиск + история) ----------------
     def _build_topbar(self) -> None:
@@ -85,6 +227,11 @@ class App:
 
         ttk.Button(top, text="Открыть", command=self.open_best_from_combo).pack(side=tk.LEFT, padx=6)
         ttk.Button(top, text="Найти в дереве", command=self.locate_in_tree).pack(side=tk.LEFT)
+        ttk.Button(top, text="Искать в тексте", command=self.search_fulltext).pack(side=tk.LEFT, padx=6)
+        ttk.Checkbutton(top, text="Следить за файлами", variable=self.watch_var,
+                        command=self._toggle_watch).pack(side=tk.LEFT, padx=(6, 0))
+        # Ctrl+Enter — поиск по тексту секций
+        self.search_combo.bind("<Control-Return>", lambda e: self.search_fulltext())
 
         self._update_hist_buttons()
 
@@ -93,15 +240,27 @@ class App:
         body = ttk.Panedwindow(self.root, orient=tk.HORIZONTAL)
         body.pack(fill=tk.BOTH, expand=True)
 
-        # слева — дерево категорий
-        left = ttk.Frame(body)
-        body.add(left, weight=1)
+        # слева — вкладки: дерево категорий и результаты поиска по тексту
+        self.left_tabs = ttk.Notebook(body)
+        body.add(self.left_tabs, weight=1)
+
+        left = ttk.Frame(self.left_tabs)
+        self.left_tabs.add(left, text="Категории")
 
         self.cat_tree = ttk.Treeview(left, show="tree")
         self.cat_tree.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
         self.cat_tree.bind("<Double-1>", self._on_tree_activate)
         self.cat_tree.bind("<Return>", self._on_tree_activate)
 
+        found = ttk.Frame(self.left_tabs)
+        self.left_tabs.add(found, text="Найдено в тексте")
+        self.found_text = ScrolledText(found, wrap="word", cursor="arrow")
+        self.found_text.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
+        self.found_text.tag_configure("title", font=("TkDefaultFont", 10, "bold"), foreground="#1a4f8b")
+        self.found_text.tag_configure("meta", foreground="#777777")
+        self.found_text.tag_configure("hit", background="#fff2a8")
+        self.found_text.configure(state="disabled")
+
         # справа — верх: markdown + путь; низ — код
         right = ttk.Panedwindow(self.root, orient=tk.VERTICAL)
         body.add(right, weight=3)
@@ -112,6 +271,7 @@ class App:
 
         self.md_text = ScrolledText(md_wrap, wrap="word")
         self.md_text.pack(fill=tk.BOTH, expand=True)
+        self.md_text.tag_configure("hit", background="#fff2a8")
         self.md_text.configure(state="disabled")
 
         path_bar = ttk.Frame(md_wrap)
@@ -145,31 +305,51 @@ class App:
     # ---------------- заполнение дерева ----------------
     def _fill_categories_tree(self) -> None:
         self.cat_tree.delete(*self.cat_tree.get_children())
+        self._tree_items = {}
 
-        # счётчик вхождений одной и той же секции (для уникальных iid)
-        per_file_counter: Dict[str, int] = {}
-
+        by_file: Dict[Path, List[Section]] = {}
         for s in self.sections:
+            by_file.setdefault(s.file_path, []).append(s)
+        for path, secs in by_file.items():
+            self._add_file_to_tree(path, secs)
+
+    def _add_file_to_tree(self, path: Path, sections: List[Section]) -> None:
+        # счётчик вхождений секций файла (для уникальных iid)
+        items = self._tree_items.setdefault(path, [])
+        n = 0
+        for s in sections:
             paths = s.categories_list or [["Без категории"]]
             for cat_path in paths:
-                k = str(s.file_path.resolve())
-                per_file_counter[k] = per_file_counter.get(k, 0) + 1
-                add_section_to_tree(self.cat_tree, "", cat_path, s, per_file_counter[k])
+                n += 1
+                items.append(add_section_to_tree(self.cat_tree, "", cat_path, s, n))
+
+    def _remove_file_from_tree(self, path: Path) -> None:
+        """Убрать узлы секций файла и опустевшие категории над ними."""
+        for iid in self._tree_items.pop(path, []):
+            if not self.cat_tree.exists(iid):
+                continue
+            parent = self.cat_tree.parent(iid)
+            self.cat_tree.delete(iid)
+            while parent and not self.cat_tree.get_children(parent):
+                up = self.cat_tree.parent(parent)
+                self.cat_tree.delete(parent)
+                parent = up
 
     # ---------------- поиск ----------------
     def _on_query_changed(self, event=None) -> None:
         q = self.search_combo.get().strip()
+        # KeyRelease приходит и на стрелки/Shift/Ctrl — текст тот же, подсказки не пересчитываем
+        if q == self._last_query:
+            return
+        if self.index is None:
+            return      # индекс ещё строится; _on_index_ready сбросит _last_query
+        self._last_query = q
+        # точное совпадение suggest() и так ставит первым (триграммный индекс, см. search_index)
         keys = self.index.suggest(q, limit=50)
 
-        exact = normalize_key(q)
-        if exact in keys:
-            ordered = [exact] + [k for k in keys if k != exact]
-        else:
-            ordered = keys
-
         out = []
-        for k in ordered:
-            sec = self.index.by_key.get(k)
+        for k in keys:
+            sec = self.by_key.get(k)
             if not sec:
                 continue
             out.append(f"{k}    —    {sec.file_path.name}")
@@ -189,12 +369,54 @@ class App:
         if not q:
             messagebox.showinfo("Поиск", "Введите ключ для поиска.")
             return
+        if self.index is None:
+            self._pending_open = True   # откроем, как только индекс будет готов
+            return
         sec = self.index.find_best(q)
         if not sec:
             messagebox.showinfo("Поиск", f"Ничего не найдено для: {q}")
             return
         self.open_section(sec, add_to_history=True)
 
+    # ---------------- поиск по тексту секций ----------------
+    def search_fulltext(self) -> None:
+        """BM25 по телу секций: список с подсвеченными фрагментами во вкладке «Найдено в тексте»."""
+        q = self._extract_key_from_combo()
+        if not q:
+            messagebox.showinfo("Поиск", "Введите слова для поиска по тексту.")
+            return
+        if self.fulltext is None:
+            messagebox.showinfo("Поиск", "Индекс ещё строится, повторите через пару секунд.")
+            return
+        hits = self.fulltext.search(q, limit=100)
+        terms = self.fulltext.terms_for(q)
+
+        ft = self.found_text
+        ft.configure(state="normal")
+        ft.delete("1.0", "end")
+        if not hits:
+            ft.insert("end", f"Ничего не найдено для: {q}")
+        for i, h in enumerate(hits):
+            tag = f"res{i}"
+            ft.insert("end", f"§ {h.section.display_key}", ("title", tag))
+            ft.insert("end", f"    {h.section.file_path.name} · {h.score:.1f}\n", ("meta", tag))
+            start = ft.index("end-1c")
+            ft.insert("end", h.snippet + "\n\n", (tag,))
+            for a, b in h.marks:
+                ft.tag_add("hit", f"{start}+{a}c", f"{start}+{b}c")
+            ft.tag_bind(tag, "<Button-1>", lambda e, s=h.section: self.open_section(s, True, highlight=terms))
+        ft.configure(state="disabled")
+        self.left_tabs.select(1)
+
+    def _highlight_md(self, terms: Set[str], body_offset: int) -> None:
+        """Подсветить совпадения в markdown открытой секции и прокрутить к первому."""
+        first = None
+        for a, b in match_spans(self.current_section.markdown, terms):
+            self.md_text.tag_add("hit", f"1.0+{body_offset + a}c", f"1.0+{body_offset + b}c")
+            first = first or f"1.0+{body_offset + a}c"
+        if first:
+            self.md_text.see(first)
+
     # ---------------- открытие секции ----------------
     def _on_tree_activate(self, event=None) -> None:
         item = self.cat_tree.focus()
@@ -204,12 +426,12 @@ class App:
         if not text.startswith("§ "):
             return
         key = text[2:].strip()
-        sec = self.index.by_key.get(key)
+        sec = self.by_key.get(key)
         if sec:
             self.open_section(sec, add_to_history=True)
 
-    def open_section(self, sec: Section, add_to_history: bool) -> None:
-        """Показать секцию и при необходимости добавить запись в историю."""
+    def open_section(self, sec: Section, add_to_history: bool, highlight: Optional[Set[str]] = None) -> None:
+        """Показать секцию и при необходимости добавить запись в историю (highlight — термы для подсветки)."""
         self.current_section = sec
 
         header = f"# {sec.display_key}"
@@ -218,6 +440,8 @@ class App:
         self.md_text.insert("1.0", header + "\n\n")
         if sec.markdown:
             self.md_text.insert("end", sec.markdown)
+            if highlight:
+                self._highlight_md(highlight, len(header) + 2)
         self.md_text.configure(state="disabled")
 
         # путь к файлу
@@ -320,7 +544,7 @@ class App:
         if self.hist_idx > 0:
             self.hist_idx -= 1
             key = self.history[self.hist_idx]
-            sec = self.index.by_key.get(key)
+            sec = self.by_key.get(key)
             if sec:
                 # при навигации по истории НЕ добавляем запись в историю
                 self.open_section(sec, add_to_history=False)
@@ -331,7 +555,7 @@ class App:
         if 0 <= self.hist_idx < len(self.history) - 1:
             self.hist_idx += 1
             key = self.history[self.hist_idx]
-            sec = self.index.by_key.get(key)
+            sec = self.by_key.get(key)
             if sec:
                 self.open_section(sec, add_to_history=False)
             self._update_hist_buttons()
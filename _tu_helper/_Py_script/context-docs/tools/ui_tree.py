@@ -6,9 +6,9 @@
 from tkinter import ttk
 from models import Section
 
-def add_section_to_tree(tree: ttk.Treeview, root_id: str, cat_path, section: Section, instance_number: int) -> None:
+def add_section_to_tree(tree: ttk.Treeview, root_id: str, cat_path, section: Section, instance_number: int) -> str:
     """
-    Вставляет секцию в дерево по пути категорий.
+    Вставляет секцию в дерево по пути категорий и возвращает iid её узла.
     Для уникальности узла секции используем iid вида:
       "sec::<key>::<abs_path>::<instance_number>"
     """
@@ -25,4 +25,4 @@ def add_section_to_tree(tree: ttk.Treeview, root_id: str, cat_path, section: Sec
         parent = found
 
     unique_iid = f"sec::{section.key}::{section.file_path.resolve()}::{instance_number}"
-    tree.insert(parent, "end", iid=unique_iid, text=f"§ {section.key}")
+    return tree.insert(parent, "end", iid=unique_iid, text=f"§ {section.key}")
@@ -8,8 +8,8 @@ from typing import List
 
 # Разделители (строки из === или --- любой длины, с пробелами)
 SEP_LINE_RE = re.compile(r"^\s*[=\-]{3,}\s*$")
-# Разбиение на токены для поиска
-TOKEN_SPLIT_RE = re.compile(r"[^a-z0-9_]+")
+# Разбиение на токены для поиска (буквы любых алфавитов, цифры, '_')
+TOKEN_SPLIT_RE = re.compile(r"[^\w]+")
 
 def normalize_key(s: str) -> str:
     """Нормализация ключей/запросов: обрезать пробелы, привести к нижнему регистру."""
@@ -18,7 +18,7 @@ def normalize_key(s: str) -> str:
 def tokenize(s: str) -> List[str]:
     """
     Разбить строку на токены по небуквенно-цифровым (кроме '_').
-    Пример: 'ul-ol-li' -> ['ul','ol','li']
+    Пример: 'ul-ol-li' -> ['ul','ol','li'], 'поле-many2one' -> ['поле','many2one']
     """
     s = normalize_key(s)
     return [t for t in TOKEN_SPLIT_RE.split(s) if t]
@@ -31,6 +31,14 @@ from typing import List, Optional, Tuple
 
 import tomllib  # стандартный парсер TOML (Python 3.11+)
 
+# Метаданные медиа — общий модуль из ../_make_video/_common (кэш, .mp3/.wav без ffprobe).
+# Если скрипт лежит отдельно от _make_video — длительность спрашиваем у ffprobe напрямую.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "_make_video" / "_common"))
+try:
+    import media_probe  # type: ignore
+except ImportError:
+    media_probe = None
+
 # ====================== ВСПОМОГАТЕЛЬНЫЕ ======================
 
 def log(msg: str) -> None:
@@ -393,6 +401,8 @@ def resolution_to_wh(res: str) -> Tuple[int, int]:
     return 1920, 1080
 
 def probe_duration_seconds(path: Path) -> float:
+    if media_probe is not None:
+        return media_probe.duration(path) or 0.0
     try:
         out = subprocess.run(
             ["ffprobe","-v","error","-show_entries","format=duration","-of","json",str(path)],
@@ -419,8 +429,14 @@ def build_images_timeline(cfg: Config) -> List[Tuple[ImageItem,float,float]]:
             t = end
     return tl
 
+def prefetch_durations(paths: List[Path]) -> None:
+    """Все аудио разом в пуле потоков (дальше probe_duration_seconds берёт из кэша)."""
+    if media_probe is not None:
+        media_probe.probe_many([p for p in paths if p.exists()])
+
 def build_audio_timeline_sequence(cfg: Config) -> List[Tuple[AudioItem,float,float]]:
     tl=[]; t=0.0
+    prefetch_durations([it.path for it in cfg.aud_list])
     for it in cfg.aud_list:
         if not it.path.exists():
             if cfg.safety_stop_on_missing: die(f"Аудио не найдено: {it.path}")
@@ -433,6 +449,7 @@ def build_audio_timeline_sequence(cfg: Config) -> List[Tuple[AudioItem,float,flo
 
 def build_audio_timeline_mix(cfg: Config) -> List[Tuple[AudioItem,float,float]]:
     tl=[]
+    prefetch_durations([it.path for it in cfg.aud_list])
     for it in cfg.aud_list:
         if not it.path.exists():
             if cfg.safety_stop_on_missing: die(f"Аудио не найдено: {it.path}")
@@ -8,9 +8,9 @@
 <имя>_di<расширение>.
 
 Логика распределения строк:
-- Если в строке присутствуют кириллические символы (диапазон U+0400..U+04FF),
-  строка идёт в "русский" файл (_ru).
-- Иначе — в "английский" файл (_en).
+- Язык строки определяет ../_make_video/_common/lang_classify.py (тот же, что у TTS) в режиме any_cyrillic:
+  если в строке есть кириллические символы (U+0400..U+04FF), она идёт в "русский" файл (_ru)
+  (строка «word — перевод» — тоже), иначе — в "английский" (_en). Повторяющиеся строки берутся из памяти.
 - Пустые строки внутри текста записываются в оба файла (сохраняем разрывы).
 - Блок "Новые слова" (поддерживаются варианты "Новые слова" и "🆕 Новые слова")
   выделяется в отдельный список и записывается в файл с суффиксом _di.
@@ -29,6 +29,12 @@ import re
 from pathlib import Path
 from typing import Dict, Any, Iterable, Tuple, Optional, List
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "_make_video" / "_common"))
+try:
+    import lang_classify  # type: ignore
+except ImportError:
+    lang_classify = None
+
 # ===============================
 # Константы и регулярные выражения
 # ===============================
@@ -137,13 +143,30 @@ def iter_source_files(source_path: Path, extensions: Iterable[str]) -> Iterable[
     raise FileNotFoundError(f"Источник не найден: {source_path}")
 
 
+# Классификатор языка (lang_classify), создаётся при первом вызове
+_classifier = None
+
+
+def get_classifier():
+    """
+    Возвращает общий классификатор с кандидатами en/ru (None, если lang_classify недоступен).
+    """
+    global _classifier
+    if _classifier is None and lang_classify is not None:
+        _classifier = lang_classify.LangClassifier(candidates=["en", "ru"], any_cyrillic=True)
+    return _classifier
+
+
 def classify_line(line: str) -> str:
     """
-    Классифицирует строку по наличию кириллицы.
-    Возвращает 'ru' если в строке выявлена кириллица, иначе 'en'.
+    Классифицирует строку: 'ru' или 'en'.
+    Основной путь — lang_classify (any_cyrillic: есть кириллица — 'ru'); без него — то же по регулярке.
     Примечание: пустые строки будем писать в оба файла отдельно, снаружи.
     """
-    return "ru" if RE_CYRILLIC.search(line) else "en"
+    clf = get_classifier()
+    if clf is None:
+        return "ru" if RE_CYRILLIC.search(line) else "en"
+    return "ru" if clf.classify(line) == "ru" else "en"
 
 
 def build_output_paths(src_file: Path, cfg: Dict[str, Any], source_root: Optional[Path]) -> Tuple[Path, Path, Path]:
@@ -374,6 +397,8 @@ def main(argv: Optional[Iterable[str]] = None) -> int:
             print(f"[ERROR] {src}: {e}")
 
     print(f"\n[DONE] Обработано файлов: {total}")
+    if _classifier is not None:
+        print(f"[INFO] {_classifier.stats_line()}")
     return 0
 
 
@@ -0,0 +1,91 @@
+# video_editor/bench_thumbs.py
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк генерации миниатюр ленты: старый цикл «один ffmpeg на кадр» против
+потокового движка thumbs_timeline.iter_thumbs_stream (один проход декодера).
+
+Запуск:
+    python bench_thumbs.py VIDEO [шаг_сек] [ширина] [высота]
+
+Выводит время и число миниатюр для каждого режима.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+from tools import thumbs_timeline, ffprobe_info
+
+
+def legacy_per_frame(ffmpeg, src, duration, step, tw, th, outdir):
+    """Точная копия прежнего цикла из ui_app_view._gen_thumbs: -ss + -frames:v 1 на каждую миниатюру."""
+    count = 0
+    for i, sec in enumerate(range(0, int(duration) + 1, step)):
+        outp = os.path.join(outdir, f"thumb_{i:05d}.png")
+        cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+               "-ss", str(sec), "-i", src,
+               "-frames:v", "1",
+               "-vf", f"scale={tw}:{th}:force_original_aspect_ratio=decrease,"
+                      f"pad={tw}:{th}:(ow-iw)/2:(oh-ih)/2:black",
+               outp]
+        try:
+            subprocess.check_call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+            if os.path.isfile(outp):
+                count += 1
+        except Exception:
+            pass
+    return count
+
+
+def stream(ffmpeg, src, duration, step, tw, th, keyframes_only):
+    count = 0
+    for sec, _data in thumbs_timeline.iter_thumbs_stream(ffmpeg, src, step, tw, th,
+                                                         keyframes_only=keyframes_only):
+        if sec > duration:
+            break
+        count += 1
+    return count
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    n = fn(*args)
+    return time.perf_counter() - t0, n
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(2)
+    src = sys.argv[1]
+    step = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    tw = int(sys.argv[3]) if len(sys.argv) > 3 else 140
+    th = int(sys.argv[4]) if len(sys.argv) > 4 else 90
+    ffmpeg = shutil.which("ffmpeg") or "ffmpeg"
+    ffprobe = shutil.which("ffprobe") or "ffprobe"
+
+    duration = ffprobe_info.get_duration(ffprobe, src)
+    gop = thumbs_timeline.probe_gop_seconds(ffprobe, src)
+    print(f"Файл: {src}")
+    print(f"Длительность: {duration:.1f} с, GOP ~{gop:.2f} с, шаг {step} с, миниатюра {tw}x{th}")
+
+    tmp = tempfile.mkdtemp(prefix="bench_thumbs_")
+    try:
+        rows = [
+            ("по кадру (старый цикл)", _timed(legacy_per_frame, ffmpeg, src, duration, step, tw, th, tmp)),
+            ("поток, все кадры",       _timed(stream, ffmpeg, src, duration, step, tw, th, False)),
+        ]
+        if gop > 0 and step > gop:
+            rows.append(("поток, только ключевые", _timed(stream, ffmpeg, src, duration, step, tw, th, True)))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    base = rows[0][1][0] or 1e-9
+    for name, (sec, n) in rows:
+        print(f"{name:<26} {sec:8.2f} с  миниатюр: {n:4d}  x{base / max(sec, 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,160 @@
 # -*- coding: utf-8 -*-
 """
 automontage.py — анализ тишины/застывшего кадра и вырезка/сжатие пауз.
-Реализован простой анализ:
-- По звуку: silencedetect (ищем участки с уровнем ниже порога).
-- По картинке: freezedetect (ищем "зависшие" кадры дольше порога t).
+
+Анализ — ОДИН проход ffmpeg на оба детектора:
+- По картинке: freezedetect (участки без изменений кадра). Ищем от _FREEZE_BASE секунд, события
+  freeze_start/freeze_end разбираем из лога по мере появления; результат кэшируется (media_cache),
+  а порог t применяется уже к готовому списку — смена порога не требует декодирования.
+- По звуку: в том же проходе дорожка идёт PCM в pipe и строит пирамиду (wave_pyramid, общая с вкладками
+  «Аудио»/«Фрагмент»); паузы для любого порога/длительности считаются по ней без ffmpeg.
+  Если пирамиду сохранить не удалось — silencedetect (события тоже разбираются потоком).
+- Пересечение тишины и застывшего кадра — линейный проход по двум отсортированным спискам.
 """
 import os
 import re
-import tempfile
-from . import utils, ffprobe_info
-
-def _detect_silence(ffmpeg, video_path, silence_db=-35.0, minlen=1.0):
-    # Получаем список t_start..t_end участков тишины
-    cmd = [ffmpeg, "-i", video_path, "-af", f"silencedetect=noise={silence_db}dB:d={minlen}", "-f", "null", "-"]
-    code, out, err = utils.run_ffmpeg(cmd)
-    text = out + "\n" + err
-    starts = [float(x) for x in re.findall(r"silence_start:\s*([0-9.]+)", text)]
-    ends = [float(x) for x in re.findall(r"silence_end:\s*([0-9.]+)", text)]
-    # Иногда количество start/end отличается; аккуратно сопоставим
-    segs = []
-    i = 0
-    for s in starts:
-        e = None
-        # ищем следующий end, который больше s
-        for j, val in enumerate(ends):
-            if val is not None and val > s:
-                e = val
-                ends[j] = None
-                break
-        if e is not None:
-            segs.append((s, e))
-    return segs
-
-def _detect_freeze(ffmpeg, video_path, freeze_t=2.0):
-    # Ищем зависшие кадры (freezedetect) — выдаёт "freeze_start"/"freeze_end"
-    cmd = [ffmpeg, "-i", video_path, "-vf", f"freezedetect=n=-60dB:d={freeze_t}", "-map", "0:v:0", "-f", "null", "-"]
-    code, out, err = utils.run_ffmpeg(cmd)
-    text = out + "\n" + err
-    starts = [float(x) for x in re.findall(r"freeze_start:\s*([0-9.]+)", text)]
-    ends = [float(x) for x in re.findall(r"freeze_end:\s*([0-9.]+)", text)]
-    segs = []
-    for i, s in enumerate(starts):
-        e = ends[i] if i < len(ends) else None
-        if e is not None:
-            segs.append((s, e))
-    return segs
+from . import utils, ffprobe_info, media_cache, smart_render, wave_pyramid
+
+_FREEZE_NOISE = "-60dB"
+_FREEZE_BASE = 0.5          # freezedetect ищет от 0.5 с; более длинные пороги — фильтр по кэшу
+_EVENT_RE = re.compile(r"(silence|freeze)_(start|end):\s*(-?[0-9.]+)")
+
+
+class _Pairs:
+    """Сопоставление start/end по мере прихода событий: открытый start + следующий end -> отрезок."""
+
+    def __init__(self):
+        self.segs = []
+        self._open = None
+
+    def start(self, t):
+        if self._open is None:
+            self._open = t
+
+    def end(self, t):
+        if self._open is not None and t > self._open:
+            self.segs.append((self._open, t))
+        self._open = None
+
+    def close(self, t_end):
+        # детектор не закрыл участок до конца файла
+        if self._open is not None and t_end > self._open:
+            self.segs.append((self._open, t_end))
+        self._open = None
+
+
+def _on_events(pairs):
+    """on_line для utils.stream_ffmpeg: события {kind}_start/_end -> pairs[kind]."""
+    def on_line(text):
+        for kind, edge, val in _EVENT_RE.findall(text):
+            p = pairs.get(kind)
+            if p is not None:
+                try: t = max(0.0, float(val))
+                except ValueError: continue
+                p.start(t) if edge == "start" else p.end(t)
+    return on_line
+
+
+def _freeze_key(video_path, d):
+    return media_cache.file_key(video_path, "freeze", n=_FREEZE_NOISE, d=round(float(d), 3))
+
+
+def _scan(ffmpeg, video_path, freeze_d=None, audio=False):
+    """
+    Один проход ffmpeg: freezedetect(d=freeze_d) по видео и/или PCM звука в пирамиду.
+    Возвращает (freezes | None, pyramid | None). Оба результата кладутся в кэш.
+    """
+    sg = wave_pyramid.stream_or_default(None)
+    pairs = {"freeze": _Pairs()}
+    builder = wave_pyramid.PyramidBuilder() if audio else None
+    cmd = [ffmpeg, "-hide_banner", "-nostdin", "-i", video_path]
+    if freeze_d is not None:
+        cmd += ["-map", "0:v:0", "-vf", f"freezedetect=n={_FREEZE_NOISE}:d={freeze_d:g}", "-f", "null", "-"]
+    if builder is not None:
+        cmd += ["-map", f"0:{sg}" if sg >= 0 else "0:a:0", "-ac", "1", "-ar", str(wave_pyramid.SAMPLE_RATE),
+                "-f", "s16le", "pipe:1"]
+    rc, _err = utils.stream_ffmpeg(cmd, _on_events(pairs), builder.feed if builder is not None else None)
+    if rc != 0 and builder is not None and builder.total_samples == 0:
+        # нет звуковой дорожки (или не та) — повторяем только по картинке
+        return (_scan(ffmpeg, video_path, freeze_d)[0] if freeze_d is not None else None), None
+
+    pyr = None
+    if builder is not None and builder.total_samples:
+        pyr = wave_pyramid.save(builder, wave_pyramid.pyramid_key(video_path, sg))
+    freezes = None
+    if freeze_d is not None and rc == 0:
+        dur = pyr.duration if pyr is not None else ffprobe_info.get_duration(smart_render.ffprobe_near(ffmpeg), video_path)
+        pairs["freeze"].close(float(dur or 0.0))
+        freezes = pairs["freeze"].segs
+        media_cache.store_json(_freeze_key(video_path, freeze_d), freezes)
+    return freezes, pyr
+
+
+def _detect_silence_log(ffmpeg, video_path, silence_db=-35.0, minlen=1.0):
+    # Запасной путь без пирамиды: silencedetect, события разбираем по мере вывода
+    pairs = {"silence": _Pairs()}
+    cmd = [ffmpeg, "-hide_banner", "-nostdin", "-i", video_path,
+           "-af", f"silencedetect=noise={silence_db}dB:d={minlen}", "-f", "null", "-"]
+    utils.stream_ffmpeg(cmd, _on_events(pairs))
+    return pairs["silence"].segs
 
-def _expand_with_pad(segs, pad=0.2):
-    # Добавляем запас до/после каждому сегменту
-    return [(max(0.0, a - pad), b + pad) for (a, b) in segs]
 
 def _intersect(a, b):
-    # Пересечение двух списков сегментов по времени
+    # Пересечение двух отсортированных списков сегментов — один проход двумя указателями
     res = []
-    for s1,e1 in a:
-        for s2,e2 in b:
-            s = max(s1,s2); e = min(e1,e2)
-            if e > s:
-                res.append((s,e))
+    i = j = 0
+    while i < len(a) and j < len(b):
+        s = max(a[i][0], b[j][0]); e = min(a[i][1], b[j][1])
+        if e > s:
+            res.append((s, e))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
     return res
 
+
+def _expand_with_pad(segs, pad=0.2):
+    # Добавляем запас до/после каждому сегменту
+    return [(max(0.0, a - pad), b + pad) for (a, b) in segs]
+
+
+def detect(ffmpeg, video_path, mode="both", silence_db=-35.0, freeze_t=2.0, minlen=1.0):
+    """
+    (silences, freezes) для режима mode. Из кэша — без ffmpeg; иначе не более одного прохода
+    на оба детектора сразу.
+    """
+    want_audio = mode in ("audio", "both")
+    want_freeze = mode in ("video", "both")
+    freeze_d = min(_FREEZE_BASE, float(freeze_t)) if want_freeze else None
+
+    pyr = wave_pyramid.open_cached(video_path) if want_audio else None
+    freezes = None
+    if want_freeze:
+        cached = media_cache.load_json(_freeze_key(video_path, freeze_d))
+        if isinstance(cached, list):
+            freezes = [(float(s), float(e)) for s, e in cached]
+    need_audio = want_audio and pyr is None
+    if need_audio or (want_freeze and freezes is None):
+        f, p = _scan(ffmpeg, video_path, freeze_d if freezes is None else None, need_audio)
+        freezes = f if freezes is None else freezes
+        pyr = p if pyr is None else pyr
+
+    sil = []
+    if pyr is not None:
+        try:
+            sil = pyr.silences(silence_db, minlen)
+        finally:
+            pyr.close()
+    elif need_audio:
+        sil = _detect_silence_log(ffmpeg, video_path, silence_db, minlen)
+    frz = [(s, e) for s, e in (freezes or []) if e - s >= float(freeze_t)]
+    return sil, frz
+
+
 def analyze(ffmpeg, video_path, mode="both", silence_db=-35.0, freeze_t=2.0, minlen=1.0, pad=0.2):
     # Возвращаем список сегментов (start,end), которые можно вырезать или сжать
-    sil = _detect_silence(ffmpeg, video_path, silence_db=silence_db, minlen=minlen) if mode in ("audio","both") else []
-    frz = _detect_freeze(ffmpeg, video_path, freeze_t=freeze_t) if mode in ("video","both") else []
+    sil, frz = detect(ffmpeg, video_path, mode, silence_db, freeze_t, minlen)
     if mode == "both":
         segs = _intersect(sil, frz)
     elif mode == "audio":
@@ -4,14 +4,26 @@
 config_store.py — простое хранилище настроек проекта в INI-файле (app.conf).
 Файл: video_editor/app.conf
 
+Настройки живут в памяти процесса (один объект на всё приложение):
+- файл читается один раз при первом обращении; get*/set работают с памятью;
+- set помечает хранилище «грязным», запись — отложенная (_SAVE_DELAY с после последнего изменения)
+  и атомарная (tmp + os.replace); пачка set подряд = одна запись; при выходе — flush();
+- subscribe(fn, section) — уведомления fn(section, key, value) об изменениях (зовутся в потоке set).
+
 Секции по умолчанию:
 [app]    last_video
 [audio]  base_height, view_height, px_per_sec, zoom, show_video
 [tools]  ffmpeg, ffprobe, ffplay
+[cache]  dir (пусто = <temp>/video_editor_cache), max_mb
+[queue]  workers (параллельных ffmpeg), file (пусто = queue_jobs.json рядом с app.conf)
 """
 import os
+import atexit
+import threading
 import configparser
 
+_SAVE_DELAY = 0.5
+
 _DEF = {
     "app": {
         "last_video": ""
@@ -28,6 +40,14 @@ _DEF = {
         "ffprobe": "ffprobe",
         "ffplay": "ffplay",
     },
+    "cache": {
+        "dir": "",
+        "max_mb": "512",
+    },
+    "queue": {
+        "workers": "2",
+        "file": "",
+    },
 }
 
 def _config_path():
@@ -43,7 +63,7 @@ def _ensure_defaults(cfg):
             if not cfg.has_option(sec, k):
                 cfg.set(sec, k, v)
 
-def load():
+def _read():
     path = _config_path()
     cfg = configparser.ConfigParser()
     if os.path.exists(path):
@@ -54,28 +74,109 @@ def load():
     _ensure_defaults(cfg)
     return cfg, path
 
+
+class _Store:
+    """Настройки в памяти: грязный флаг, отложенная атомарная запись, подписчики."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.cfg, self.path = _read()
+        self.dirty = False
+        self._timer = None
+        self._subs = []        # (fn, section | None)
+
+    def get(self, section, key):
+        with self.lock:
+            return self.cfg.get(section, key)
+
+    def set(self, section, key, value):
+        value = str(value)
+        with self.lock:
+            if not self.cfg.has_section(section):
+                self.cfg.add_section(section)
+            if self.cfg.has_option(section, key) and self.cfg.get(section, key) == value:
+                return
+            self.cfg.set(section, key, value)
+            self.dirty = True
+            self._schedule()
+            subs = [fn for fn, sec in self._subs if sec is None or sec == section]
+        for fn in subs:
+            try: fn(section, key, value)
+            except Exception: pass
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(_SAVE_DELAY, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel(); self._timer = None
+            if not self.dirty:
+                return True
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    self.cfg.write(f)
+                os.replace(tmp, self.path)
+            except Exception:
+                return False
+            self.dirty = False
+            return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _Store()
+                atexit.register(_store.flush)
+    return _store
+
+
+def load():
+    """(ConfigParser, путь) — общий объект в памяти; после правок напрямую вызовите save(cfg)."""
+    st = _get_store()
+    return st.cfg, st.path
+
 def save(cfg):
-    path = _config_path()
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            cfg.write(f)
-        return True
-    except Exception:
-        return False
+    st = _get_store()
+    with st.lock:
+        st.cfg = cfg
+        st.dirty = True
+    return st.flush()
+
+def flush():
+    """Немедленно записать несохранённые изменения (например, при закрытии окна)."""
+    return _get_store().flush()
+
+def subscribe(fn, section=None):
+    """fn(section, key, value) при каждом изменении (section=None — все секции)."""
+    st = _get_store()
+    with st.lock:
+        st._subs.append((fn, section))
+
+def unsubscribe(fn):
+    st = _get_store()
+    with st.lock:
+        st._subs = [(f, s) for f, s in st._subs if f is not fn]
 
 def get(section, key, default=None):
-    cfg, _ = load()
     try:
-        return cfg.get(section, key)
+        return _get_store().get(section, key)
     except Exception:
         return default
 
 def set(section, key, value):
-    cfg, _ = load()
-    if not cfg.has_section(section):
-        cfg.add_section(section)
-    cfg.set(section, key, str(value))
-    save(cfg)
+    _get_store().set(section, key, value)
 
 def get_bool(section, key, default=False):
     val = get(section, key, None)
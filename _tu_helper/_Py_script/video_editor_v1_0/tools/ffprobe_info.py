@@ -1,74 +1,236 @@
 # -*- coding: utf-8 -*-
 """
-ffprobe_info.py — утилиты для извлечения метаданных через ffprobe.
-Главная функция: get_duration(ffprobe, path) -> float (секунды)
+ffprobe_info.py — метаданные медиафайла: один запуск ffprobe на файл, результат кэшируется.
+
+- probe() делает `ffprobe -show_format -show_streams -of json` один раз и хранит ответ в памяти и на диске
+  (media_cache, ключ — путь + размер + mtime: изменили файл — ключ другой, ffprobe запустится заново).
+- .wav/.mp3 разбираются по заголовкам без ffprobe (WAV — RIFF-чанки fmt/data, MP3 — mutagen, если установлен);
+  результат в том же виде, что у ffprobe ({"format": {...}, "streams": [...]}).
+- probe_many() — пакетный разбор (папка целиком) в пуле потоков: ffprobe — внешний процесс, GIL не мешает.
+
+Функции:
+- probe(ffprobe, path, cache=True)      -> dict ({"format", "streams"}) или {} при неудаче
+  (cache=False — без кэша в памяти и на диске: временные файлы, которые сразу удаляются)
+- get_duration(ffprobe, path)           -> float (секунды) или 0.0
+- has_audio(ffprobe, path) / has_video(ffprobe, path) -> bool
+- streams(ffprobe, path, kind=None, cache=True) -> список потоков ("audio"/"video" — только этого типа)
+- probe_many(ffprobe, paths, workers=None) -> {path: dict}
+- clear_memory()                        -> сбросить кэш в памяти
 """
+import os
+import json
+import struct
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from . import media_cache
+
+try:
+    from mutagen.mp3 import MP3  # необязательно: без mutagen .mp3 уходит в ffprobe
+except Exception:
+    MP3 = None
+
+_mem = {}
+_mem_lock = threading.Lock()
+
+# WAVE_FORMAT -> codec_name как у ffprobe (для extensible берётся подформат)
+_WAV_CODECS = {1: "pcm_s{bits}le", 3: "pcm_f{bits}le", 6: "pcm_alaw", 7: "pcm_mulaw"}
+
 
-def _run(args):
+def _stat_key(path):
     try:
-        cp = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                            check=False, encoding="utf-8", errors="ignore")
-        return cp.stdout.strip(), cp.returncode
-    except Exception:
-        return "", 1
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.normcase(os.path.abspath(path)), st.st_size, st.st_mtime_ns)
+
 
 def _parse_time_to_seconds(s):
     """Пробуем распарсить число или формат HH:MM:SS(.ms)."""
+    if s is None:
+        return None
+    s = str(s).strip()
     if not s:
         return None
-    s = s.strip()
     try:
         return float(s)
     except Exception:
         pass
     if ":" in s:
         try:
-            parts = s.split(":")
             sec = 0.0
-            for p in parts:
+            for p in s.split(":"):
                 sec = sec * 60.0 + float(p)
             return sec
         except Exception:
             return None
     return None
 
+
+# ---------------- разбор заголовков ----------------
+
+def _audio_only(fmt_name, codec, sr, channels, duration, size, bit_rate=0):
+    stream = {"index": 0, "codec_type": "audio", "codec_name": codec, "sample_rate": str(int(sr)),
+              "channels": int(channels), "duration": f"{duration:.6f}", "disposition": {"default": 1}}
+    if bit_rate:
+        stream["bit_rate"] = str(int(bit_rate))
+    return {"format": {"format_name": fmt_name, "duration": f"{duration:.6f}", "size": str(size),
+                       "nb_streams": 1},
+            "streams": [stream], "source": "header"}
+
+
+def _probe_wav(path):
+    """RIFF/WAVE: fmt — частота, каналы, байт/с; data — размер. Длительность = data / байт_в_секунду."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(12)
+        if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            ch = f.read(8)
+            if len(ch) < 8:
+                return None
+            cid, clen = ch[:4], struct.unpack("<I", ch[4:])[0]
+            if cid == b"fmt ":
+                body = f.read(clen)
+                if len(body) < 16:
+                    return None
+                tag, channels, sr, byte_rate, _align, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == 0xFFFE and len(body) >= 26:
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (tag, channels, sr, byte_rate, bits)
+                f.seek(clen & 1, 1)
+            elif cid == b"data":
+                if fmt is None or not fmt[3]:
+                    return None
+                tag, channels, sr, byte_rate, bits = fmt
+                data_len = min(clen, size - f.tell())   # clen бывает 0xFFFFFFFF у потоковой записи
+                codec = _WAV_CODECS.get(tag, "").format(bits=bits)
+                if not codec:
+                    return None
+                return _audio_only("wav", codec, sr, channels, data_len / byte_rate, size, byte_rate * 8)
+            else:
+                f.seek(clen + (clen & 1), 1)
+
+
+def _probe_mp3(path):
+    if MP3 is None:
+        return None
+    info = MP3(path).info
+    if not info.length:
+        return None
+    return _audio_only("mp3", "mp3", info.sample_rate, info.channels, float(info.length),
+                       os.path.getsize(path), getattr(info, "bitrate", 0))
+
+
+_HEADER_PARSERS = {".wav": _probe_wav, ".mp3": _probe_mp3}
+
+
+def _probe_header(path):
+    fn = _HEADER_PARSERS.get(os.path.splitext(path)[1].lower())
+    if fn is None:
+        return None
+    try:
+        return fn(path)
+    except Exception:
+        return None
+
+
+def _run_ffprobe(ffprobe, path):
+    try:
+        cp = subprocess.run([ffprobe, "-v", "error", "-show_format", "-show_streams", "-of", "json", path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    except Exception:
+        return None
+    if cp.returncode != 0:
+        return None
+    try:
+        data = json.loads(cp.stdout.decode("utf-8", "ignore") or "{}")
+    except Exception:
+        return None
+    return data if isinstance(data, dict) and (data.get("format") or data.get("streams")) else None
+
+
+# ---------------- публичные функции ----------------
+
+def probe(ffprobe, path, cache=True):
+    """
+    Метаданные файла в формате ffprobe JSON ({"format": {...}, "streams": [...]}), {} при неудаче.
+    Порядок: память -> диск (media_cache) -> заголовок (.wav/.mp3) -> ffprobe.
+    cache=False — сразу заголовок/ffprobe, результат нигде не сохраняется.
+    """
+    sk = _stat_key(path)
+    if sk is None:
+        return {}
+    if not cache:
+        data = _probe_header(path)
+        if data is None:
+            data = _run_ffprobe(ffprobe or "ffprobe", path)
+        return data or {}
+    with _mem_lock:
+        hit = _mem.get(sk)
+    if hit is not None:
+        return hit
+
+    key = media_cache.file_key(path, "probe")
+    data = media_cache.load_json(key)
+    if not isinstance(data, dict):
+        data = _probe_header(path)
+        if data is None:
+            data = _run_ffprobe(ffprobe or "ffprobe", path)
+        if data is None:
+            return {}   # неудачу не кэшируем: ffprobe мог быть не найден
+        media_cache.store_json(key, data)
+    with _mem_lock:
+        _mem[sk] = data
+    return data
+
+
+def streams(ffprobe, path, kind=None, cache=True):
+    out = probe(ffprobe, path, cache=cache).get("streams") or []
+    return [s for s in out if kind is None or s.get("codec_type") == kind]
+
+
 def get_duration(ffprobe, path):
     """
-    Возвращает длительность файла в секундах (float) или 0.0 при неудаче.
-    Стратегия:
-      1) format=duration (десятичные секунды)
-      2) format=duration с -sexagesimal (HH:MM:SS.ms)
-      3) stream=duration по всем потокам — берём максимум
+    Возвращает длительность файла в секундах (float) или 0.0 при неудаче:
+    format.duration, иначе максимум duration по потокам.
     """
-    # 1) format=duration (десятичные секунды)
-    out, rc = _run([ffprobe, "-v", "error",
-                    "-show_entries", "format=duration",
-                    "-of", "default=nokey=1:noprint_wrappers=1",
-                    path])
-    dur = _parse_time_to_seconds(out)
-    if rc == 0 and dur and dur > 0:
+    data = probe(ffprobe, path)
+    dur = _parse_time_to_seconds((data.get("format") or {}).get("duration"))
+    if dur and dur > 0:
         return float(dur)
+    best = 0.0
+    for st in data.get("streams") or []:
+        val = _parse_time_to_seconds(st.get("duration"))
+        if val and val > best:
+            best = float(val)
+    return best
 
-    # 2) тот же параметр, но sexagesimal
-    out, rc = _run([ffprobe, "-v", "error",
-                    "-sexagesimal",
-                    "-show_entries", "format=duration",
-                    "-of", "default=nokey=1:noprint_wrappers=1",
-                    path])
-    dur = _parse_time_to_seconds(out)
-    if rc == 0 and dur and dur > 0:
-        return float(dur)
 
-    # 3) максимум среди stream=duration
-    out, rc = _run([ffprobe, "-v", "error",
-                    "-show_entries", "stream=duration",
-                    "-of", "default=nokey=1:noprint_wrappers=1",
-                    path])
-    best = 0.0
-    if rc == 0 and out:
-        for line in out.splitlines():
-            val = _parse_time_to_seconds(line)
-            if val and val > best:
-                best = float(val)
-    return best if best > 0 else 0.0
+def has_audio(ffprobe, path):
+    return bool(streams(ffprobe, path, "audio"))
+
+
+def has_video(ffprobe, path):
+    return any(not (s.get("disposition") or {}).get("attached_pic") for s in streams(ffprobe, path, "video"))
+
+
+def probe_many(ffprobe, paths, workers=None):
+    """Разбор списка файлов в пуле потоков. Возвращает {путь: dict} (порядок — как в paths)."""
+    paths = list(paths)
+    if not paths:
+        return {}
+    n = workers or min(8, (os.cpu_count() or 2) * 2)
+    n = max(1, min(int(n), len(paths)))
+    if n == 1:
+        return {p: probe(ffprobe, p) for p in paths}
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        return dict(zip(paths, ex.map(lambda p: probe(ffprobe, p), paths)))
+
+
+def clear_memory():
+    with _mem_lock:
+        _mem.clear()
@@ -6,48 +6,37 @@ fragment_ops.py — операции вырезания/сохранения н
 Ключевые функции:
 - normalize_intervals(segs, duration)       -> сортирует, обрезает в границы, склеивает пересечения
 - invert_intervals(segs, duration)          -> возвращает список "оставшихся" интервалов
-- keep_only_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0)
-- cut_out_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0)
+- keep_only_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0, smart=True)
+- cut_out_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0, smart=True)
 
 Реализация вырезки/склейки:
 - Используем один прогон FFmpeg с filter_complex: trim/atrim + concat (v=1,a=1).
 - Это точнее и надёжнее, чем много раз "копировать" куски и потом демультиплексировать.
 - Если в видео нет аудио — строим граф только для видео (v=1,a=0).
 
-Выход:
-- Всегда перекодирование в H.264 + AAC (совместимость), CRF=22, preset=veryfast, yuv420p, 48 kHz.
+Smart-render (smart=True, по умолчанию; tools/smart_render.py):
+- Видео между ключевыми кадрами внутри оставляемых интервалов копируется без перекодирования,
+  перекодируются только GOP у границ резов; куски склеиваются concat demuxer'ом.
+- Звук — тот же atrim/concat одним проходом (AAC 192k, 48 kHz).
+- Если кодек/параметры источника не подходят — полный рендер, как раньше.
+
+Выход полного рендера:
+- Перекодирование в H.264 + AAC (совместимость), CRF=22, preset=veryfast, yuv420p, 48 kHz.
 """
 
 import os
-import subprocess
-from . import ffprobe_info, utils
+from . import ffprobe_info, utils, smart_render
 
 
 # ----------------------------------------------------------------------
 # Вспомогательные функции
 # ----------------------------------------------------------------------
-def _run(args):
-    """Простой запуск внешней команды, возвращает (код_выхода, stdout, stderr) как строки."""
-    try:
-        cp = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                            check=False, encoding="utf-8", errors="ignore")
-        return cp.returncode, cp.stdout, cp.stderr
-    except Exception as e:
-        return 1, "", str(e)
-
 def _has_audio(ffprobe, path):
     """
-    Проверяем наличие аудиопотока через ffprobe.
+    Проверяем наличие аудиопотока (ffprobe_info — тот же разбор файла, что и для длительности).
     Возвращаем True/False.
     """
-    rc, out, _ = _run([
-        ffprobe, "-v", "error",
-        "-select_streams", "a",
-        "-show_entries", "stream=index",
-        "-of", "csv=p=0",
-        path
-    ])
-    return (rc == 0) and (out.strip() != "")
+    return ffprobe_info.has_audio(ffprobe, path)
 
 def _safe_basename_noext(path):
     """Имя файла без расширения, безопасное для формирования имени вывода."""
@@ -157,10 +146,27 @@ def _build_concat_filter(keep_segs, with_audio=True):
 
     return ";".join(parts), maps
 
+def _build_audio_concat_filter(keep_segs):
+    """Только звук: [0:a]atrim... -> concat (v=0,a=1) -> [a]. Для smart-render."""
+    parts = []
+    for i, (s, e) in enumerate(keep_segs):
+        s_str = f"{max(0.0, float(s)):.6f}".rstrip('0').rstrip('.')
+        e_str = f"{max(0.0, float(e)):.6f}".rstrip('0').rstrip('.')
+        parts.append(f"[0:a]atrim=start={s_str}:end={e_str},asetpts=PTS-STARTPTS[a{i}]")
+    mid = "".join(f"[a{i}]" for i in range(len(keep_segs)))
+    parts.append(f"{mid}concat=n={len(keep_segs)}:v=0:a=1[a]")
+    return ";".join(parts)
+
+def _smart(ffmpeg, ffprobe, src, keep, with_audio, out):
+    """Попытка smart-render; False — вызывающий делает полный рендер."""
+    afilter = _build_audio_concat_filter(keep) if with_audio else None
+    return smart_render.render(ffmpeg, ffprobe, src, [(s, e, None) for s, e in keep], out,
+                               audio_filter=afilter, crf=22)
+
 # ----------------------------------------------------------------------
 # Основные операции
 # ----------------------------------------------------------------------
-def keep_only_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0):
+def keep_only_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0, smart=True):
     """
     Сохраняет только указанные интервалы `segs` (в секундах) и склеивает их в один файл.
     Возвращает путь к готовому файлу.
@@ -183,6 +189,8 @@ def keep_only_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0):
     base = _safe_basename_noext(src)
     os.makedirs(outdir, exist_ok=True)
     out = os.path.join(outdir, f"{base}_keep_segments.mp4")
+    if smart and _smart(ffmpeg, ffprobe, src, keep, with_audio, out):
+        return out
 
     # Команда FFmpeg
     cmd = [
@@ -199,14 +207,14 @@ def keep_only_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0):
         cmd += ["-an"]
     cmd += [out]
 
-    rc, _stdout, stderr = _run(cmd)
+    rc, _stdout, stderr = utils.run_ffmpeg(cmd)
     if rc != 0:
         # Для простоты отдадим stderr пользователю через исключение
         raise RuntimeError(f"FFmpeg error (keep_only_segments): {stderr.strip() or rc}")
     return out
 
 
-def cut_out_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0):
+def cut_out_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0, smart=True):
     """
     Удаляет (вырезает) все интервалы `segs`, а оставшееся склеивает в один файл.
     Возвращает путь к готовому файлу.
@@ -229,6 +237,8 @@ def cut_out_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0):
     base = _safe_basename_noext(src)
     os.makedirs(outdir, exist_ok=True)
     out = os.path.join(outdir, f"{base}_cut_removed.mp4")
+    if smart and _smart(ffmpeg, ffprobe, src, keep, with_audio, out):
+        return out
 
     # Команда FFmpeg
     cmd = [
@@ -245,7 +255,7 @@ def cut_out_segments(ffmpeg, ffprobe, src, segs, outdir, duration_hint=0.0):
         cmd += ["-an"]
     cmd += [out]
 
-    rc, _stdout, stderr = _run(cmd)
+    rc, _stdout, stderr = utils.run_ffmpeg(cmd)
     if rc != 0:
         raise RuntimeError(f"FFmpeg error (cut_out_segments): {stderr.strip() or rc}")
     return out
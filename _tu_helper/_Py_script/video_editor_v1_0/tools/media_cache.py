@@ -0,0 +1,227 @@
+# video_editor/tools/media_cache.py
+# -*- coding: utf-8 -*-
+"""
+media_cache.py — постоянный кэш производных данных по медиафайлу (ленты миниатюр, кадры предпросмотра,
+результаты анализа).
+
+Ключ — адрес по содержимому: sha1 от (абсолютный путь, размер, mtime) исходника + вид записи + параметры
+(шаг, ширина, высота, ...). Изменили файл — поменялись размер/mtime, а значит и ключ; старые записи
+со временем вытесняются LRU.
+
+Хранение: файлы <ключ>.<расширение> в каталоге кэша ([cache] dir в app.conf,
+по умолчанию <temp>/video_editor_cache). LRU: при чтении обновляем mtime записи, при превышении
+лимита ([cache] max_mb) удаляем самые давние.
+
+Функции:
+- file_key(src, kind, **params) -> str | None
+- lookup(key, ext) -> путь к записи или None
+- reserve(key, ext) / commit(tmp, key, ext) / discard(tmp) — запись файла «снаружи» (например, ffmpeg)
+- writer(key, ext) -> CacheWriter — потоковая запись с атомарной публикацией
+- store_bytes(key, ext, data), load_json(key), store_json(key, obj)
+- enforce_limit()
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+from . import config_store as cfg
+
+_lock = threading.Lock()
+_total_bytes = None   # текущий объём кэша (лениво считается при первой записи)
+
+
+def cache_dir():
+    """Каталог кэша (создаётся при необходимости)."""
+    path = (cfg.get("cache", "dir", "") or "").strip()
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "video_editor_cache")
+    try:
+        os.makedirs(path, exist_ok=True)
+    except Exception:
+        pass
+    return path
+
+
+def _limit_bytes():
+    return max(16, cfg.get_int("cache", "max_mb", 512)) * 1024 * 1024
+
+
+def file_key(src, kind, **params):
+    """
+    Ключ записи: sha1(путь, размер, mtime, вид, параметры).
+    Возвращает None, если исходник недоступен.
+    """
+    try:
+        st = os.stat(src)
+    except OSError:
+        return None
+    parts = [os.path.normcase(os.path.abspath(src)), str(st.st_size), str(st.st_mtime_ns), str(kind)]
+    for k in sorted(params):
+        parts.append(f"{k}={params[k]}")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _entry_path(key, ext):
+    return os.path.join(cache_dir(), f"{key}.{ext.lstrip('.')}")
+
+
+def lookup(key, ext):
+    """Путь к записи, если она есть (и отметка «недавно использована» для LRU), иначе None."""
+    if not key:
+        return None
+    path = _entry_path(key, ext)
+    if not os.path.isfile(path):
+        return None
+    try:
+        os.utime(path, None)
+    except Exception:
+        pass
+    return path
+
+
+def reserve(key, ext):
+    """Временный путь под новую запись (с тем же расширением — чтобы ffmpeg понял формат)."""
+    ext = ext.lstrip(".")
+    return os.path.join(cache_dir(), f"{key}.{os.getpid()}-{threading.get_ident()}.tmp.{ext}")
+
+
+def commit(tmp_path, key, ext):
+    """Публикует временный файл как запись кэша. Возвращает итоговый путь или None."""
+    path = _entry_path(key, ext)
+    try:
+        size = os.path.getsize(tmp_path)
+        with _lock:
+            # перезапись ключа: в объёме кэша старая запись заменяется новой, а не добавляется к ней
+            try:
+                old = os.path.getsize(path)
+            except OSError:
+                old = 0
+            os.replace(tmp_path, path)
+    except Exception:
+        discard(tmp_path)
+        return None
+    _account(size - old)
+    return path
+
+
+def discard(tmp_path):
+    try:
+        if tmp_path and os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+    except Exception:
+        pass
+
+
+class CacheWriter:
+    """Потоковая запись: write() в временный файл, commit() — атомарная публикация, abort() — отмена."""
+
+    def __init__(self, key, ext):
+        self.key = key
+        self.ext = ext
+        self.tmp = reserve(key, ext)
+        self._f = open(self.tmp, "wb")
+
+    def write(self, data):
+        self._f.write(data)
+
+    def commit(self):
+        self._f.close()
+        return commit(self.tmp, self.key, self.ext)
+
+    def abort(self):
+        try: self._f.close()
+        except Exception: pass
+        discard(self.tmp)
+
+
+def writer(key, ext):
+    """CacheWriter для ключа или None (если ключа нет или каталог недоступен)."""
+    if not key:
+        return None
+    try:
+        return CacheWriter(key, ext)
+    except Exception:
+        return None
+
+
+def store_bytes(key, ext, data):
+    w = writer(key, ext)
+    if w is None:
+        return None
+    try:
+        w.write(data)
+    except Exception:
+        w.abort()
+        return None
+    return w.commit()
+
+
+def load_json(key):
+    path = lookup(key, "json")
+    if not path:
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def store_json(key, obj):
+    try:
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    except Exception:
+        return None
+    return store_bytes(key, "json", data)
+
+
+# ---------------- LRU ----------------
+
+def _scan():
+    """Список записей [(mtime, size, path)] (временные файлы не учитываем)."""
+    res = []
+    try:
+        with os.scandir(cache_dir()) as it:
+            for e in it:
+                if not e.is_file() or ".tmp." in e.name:
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                res.append((st.st_mtime, st.st_size, e.path))
+    except Exception:
+        pass
+    return res
+
+
+def _account(size):
+    global _total_bytes
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = sum(sz for _m, sz, _p in _scan())
+        else:
+            _total_bytes += int(size)
+        over = _total_bytes > _limit_bytes()
+    if over:
+        enforce_limit()
+
+
+def enforce_limit():
+    """Удаляет самые давно использованные записи, пока объём не станет ≤ 90% лимита."""
+    global _total_bytes
+    with _lock:
+        entries = sorted(_scan())
+        total = sum(sz for _m, sz, _p in entries)
+        target = int(_limit_bytes() * 0.9)
+        for _m, sz, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= sz
+            except Exception:
+                pass
+        _total_bytes = total
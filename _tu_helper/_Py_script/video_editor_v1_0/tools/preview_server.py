@@ -0,0 +1,155 @@
+# video_editor/tools/preview_server.py
+# -*- coding: utf-8 -*-
+"""
+preview_server.py — быстрый предпросмотр кадров при перемотке (scrubbing).
+
+Как работает:
+- Один долгоживущий процесс ffmpeg на открытый файл (и размер поля предпросмотра).
+  Запускается с -ss ДО -i: переход к ближайшему ключевому кадру + точное декодирование вперёд
+  до нужного момента. Время ответа не зависит от позиции в файле.
+- Кадры идут через pipe сырыми RGB (rawvideo rgb24) с частотой `fps`; к ним дописываем заголовок PPM,
+  и байты сразу отдаются в tk.PhotoImage(data=...) — без PNG на диске.
+- Если новый запрос чуть впереди текущей позиции декодера (до `forward_window` сек) — не перезапускаем
+  процесс, а дочитываем кадры вперёд (так работают проигрывание и протяжка ползунка вправо).
+- Запросы «схлопываются»: хранится только последний; если пока декодируем старый пришёл новый —
+  старый отменяется. Пока пользователь тянет ползунок, лишней работы нет.
+
+Использование:
+    srv = PreviewServer(on_frame=lambda req, ppm: ...)   # вызывается из рабочего потока
+    srv.request(ffmpeg, src, sec, width, height, tag=None)
+    srv.close()                                           # при закрытии окна: поток и ffmpeg завершаются
+"""
+import threading
+import subprocess
+from collections import namedtuple
+
+PreviewRequest = namedtuple("PreviewRequest", "ffmpeg src sec width height tag")
+
+
+class PreviewServer:
+    def __init__(self, on_frame, fps=10, forward_window=2.0):
+        self._on_frame = on_frame
+        self.fps = max(1, int(fps))
+        self.forward_window = max(0.0, float(forward_window))
+
+        self._cond = threading.Condition()
+        self._pending = None      # последний необработанный запрос
+        self._closed = False
+
+        # состояние декодера (трогает только рабочий поток)
+        self._proc = None
+        self._sess = None         # (ffmpeg, src, width, height)
+        self._pos = 0.0           # время кадра, который будет прочитан следующим
+        self._last = None         # (время, ppm) последнего отданного кадра
+
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    # ---- публичное API
+    def request(self, ffmpeg, src, sec, width, height, tag=None):
+        """Поставить запрос кадра; предыдущий необработанный запрос заменяется этим."""
+        req = PreviewRequest(ffmpeg, src, max(0.0, float(sec)), int(width), int(height), tag)
+        with self._cond:
+            self._pending = req
+            self._cond.notify()
+
+    def close(self, timeout=1.0):
+        """Остановить рабочий поток (он сам гасит ffmpeg); ждём не дольше timeout — декодирование
+        между кадрами проверяет _closed. Повторный вызов безопасен."""
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    # ---- рабочий поток
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    break
+                req = self._pending
+                self._pending = None
+            try:
+                ppm = self._decode(req)
+            except Exception:
+                self._kill()
+                ppm = None
+            if ppm is not None and not self._closed:
+                try: self._on_frame(req, ppm)
+                except Exception: pass
+        self._kill()
+
+    def _stale(self):
+        return self._pending is not None or self._closed
+
+    def _decode(self, req):
+        t = req.sec
+        step = 1.0 / self.fps
+        sess = (req.ffmpeg, req.src, req.width, req.height)
+
+        if self._last is not None and sess == self._sess and abs(t - self._last[0]) < step / 2:
+            return self._last[1]
+
+        if (self._proc is None or sess != self._sess
+                or not (self._pos - step / 2 <= t <= self._pos + self.forward_window)):
+            self._spawn(sess, t)
+            skip = 0
+        else:
+            skip = max(0, int(round((t - self._pos) * self.fps)))
+
+        frame = None
+        for i in range(skip + 1):
+            if i > 0 and self._stale():
+                return None
+            frame = self._read_frame(req.width, req.height)
+            if frame is None:
+                self._kill()
+                return None
+            self._pos += step
+        ppm = f"P6\n{req.width} {req.height}\n255\n".encode("ascii") + frame
+        self._last = (self._pos - step, ppm)
+        return ppm
+
+    def _spawn(self, sess, t):
+        self._kill()
+        ffmpeg, src, w, h = sess
+        vf = (f"fps={self.fps},"
+              f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+              f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:black")
+        cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin",
+               "-ss", f"{t:.3f}", "-i", src,
+               "-map", "0:v:0", "-an", "-sn",
+               "-vf", vf, "-pix_fmt", "rgb24", "-f", "rawvideo", "pipe:1"]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        self._sess = sess
+        self._pos = t
+        self._last = None
+
+    def _read_frame(self, w, h):
+        n = w * h * 3
+        buf = bytearray()
+        stream = self._proc.stdout
+        while len(buf) < n:
+            chunk = stream.read(n - len(buf))
+            if not chunk:
+                return None
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _kill(self):
+        proc, self._proc = self._proc, None
+        self._sess = None
+        self._last = None
+        if proc is None:
+            return
+        try: proc.stdout.close()
+        except Exception: pass
+        if proc.poll() is None:
+            try: proc.kill()
+            except Exception: pass
+        try: proc.wait(timeout=2)
+        except Exception: pass
@@ -1,6 +1,430 @@
+# video_editor/tools/queue_runner.py
 # -*- coding: utf-8 -*-
 """
-queue_runner.py — заготовка под очередь задач (на будущее).
-Сейчас операции запускаются напрямую из UI в потоках.
+queue_runner.py — очередь задач ffmpeg с пулом исполнителей.
+
+- Задача = операция из реестра OPS (например "convert_ops.convert_video") + её аргументы (JSON).
+- Очередь хранится на диске ([queue] file, по умолчанию queue_jobs.json рядом с app.conf).
+  Если приложение упало посреди работы, прерванные задачи при следующем запуске снова встают
+  в очередь, а их недописанные выходные файлы удаляются.
+- Параллельно работают [queue] workers исполнителей (у каждого — свой процесс ffmpeg); число можно
+  менять на ходу (set_workers).
+- Операции не переписаны: внутри задачи utils.run_ffmpeg идёт через _JobContext.run, который добавляет
+  `-progress pipe:1 -nostats`, читает out_time и делит на длительность исходника, а при отмене убивает ffmpeg.
+  utils.stream_ffmpeg (потоковое чтение лога/данных) — через _JobContext.stream, прогресс там в stderr.
+- Отмена, повтор, удаление; клонирование задачи на пачку файлов (clone_for_files).
+- Слушатели (add_listener) получают снимки задач из рабочих потоков — UI перекладывает их в свою
+  очередь сообщений, mainloop не блокируется.
+
+Статусы: queued -> running -> done | error | cancelled.
 """
-# Пока без реального кода, будет расширено при необходимости.
+import os
+import json
+import time
+import threading
+import importlib
+import subprocess
+
+from . import utils, ffprobe_info
+from . import config_store as cfg
+
+# Операции, которые можно ставить в очередь: "модуль.функция" -> имя аргумента с исходным файлом.
+# (запись с микрофона сюда не входит: ей нужен живой пользователь, а не фон)
+OPS = {
+    "audio_ops.remove_audio_all": "video_path",
+    "audio_ops.mute_audio_fragment": "video_path",
+    "audio_ops.replace_audio_full": "video_path",
+    "audio_ops.mix_audio_overlay": "video_path",
+    "audio_ops.normalize_audio": "video_path",
+    "speed_ops.apply_speed": "video_path",
+    "denoise.apply_denoise": "video_path",
+    "convert_ops.convert_video": "video_path",
+    "convert_ops.remux_video": "video_path",
+    "logo_overlay.apply_logo": "video_path",
+    "fragment_ops.keep_only_segments": "src",
+    "fragment_ops.cut_out_segments": "src",
+    "automontage.analyze": "video_path",
+    "automontage.apply": "video_path",
+}
+
+FINISHED = ("done", "error", "cancelled")
+
+
+def _resolve(op):
+    if op not in OPS:
+        raise ValueError(f"Неизвестная операция: {op}")
+    mod, func = op.rsplit(".", 1)
+    return getattr(importlib.import_module(f".{mod}", __package__), func)
+
+
+def default_jobs_path():
+    path = (cfg.get("queue", "file", "") or "").strip()
+    if path:
+        return path
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    return os.path.join(root, "queue_jobs.json")
+
+
+def default_workers():
+    return max(1, min(32, cfg.get_int("queue", "workers", 2)))
+
+
+def _is_file_output(arg):
+    a = str(arg)
+    return bool(a) and a != "-" and not a.startswith("pipe:") and a != os.devnull
+
+
+class _JobContext:
+    """Исполнение одной задачи: перехват run_ffmpeg (прогресс, отмена, учёт выходных файлов)."""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job = job
+        self.cancelled = False
+        self.proc = None
+        self.last_rc = 0
+        self.last_err = ""
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            proc = self.proc
+        if proc is not None and proc.poll() is None:
+            try: proc.kill()
+            except Exception: pass
+
+    def run(self, cmd):
+        if self.cancelled:
+            return 1, "", "cancelled"
+        cmd = [str(c) for c in cmd]
+        is_ffmpeg = os.path.basename(cmd[0]).lower().startswith("ffmpeg")
+        if not is_ffmpeg or "pipe:1" in cmd:
+            return utils.run_command(cmd)
+        if _is_file_output(cmd[-1]) and not os.path.exists(cmd[-1]):
+            # только файлы, созданные этой задачей: существующий (перезапись) при ошибке не удаляем
+            self.queue._add_partial(self.job, cmd[-1])
+
+        full = [cmd[0], "-progress", "pipe:1", "-nostats"] + cmd[1:]
+        try:
+            proc = subprocess.Popen(full, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except Exception as e:
+            self.last_rc, self.last_err = 1, str(e)
+            return 1, "", str(e)
+        with self._lock:
+            self.proc = proc
+            killed = self.cancelled
+        if killed:
+            try: proc.kill()
+            except Exception: pass
+
+        err_parts = []
+        t_err = threading.Thread(target=lambda: err_parts.append(proc.stderr.read() or b""), daemon=True)
+        t_err.start()
+        for raw in proc.stdout:
+            key, _, val = raw.decode("ascii", "ignore").strip().partition("=")
+            if key in ("out_time_us", "out_time_ms"):   # оба — в микросекундах
+                try: self.queue._progress(self.job, int(val) / 1e6)
+                except ValueError: pass
+        rc = proc.wait()
+        t_err.join()
+        with self._lock:
+            self.proc = None
+        err = b"".join(err_parts).decode("utf-8", "ignore")
+        self.last_rc = rc
+        self.last_err = err.strip()[-2000:] if rc != 0 else ""
+        return rc, "", err
+
+    def stream(self, cmd, on_line=None, on_chunk=None):
+        """utils.stream_ffmpeg внутри задачи: stdout занят данными, поэтому прогресс идёт в stderr (pipe:2)."""
+        if self.cancelled:
+            return 1, "cancelled"
+        cmd = [str(c) for c in cmd]
+        tail = []
+
+        def line(text):
+            key, sep, val = text.partition("=")
+            if sep and key in ("out_time_us", "out_time_ms"):
+                try: self.queue._progress(self.job, int(val) / 1e6)
+                except ValueError: pass
+            elif not sep or " " in key:      # прочие строки -progress (frame=..., speed=...) не нужны
+                tail.append(text); del tail[:-50]
+                if on_line is not None:
+                    on_line(text)
+
+        full = [cmd[0], "-progress", "pipe:2", "-nostats"] + cmd[1:]
+        rc, _ = utils.stream_command(full, line, on_chunk, on_start=self._attach)
+        with self._lock:
+            self.proc = None
+        err = "\n".join(tail)
+        self.last_rc = rc
+        self.last_err = err.strip()[-2000:] if rc != 0 else ""
+        return rc, err
+
+    def _attach(self, proc):
+        with self._lock:
+            self.proc = proc
+            killed = self.cancelled
+        if killed:
+            try: proc.kill()
+            except Exception: pass
+
+
+class JobQueue:
+    def __init__(self, path=None, workers=None, ffprobe="ffprobe"):
+        self.path = path or default_jobs_path()
+        self.workers = int(workers or default_workers())
+        self.ffprobe = ffprobe
+        self._cond = threading.Condition()
+        self._jobs = []              # по порядку постановки
+        self._running = {}           # id -> _JobContext
+        self._reserved = {}          # выходной путь -> id задачи (safe_out_path внутри задач)
+        self._threads = {}           # номер исполнителя -> поток
+        self._listeners = []
+        self._last_emit = {}
+        self._closed = False
+        self._load()
+
+    # ---------------- хранение ----------------
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            jobs = [j for j in (data.get("jobs") or []) if isinstance(j, dict) and j.get("op") in OPS]
+        except Exception:
+            jobs = []
+        for job in jobs:
+            if job.get("status") == "running":
+                # приложение закрылось/упало посреди задачи — чистим хвосты и ставим заново
+                self._remove_partials(job)
+                job["status"] = "queued"; job["progress"] = 0.0; job["resumed"] = True
+        self._jobs = jobs
+        if jobs:
+            self._save_locked()
+
+    def _save_locked(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"jobs": self._jobs}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    # ---------------- публичное API ----------------
+    def add_listener(self, fn):
+        """fn(снимок_задачи) вызывается из рабочих потоков при каждом изменении задачи."""
+        self._listeners.append(fn)
+
+    def start(self):
+        self.set_workers(self.workers)
+
+    def set_workers(self, n):
+        with self._cond:
+            self.workers = max(1, int(n))
+            for idx in range(self.workers):
+                if idx not in self._threads and not self._closed:
+                    t = threading.Thread(target=self._worker, args=(idx,), daemon=True)
+                    self._threads[idx] = t
+                    t.start()
+            self._cond.notify_all()
+
+    def submit(self, op, args, title="", duration=0.0, reply="info"):
+        """
+        Поставить задачу. reply — как сообщить о результате в UI ("info", "am_segments", "" — молча).
+        Возвращает id задачи.
+        """
+        _resolve(op)
+        with self._cond:
+            job = {
+                "id": 1 + max([j["id"] for j in self._jobs] or [0]),
+                "op": op, "args": dict(args), "title": title or op,
+                "duration": float(duration or 0.0), "reply": reply,
+                "status": "queued", "progress": 0.0, "result": None, "error": "",
+                "attempts": 0, "partial": [], "created": time.time(), "started": 0.0, "finished": 0.0,
+            }
+            self._jobs.append(job)
+            self._save_locked()
+            self._cond.notify_all()
+        self._emit(job)
+        return job["id"]
+
+    def clone_for_files(self, job_id, paths):
+        """Та же операция с теми же параметрами для других исходных файлов."""
+        job = self._find(job_id)
+        if job is None:
+            return []
+        key = OPS[job["op"]]
+        ffprobe_info.probe_many(self.ffprobe, paths)   # длительности пачки — параллельно, дальше из кэша
+        ids = []
+        for p in paths:
+            args = dict(job["args"]); args[key] = p
+            name = os.path.basename(p)
+            title = f"{job['title'].split(':')[0]}: {name}"
+            ids.append(self.submit(job["op"], args, title=title, reply="",
+                                   duration=ffprobe_info.get_duration(self.ffprobe, p)))
+        return ids
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._find(job_id)
+            if job is None:
+                return
+            ctx = self._running.get(job_id)
+            if ctx is None:
+                if job["status"] == "queued":
+                    job["status"] = "cancelled"; job["finished"] = time.time()
+                    self._save_locked()
+                else:
+                    return
+        if ctx is not None:
+            ctx.cancel()
+        else:
+            self._emit(job)
+
+    def retry(self, job_id):
+        with self._cond:
+            job = self._find(job_id)
+            if job is None or job["status"] not in FINISHED:
+                return
+            job.update(status="queued", progress=0.0, error="", result=None, finished=0.0)
+            self._save_locked()
+            self._cond.notify_all()
+        self._emit(job)
+
+    def remove(self, job_id):
+        with self._cond:
+            job = self._find(job_id)
+            if job is None or job["status"] == "running":
+                return False
+            self._jobs.remove(job)
+            self._save_locked()
+        return True
+
+    def clear_finished(self):
+        with self._cond:
+            self._jobs = [j for j in self._jobs if j["status"] not in FINISHED]
+            self._save_locked()
+
+    def jobs(self):
+        with self._cond:
+            return [dict(j) for j in self._jobs]
+
+    def counts(self):
+        with self._cond:
+            res = {}
+            for j in self._jobs:
+                res[j["status"]] = res.get(j["status"], 0) + 1
+            return res
+
+    def shutdown(self):
+        """Остановить исполнителей и убить текущие ffmpeg. Прерванные задачи доделаются при следующем запуске."""
+        with self._cond:
+            self._closed = True
+            ctxs = list(self._running.values())
+            self._cond.notify_all()
+        for ctx in ctxs:
+            ctx.cancel()
+
+    # ---------------- исполнители ----------------
+    def _find(self, job_id):
+        for j in self._jobs:
+            if j["id"] == job_id:
+                return j
+        return None
+
+    def _worker(self, idx):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed or idx >= self.workers:
+                        self._threads.pop(idx, None)
+                        return
+                    job = next((j for j in self._jobs if j["status"] == "queued"), None)
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                job.update(status="running", progress=0.0, error="", started=time.time())
+                job["attempts"] = int(job.get("attempts", 0)) + 1
+                ctx = _JobContext(self, job)
+                self._running[job["id"]] = ctx
+                self._save_locked()
+            self._emit(job, force=True)
+            self._run_job(job, ctx)
+
+    def _run_job(self, job, ctx):
+        result = None; err = ""
+        try:
+            fn = _resolve(job["op"])
+            if not job.get("duration"):
+                src = job["args"].get(OPS[job["op"]])
+                try: job["duration"] = float(ffprobe_info.get_duration(self.ffprobe, src) or 0.0)
+                except Exception: job["duration"] = 0.0
+            utils.set_thread_runner(ctx.run, ctx.stream, lambda p: self._reserve_out(job, p))
+            try:
+                result = fn(**job["args"])
+            finally:
+                utils.set_thread_runner(None)
+        except Exception as e:
+            err = str(e) or e.__class__.__name__
+
+        with self._cond:
+            self._running.pop(job["id"], None)
+            self._reserved = {p: jid for p, jid in self._reserved.items() if jid != job["id"]}
+            if self._closed:
+                return      # статус на диске остаётся "running" -> задача продолжится при следующем запуске
+            job["finished"] = time.time()
+            if ctx.cancelled:
+                job["status"] = "cancelled"
+                self._remove_partials(job)
+            elif err or ctx.last_rc != 0:
+                job["status"] = "error"
+                job["error"] = err or ctx.last_err or f"ffmpeg rc={ctx.last_rc}"
+                self._remove_partials(job)
+            else:
+                job["status"] = "done"; job["progress"] = 1.0
+                job["result"] = result; job["partial"] = []
+            self._save_locked()
+            self._cond.notify_all()
+        self._emit(job, force=True)
+
+    def _reserve_out(self, job, path):
+        """Занять имя выходного файла за задачей; False — его уже взяла другая работающая задача."""
+        key = os.path.normcase(os.path.abspath(path))
+        with self._cond:
+            owner = self._reserved.setdefault(key, job["id"])
+        return owner == job["id"]
+
+    def _add_partial(self, job, path):
+        with self._cond:
+            job.setdefault("partial", [])
+            if path not in job["partial"]:
+                job["partial"].append(path)
+                self._save_locked()
+
+    @staticmethod
+    def _remove_partials(job):
+        for p in job.get("partial") or []:
+            try:
+                if os.path.isfile(p):
+                    os.remove(p)
+            except Exception:
+                pass
+        job["partial"] = []
+
+    def _progress(self, job, out_sec):
+        dur = float(job.get("duration") or 0.0)
+        if dur <= 0:
+            return
+        job["progress"] = max(0.0, min(1.0, out_sec / dur))
+        self._emit(job)
+
+    def _emit(self, job, force=False):
+        now = time.monotonic()
+        if not force and job.get("status") == "running" and now - self._last_emit.get(job["id"], 0.0) < 0.25:
+            return
+        self._last_emit[job["id"]] = now
+        snap = dict(job)
+        for fn in list(self._listeners):
+            try: fn(snap)
+            except Exception: pass
@@ -0,0 +1,275 @@
+# video_editor/tools/smart_render.py
+# -*- coding: utf-8 -*-
+"""
+smart_render.py — «умный» рендер правок по фрагментам: перекодируем только GOP на границах правок.
+
+Идея:
+- Выход описывается списком участков исходника в порядке вывода: (start, end, vf),
+  где vf=None — участок без изменений, иначе — видеофильтр (например, setpts для скорости).
+- Участок без изменений режется по IDR-кадрам: середина [k1, k2) копируется как есть (-c copy),
+  а «хвосты» [start, k1) и [k2, end) — до ближайшего IDR — перекодируются тем же кодеком.
+  Ключевые кадры open-GOP (H.264 recovery point, HEVC CRA) границей копирования не бывают: B-кадры после них
+  ссылаются на кадры предыдущей группы, и скопированный с такого кадра кусок декодируется с артефактами.
+  Участки с фильтром перекодируются целиком (это и есть правка).
+- Куски пишутся во временные MPEG-TS (SPS/PPS внутри потока — куски с разными параметрами
+  кодера склеиваются корректно) и собираются concat demuxer'ом без перекодирования.
+- Звук собирается отдельно одним проходом по графу фильтров вызывающей стороны (atrim/concat/atempo...)
+  и перекодируется целиком: это дёшево и без щелчков на стыках AAC-кадров.
+- Кодер получает профиль, уровень и число опорных кадров исходника. Если кодек/параметры не поддерживаются
+  (не H.264/HEVC, 10 бит, неизвестны уровень или refs) или перекодированный кусок не совпал с исходником
+  по параметрам SPS (профиль, уровень, refs, размер, pix_fmt, развёртка) — возвращаем False,
+  вызывающий делает полное перекодирование.
+- Временные куски разбираются ffprobe мимо кэша метаданных (ffprobe_info.probe(cache=False)).
+
+Функции:
+- probe_video(ffprobe, src, cache=True) -> dict с параметрами видеопотока или None
+- probe_keyframes(ffmpeg, src, codec)  -> отсортированный список времён IDR-кадров (кэшируется)
+- plan_pieces(ranges, keyframes, fps) -> [("copy"|"encode", a, b, vf)]
+- render(ffmpeg, ffprobe, src, ranges, out, audio_filter=None, crf=18) -> True | False
+- ffprobe_near(ffmpeg)             -> путь к ffprobe рядом с ffmpeg
+"""
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+from bisect import bisect_left, bisect_right
+
+from . import utils, media_cache, ffprobe_info
+
+# кодек источника -> (кодер, допустимые профили источника -> профиль кодера)
+_ENCODERS = {
+    "h264": ("libx264", {"baseline": "baseline", "constrained baseline": "baseline",
+                         "main": "main", "high": "high"}),
+    "hevc": ("libx265", {"main": "main"}),
+}
+_PIX_FMTS = ("yuv420p", "yuvj420p")
+
+# NAL-типы кадров, с которых поток декодируется без предыдущих: IDR (H.264), IDR_W_RADL/IDR_N_LP (HEVC)
+_IDR_NAL_TYPES = {"h264": "5", "hevc": "19-20"}
+
+# поля SPS, которые должны совпасть у копируемых и перекодированных кусков
+_SPS_FIELDS = ("codec", "profile", "level", "refs", "pix_fmt", "width", "height", "field_order")
+
+_TB_RE = re.compile(r"^#tb 0:\s*(\d+)/(\d+)")
+
+
+def _rate(text):
+    try:
+        num, _, den = str(text).partition("/")
+        return float(num) / float(den or 1)
+    except Exception:
+        return 0.0
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def probe_video(ffprobe, src, cache=True):
+    """
+    Параметры первого видеопотока: codec, profile, level, refs, pix_fmt, width, height, field_order, fps
+    (или None). Неизвестные level/refs — 0. cache=False — мимо кэша метаданных (временные файлы).
+    """
+    streams = ffprobe_info.streams(ffprobe, src, "video", cache=cache)
+    if not streams:
+        return None
+    st = streams[0]
+    return {
+        "codec": (st.get("codec_name") or "").lower(),
+        "profile": (st.get("profile") or "").lower(),
+        "level": max(0, _int(st.get("level"))),
+        "refs": max(0, _int(st.get("refs"))),
+        "pix_fmt": (st.get("pix_fmt") or "").lower(),
+        "width": _int(st.get("width")),
+        "height": _int(st.get("height")),
+        "field_order": (st.get("field_order") or "progressive").lower(),
+        "fps": _rate(st.get("avg_frame_rate")) or _rate(st.get("r_frame_rate")),
+    }
+
+
+def probe_keyframes(ffmpeg, src, codec):
+    """
+    Времена IDR-кадров видеопотока — только с них можно начинать копируемый кусок.
+    Пакеты без IDR-слайсов отбрасывает bitstream-фильтр filter_units (без декодирования),
+    оставшиеся перечисляет framecrc (pts в единицах #tb). Результат кэшируется.
+    """
+    types = _IDR_NAL_TYPES.get(codec)
+    if types is None:
+        return []
+    key = media_cache.file_key(src, "idr_frames")
+    cached = media_cache.load_json(key)
+    if isinstance(cached, list):
+        return [float(t) for t in cached]
+    cmd = [ffmpeg, "-hide_banner", "-v", "error", "-copyts", "-i", src, "-map", "0:v:0", "-c", "copy",
+           "-bsf:v", f"filter_units=pass_types={types}", "-f", "framecrc", "-"]
+    try:
+        cp = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    except Exception:
+        return []
+    tb = None
+    kfs = []
+    for line in cp.stdout.decode("ascii", "ignore").splitlines():
+        m = _TB_RE.match(line)
+        if m:
+            tb = float(m.group(1)) / float(m.group(2))
+            continue
+        parts = line.split(",")
+        if tb is None or line.startswith("#") or len(parts) < 3:
+            continue
+        try:
+            kfs.append(int(parts[2]) * tb)
+        except ValueError:
+            pass
+    kfs.sort()
+    if cp.returncode == 0 and kfs:
+        media_cache.store_json(key, kfs)
+    return kfs
+
+
+def plan_pieces(ranges, keyframes, fps, min_copy=1.0):
+    """
+    ranges — [(a, b, vf)] в порядке вывода. Возвращает куски [("copy"|"encode", a, b, vf)].
+    Копируем [k1, k2) — от первого ключевого кадра внутри участка до последнего; остальное кодируем.
+    """
+    eps = 0.5 / fps if fps > 0 else 0.02
+    pieces = []
+    for a, b, vf in ranges:
+        if b - a <= eps:
+            continue
+        if vf is not None:
+            pieces.append(("encode", a, b, vf))
+            continue
+        i = bisect_left(keyframes, a - eps)
+        j = bisect_right(keyframes, b + eps) - 1
+        k1 = keyframes[i] if i < len(keyframes) else None
+        k2 = keyframes[j] if j >= 0 else None
+        if k1 is None or k2 is None or k2 - k1 < min_copy:
+            pieces.append(("encode", a, b, None))
+            continue
+        if k1 - a > eps:
+            pieces.append(("encode", a, k1, None))
+        pieces.append(("copy", k1, k2, None))
+        if b - k2 > eps:
+            pieces.append(("encode", k2, b, None))
+    return pieces
+
+
+def _encoder_args(info, crf):
+    enc = _ENCODERS.get(info["codec"])
+    if enc is None or info["pix_fmt"] not in _PIX_FMTS:
+        return None
+    name, profiles = enc
+    profile = profiles.get(info["profile"])
+    if profile is None:
+        return None
+    if not info["level"] or not info["refs"]:
+        return None   # без уровня и числа опорных кадров нельзя повторить SPS исходника
+    args = ["-c:v", name, "-preset", "veryfast", "-crf", str(crf), "-pix_fmt", info["pix_fmt"], "-profile:v", profile]
+    if name == "libx264":
+        # ffprobe: level_idc (41 -> 4.1)
+        args += ["-level:v", f"{info['level'] / 10:g}", "-refs", str(info["refs"])]
+    else:
+        # HEVC: general_level_idc = 30 * уровень (123 -> 4.1)
+        args += ["-x265-params", f"log-level=error:level-idc={info['level'] / 30:g}:ref={info['refs']}"]
+    return args
+
+
+def _same_params(a, b):
+    """Совпадение параметров SPS; профиль — с точностью до имени у кодера («constrained baseline» = baseline)."""
+    profiles = _ENCODERS.get(a.get("codec"), ("", {}))[1]
+    if profiles.get(a.get("profile")) != profiles.get(b.get("profile")):
+        return False
+    return all(a.get(k) == b.get(k) for k in _SPS_FIELDS if k != "profile")
+
+
+def render(ffmpeg, ffprobe, src, ranges, out, audio_filter=None, crf=18):
+    """
+    Собрать out из участков ranges (см. модуль). audio_filter — filter_complex по [0:a] с выходом [a]
+    (None — без звука). Возвращает True при успехе; False — нужен полный рендер (out не создан).
+    """
+    info = probe_video(ffprobe, src)
+    if not info or info["fps"] <= 0:
+        return False
+    enc = _encoder_args(info, crf)
+    if enc is None:
+        return False
+    keyframes = probe_keyframes(ffmpeg, src, info["codec"])
+    pieces = plan_pieces(ranges, keyframes, info["fps"])
+    if not pieces or not any(p[0] == "copy" for p in pieces):
+        return False   # копировать нечего — выигрыша нет, пусть работает обычный путь
+
+    half = 0.5 / info["fps"]
+    tmpdir = tempfile.mkdtemp(prefix="smart_", dir=os.path.dirname(os.path.abspath(out)) or None)
+    try:
+        parts = []; checked = False
+        for n, (kind, a, b, vf) in enumerate(pieces):
+            part = os.path.join(tmpdir, f"part_{n:04d}.ts")
+            if kind == "copy":
+                # -ss чуть позже ключевого кадра: поиск на вводе встаёт ровно на k1; заканчиваем до k2
+                cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                       "-ss", f"{a + 0.001:.6f}", "-i", src, "-t", f"{b - a - half:.6f}",
+                       "-map", "0:v:0", "-c", "copy", "-avoid_negative_ts", "make_zero", "-f", "mpegts", part]
+            else:
+                # -t до -i — длительность ИСХОДНИКА: vf со сменой скорости (setpts) меняет длину выхода,
+                # а кусок должен покрыть ровно [a, b) — звук собирается отдельно по тем же границам
+                cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                       "-ss", f"{a:.6f}", "-t", f"{b - a - half:.6f}", "-i", src,
+                       "-map", "0:v:0", "-an", "-sn"]
+                if vf:
+                    cmd += ["-vf", vf]
+                cmd += enc + ["-f", "mpegts", part]
+            rc, _o, _e = utils.run_ffmpeg(cmd)
+            if rc != 0 or not os.path.isfile(part):
+                return False
+            if kind == "encode" and not checked:
+                # первый перекодированный кусок сверяем с исходником — иначе склейка copy будет битой
+                got = probe_video(ffprobe, part, cache=False)
+                if not got or not _same_params(info, got):
+                    return False
+                checked = True
+            parts.append(part)
+
+        audio = None
+        if audio_filter:
+            audio = os.path.join(tmpdir, "audio.m4a")
+            cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+                   "-filter_complex", audio_filter, "-map", "[a]", "-vn",
+                   "-c:a", "aac", "-b:a", "192k", "-ar", "48000", audio]
+            rc, _o, _e = utils.run_ffmpeg(cmd)
+            if rc != 0 or not os.path.isfile(audio):
+                return False
+
+        lst = os.path.join(tmpdir, "list.txt")
+        with open(lst, "w", encoding="utf-8") as f:
+            for p in parts:
+                f.write("file '{}'\n".format(p.replace("'", "'\\''")))
+        cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+               "-f", "concat", "-safe", "0", "-i", lst]
+        if audio:
+            cmd += ["-i", audio, "-map", "0:v:0", "-map", "1:a:0"]
+        else:
+            cmd += ["-map", "0:v:0"]
+        cmd += ["-c", "copy", "-movflags", "+faststart", out]
+        rc, _o, _e = utils.run_ffmpeg(cmd)
+        if rc != 0 or not os.path.isfile(out):
+            try: os.remove(out)
+            except Exception: pass
+            return False
+        return True
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def ffprobe_near(ffmpeg):
+    """ffprobe рядом с ffmpeg (тот же каталог), иначе из PATH."""
+    d = os.path.dirname(str(ffmpeg or ""))
+    if d:
+        name = os.path.basename(str(ffmpeg)).lower().replace("ffmpeg", "ffprobe")
+        cand = os.path.join(d, name)
+        if os.path.isfile(cand):
+            return cand
+    return shutil.which("ffprobe") or "ffprobe"
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 """
 speed_ops.py — изменение скорости видео и аудио, с вариантами "сохранять высоту" и "менять высоту".
+Для scope="fragment" сначала пробуем smart-render (tools/smart_render.py): видео вне окна копируется
+по GOP, перекодируется только окно и GOP у его границ; не вышло — полный рендер.
 """
 import os
-from . import utils
+from . import utils, ffprobe_info, smart_render
 
 def _atempo_chain(factor):
     """
@@ -29,7 +31,8 @@ def _atempo_chain(factor):
         chain.append(f"atempo={f:.4f}")
     return ",".join(chain)
 
-def apply_speed(ffmpeg, video_path, out_dir, factor=1.5, pitch_mode="preserve", scope="all", start=None, end=None):
+def apply_speed(ffmpeg, video_path, out_dir, factor=1.5, pitch_mode="preserve", scope="all", start=None, end=None,
+                ffprobe=None, smart=True):
     base = os.path.splitext(os.path.basename(video_path))[0]
     out = utils.safe_out_path(out_dir, f"{base}_speed_{factor:g}", "mp4")
 
@@ -41,6 +44,18 @@ def apply_speed(ffmpeg, video_path, out_dir, factor=1.5, pitch_mode="preserve",
     else:
         a_filter = f"asetrate=44100*{factor:.6f},aresample=44100"
 
+    if scope == "fragment" and start is not None and end is not None and smart:
+        ffprobe = ffprobe or smart_render.ffprobe_near(ffmpeg)
+        dur = ffprobe_info.get_duration(ffprobe, video_path) or 0.0
+        if 0 <= start < end <= dur:
+            af = (f"[0:a]atrim=0:{start},asetpts=PTS-STARTPTS[a0];"
+                  f"[0:a]atrim={start}:{end},{a_filter},asetpts=PTS-STARTPTS[a1];"
+                  f"[0:a]atrim={end},asetpts=PTS-STARTPTS[a2];"
+                  f"[a0][a1][a2]concat=n=3:v=0:a=1[a]")
+            ranges = [(0.0, start, None), (start, end, f"{v_filter},setpts=PTS-STARTPTS"), (end, dur, None)]
+            if smart_render.render(ffmpeg, ffprobe, video_path, ranges, out, audio_filter=af, crf=23):
+                return out
+
     if scope == "fragment" and start is not None and end is not None:
         # Разрежем на 3 части и изменим скорость только внутри окна
         vf = (f"[0:v]trim=0:{start},setpts=PTS-STARTPTS[v0];"
@@ -7,6 +7,11 @@ thumbs_timeline.py — генерация миниатюр ленты и сох
 - generate_thumbs_per_second(ffmpeg, src, outdir, duration): миниатюры каждую секунду (быстро)
 - generate_thumbs_step(ffmpeg, src, outdir, duration, step_sec): миниатюры каждые N секунд (быстро)
 - generate_thumbs_step_iter(ffmpeg, src, outdir, duration, step_sec): надёжный режим (медленнее)
+- iter_thumbs_stream(ffmpeg, src, step_sec, width, height): потоковый режим — ОДИН проход декодера,
+  кадры идут через pipe (image2pipe/ppm) и отдаются по мере готовности: (секунда, байты PPM)
+- iter_thumbs_cached(ffmpeg, src, duration, step_sec, width, height): то же, но через общий кэш
+  (media_cache): повторное открытие файла рисует ленту из кэша без запуска ffmpeg
+- probe_gop_seconds(ffprobe, src): оценка длины GOP (интервал между ключевыми кадрами)
 - save_frame(ffmpeg, src, sec, out_png): сохранить кадр на заданной секунде
 """
 import os
@@ -14,6 +19,8 @@ import glob
 import shutil
 import subprocess
 
+from . import media_cache
+
 def _run(cmd):
     """Запускает внешнюю команду и возвращает код возврата."""
     try:
@@ -119,6 +126,193 @@ def generate_thumbs_step_iter(ffmpeg, src, outdir, duration, step_sec=10):
 
     return total
 
+# -------- Потоковый режим (один проход, image2pipe) --------
+
+def probe_gop_seconds(ffprobe, src, probe_sec=60):
+    """
+    Оценивает длину GOP (секунды между ключевыми кадрами) по первым probe_sec секундам.
+    Читаются только пакеты (без декодирования), поэтому это быстро.
+    Возвращает медиану интервалов или 0.0, если оценить не удалось.
+    """
+    cmd = [
+        ffprobe, "-v", "error",
+        "-select_streams", "v:0",
+        "-read_intervals", f"%+{int(max(1, probe_sec))}",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        src
+    ]
+    try:
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             check=False).stdout.decode("utf-8", "ignore")
+    except Exception:
+        return 0.0
+    keys = []
+    for line in out.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) < 2 or "K" not in parts[1]:
+            continue
+        try:
+            keys.append(float(parts[0]))
+        except ValueError:
+            pass
+    keys.sort()
+    gaps = sorted(b - a for a, b in zip(keys, keys[1:]) if b > a)
+    if not gaps:
+        return 0.0
+    return gaps[len(gaps) // 2]
+
+def _read_exact(stream, n):
+    """Читает ровно n байт из потока (или меньше — если поток закончился)."""
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = stream.read(n - len(buf))
+        if not chunk:
+            break
+        buf.extend(chunk)
+    return bytes(buf)
+
+def _read_ppm_token(stream, head):
+    """Читает один токен заголовка PPM (пропуская пробелы и комментарии), дописывая байты в head."""
+    tok = b""
+    while True:
+        ch = stream.read(1)
+        if not ch:
+            return None
+        head.extend(ch)
+        if ch == b"#":
+            while ch and ch not in (b"\n", b"\r"):
+                ch = stream.read(1)
+                head.extend(ch)
+            continue
+        if ch.isspace():
+            if tok:
+                return tok
+            continue
+        tok += ch
+
+def read_ppm_frame(stream):
+    """
+    Читает один кадр PPM (P6) из потока image2pipe.
+    Возвращает (width, height, ppm_bytes) — ppm_bytes целиком (заголовок + пиксели),
+    их можно сразу отдать в tk.PhotoImage(data=...). None — если поток закончился.
+    """
+    head = bytearray()
+    tokens = []
+    while len(tokens) < 4:
+        tok = _read_ppm_token(stream, head)
+        if tok is None:
+            return None
+        tokens.append(tok)
+    if tokens[0] != b"P6":
+        return None
+    try:
+        w, h, maxval = int(tokens[1]), int(tokens[2]), int(tokens[3])
+    except ValueError:
+        return None
+    size = w * h * (6 if maxval > 255 else 3)
+    pixels = _read_exact(stream, size)
+    if len(pixels) < size:
+        return None
+    return w, h, bytes(head) + pixels
+
+def iter_thumbs_stream(ffmpeg, src, step_sec, width, height, keyframes_only=False, stop_evt=None):
+    """
+    Генератор миниатюр за ОДИН проход декодера: fps=1/step + image2pipe (ppm) в stdout.
+    Отдаёт пары (секунда, ppm_bytes) по мере того, как ffmpeg их выдаёт.
+
+    keyframes_only=True — декодировать только ключевые кадры (-skip_frame nokey).
+    Имеет смысл, когда шаг больше GOP: каждый шаг всё равно попадает на свой ключевой кадр,
+    а P/B-кадры между ними не декодируются вовсе.
+
+    stop_evt (threading.Event) — досрочная остановка; процесс ffmpeg будет завершён.
+    """
+    step = max(1, int(step_sec))
+    w = max(2, int(width)); h = max(2, int(height))
+    vf = (f"fps=1/{step},"
+          f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+          f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:black")
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if keyframes_only:
+        cmd += ["-skip_frame", "nokey"]
+    cmd += ["-i", src, "-map", "0:v:0", "-an", "-sn",
+            "-vf", vf,
+            "-f", "image2pipe", "-vcodec", "ppm", "pipe:1"]
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                bufsize=0)
+    except Exception:
+        return
+    try:
+        i = 0
+        while True:
+            if stop_evt is not None and stop_evt.is_set():
+                break
+            frame = read_ppm_frame(proc.stdout)
+            if frame is None:
+                break
+            yield float(i * step), frame[2]
+            i += 1
+    finally:
+        try: proc.stdout.close()
+        except Exception: pass
+        if proc.poll() is None:
+            try: proc.kill()
+            except Exception: pass
+        try: proc.wait(timeout=2)
+        except Exception: pass
+
+def iter_thumbs_cached(ffmpeg, src, duration, step_sec, width, height,
+                       ffprobe=None, keyframes_only=None, stop_evt=None):
+    """
+    Лента миниатюр через общий кэш (ключ: файл + шаг + ширина + высота).
+    - Есть в кэше — читаем готовую ленту (последовательность PPM), ffmpeg не запускается.
+    - Нет — генерируем iter_thumbs_stream и параллельно пишем в кэш; запись публикуется,
+      только если лента получена целиком (не прервана и кадров не меньше ожидаемого).
+    keyframes_only=None — решаем сами по GOP (нужен ffprobe), только при промахе кэша.
+    Отдаёт пары (секунда, ppm_bytes), как iter_thumbs_stream.
+    """
+    step = max(1, int(step_sec))
+    w = max(2, int(width)); h = max(2, int(height))
+    key = media_cache.file_key(src, "thumbs", step=step, w=w, h=h)
+
+    path = media_cache.lookup(key, "ppms")
+    if path:
+        try:
+            with open(path, "rb") as f:
+                i = 0
+                while not (stop_evt is not None and stop_evt.is_set()):
+                    frame = read_ppm_frame(f)
+                    if frame is None:
+                        break
+                    yield float(i * step), frame[2]
+                    i += 1
+            return
+        except OSError:
+            pass
+
+    if keyframes_only is None:
+        gop = probe_gop_seconds(ffprobe, src) if ffprobe else 0.0
+        keyframes_only = (gop > 0.0 and step > gop)
+
+    expected = max(1, int(float(duration or 0.0) // step))
+    wr = media_cache.writer(key, "ppms")
+    count = 0
+    try:
+        for sec, data in iter_thumbs_stream(ffmpeg, src, step, w, h,
+                                            keyframes_only=keyframes_only, stop_evt=stop_evt):
+            if wr is not None:
+                wr.write(data)
+            count += 1
+            yield sec, data
+    finally:
+        if wr is not None:
+            stopped = stop_evt is not None and stop_evt.is_set()
+            if not stopped and count >= expected:
+                wr.commit()
+            else:
+                wr.abort()
+
 # -------- Точное сохранение одиночного кадра --------
 
 def save_frame(ffmpeg, src, sec, out_png):
@@ -4,17 +4,19 @@
 Аудио → Аудиограмма по PCM без дрейфа + режимы отрисовки (столбики/линия/заливка).
 
 Главное:
-- PCM вытягиваем через ffmpeg+atrim (точно по времени), дрейфа нет.
+- PCM — один проход ffmpeg через pipe (tools/waveform.py), бины по абсолютным номерам сэмплов — дрейфа нет.
+- Лента дорисовывается по мере декодирования.
+- Заодно строится пирамида min/max/RMS (tools/wave_pyramid.py) и кладётся в кэш: зум, прокрутка и
+  перерисовка дальше идут без ffmpeg — рисуем только видимые пиксели из нужного уровня пирамиды.
 - Метрика peak/rms, сглаживание (скользящее среднее).
 - Режимы отрисовки: bars | line | area (выбирается в UI).
 """
 
-import os, json, math, time, threading, subprocess
-from array import array
+import os, time, threading, subprocess
 import tkinter as tk
 from tkinter import ttk, messagebox
 
-from . import utils
+from . import utils, waveform, wave_pyramid, ffprobe_info
 from . import config_store as cfg
 
 
@@ -36,9 +38,13 @@ class UITabAudio:
         # состояние ленты
         self._sec_per_px = 1.0
         self._total_width = 0
-        self._chunk_w_target = 800
         self._wave_items = []
         self._bins_acc = None  # сюда собираем все бины для «line/area»
+        self._wave_stop_evt = None  # остановка текущего прохода ffmpeg
+        self._pyr = None            # WavePyramid текущей дорожки (после построения)
+        self._view = None           # (metric, smooth_r, draw_mode) для перерисовки из пирамиды
+        self._view_drawn = None     # что уже нарисовано: (x0, x1, sec_per_px, view)
+        self._view_job = None
 
         # курсор/проигрывание
         self._cursor_x = 0
@@ -50,6 +56,7 @@ class UITabAudio:
 
         # лимиты ширины ленты (чтобы Canvas жил)
         self._MAX_WIDTH = 12000
+        self._MAX_WIDTH_PYR = 2000000   # с пирамидой рисуется только видимое — можно шире
 
         # UI refs/vars
         self.var_stream_global = tk.StringVar(value=str(self._saved_stream_global) if self._saved_stream_global>=0 else "")
@@ -59,7 +66,6 @@ class UITabAudio:
         self.var_smooth_disp = tk.StringVar(value=str(self._smooth))
         self.var_draw = tk.StringVar(value=self._draw_mode)
 
-        self._use_map_global = True  # фолбэк для -map
         self._build()
 
     # --- ff* helpers
@@ -85,7 +91,7 @@ class UITabAudio:
         ttk.Button(top, text="1×", width=3, command=lambda: self._zoom_set(1.0)).pack(side="left", padx=2)
         ttk.Button(top, text="+", width=3, command=lambda: self._zoom_change(2.0)).pack(side="left", padx=(0,6))
         ttk.Label(top, textvariable=self.var_zoom_value).pack(side="left")
-        ttk.Label(top, text="(зум применится после «Сгенерировать»)", foreground="#666").pack(side="left", padx=(8,8))
+        ttk.Label(top, text="(после построения — без пересчёта)", foreground="#666").pack(side="left", padx=(8,8))
 
         ttk.Label(top, text="Метрика:").pack(side="left", padx=(10,2))
         ttk.Combobox(top, textvariable=self.var_metric, values=["peak","rms"], width=6, state="readonly").pack(side="left")
@@ -110,7 +116,7 @@ class UITabAudio:
         mid = ttk.Frame(root); mid.pack(fill="both", expand=True, pady=(8,8))
         self.canvas = tk.Canvas(mid, height=self._VIEW_H, bg="#111"); self.canvas.pack(fill="both", expand=True, side="top")
         self.hbar = ttk.Scrollbar(mid, orient="horizontal", command=self.canvas.xview); self.hbar.pack(fill="x", side="bottom")
-        self.canvas.configure(xscrollcommand=self.hbar.set)
+        self.canvas.configure(xscrollcommand=self._on_xscroll)
         self.canvas.bind("<Button-1>", self._on_canvas_click)
 
         bot = ttk.Frame(root); bot.pack(fill="x")
@@ -132,13 +138,8 @@ class UITabAudio:
         src = os.path.normpath(os.path.expanduser(os.path.expandvars(src)))
         if not src or not os.path.isfile(src):
             self.cb_stream["values"] = []; self.var_stream_global.set(""); return
-        cmd = [self._ffprobe_cmd(), "-v","error","-show_streams","-select_streams","a","-of","json", src]
-        try:
-            data = json.loads(subprocess.check_output(cmd, stderr=subprocess.STDOUT).decode("utf-8","ignore"))
-        except Exception:
-            data = {}
         streams = []; aord=0
-        for st in (data.get("streams") or []):
+        for st in ffprobe_info.streams(self._ffprobe_cmd(), src, "audio"):
             gidx=int(st.get("index",-1))
             disp = st.get("disposition") or {}
             is_def = (disp.get("default",0)==1)
@@ -183,106 +184,37 @@ class UITabAudio:
         self.var_wave_progress.set(f"Аудиограмма: {done}/{max(1,total)}")
         self.pb_wave["value"]=pct
 
-    def _clear_wave_canvas(self):
+    def _clear_wave_items(self):
         for it in self._wave_items:
             try: self.canvas.delete(it)
             except Exception: pass
         self._wave_items=[]
+        self._view_drawn=None
+
+    def _clear_wave_canvas(self):
+        self._clear_wave_items()
         if self._cursor_id is not None:
             try: self.canvas.delete(self._cursor_id)
             except Exception: pass
             self._cursor_id=None
 
+    def _width_limit(self):
+        return self._MAX_WIDTH_PYR if self._pyr is not None else self._MAX_WIDTH
+
     def _effective_px_per_sec(self, duration):
         try: base = max(1, int(float(self.var_px_per_sec.get())))
         except Exception: base = self._px_per_sec_default
         desired = max(1, int(round(base * self._zoom)))
         width = int(round(duration * desired))
-        if width <= self._MAX_WIDTH: return desired, width
-        limited = max(1, int(self._MAX_WIDTH/max(1.0,duration)))
+        limit = self._width_limit()
+        if width <= limit: return desired, width
+        limited = max(1, int(limit/max(1.0,duration)))
         return limited, int(round(duration*limited))
 
     def _change_smooth(self, d):
         v=max(0, min(12, int(self.var_smooth.get())+int(d)))
         self.var_smooth.set(v); self.var_smooth_disp.set(str(v))
 
-    # --- PCM core
-    def _decode_pcm_bytes(self, src, start_sec, dur_sec, sel_global):
-        """Достаём PCM точно по времени (atrim). Форматы: s16le → f32le → u8."""
-        ffmpeg = self._ffmpeg_cmd()
-        sr = 16000
-        attempts=[("s16le",2),("f32le",4),("u8",1)]
-        last_err=""
-        for fmt,_bps in attempts:
-            atrim=f"atrim=start={max(0.0,start_sec)}:end={max(0.0,start_sec+max(0.001,dur_sec))}"
-            cmd=[ffmpeg,"-hide_banner","-nostats","-loglevel","error","-i",src,"-vn"]
-            if self._use_map_global and sel_global>=0: cmd+=["-map",f"0:{sel_global}"]
-            cmd+=["-af",atrim,"-ac","1","-ar",str(sr),"-f",fmt,"pipe:1"]
-            try:
-                p=subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                raw,err=p.communicate(); rc=p.returncode; err=(err.decode("utf-8","ignore") if err else "")
-            except Exception as e:
-                raw=b""; rc=1; err=str(e)
-            if rc!=0 and (("matches no streams" in err) or ("stream specifier" in err.lower())) and self._use_map_global:
-                self._use_map_global=False
-                try:
-                    cmd2=[ffmpeg,"-hide_banner","-nostats","-loglevel","error","-i",src,"-vn","-af",atrim,"-ac","1","-ar",str(sr),"-f",fmt,"pipe:1"]
-                    p2=subprocess.Popen(cmd2, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    raw,err=p2.communicate(); rc=p2.returncode; err=(err.decode("utf-8","ignore") if err else "")
-                except Exception as e2:
-                    raw=b""; rc=1; err=str(e2)
-            last_err = err or f"ffmpeg rc={rc}"
-            if rc==0 and raw: return True, fmt, sr, raw
-        return False, f"ERROR: {last_err}", sr, b""
-
-    # --- амплитуда
-    @staticmethod
-    def _peak_from_block(fmt, block):
-        if not block: return 0.0
-        try:
-            if fmt=="s16le":
-                arr=array("h"); arr.frombytes(block); return min(1.0, max((abs(x) for x in arr), default=0)/32767.0)
-            if fmt=="f32le":
-                arr=array("f"); arr.frombytes(block); return max(0.0, min(1.0, float(max((abs(x) for x in arr), default=0.0))))
-            arr=array("B"); arr.frombytes(block);  return min(1.0, max((abs(int(x)-128) for x in arr), default=0)/127.0)
-        except Exception: return 0.0
-
-    @staticmethod
-    def _rms_from_block(fmt, block):
-        if not block: return 0.0
-        try:
-            if fmt=="s16le":
-                arr=array("h"); arr.frombytes(block); n=len(arr);
-                if n==0: return 0.0
-                s=0.0
-                for v in arr: s+=float(v)*float(v)
-                return min(1.0, math.sqrt(s/n)/32767.0)
-            if fmt=="f32le":
-                arr=array("f"); arr.frombytes(block); n=len(arr)
-                if n==0: return 0.0
-                s=0.0
-                for v in arr: s+=float(v)*float(v)
-                return max(0.0, min(1.0, math.sqrt(s/n)))
-            arr=array("B"); arr.frombytes(block); n=len(arr)
-            if n==0: return 0.0
-            s=0.0
-            for v in arr:
-                vv=float(int(v)-128); s+=vv*vv
-            return min(1.0, math.sqrt(s/n)/127.0)
-        except Exception: return 0.0
-
-    @staticmethod
-    def _smooth_bins(bins, radius):
-        r=int(max(0, radius))
-        if r==0 or not bins: return bins
-        n=len(bins); out=[0.0]*n
-        for i in range(n):
-            a=max(0, i-r); b=min(n-1, i+r)
-            s=0.0; cnt=0
-            for k in range(a,b+1): s+=bins[k]; cnt+=1
-            out[i]=s/cnt if cnt else 0.0
-        return out
-
     # --- координаты/курсор
     def _time_to_x(self, sec):
         return 0 if self._total_width<=0 else int(round(float(sec)/self._sec_per_px))
@@ -335,6 +267,25 @@ class UITabAudio:
         if meta_duration<=0.0:
             messagebox.showwarning("Длительность", "Неизвестна длительность файла."); return
 
+        if self._wave_stop_evt is not None: self._wave_stop_evt.set()
+        self._close_pyramid()
+        src = self.app.state["video_path"]; ffmpeg = self._ffmpeg_cmd()
+        metric = (self.var_metric.get() or "rms").lower()
+        smooth_r = int(self.var_smooth.get())
+        draw_mode = (self.var_draw.get() or "area").lower()
+        sr_used = waveform.SAMPLE_RATE
+
+        # пирамида уже в кэше — рисуем сразу, без ffmpeg
+        pyr = wave_pyramid.open_cached(src, sel_global, sr_used)
+        if pyr is not None:
+            self._pyr = pyr; self._view = (metric, smooth_r, draw_mode)
+            self._clear_wave_canvas(); self._total_width = 0
+            self.scale.configure(from_=0.0, to=pyr.duration)
+            self._apply_zoom()
+            self._set_progress(1, 1)
+            self._save_wave_settings(metric, smooth_r, draw_mode)
+            return
+
         pps, total_w = self._effective_px_per_sec(meta_duration)
         self._total_width = total_w
         self._sec_per_px = meta_duration / float(max(1,total_w))
@@ -342,80 +293,54 @@ class UITabAudio:
 
         H=self._VIEW_H; self._clear_wave_canvas()
         self.canvas.config(scrollregion=(0,0,total_w,H))
-        self._set_progress(0,1)
         self.var_wave_hint.set("Генерация аудиограммы (PCM, сглаживание, режим отрисовки)…")
-        self._use_map_global = (sel_global>=0)
-        metric = (self.var_metric.get() or "rms").lower()
-        smooth_r = int(self.var_smooth.get())
-        draw_mode = (self.var_draw.get() or "area").lower()
-
-        # фактическая длительность по PCM
-        pcm_total_seconds = 0.0
-        bytes_per_sample_map={"s16le":2,"f32le":4,"u8":1}
-        t_cursor=0.0
+        self._set_progress(0, total_w)
 
-        n_chunks = int(math.ceil(total_w / float(self._chunk_w_target))); n_chunks=max(1,n_chunks)
-        self._set_progress(0, n_chunks)
+        stop_evt = threading.Event(); self._wave_stop_evt = stop_evt
+        sec_per_px = self._sec_per_px
+        pyr_key = wave_pyramid.pyramid_key(src, sel_global, sr_used)
 
         def worker():
-            nonlocal t_cursor, pcm_total_seconds
-            first_err=[None]; offset_x=0; fmt_used=None; sr_used=None
-
-            for i in range(n_chunks):
-                width_i = self._chunk_w_target if (offset_x+self._chunk_w_target)<=total_w else (total_w-offset_x)
-                width_i=int(max(1,width_i))
-                planned_dur = width_i * self._sec_per_px
-                start_sec = t_cursor
-
-                ok, fmt, sr, raw = self._decode_pcm_bytes(self.app.state["video_path"], start_sec, planned_dur, sel_global)
-                if ok and fmt_used is None: fmt_used=fmt; sr_used=sr
-
-                bins=[0.0]*width_i
-                if ok and raw:
-                    bps = bytes_per_sample_map.get(fmt,2)
-                    chunk_seconds = len(raw)/float(max(1,sr*bps))
-                    pcm_total_seconds += chunk_seconds
-                    t_cursor += chunk_seconds
-
-                    total=len(raw); step = total/float(width_i); pos=0
-                    block2amp = (self._peak_from_block if metric=="peak" else self._rms_from_block)
-                    for x in range(width_i):
-                        pos_end = int(round((x+1)*step))
-                        if pos_end>total: pos_end=total
-                        bins[x]= block2amp(fmt, raw[pos:pos_end])
-                        pos=pos_end
-                        if pos>=total and x<width_i-1:
-                            # остаток — нули
-                            for k in range(x+1, width_i): bins[k]=0.0
-                            break
-                    if smooth_r>0:
-                        bins = self._smooth_bins(bins, smooth_r)
-                else:
-                    if i==0 and first_err[0] is None: first_err[0]=fmt  # здесь fmt содержит текст ошибки
-
-                # накапливаем бины в общий массив (рисовать будем после сборки всех чанков)
-                self._bins_acc[offset_x:offset_x+width_i] = bins
-
-                # прогресс
-                try: self.canvas.after(0, self._set_progress, min(i+1,n_chunks), n_chunks)
+            # один проход ffmpeg: бины приходят кусками и сразу дорисовываются
+            def on_bins(x0, bins):
+                try: self.canvas.after(0, self._on_partial_bins, stop_evt, x0, bins, draw_mode)
                 except Exception: pass
-
-                offset_x += width_i
+            # тем же проходом строим пирамиду для последующих зума/прокрутки
+            builder = wave_pyramid.PyramidBuilder(sr_used)
+            ok, err, total_samples = waveform.stream_bins(ffmpeg, src, total_w, sec_per_px, metric=metric,
+                                                          stream_global=sel_global, sr=sr_used,
+                                                          on_bins=on_bins, stop_evt=stop_evt, tee=builder.feed)
+            err_text = None if ok else (err or "ffmpeg error")
+            pyr = None
+            if ok and total_samples > 0 and not stop_evt.is_set():
+                pyr = wave_pyramid.save(builder, pyr_key)
+            builder = None
+            pcm_total_seconds = total_samples/float(sr_used)
+            fmt_used = "s16le" if ok else None
 
             def on_done():
+                if stop_evt.is_set():
+                    if pyr is not None: pyr.close()
+                    return
                 self._set_controls_enabled(True)
-                if first_err[0]:
-                    messagebox.showwarning("FFmpeg", f"Не удалось построить аудиограмму:\n{first_err[0]}")
+                self._set_progress(total_w, total_w)
+                if err_text:
+                    messagebox.showwarning("FFmpeg", f"Не удалось построить аудиограмму:\n{err_text}")
                     self.var_wave_hint.set("Ошибка построения аудиограммы (см. сообщение)."); return
 
-                # финально подгоняем шкалу времени под фактическую длительность по PCM
+                # шкала позиции — по фактической длительности PCM; сетка бинов остаётся прежней
+                # (бины считались по абсолютным номерам сэмплов, дрейфа нет)
                 eff_dur = max(0.0, pcm_total_seconds)
                 if eff_dur>0.0:
-                    self._sec_per_px = eff_dur / float(max(1, self._total_width))
                     self.scale.configure(from_=0.0, to=eff_dur)
 
-                # рендерим выбранным режимом
-                self._render_bins(self._bins_acc, draw_mode)
+                # сглаживание и финальный рендер выбранным режимом
+                if pyr is not None:
+                    # дальше лента живёт на пирамиде: рисуем только видимую часть
+                    self._pyr = pyr; self._view = (metric, smooth_r, draw_mode); self._bins_acc = None
+                    self._apply_zoom(keep_hint=True)
+                else:
+                    self._render_bins(waveform.smooth_bins(self._bins_acc, smooth_r), draw_mode)
 
                 # подпись
                 s = next((s for s in self.audio_streams if str(s["global"])==self.var_stream_global.get().strip()), None)
@@ -426,19 +351,13 @@ class UITabAudio:
                     ttl=s['title'] or ""
                     info=f" | a:{s['aord']} [#{s['global']}] {s['codec'] or ''} {ch} {lang}{ttl}".strip()
                 extra = (f" • PCM: {fmt_used}@{sr_used}Hz" if fmt_used else "") + (f" • сглаживание r={smooth_r}" if smooth_r>0 else "") + f" • метрика={metric.upper()}"
-                self.var_wave_hint.set(f"Готово: ширина {self._total_width}px × высота {self._VIEW_H}px (~{self._total_width/max(1,eff_dur):.1f} px/сек, zoom={self._zoom:.2f}×){info}{extra}" + (f" • достигнут предел {self._MAX_WIDTH}px" if self._total_width>=self._MAX_WIDTH else ""))
+                self.var_wave_hint.set(f"Готово: ширина {self._total_width}px × высота {self._VIEW_H}px (~{self._total_width/max(1,eff_dur):.1f} px/сек, zoom={self._zoom:.2f}×){info}{extra}" + (f" • достигнут предел {self._width_limit()}px" if self._total_width>=self._width_limit() else ""))
 
                 # курсор/подпись
                 cur=float(self.var_pos.get() or 0.0); self.var_pos.set(max(0.0, min(cur, eff_dur)))
                 self._update_pos_label(self.var_pos.get(), eff_dur); self._draw_cursor(self._time_to_x(self.var_pos.get()))
 
-                # сохранить настройки
-                cfg.set("audio","px_per_sec", int(self.var_px_per_sec.get() or self._px_per_sec_default))
-                cfg.set("audio","zoom", self._zoom)
-                cfg.set("audio","view_height", self._VIEW_H)
-                if self.var_stream_global.get().strip()!="": cfg.set("audio","stream_global", int(self.var_stream_global.get().strip()))
-                cfg.set("audio","show_video", "true" if self.var_show_video.get() else "false")
-                cfg.set("audio","metric", metric); cfg.set("audio","smooth", str(smooth_r)); cfg.set("audio","draw", draw_mode)
+                self._save_wave_settings(metric, smooth_r, draw_mode)
 
             try: self.canvas.after(0, on_done)
             except Exception: pass
@@ -446,11 +365,35 @@ class UITabAudio:
         self._set_controls_enabled(False)
         threading.Thread(target=worker, daemon=True).start()
 
+    def _save_wave_settings(self, metric, smooth_r, draw_mode):
+        try: cfg.set("audio","px_per_sec", int(self.var_px_per_sec.get() or self._px_per_sec_default))
+        except Exception: pass
+        cfg.set("audio","zoom", self._zoom)
+        cfg.set("audio","view_height", self._VIEW_H)
+        if self.var_stream_global.get().strip()!="": cfg.set("audio","stream_global", int(self.var_stream_global.get().strip()))
+        cfg.set("audio","show_video", "true" if self.var_show_video.get() else "false")
+        cfg.set("audio","metric", metric); cfg.set("audio","smooth", str(smooth_r)); cfg.set("audio","draw", draw_mode)
+
+    def _on_partial_bins(self, stop_evt, x0, bins, mode):
+        """Очередная порция бинов из потока — сохраняем и сразу дорисовываем этот участок."""
+        if stop_evt.is_set() or self._bins_acc is None: return
+        x1 = min(len(self._bins_acc), x0+len(bins))
+        self._bins_acc[x0:x1] = bins[:x1-x0]
+        start = max(0, x0-1)  # захватываем предыдущий бин, чтобы линия/заливка шла без разрывов
+        self._draw_bins(self._bins_acc[start:x1], mode, x_off=start)
+        self._set_progress(x1, len(self._bins_acc))
+
     # --- рендер целой ленты из bins (0..1)
     def _render_bins(self, bins, mode):
         """Рисуем готовую ленту одним приёмом — чтобы картинка была ровной."""
         self._clear_wave_canvas()
         if not bins: return
+        self._draw_bins(bins, mode)
+        self.canvas.config(scrollregion=(0,0, len(bins), self._VIEW_H))
+
+    def _draw_bins(self, bins, mode, x_off=0):
+        """Рисует участок ленты: bins[i] — амплитуда в пикселе x_off+i."""
+        if not bins: return
         H=self._VIEW_H; mid=H//2; amp_scale=(H*0.9)/2.0
         W=len(bins)
 
@@ -460,10 +403,11 @@ class UITabAudio:
             for x,amp in enumerate(bins):
                 if amp<=0.0: continue
                 h=max(1, int(amp*amp_scale))
-                it=self.canvas.create_line(x, mid-h, x, mid+h, fill="white")
+                it=self.canvas.create_line(x_off+x, mid-h, x_off+x, mid+h, fill="white")
                 items.append(it)
             self._wave_items.extend(items)
         elif mode in ("line","area"):
+            if W<2: return
             # формируем верхнюю/нижнюю огибающую
             # чтобы Canvas не задохнулся — ограничим количество точек ~6k
             step=max(1, int(W/6000))
@@ -474,7 +418,7 @@ class UITabAudio:
             for x in xs:
                 y_up = mid - max(1, int(bins[x]*amp_scale))
                 y_dn = mid + max(1, int(bins[x]*amp_scale))
-                top.append((x, y_up)); bot.append((x, y_dn))
+                top.append((x_off+x, y_up)); bot.append((x_off+x, y_dn))
 
             if mode=="line":
                 # рисуем две линии (верх/низ)
@@ -491,14 +435,75 @@ class UITabAudio:
                 self._wave_items.append(self.canvas.create_polygon(*coords, fill="white", outline=""))
         else:
             # на всякий случай — bars
-            return self._render_bins(bins, "bars")
+            self._draw_bins(bins, "bars", x_off)
 
-        self.canvas.config(scrollregion=(0,0, W, H))
+    # --- лента на пирамиде: рисуем только видимое
+    def _close_pyramid(self):
+        if self._view_job is not None:
+            try: self.canvas.after_cancel(self._view_job)
+            except Exception: pass
+            self._view_job=None
+        if self._pyr is not None: self._pyr.close()
+        self._pyr=None; self._view_drawn=None
+
+    def _on_xscroll(self, first, last):
+        self.hbar.set(first, last)
+        if self._pyr is not None and self._view_job is None:
+            self._view_job=self.canvas.after_idle(self._redraw_view)
+
+    def _redraw_view(self):
+        """Перерисовать видимый участок ленты из пирамиды (только при изменении участка/масштаба)."""
+        self._view_job=None
+        pyr=self._pyr
+        if pyr is None or self._total_width<=0 or self._view is None: return
+        metric, r, mode = self._view
+        try:
+            cw=max(1, int(self.canvas.winfo_width())); left=max(0, int(self.canvas.canvasx(0)))
+        except Exception: return
+        vx0=max(0, left-1); vx1=min(self._total_width, left+cw+1)
+        key=(vx0, vx1, self._sec_per_px, self._view)
+        if key==self._view_drawn: return
+        # сглаживание честное и на краях окна: берём по r пикселей с каждой стороны
+        x0=max(0, vx0-r); x1=min(self._total_width, vx1+r)
+        bins=waveform.smooth_bins(pyr.pixels(x0, x1, self._sec_per_px, metric), r)
+        self._clear_wave_items()
+        self._draw_bins(bins[vx0-x0:vx1-x0], mode, x_off=vx0)
+        if self._cursor_id is not None: self.canvas.tag_raise(self._cursor_id)
+        self._view_drawn=key
+
+    def _apply_zoom(self, keep_hint=False):
+        """Новый масштаб из пирамиды: пересчёт ширины, та же точка в центре экрана, перерисовка видимого."""
+        pyr=self._pyr
+        if pyr is None: return
+        dur=pyr.duration
+        try:
+            cw=max(1, int(self.canvas.winfo_width()))
+            center_sec=(self.canvas.canvasx(0)+cw/2.0)*self._sec_per_px if self._total_width>0 else 0.0
+        except Exception:
+            cw=1; center_sec=0.0
+        pps, total_w = self._effective_px_per_sec(dur)
+        self._total_width=max(1, total_w); self._sec_per_px=dur/float(self._total_width)
+        self._clear_wave_items()
+        self.canvas.config(scrollregion=(0,0,self._total_width,self._VIEW_H))
+        new_left=max(0.0, center_sec/self._sec_per_px - cw/2.0)
+        self.canvas.xview_moveto(new_left/float(self._total_width))
+        self._redraw_view()
+        cur=float(self.var_pos.get() or 0.0); self.var_pos.set(max(0.0, min(cur, dur)))
+        self._update_pos_label(self.var_pos.get(), dur)
+        x=self._time_to_x(self.var_pos.get()); self._cursor_x=x
+        if self._cursor_id is None: self._cursor_id=self.canvas.create_line(x,0,x,self._VIEW_H,fill="red",width=2)
+        else: self.canvas.coords(self._cursor_id, x,0,x,self._VIEW_H)
+        if not keep_hint:
+            metric, r, _mode = self._view
+            self.var_wave_hint.set(f"Из пирамиды: ширина {self._total_width}px (~{pps} px/сек, zoom={self._zoom:.2f}×)"
+                                   f" • уровней {len(pyr.levels)} • метрика={metric.upper()}" + (f" • сглаживание r={r}" if r>0 else ""))
 
     # --- zoom/seek/playback
     def _zoom_set(self, z: float):
         self._zoom = max(0.25, min(8.0, float(z)))
         self.var_zoom_value.set(f"{self._zoom:.2f}×")
+        if self._pyr is not None:
+            self._apply_zoom(); cfg.set("audio","zoom", self._zoom)
 
     def _zoom_change(self, factor: float):
         self._zoom_set(self._zoom*float(factor))
@@ -5,7 +5,6 @@ ui_app_automontage.py — вкладка "Автомонтаж".
 """
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
 from . import automontage, utils
 
 class UITabAutomontage:
@@ -58,10 +57,7 @@ class UITabAutomontage:
         minlen = float(self.app.var_am_minlen.get() or 1.0)
         pad = float(self.app.var_am_pad.get() or 0.2)
         ffmpeg = self.app.var_ffmpeg.get() or "ffmpeg"
-        def worker():
-            segs = automontage.analyze(ffmpeg, self.app.state["video_path"], mode=mode, silence_db=silence_db, freeze_t=freeze_t, minlen=minlen, pad=pad)
-            self.app.msg_queue.put(("am_segments", segs))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("automontage.analyze", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], mode=mode, silence_db=silence_db, freeze_t=freeze_t, minlen=minlen, pad=pad), "Анализ пауз", reply="am_segments")
 
     def on_segments(self, segs):
         self.txt_segments.delete("1.0", "end")
@@ -79,7 +75,4 @@ class UITabAutomontage:
         if not segs:
             messagebox.showwarning("Нет сегментов", "Сначала выполните анализ и убедитесь, что список сегментов непустой.")
             return
-        def worker():
-            out = automontage.apply(ffmpeg, self.app.state["video_path"], segs, outdir, mode=mode)
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("automontage.apply", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], segs=segs, out_dir=outdir, mode=mode), "Автомонтаж (вырезка)" if mode == "cut" else "Автомонтаж (сжатие)")
@@ -5,8 +5,6 @@ ui_app_convert.py — вкладка "Конвертация".
 """
 import tkinter as tk
 from tkinter import ttk
-import threading
-from . import convert_ops
 
 class UITabConvert:
     def __init__(self, app, parent):
@@ -38,17 +36,11 @@ class UITabConvert:
             return
         ffmpeg = self.app.var_ffmpeg.get() or "ffmpeg"
         outdir = self.app.state["output_dir"]
-        def worker():
-            out = convert_ops.convert_video(ffmpeg, self.app.state["video_path"], outdir, fmt=self.app.var_fmt.get(), quality=self.app.var_quality.get(), scale=self.app.var_scale.get())
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("convert_ops.convert_video", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], out_dir=outdir, fmt=self.app.var_fmt.get(), quality=self.app.var_quality.get(), scale=self.app.var_scale.get()), "Конвертация")
 
     def _remux_now(self):
         if not self.app.state["video_path"]:
             return
         ffmpeg = self.app.var_ffmpeg.get() or "ffmpeg"
         outdir = self.app.state["output_dir"]
-        def worker():
-            out = convert_ops.remux_video(ffmpeg, self.app.state["video_path"], outdir, fmt=self.app.var_fmt.get())
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("convert_ops.remux_video", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], out_dir=outdir, fmt=self.app.var_fmt.get()), "Ремакс")
@@ -6,8 +6,7 @@ ui_app_denoise.py — вкладка "Шумоподавление".
 """
 import tkinter as tk
 from tkinter import ttk
-import threading
-from . import denoise, utils
+from . import utils
 
 class UITabDenoise:
     def __init__(self, app, parent):
@@ -32,10 +31,7 @@ class UITabDenoise:
         ffmpeg = self.app.var_ffmpeg.get() or "ffmpeg"
         outdir = self.app.state["output_dir"]
         preset = self.app.var_dn_preset.get()
-        def worker():
-            out = denoise.apply_denoise(ffmpeg, self.app.state["video_path"], outdir, preset=preset, scope="all")
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("denoise.apply_denoise", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], out_dir=outdir, preset=preset, scope="all"), f"Шумоподавление ({preset})")
 
     def _denoise_fragment(self):
         if not self.app.state["video_path"]:
@@ -45,7 +41,4 @@ class UITabDenoise:
         preset = self.app.var_dn_preset.get()
         start = utils.hhmmss_to_sec(self.app.var_frag_start.get())
         end = utils.hhmmss_to_sec(self.app.var_frag_end.get())
-        def worker():
-            out = denoise.apply_denoise(ffmpeg, self.app.state["video_path"], outdir, preset=preset, scope="fragment", start=start, end=end)
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("denoise.apply_denoise", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], out_dir=outdir, preset=preset, scope="fragment", start=start, end=end), f"Шумоподавление фрагмента ({preset})")
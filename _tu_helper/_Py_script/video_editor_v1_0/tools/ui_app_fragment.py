@@ -9,7 +9,7 @@
    - Отсортировать и склеить пересекающиеся (нормализация списка).
 2) Автозаполнение интервалов:
    - Поле «Разбивать на интервалы, сек» + кнопка «Разбить»;
-   - Флажок «привязывать к паузам речи» (FFmpeg silencedetect) и настройки
+   - Флажок «привязывать к паузам речи» (пирамида аудиодорожки, как silencedetect) и настройки
      Порог дБ / Мин. пауза мс / Окно поиска ± мс.
 3) Просмотр:
    - Кнопка «Посмотреть фрагмент» — быстро запустить ffplay на выбранном интервале;
@@ -26,7 +26,6 @@
 """
 
 import os
-import json
 import math
 import tempfile
 import subprocess
@@ -35,6 +34,8 @@ from tkinter import ttk, messagebox
 
 # Если в проекте уже есть utils с форматированием времени — используем его.
 from . import utils
+from . import wave_pyramid
+from . import ffprobe_info
 
 # ----------------------- УТИЛИТЫ ВРЕМЕНИ -----------------------
 
@@ -208,19 +209,11 @@ class UITabFragment:
     # ------------------- Длительность текущего видео -------------------
 
     def _ensure_duration(self):
-        """Узнаём длительность текущего видео (из app.state или через ffprobe)."""
+        """Узнаём длительность текущего видео (из app.state или ffprobe_info — ffprobe один раз на файл)."""
         dur = float(self.app.state.get("duration") or 0.0)
         src = self.app.state.get("video_path") or ""
         if dur <= 0.0 and src and os.path.isfile(src):
-            try:
-                out = subprocess.check_output(
-                    [self._ffprobe_cmd(), "-v", "error", "-show_format", "-of", "json", src],
-                    stderr=subprocess.STDOUT
-                )
-                fmt = (json.loads(out.decode("utf-8", "ignore")).get("format") or {})
-                dur = float(fmt.get("duration", 0.0) or 0.0)
-            except Exception:
-                dur = 0.0
+            dur = ffprobe_info.get_duration(self._ffprobe_cmd(), src)
         self._duration_cache = max(0.0, dur)
 
     # ----------------------- Работа с таблицей -----------------------
@@ -301,43 +294,24 @@ class UITabFragment:
         merged = self._merge_overlaps(self._get_intervals_from_table())
         self._set_intervals_to_table(merged)
 
-    # ----------------------- Авторазбиение (silencedetect) -----------------------
+    # ----------------------- Авторазбиение (паузы по пирамиде) -----------------------
 
     def _detect_silences(self, noise_db: float, min_sil_ms: int):
         """
-        FFmpeg silencedetect: возвращаем список тишин [(start, end), ...] в секундах.
+        Список тишин [(start, end), ...] в секундах — по пирамиде аудиодорожки (tools/wave_pyramid.py).
+        Пирамида общая с вкладкой «Аудио» и лежит в кэше: если аудиограмма уже строилась,
+        ffmpeg не запускается вовсе; иначе один проход строит её для всех вкладок.
         """
         src = self.app.state.get("video_path") or ""
         if not src or not os.path.isfile(src):
             return []
-        cmd = [
-            self._ffmpeg_cmd(), "-hide_banner", "-nostats",
-            "-i", src,
-            "-af", f"silencedetect=noise={noise_db}dB:d={max(0.05, min_sil_ms/1000.0)}",
-            "-f", "null", "-"
-        ]
-        try:
-            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            _, err = proc.communicate()
-            text = err.decode("utf-8", "ignore")
-        except Exception:
+        pyr, _err = wave_pyramid.open_or_build(self._ffmpeg_cmd(), src)
+        if pyr is None:
             return []
-        silences = []
-        cur = None
-        for line in text.splitlines():
-            s = line.strip().lower()
-            if "silence_start" in s:
-                try:
-                    cur = float(s.split("silence_start:")[1].strip())
-                except Exception:
-                    cur = None
-            elif "silence_end" in s and cur is not None:
-                try:
-                    val = float(s.split("silence_end:")[1].split("|")[0].strip())
-                    silences.append((cur, val)); cur = None
-                except Exception:
-                    cur = None
-        return silences
+        try:
+            return pyr.silences(noise_db, max(0.05, min_sil_ms / 1000.0))
+        finally:
+            pyr.close()
 
     @staticmethod
     def _snap_to_nearest_silence(t: float, silences, window_ms: int) -> float:
@@ -5,8 +5,7 @@ ui_app_logo.py — вкладка "Логотип".
 """
 import tkinter as tk
 from tkinter import ttk, filedialog
-import threading
-from . import logo_overlay, utils
+from . import utils
 
 class UITabLogo:
     def __init__(self, app, parent):
@@ -46,10 +45,7 @@ class UITabLogo:
             return
         ffmpeg = self.app.var_ffmpeg.get() or "ffmpeg"
         outdir = self.app.state["output_dir"]
-        def worker():
-            out = logo_overlay.apply_logo(ffmpeg, self.app.state["video_path"], outdir, self.app.var_logo_path.get(), self.app.var_logo_pos.get(), int(self.app.var_logo_scale.get() or "10"), scope="all")
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("logo_overlay.apply_logo", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], out_dir=outdir, logo_path=self.app.var_logo_path.get(), pos=self.app.var_logo_pos.get(), scale_pct=int(self.app.var_logo_scale.get() or "10"), scope="all"), "Логотип")
 
     def _apply_logo_fragment(self):
         if not self.app.state["video_path"] or not self.app.var_logo_path.get():
@@ -58,7 +54,4 @@ class UITabLogo:
         outdir = self.app.state["output_dir"]
         start = utils.hhmmss_to_sec(self.app.var_frag_start.get())
         end = utils.hhmmss_to_sec(self.app.var_frag_end.get())
-        def worker():
-            out = logo_overlay.apply_logo(ffmpeg, self.app.state["video_path"], outdir, self.app.var_logo_path.get(), self.app.var_logo_pos.get(), int(self.app.var_logo_scale.get() or "10"), scope="fragment", start=start, end=end)
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("logo_overlay.apply_logo", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], out_dir=outdir, logo_path=self.app.var_logo_path.get(), pos=self.app.var_logo_pos.get(), scale_pct=int(self.app.var_logo_scale.get() or "10"), scope="fragment", start=start, end=end), "Логотип на фрагмент")
@@ -22,7 +22,8 @@ from .ui_app_convert import UITabConvert
 from .ui_app_automontage import UITabAutomontage
 from .ui_app_queue import UITabQueue
 
-from . import config
+from . import config, queue_runner
+from . import config_store as cfg
 
 class App_UI(tk.Tk):
     def __init__(self):
@@ -41,6 +42,10 @@ class App_UI(tk.Tk):
 
         self.msg_queue = queue.Queue()
 
+        # Очередь задач ffmpeg (вкладки ставят операции сюда, исполняет пул в фоне)
+        self.jobs = queue_runner.JobQueue(ffprobe=self.state["ffprobe"] or "ffprobe")
+        self.jobs.add_listener(lambda job: self.msg_queue.put(("job", job)))
+
         nb = ttk.Notebook(self)
         nb.pack(fill="both", expand=True)
 
@@ -74,8 +79,49 @@ class App_UI(tk.Tk):
         self.var_progress = tk.StringVar(value="Готово")
         ttk.Label(self.frames["queue"], textvariable=self.var_progress).pack(anchor="w")
 
+        self.jobs.start()
+        cfg.subscribe(self._on_tools_changed, "tools")
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
         self.after(150, self._poll_msgs)
 
+    def _on_close(self):
+        # незавершённые задачи останутся в файле очереди и продолжатся при следующем запуске
+        self.tabs["view"].close()
+        self.jobs.shutdown()
+        cfg.flush()
+        self.destroy()
+
+    def _on_tools_changed(self, _section, key, value):
+        # пути к утилитам сохранили на вкладке «Файлы» — новые задачи очереди берут их сразу
+        if key in ("ffmpeg", "ffprobe", "ffplay") and value:
+            self.state[key] = value
+            if key == "ffprobe":
+                self.jobs.ffprobe = value
+
+    def submit_job(self, op, args, title, reply="info"):
+        """Поставить операцию в очередь (для вкладок). Длительность текущего файла — для прогресса."""
+        src = args.get(queue_runner.OPS.get(op, ""), "")
+        dur = self.state.get("duration") if src and src == self.state.get("video_path") else 0.0
+        name = os.path.basename(src) if src else ""
+        jid = self.jobs.submit(op, args, title=f"{title}: {name}" if name else title, duration=dur or 0.0, reply=reply)
+        self.var_progress.set(f"Задача №{jid} поставлена в очередь: {title}")
+        return jid
+
+    def _on_job(self, job):
+        self.tabs["queue"].on_job(job)
+        status = job.get("status")
+        if status == "running":
+            self.var_progress.set(f"№{job['id']} {job.get('title','')}: {int(round(float(job.get('progress') or 0)*100))}%")
+        if status not in ("done", "error"):
+            return
+        reply = job.get("reply") or ""
+        if status == "error" and reply:
+            messagebox.showwarning("Очередь", f"Задача №{job['id']} «{job.get('title','')}» завершилась с ошибкой:\n{job.get('error','')[-800:]}")
+        elif reply == "am_segments":
+            self.tabs["automontage"].on_segments([tuple(s) for s in (job.get("result") or [])])
+        elif reply == "info":
+            messagebox.showinfo("Инфо", f"Готово: {job.get('result')}")
+
     def _poll_msgs(self):
         try:
             while True:
@@ -85,6 +131,8 @@ class App_UI(tk.Tk):
                 elif kind == "view_progress":
                     # Прогресс генерации ленты (N из M)
                     self.tabs["view"].on_progress(payload)
+                elif kind == "job":
+                    self._on_job(payload)
                 elif kind == "am_segments":
                     self.tabs["automontage"].on_segments(payload)
                 elif kind == "info":
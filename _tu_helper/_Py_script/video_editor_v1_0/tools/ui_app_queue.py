@@ -1,32 +1,142 @@
 # video_editor/tools/ui_app_queue.py
 # -*- coding: utf-8 -*-
 """
-ui_app_queue.py — вкладка "Очередь/Статус". Пока демонстрационная.
+ui_app_queue.py — вкладка "Очередь/Статус".
+
+- Таблица задач очереди (tools/queue_runner.py): операция, статус, прогресс, результат/ошибка.
+- Обновляется «вживую»: App получает снимки задач из рабочих потоков через msg_queue и зовёт on_job().
+- Кнопки: отменить, повторить, удалить, очистить завершённые, «применить к файлам…» (та же операция
+  с теми же настройками для пачки файлов), число параллельных исполнителей.
 """
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+
+from . import utils
+from . import config_store as cfg
+
+_STATUS_RU = {
+    "queued": "в очереди",
+    "running": "выполняется",
+    "done": "готово",
+    "error": "ошибка",
+    "cancelled": "отменено",
+}
+
 
 class UITabQueue:
     def __init__(self, app, parent):
         self.app = app
         self.parent = parent
         self._build()
+        for job in self.app.jobs.jobs():
+            self.on_job(job)
 
     def _build(self):
         frm = ttk.Frame(self.parent, padding=10)
         frm.pack(fill="both", expand=True)
-        ttk.Label(frm, text="Очередь задач (выполняются по очереди)").pack(anchor="w")
-        self.lst_queue = tk.Listbox(frm, height=10)
-        self.lst_queue.pack(fill="both", expand=True, pady=4)
+
+        top = ttk.Frame(frm); top.pack(fill="x")
+        ttk.Label(top, text="Очередь задач").pack(side="left")
+        ttk.Label(top, text="Параллельно:").pack(side="left", padx=(20, 4))
+        self.var_workers = tk.StringVar(value=str(self.app.jobs.workers))
+        sp = ttk.Spinbox(top, from_=1, to=32, width=4, textvariable=self.var_workers, command=self._apply_workers)
+        sp.pack(side="left")
+        sp.bind("<Return>", lambda _e: self._apply_workers())
+        self.var_summary = tk.StringVar(value="")
+        ttk.Label(top, textvariable=self.var_summary, foreground="#555").pack(side="left", padx=(16, 0))
+
+        cols = ("id", "title", "status", "progress", "info")
+        self.tree = ttk.Treeview(frm, columns=cols, show="headings", height=12, selectmode="extended")
+        for c, text, w, anchor in (("id", "№", 50, "center"), ("title", "Задача", 320, "w"),
+                                   ("status", "Статус", 110, "center"), ("progress", "Прогресс", 90, "center"),
+                                   ("info", "Результат / ошибка", 480, "w")):
+            self.tree.heading(c, text=text)
+            self.tree.column(c, width=w, anchor=anchor, stretch=(c == "info"))
+        self.tree.pack(fill="both", expand=True, pady=4)
+        self.tree.tag_configure("error", foreground="#b00")
+        self.tree.tag_configure("done", foreground="#060")
+        self.tree.tag_configure("cancelled", foreground="#777")
 
         btns = ttk.Frame(frm)
         btns.pack(fill="x")
-        ttk.Button(btns, text="Запустить очередь", command=self._run_queue).pack(side="left")
+        ttk.Button(btns, text="Отменить", command=self._cancel_selected).pack(side="left")
+        ttk.Button(btns, text="Повторить", command=self._retry_selected).pack(side="left", padx=6)
+        ttk.Button(btns, text="Удалить", command=self._remove_selected).pack(side="left")
+        ttk.Button(btns, text="Очистить завершённые", command=self._clear_finished).pack(side="left", padx=6)
+        ttk.Button(btns, text="Применить к файлам…", command=self._clone_for_files).pack(side="left")
         ttk.Button(btns, text="Открыть папку вывода", command=self._open_outdir).pack(side="left", padx=6)
 
-    def _run_queue(self):
-        messagebox.showinfo("Очередь", "Демонстрационная очередь: текущие кнопки запускают задачи сразу. Расширим при необходимости.")
+    # --- обновление из очереди
+    def on_job(self, job):
+        iid = str(job["id"])
+        status = job.get("status", "")
+        prog = f"{int(round(float(job.get('progress') or 0.0) * 100))}%" if status in ("running", "done") else ""
+        if status == "error":
+            info = (job.get("error") or "").strip().splitlines()[-1:] or [""]
+            info = info[0]
+        elif status == "done":
+            res = job.get("result")
+            info = res if isinstance(res, str) else (f"сегментов: {len(res)}" if isinstance(res, list) else "")
+        else:
+            info = "продолжена после перезапуска" if job.get("resumed") and status != "cancelled" else ""
+        if job.get("attempts", 0) > 1 and status != "queued":
+            info = f"[попытка {job['attempts']}] {info}"
+        values = (job["id"], job.get("title", ""), _STATUS_RU.get(status, status), prog, info)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=values, tags=(status,))
+        else:
+            self.tree.insert("", "end", iid=iid, values=values, tags=(status,))
+        self._update_summary()
+
+    def _update_summary(self):
+        c = self.app.jobs.counts()
+        self.var_summary.set(f"выполняется: {c.get('running', 0)} • ждёт: {c.get('queued', 0)} • "
+                             f"готово: {c.get('done', 0)} • ошибок: {c.get('error', 0)}")
+
+    # --- кнопки
+    def _selected_ids(self):
+        return [int(i) for i in self.tree.selection()]
+
+    def _apply_workers(self):
+        try: n = max(1, min(32, int(self.var_workers.get())))
+        except Exception: return
+        self.app.jobs.set_workers(n)
+        cfg.set("queue", "workers", n)
+
+    def _cancel_selected(self):
+        for jid in self._selected_ids():
+            self.app.jobs.cancel(jid)
+
+    def _retry_selected(self):
+        for jid in self._selected_ids():
+            self.app.jobs.retry(jid)
+
+    def _remove_selected(self):
+        for jid in self._selected_ids():
+            if self.app.jobs.remove(jid):
+                self.tree.delete(str(jid))
+        self._update_summary()
+
+    def _clear_finished(self):
+        self.app.jobs.clear_finished()
+        alive = {str(j["id"]) for j in self.app.jobs.jobs()}
+        for iid in self.tree.get_children():
+            if iid not in alive:
+                self.tree.delete(iid)
+        self._update_summary()
+
+    def _clone_for_files(self):
+        ids = self._selected_ids()
+        if len(ids) != 1:
+            messagebox.showinfo("Очередь", "Выберите одну задачу-образец: её операция с теми же настройками будет поставлена для каждого файла.")
+            return
+        paths = filedialog.askopenfilenames(title="Файлы для пакетной обработки",
+                                            filetypes=[("Видео/аудио", "*.mp4 *.mkv *.mov *.avi *.webm *.mp3 *.wav *.m4a"), ("Все файлы", "*.*")])
+        if not paths:
+            return
+        new_ids = self.app.jobs.clone_for_files(ids[0], [os.path.normpath(p) for p in paths])
+        self.app.var_progress.set(f"В очередь добавлено задач: {len(new_ids)}")
 
     def _open_outdir(self):
-        from . import utils
         utils.open_folder(self.app.state["output_dir"])
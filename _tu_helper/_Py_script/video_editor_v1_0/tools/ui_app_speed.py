@@ -5,8 +5,7 @@ ui_app_speed.py — вкладка "Скорость".
 """
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
-from . import utils, speed_ops
+from . import utils
 
 class UITabSpeed:
     def __init__(self, app, parent):
@@ -45,7 +44,4 @@ class UITabSpeed:
         outdir = self.app.state["output_dir"]
         start = utils.hhmmss_to_sec(self.app.var_frag_start.get())
         end = utils.hhmmss_to_sec(self.app.var_frag_end.get())
-        def worker():
-            out = speed_ops.apply_speed(ffmpeg, self.app.state["video_path"], outdir, factor=factor, pitch_mode=pitch, scope=scope, start=start, end=end)
-            self.app.msg_queue.put(("info", f"Готово: {out}"))
-        threading.Thread(target=worker, daemon=True).start()
+        self.app.submit_job("speed_ops.apply_speed", dict(ffmpeg=ffmpeg, video_path=self.app.state["video_path"], out_dir=outdir, factor=factor, pitch_mode=pitch, scope=scope, start=start, end=end), f"Скорость ×{factor:g}")
@@ -4,16 +4,17 @@
 Вкладка «Видео»
 - ОДНА кнопка «Сгенерировать (лента+миниатюры)»
 - Миниатюры раскладываются ПО ВРЕМЕНИ (x = t / sec_per_px)
+- Миниатюры идут одним проходом ffmpeg (thumbs_timeline.iter_thumbs_stream) и появляются по мере готовности
 - ЛКМ по ленте/миниатюре/шкале — переход к времени + предпросмотр (force)
 - Подсветка ближайшей миниатюры + автопрокрутка корректна
 - Всегда видна временная шкала (сек/мин) под миниатюрами
 """
 
-import os, json, time, math, threading, tempfile, subprocess
+import os, time, math, threading, subprocess
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
-from . import utils
+from . import utils, thumbs_timeline, media_cache, preview_server, ffprobe_info
 from . import config_store as cfg
 
 
@@ -45,16 +46,16 @@ class UITabView:
         self.var_thumb_step = tk.StringVar(value=str(cfg.get_int("view","thumb_step",5)))
         self.var_thumb_h    = tk.StringVar(value=str(cfg.get_int("view","thumb_h",90)))
         self.var_thumb_w    = tk.StringVar(value=str(cfg.get_int("view","thumb_w",140)))
-        self._thumb_tempdir = os.path.join(tempfile.gettempdir(),"video_editor_thumbs")
         self._thumb_items   = []     # id canvas-элементов (png/рамки/делители)
         self._thumb_images  = []     # ссылки на PhotoImage
-        self._thumb_paths   = []     # пути временных png
+        self._thumb_stop_evt = None  # остановка текущего потока миниатюр
         self._thumb_meta    = []     # [{sec,x_left,w,h,rect_id,img_id}]
         self._sel_thumb_box_id = None
 
-        # предпросмотр (отдельное поле)
-        self._last_preview_ts  = 0.0
+        # предпросмотр (отдельное поле): долгоживущий декодер, запросы схлопываются
         self._last_preview_sec = -1.0
+        self._preview_gen = 0          # номер последнего запроса предпросмотра
+        self._preview_server = preview_server.PreviewServer(on_frame=self._on_preview_frame_thread)
         self._preview_img   = None
         self._preview_item  = None
         self._preview_bg    = None
@@ -127,11 +128,7 @@ class UITabView:
         dur = float(self.app.state.get("duration") or 0.0)
         src = self.app.state.get("video_path") or ""
         if dur<=0.0 and src and os.path.isfile(src):
-            try:
-                out = subprocess.check_output([self._ffprobe_cmd(), "-v","error","-show_format","-of","json", src], stderr=subprocess.STDOUT)
-                dur = float((json.loads(out.decode("utf-8","ignore")).get("format") or {}).get("duration", 0.0) or 0.0)
-            except Exception:
-                dur = 0.0
+            dur = ffprobe_info.get_duration(self._ffprobe_cmd(), src)
         self._duration_cache = max(0.0, dur)
         self.scale.configure(from_=0.0, to=self._duration_cache)
 
@@ -142,13 +139,14 @@ class UITabView:
         self.pb["value"]=int(round(done*100.0/total))
 
     def _clear_timeline(self):
+        self._stop_thumbs()
         try: self.timeline_canvas.delete("all")
         except Exception: pass
         self._cursor_id=None
         self._total_width=0
         self._sec_per_px=1.0
         self.timeline_canvas.configure(scrollregion=(0,0,0,self._timeline_height))
-        self._clear_thumbs(delete_files=True)
+        self._clear_thumbs()
         self._thumb_meta.clear()
         if self._sel_thumb_box_id:
             try: self.timeline_canvas.delete(self._sel_thumb_box_id)
@@ -188,18 +186,12 @@ class UITabView:
         self.timeline_canvas.configure(scrollregion=(0,0,self._total_width,self._timeline_height))
         self._draw_time_grid(self._total_width, self._timeline_height)
 
-    def _clear_thumbs(self, delete_files=False):
+    def _clear_thumbs(self):
         for it in self._thumb_items:
             try: self.timeline_canvas.delete(it)
             except Exception: pass
         self._thumb_items.clear()
         self._thumb_images.clear()
-        if delete_files:
-            for p in self._thumb_paths:
-                try:
-                    if os.path.isfile(p): os.remove(p)
-                except Exception: pass
-            self._thumb_paths.clear()
 
     def _gen_thumbs(self):
         src = self.app.state.get("video_path") or ""
@@ -232,51 +224,26 @@ class UITabView:
             step=max(step, int(math.ceil(self._duration_cache/500.0)))
             n_est=max(1, int(self._duration_cache//step)+1)
 
-        self._clear_thumbs(delete_files=True)
+        self._stop_thumbs()
+        self._clear_thumbs()
         self._thumb_meta.clear()
-        try: os.makedirs(self._thumb_tempdir, exist_ok=True)
-        except Exception: pass
 
-        ffmpeg=self._ffmpeg_cmd()
+        ffmpeg=self._ffmpeg_cmd(); ffprobe=self._ffprobe_cmd()
         self._set_progress(0,n_est)
+        stop_evt=threading.Event(); self._thumb_stop_evt=stop_evt
 
         def worker():
-            done=0; paths=[]
-            for i,sec in enumerate(range(0, int(self._duration_cache)+1, step)):
-                outp=os.path.join(self._thumb_tempdir, f"thumb_{i:05d}.png")
-                cmd=[ffmpeg,"-hide_banner","-loglevel","error","-y",
-                     "-ss",str(sec), "-i", src,
-                     "-frames:v","1",
-                     "-vf", f"scale={tw}:{th}:force_original_aspect_ratio=decrease,"
-                            f"pad={tw}:{th}:(ow-iw)/2:(oh-ih)/2:black",
-                     outp]
-                try:
-                    subprocess.check_call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-                    if os.path.isfile(outp): paths.append((float(sec), outp))
-                except Exception:
-                    pass
+            # из кэша — сразу; иначе один проход ffmpeg (шаг больше GOP — только ключевые кадры)
+            done=0
+            for sec, data in thumbs_timeline.iter_thumbs_cached(ffmpeg, src, self._duration_cache, step, tw, th,
+                                                                 ffprobe=ffprobe, stop_evt=stop_evt):
+                if sec>self._duration_cache: continue
                 done+=1
-                try: self.timeline_canvas.after(0, self._set_progress, done, n_est)
-                except Exception: pass
+                try: self.timeline_canvas.after(0, self._on_thumb_ready, stop_evt, sec, data, done, n_est)
+                except Exception: break
 
             def on_done():
-                # рисуем по ВРЕМЕНИ
-                for sec, path in paths:
-                    try: img=tk.PhotoImage(file=path)
-                    except Exception: continue
-                    x_center = int(round(sec / self._sec_per_px))
-                    x_left   = max(2, min(x_center - img.width()//2, self._total_width - img.width() - 2))
-                    y = 4
-                    rect = self.timeline_canvas.create_rectangle(x_left-1, y-1, x_left+img.width()+1, y+img.height()+1,
-                                                                 outline="#333", fill="#000",
-                                                                 tags=("thumb", f"t={sec}"))
-                    it   = self.timeline_canvas.create_image(x_left, y, anchor="nw",
-                                                             image=img, tags=("thumb", f"t={sec}"))
-                    self._thumb_items.extend([rect,it]); self._thumb_images.append(img); self._thumb_paths.append(path)
-                    self._thumb_meta.append({"sec":sec,"x_left":x_left,"w":img.width(),"h":img.height(),
-                                             "rect_id":rect,"img_id":it})
-                # сетку перерисуем поверх фона, но под миниатюрами — НЕ надо. Мы рисовали ДО миниатюр.
-                # курсор и подсветку — сверху
+                if stop_evt.is_set(): return
                 self._highlight_nearest_thumb(float(self.var_pos.get() or 0.0))
                 self._raise_foreground_layers()
                 self._set_progress(n_est,n_est)
@@ -286,6 +253,34 @@ class UITabView:
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def _stop_thumbs(self):
+        if self._thumb_stop_evt is not None: self._thumb_stop_evt.set()
+        self._thumb_stop_evt=None
+
+    def _on_thumb_ready(self, stop_evt, sec, data, done, total):
+        """Миниатюра пришла из потока ffmpeg — сразу рисуем её на ленте (в UI-потоке)."""
+        if stop_evt.is_set(): return
+        try: img=tk.PhotoImage(data=data, format="ppm")
+        except Exception: return
+        self._add_thumb_image(sec, img)
+        self._set_progress(done, total)
+
+    def _add_thumb_image(self, sec, img):
+        # рисуем по ВРЕМЕНИ
+        x_center = int(round(sec / self._sec_per_px))
+        x_left   = max(2, min(x_center - img.width()//2, self._total_width - img.width() - 2))
+        y = 4
+        rect = self.timeline_canvas.create_rectangle(x_left-1, y-1, x_left+img.width()+1, y+img.height()+1,
+                                                     outline="#333", fill="#000",
+                                                     tags=("thumb", f"t={sec}"))
+        it   = self.timeline_canvas.create_image(x_left, y, anchor="nw",
+                                                 image=img, tags=("thumb", f"t={sec}"))
+        self._thumb_items.extend([rect,it]); self._thumb_images.append(img)
+        self._thumb_meta.append({"sec":sec,"x_left":x_left,"w":img.width(),"h":img.height(),
+                                 "rect_id":rect,"img_id":it})
+        # курсор и подсветку — сверху
+        self._raise_foreground_layers()
+
     def _gen_all(self):
         self._clear_timeline()
         if not self.app.state.get("video_path"):
@@ -407,11 +402,11 @@ class UITabView:
         self._render_preview_at_sec(float(self.var_pos.get() or 0.0), force=force)
 
     def _render_preview_at_sec(self, sec: float, force: bool=False):
-        now=time.monotonic()
-        if not force:
-            if now-self._last_preview_ts<0.2: return
-            if abs(sec-self._last_preview_sec)<0.05: return
-        self._last_preview_ts=now; self._last_preview_sec=sec
+        if not force and abs(sec-self._last_preview_sec)<0.05: return
+        self._last_preview_sec=sec
+        # поколение запроса: кадр от сервера, пришедший после более нового запроса (в т.ч. попадания в кэш), выбрасываем
+        self._preview_gen+=1
+        gen=self._preview_gen
 
         src=self.app.state.get("video_path") or ""
         if not src or not os.path.isfile(src): return
@@ -423,15 +418,38 @@ class UITabView:
         except Exception:
             W,H=800,320
 
-        tmp=os.path.join(tempfile.gettempdir(), f"video_editor_preview_{os.getpid()}.png")
-        cmd=[self._ffmpeg_cmd(),"-hide_banner","-loglevel","error","-y",
-             "-i",src,"-ss",str(max(0.0,float(sec))),"-frames:v","1",
-             "-vf", f"scale={W}:-2:force_original_aspect_ratio=decrease,"
-                    f"pad={W}:{H}:(ow-iw)/2:(oh-ih)/2:black",
-             tmp]
+        # кадр из общего кэша (ключ: файл + секунда + размер поля)
+        sec=max(0.0,float(sec))
+        key=media_cache.file_key(src, "preview", sec=f"{sec:.2f}", w=W, h=H)
+        path=media_cache.lookup(key, "ppm")
+        if path:
+            try:
+                with open(path,"rb") as f: self._show_preview(f.read(), W, H)
+                return
+            except OSError: pass
+        # промах — в сервер предпросмотра; в кэш кладём только явные переходы (клики), не протяжку
+        self._preview_server.request(self._ffmpeg_cmd(), src, sec, W, H, tag=(gen, key if force else None))
+
+    def close(self):
+        """Закрытие окна (App_UI._on_close): сервер предпросмотра, поток миниатюр и проигрывание."""
+        self._preview_server.close()
+        self._stop_thumbs()
+        self._stop(kill_only=True)
+
+    def _on_preview_frame_thread(self, req, ppm):
+        """Колбэк рабочего потока PreviewServer — переносим отрисовку в UI-поток."""
+        try: self.preview_canvas.after(0, self._on_preview_frame, req, ppm)
+        except Exception: pass
+
+    def _on_preview_frame(self, req, ppm):
+        gen, key = req.tag
+        if key: media_cache.store_bytes(key, "ppm", ppm)
+        if gen != self._preview_gen: return
+        self._show_preview(ppm, req.width, req.height)
+
+    def _show_preview(self, ppm, W, H):
         try:
-            subprocess.check_call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-            img=tk.PhotoImage(file=tmp)
+            img=tk.PhotoImage(data=ppm, format="ppm")
         except Exception:
             return
 
@@ -463,8 +481,9 @@ class UITabView:
                                                   initialfile=f"frame_{ts}.png",
                                                   initialdir=self._default_frames_dir())
             if not out_path: return
+        # -ss до -i: переход к ключевому кадру + точное декодирование вперёд (не с начала файла)
         cmd=[self._ffmpeg_cmd(),"-hide_banner","-loglevel","error","-y",
-             "-i",src,"-ss",str(max(0.0,float(sec))),"-frames:v","1", out_path]
+             "-ss",str(max(0.0,float(sec))),"-i",src,"-frames:v","1", out_path]
         try:
             subprocess.check_call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
             messagebox.showinfo("Готово", f"Кадр сохранён:\n{out_path}")
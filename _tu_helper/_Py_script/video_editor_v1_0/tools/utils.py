@@ -5,6 +5,10 @@ utils.py — общие утилиты: проверка бинарников, 
 import os
 import subprocess
 import sys
+import threading
+from collections import deque
+
+_tls = threading.local()
 
 def which(name):
     """Ищем программу в PATH, возвращаем полный путь или None."""
@@ -60,22 +64,91 @@ def hhmmss_to_sec(text):
     return 0.0
 
 def safe_out_path(out_dir, base_name, ext):
-    """Версионирование файла, если такой уже существует: name.mp4 -> name(1).mp4 и т.д."""
+    """
+    Версионирование файла, если такой уже существует: name.mp4 -> name(1).mp4 и т.д.
+    Внутри задачи очереди имя ещё и резервируется (set_thread_runner(reserve=...)): параллельные задачи,
+    пока их файлы не созданы, не получат одно и то же name(N).ext.
+    """
     os.makedirs(out_dir, exist_ok=True)
+    reserve = getattr(_tls, "reserve", None)
+
+    def free(p):
+        return not os.path.exists(p) and (reserve is None or reserve(p))
+
     path = os.path.join(out_dir, base_name + "." + ext.lstrip("."))
-    if not os.path.exists(path):
+    if free(path):
         return path
     i = 1
     while True:
         p = os.path.join(out_dir, f"{base_name}({i}).{ext.lstrip('.')}")
-        if not os.path.exists(p):
+        if free(p):
             return p
         i += 1
 
+def set_thread_runner(fn, streamer=None, reserve=None):
+    """
+    Перехват run_ffmpeg в текущем потоке: fn(cmd) -> (returncode, stdout, stderr).
+    streamer(cmd, on_line, on_chunk) -> (returncode, stderr_tail) — то же для stream_ffmpeg.
+    reserve(path) -> bool — занять имя выходного файла для safe_out_path (False — имя уже занято другим).
+    Так очередь задач (queue_runner) добавляет прогресс и отмену, не меняя операции. None — снять.
+    """
+    _tls.runner = fn
+    _tls.streamer = streamer
+    _tls.reserve = reserve
+
 def run_ffmpeg(cmd):
     """Запуск ffmpeg/ffprobe/ffplay с передачей списка аргументов; возвращает (returncode, stdout, stderr)."""
+    runner = getattr(_tls, "runner", None)
+    if runner is not None:
+        return runner(cmd)
+    return run_command(cmd)
+
+def run_command(cmd):
+    """Прямой запуск без перехвата; возвращает (returncode, stdout, stderr)."""
     try:
         proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False, text=True)
         return proc.returncode, proc.stdout, proc.stderr
     except Exception as e:
         return 1, "", str(e)
+
+def stream_ffmpeg(cmd, on_line=None, on_chunk=None):
+    """
+    Запуск ffmpeg с чтением по мере работы: on_line(str) — строки stderr (лог фильтров),
+    on_chunk(bytes) — данные stdout (если вывод в pipe:1). Возвращает (returncode, хвост stderr).
+    """
+    streamer = getattr(_tls, "streamer", None)
+    if streamer is not None:
+        return streamer(cmd, on_line, on_chunk)
+    return stream_command(cmd, on_line, on_chunk)
+
+def stream_command(cmd, on_line=None, on_chunk=None, on_start=None, chunk=1 << 16):
+    """Прямой потоковый запуск без перехвата. on_start(proc) — сразу после старта (для отмены)."""
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE if on_chunk else subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+    except Exception as e:
+        return 1, str(e)
+    if on_start is not None:
+        on_start(proc)
+    tail = deque(maxlen=50)
+
+    def read_err():
+        for raw in proc.stderr:
+            text = raw.decode("utf-8", "ignore").rstrip("\r\n")
+            tail.append(text)
+            if on_line is not None:
+                try: on_line(text)
+                except Exception: pass
+
+    if on_chunk is not None:
+        t = threading.Thread(target=read_err, daemon=True)
+        t.start()
+        while True:
+            raw = proc.stdout.read(chunk)
+            if not raw:
+                break
+            on_chunk(raw)
+        t.join()
+    else:
+        read_err()
+    return proc.wait(), "\n".join(tail)
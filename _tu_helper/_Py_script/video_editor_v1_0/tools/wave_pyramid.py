@@ -0,0 +1,344 @@
+# video_editor/tools/wave_pyramid.py
+# -*- coding: utf-8 -*-
+"""
+wave_pyramid.py — многоуровневая пирамида min/max/RMS аудиодорожки в файле-спутнике (mmap).
+
+- Уровень L хранит бины по BASE·2^L сэмплов (BASE = 32 сэмпла = 2 мс при 16 кГц).
+  Уровень 0 считается из PCM, каждый следующий — попарным слиянием бинов предыдущего
+  (min от min, max от max, средний квадрат — взвешенное среднее).
+- Строится один раз на дорожку, за тот же проход ffmpeg, что и аудиограмма (waveform.stream_bins(tee=...)),
+  и кладётся в media_cache (ключ: файл + номер дорожки + частота). Дальше файл открывается через mmap —
+  с диска подтягиваются только страницы, которые реально читаются.
+- Зум/прокрутка/перерисовка: берём уровень, где на пиксель приходится ~8 бинов, и агрегируем только видимые.
+- Паузы (silences) — по уровню ~8 мс: бин «тихий», если его пик ниже порога (как silencedetect).
+
+Формат файла (little-endian):
+    заголовок  '<8sIIIQ'  magic, sr, base_shift, n_levels, total_samples
+    таблица    n_levels × '<QQ'  (n_bins, offset)
+    уровень    int16 min[n] | int16 max[n] | float32 ms[n]   (ms — средний квадрат сэмплов бина)
+
+Функции/классы:
+- PyramidBuilder(sr)                         -> feed(raw) / write_to(fobj)
+- WavePyramid(path)                          -> pixels(x0, x1, sec_per_px, metric), silences(db, min_len), close()
+- stream_or_default(stream_global)           -> номер дорожки (None -> [audio] stream_global)
+- pyramid_key(src, stream_global, sr)        -> ключ media_cache
+- open_cached(src, stream_global, sr)        -> WavePyramid | None
+- save(builder, key)                         -> WavePyramid | None
+- open_or_build(ffmpeg, src, stream_global, sr, stop_evt) -> (WavePyramid | None, err_text)
+"""
+import sys
+import mmap
+import math
+import struct
+from array import array
+from itertools import groupby
+from operator import mul
+
+from . import waveform, media_cache
+from . import config_store as cfg
+from .waveform import np, SAMPLE_RATE
+
+EXT = "wpyr"
+MAGIC = b"VEWPYR01"
+BASE_SHIFT = 5
+_HDR = struct.Struct("<8sIIIQ")
+_LVL = struct.Struct("<QQ")
+_FULL_SCALE = 32767.0
+_BINS_PER_PX = 8
+
+
+def _align8(n):
+    return (n + 7) & ~7
+
+
+# ---------------- построение ----------------
+
+class PyramidBuilder:
+    """Накопитель PCM s16le: feed(raw) по мере чтения из pipe, в конце write_to(fobj)."""
+
+    def __init__(self, sr=SAMPLE_RATE, base_shift=BASE_SHIFT):
+        self.sr = int(sr)
+        self.base_shift = int(base_shift)
+        self.base = 1 << self.base_shift
+        self._tail = b""       # неполный базовый бин (и, возможно, нечётный байт)
+        self._nbytes = 0
+        self._mins = array("h"); self._maxs = array("h"); self._ms = array("f")
+
+    @property
+    def total_samples(self):
+        return self._nbytes // 2
+
+    def feed(self, raw):
+        self._nbytes += len(raw)
+        data = self._tail + raw if self._tail else raw
+        block = self.base * 2
+        n = len(data) // block
+        if n:
+            self._add_blocks(data[:n * block], n, self.base)
+        self._tail = data[n * block:]
+
+    def _add_blocks(self, buf, n, size, out=None):
+        """n подряд идущих блоков по size сэмплов -> min/max/ms в out (по умолчанию — уровень 0)."""
+        mins, maxs, ms = out or (self._mins, self._maxs, self._ms)
+        if np is not None:
+            a = np.frombuffer(buf, dtype="<i2").reshape(n, size)
+            mins.frombytes(a.min(axis=1).astype(np.int16).tobytes())
+            maxs.frombytes(a.max(axis=1).astype(np.int16).tobytes())
+            sq = a.astype(np.float64) ** 2
+            ms.frombytes(sq.mean(axis=1).astype(np.float32).tobytes())
+            return
+        s = waveform._samples_from_bytes(buf)
+        for i in range(0, n * size, size):
+            sl = s[i:i + size]
+            mins.append(min(sl)); maxs.append(max(sl))
+            ms.append(sum(map(mul, sl, sl)) / size)
+
+    def _levels(self):
+        """Все уровни [(mins, maxs, ms)] — уровень 0 с хвостом + попарные слияния."""
+        mins, maxs, ms = self._mins, self._maxs, self._ms
+        last_n = self.base
+        tail = len(self._tail) // 2
+        if tail:
+            mins = array("h", mins); maxs = array("h", maxs); ms = array("f", ms)
+            self._add_blocks(self._tail[:tail * 2], 1, tail, (mins, maxs, ms))
+            last_n = tail
+        levels = [(mins, maxs, ms)]
+        spb = self.base
+        while len(mins) > 1:
+            n = len(mins)
+            mins_up = array("h", map(min, mins[0::2], mins[1::2]))
+            maxs_up = array("h", map(max, maxs[0::2], maxs[1::2]))
+            if np is not None:
+                pair = np.frombuffer(ms, dtype=np.float32)
+                ms_up = array("f", ((pair[0:n - 1:2] + pair[1::2]) * 0.5).astype(np.float32).tobytes())
+            else:
+                ms_up = array("f", [(a + b) * 0.5 for a, b in zip(ms[0::2], ms[1::2])])
+            if n % 2:
+                mins_up.append(mins[-1]); maxs_up.append(maxs[-1]); ms_up.append(ms[-1])
+            else:
+                # последний бин уровня неполный — честное взвешивание по числу сэмплов
+                ms_up[-1] = (ms[-2] * spb + ms[-1] * last_n) / (spb + last_n)
+                last_n += spb
+            mins, maxs, ms = mins_up, maxs_up, ms_up
+            spb *= 2
+            levels.append((mins, maxs, ms))
+        if not len(levels[0][0]):
+            return []
+        return levels
+
+    def write_to(self, fobj):
+        """Записывает файл пирамиды в открытый на запись бинарный файл."""
+        levels = self._levels()
+        off = _align8(_HDR.size + _LVL.size * len(levels))
+        table = []
+        for mins, _maxs, _ms in levels:
+            n = len(mins)
+            table.append((n, off))
+            off = _align8(off + n * 8)
+        fobj.write(_HDR.pack(MAGIC, self.sr, self.base_shift, len(levels), self.total_samples))
+        for n, o in table:
+            fobj.write(_LVL.pack(n, o))
+        pos = _HDR.size + _LVL.size * len(levels)
+        for (n, o), arrs in zip(table, levels):
+            fobj.write(b"\0" * (o - pos)); pos = o
+            for arr in arrs:
+                if sys.byteorder == "big":
+                    arr = array(arr.typecode, arr); arr.byteswap()
+                data = arr.tobytes()
+                fobj.write(data); pos += len(data)
+
+
+# ---------------- чтение ----------------
+
+class WavePyramid:
+    """Пирамида из файла через mmap. Массивы уровней — без копирования (ndarray или memoryview)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, sr, base_shift, n_levels, total = _HDR.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise ValueError("not a waveform pyramid")
+            self.levels = [_LVL.unpack_from(self._mm, _HDR.size + i * _LVL.size) for i in range(n_levels)]
+        except Exception:
+            self._f.close()
+            raise
+        self.sr = sr
+        self.base = 1 << base_shift
+        self.total_samples = total
+        self._views = {}
+
+    @property
+    def duration(self):
+        return self.total_samples / float(self.sr or 1)
+
+    def close(self):
+        self._views.clear()
+        try: self._mm.close()
+        except Exception: pass
+        try: self._f.close()
+        except Exception: pass
+
+    def _level(self, lvl):
+        arrs = self._views.get(lvl)
+        if arrs is not None:
+            return arrs
+        n, off = self.levels[lvl]
+        if np is not None:
+            arrs = (np.frombuffer(self._mm, dtype="<i2", count=n, offset=off),
+                    np.frombuffer(self._mm, dtype="<i2", count=n, offset=off + 2 * n),
+                    np.frombuffer(self._mm, dtype="<f4", count=n, offset=off + 4 * n))
+        elif sys.byteorder == "little":
+            mv = memoryview(self._mm)
+            arrs = (mv[off:off + 2 * n].cast("h"), mv[off + 2 * n:off + 4 * n].cast("h"),
+                    mv[off + 4 * n:off + 8 * n].cast("f"))
+        else:
+            arrs = []
+            for code, a, b in (("h", off, off + 2 * n), ("h", off + 2 * n, off + 4 * n), ("f", off + 4 * n, off + 8 * n)):
+                arr = array(code); arr.frombytes(self._mm[a:b]); arr.byteswap(); arrs.append(arr)
+            arrs = tuple(arrs)
+        self._views[lvl] = arrs
+        return arrs
+
+    def _pick_level(self, samples_per_unit):
+        """Самый грубый уровень, у которого бин не крупнее samples_per_unit сэмплов."""
+        if not self.levels:
+            return None
+        ratio = float(samples_per_unit) / self.base
+        lvl = int(math.floor(math.log2(ratio))) if ratio >= 1.0 else 0
+        return max(0, min(lvl, len(self.levels) - 1))
+
+    def pixels(self, x0, x1, sec_per_px, metric="peak"):
+        """
+        Амплитуды 0..1 для пикселей [x0, x1) при масштабе sec_per_px.
+        Читаются только бины, попадающие в эти пиксели.
+        """
+        x0 = max(0, int(x0)); x1 = max(x0, int(x1))
+        out = [0.0] * (x1 - x0)
+        # ~8+ бинов на пиксель: края пикселя попадают внутрь бина не больше чем на 1/8
+        lvl = self._pick_level(sec_per_px * self.sr / _BINS_PER_PX)
+        if lvl is None or not out:
+            return out
+        spb = self.base << lvl
+        mins, maxs, ms = self._level(lvl)
+        n = len(mins)
+        spp = sec_per_px * self.sr
+        starts = [int(round(x * spp)) // spb for x in range(x0, x1)]
+        cnt = len(starts)
+        while cnt and starts[cnt - 1] >= n:
+            cnt -= 1
+        if not cnt:
+            return out
+        end = min(n, max(starts[cnt - 1] + 1, -(-int(round(x1 * spp)) // spb)))
+        a0 = starts[0]
+
+        if np is not None:
+            idx = np.asarray(starts[:cnt], dtype=np.int64) - a0
+            bounds = np.append(idx, end - a0)
+            counts = np.maximum(1, np.diff(bounds))
+            if metric == "peak":
+                hi = np.maximum.reduceat(maxs[a0:end].astype(np.int32), idx)
+                lo = np.minimum.reduceat(mins[a0:end].astype(np.int32), idx)
+                res = np.maximum(hi, -lo) / _FULL_SCALE
+            else:
+                res = np.sqrt(np.add.reduceat(ms[a0:end].astype(np.float64), idx) / counts) / _FULL_SCALE
+            out[:cnt] = np.minimum(res, 1.0).tolist()
+            return out
+
+        for i in range(cnt):
+            a = starts[i]
+            b = max(a + 1, starts[i + 1] if i + 1 < cnt else end)
+            if metric == "peak":
+                out[i] = min(1.0, max(max(maxs[a:b]), -min(mins[a:b])) / _FULL_SCALE)
+            else:
+                out[i] = min(1.0, math.sqrt(sum(ms[a:b]) / (b - a)) / _FULL_SCALE)
+        return out
+
+    def silences(self, noise_db=-35.0, min_len=1.0):
+        """
+        Паузы [(start, end), ...] в секундах: подряд идущие бины (~8 мс), у которых пик ниже
+        noise_db (дБ от полной шкалы), общей длиной не меньше min_len.
+        """
+        lvl = self._pick_level(self.sr * 0.01)
+        if lvl is None:
+            return []
+        spb = self.base << lvl
+        mins, maxs, _ms = self._level(lvl)
+        thr = _FULL_SCALE * (10.0 ** (float(noise_db) / 20.0))
+        min_bins = max(1, int(math.ceil(float(min_len) * self.sr / spb)))
+        res = []
+        if np is not None:
+            quiet = (maxs.astype(np.int32) < thr) & (mins.astype(np.int32) > -thr)
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], quiet.astype(np.int8), [0]))))
+            runs = zip(edges[0::2].tolist(), edges[1::2].tolist())
+        else:
+            runs = []; pos = 0
+            for q, grp in groupby(mx < thr and mn > -thr for mn, mx in zip(mins, maxs)):
+                k = sum(1 for _ in grp)
+                if q:
+                    runs.append((pos, pos + k))
+                pos += k
+        for a, b in runs:
+            if b - a >= min_bins:
+                res.append((a * spb / float(self.sr), min(self.total_samples, b * spb) / float(self.sr)))
+        return res
+
+
+# ---------------- кэш ----------------
+
+def stream_or_default(stream_global):
+    """None -> дорожка, выбранная на вкладке «Аудио» ([audio] stream_global)."""
+    if stream_global is None:
+        stream_global = cfg.get_int("audio", "stream_global", -1)
+    try: return int(stream_global)
+    except Exception: return -1
+
+
+def pyramid_key(src, stream_global=None, sr=SAMPLE_RATE):
+    return media_cache.file_key(src, "wavepyr", stream=stream_or_default(stream_global),
+                                sr=int(sr), base=BASE_SHIFT)
+
+
+def open_cached(src, stream_global=None, sr=SAMPLE_RATE):
+    """Готовая пирамида из кэша или None."""
+    path = media_cache.lookup(pyramid_key(src, stream_global, sr), EXT)
+    if not path:
+        return None
+    try:
+        return WavePyramid(path)
+    except Exception:
+        return None
+
+
+def save(builder, key):
+    """Записывает пирамиду в кэш и открывает её. None — если записать не удалось."""
+    w = media_cache.writer(key, EXT)
+    if w is None:
+        return None
+    try:
+        builder.write_to(w)
+    except Exception:
+        w.abort()
+        return None
+    path = w.commit()
+    if not path:
+        return None
+    try:
+        return WavePyramid(path)
+    except Exception:
+        return None
+
+
+def open_or_build(ffmpeg, src, stream_global=None, sr=SAMPLE_RATE, stop_evt=None):
+    """Пирамида из кэша, а если её нет — один проход ffmpeg и запись в кэш. -> (pyr | None, err_text)."""
+    stream_global = stream_or_default(stream_global)
+    pyr = open_cached(src, stream_global, sr)
+    if pyr is not None:
+        return pyr, ""
+    builder = PyramidBuilder(sr)
+    ok, err, total = waveform.stream_pcm(ffmpeg, src, builder.feed, stream_global, sr, stop_evt)
+    if not ok or total == 0 or (stop_evt is not None and stop_evt.is_set()):
+        return None, err
+    return save(builder, pyramid_key(src, stream_global, sr)), err
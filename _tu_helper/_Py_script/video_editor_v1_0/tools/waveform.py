@@ -0,0 +1,254 @@
+# video_editor/tools/waveform.py
+# -*- coding: utf-8 -*-
+"""
+waveform.py — аудиограмма по PCM за ОДИН проход ffmpeg.
+
+- ffmpeg декодирует выбранную дорожку целиком и отдаёт PCM (s16le, моно, 16 кГц) в pipe;
+  мы читаем поток кусками и сразу считаем готовые бины — время работы растёт линейно с длительностью.
+- Бины (peak/rms) считаются векторно: NumPy, если установлен; иначе срезы memoryview по array('h')
+  + встроенные max/min/sum(map(mul)) (циклы на стороне C, а не по одному сэмплу в Python).
+- Границы бинов считаются от абсолютного номера сэмпла: бин x = сэмплы [round(x*spb), round((x+1)*spb)),
+  поэтому время не «плывёт», сколько бы кусков ни пришло.
+
+Функции/классы:
+- pcm_command(ffmpeg, src, stream_global, sr)   -> список аргументов ffmpeg
+- block_amplitudes(samples, bounds, metric)    -> список амплитуд 0..1 для бинов
+- BinBuilder(n_bins, samples_per_bin, metric)  -> feed(raw) / finish(): готовые бины по мере поступления PCM
+- stream_pcm(ffmpeg, src, on_chunk, ...)       -> (ok, err, total_samples): сырой PCM кусками
+- stream_bins(ffmpeg, src, n_bins, sec_per_bin, metric, ...) -> (ok, err, total_samples)
+- smooth_bins(bins, radius)                    -> скользящее среднее за O(n)
+"""
+import sys
+import math
+import time
+import subprocess
+from array import array
+from itertools import accumulate
+from operator import mul
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен
+    np = None
+
+SAMPLE_RATE = 16000
+_FULL_SCALE = 32767.0
+
+
+def pcm_command(ffmpeg, src, stream_global=-1, sr=SAMPLE_RATE):
+    """Команда ffmpeg: выбранная дорожка -> моно s16le в stdout."""
+    cmd = [ffmpeg, "-hide_banner", "-nostats", "-loglevel", "error", "-nostdin", "-i", src, "-vn"]
+    if stream_global is not None and int(stream_global) >= 0:
+        cmd += ["-map", f"0:{int(stream_global)}"]
+    cmd += ["-ac", "1", "-ar", str(int(sr)), "-f", "s16le", "pipe:1"]
+    return cmd
+
+
+def _samples_from_bytes(raw):
+    """bytes s16le -> последовательность int (ndarray или memoryview по array('h'))."""
+    if np is not None:
+        return np.frombuffer(raw, dtype="<i2")
+    arr = array("h")
+    arr.frombytes(raw)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return memoryview(arr)
+
+
+def block_amplitudes(samples, bounds, metric="peak"):
+    """
+    samples — ndarray/memoryview сэмплов int16; bounds — [s0, s1, ..., sN] (границы N бинов в сэмплах).
+    Возвращает N амплитуд в диапазоне 0..1 (peak — максимум модуля, rms — среднеквадратичное).
+    """
+    n = len(bounds) - 1
+    if n <= 0:
+        return []
+    if np is not None:
+        starts = np.asarray(bounds[:-1], dtype=np.int64)
+        counts = np.diff(np.asarray(bounds, dtype=np.int64))
+        valid = counts > 0
+        res = np.zeros(n, dtype=np.float64)
+        if valid.any():
+            idx = starts[valid]
+            if metric == "peak":
+                vals = np.abs(samples.astype(np.int32))
+                res[valid] = np.maximum.reduceat(vals, idx) / _FULL_SCALE
+            else:
+                sq = samples.astype(np.float64) ** 2
+                res[valid] = np.sqrt(np.add.reduceat(sq, idx) / counts[valid]) / _FULL_SCALE
+        return np.minimum(res, 1.0).tolist()
+
+    res = [0.0] * n
+    for i in range(n):
+        a, b = bounds[i], bounds[i + 1]
+        if b <= a:
+            continue
+        sl = samples[a:b]
+        if metric == "peak":
+            res[i] = min(1.0, max(max(sl), -min(sl)) / _FULL_SCALE)
+        else:
+            res[i] = min(1.0, math.sqrt(sum(map(mul, sl, sl)) / (b - a)) / _FULL_SCALE)
+    return res
+
+
+class BinBuilder:
+    """
+    Накопитель PCM: feed(raw) возвращает (x0, bins) — новые полностью готовые бины, начиная с индекса x0.
+    finish() дочитывает последний неполный бин.
+    Когда готов последний бин, дальнейшие сэмплы только считаются (total_samples) и не хранятся.
+    """
+
+    def __init__(self, n_bins, samples_per_bin, metric="peak"):
+        self.n_bins = max(1, int(n_bins))
+        self.spb = max(1e-9, float(samples_per_bin))
+        self.metric = metric
+        self.total_samples = 0
+        self._buf = bytearray()
+        self._base = 0          # абсолютный номер первого сэмпла в буфере
+        self._x = 0             # следующий бин
+        self._dropped = 0       # байт, отброшенных после последнего бина
+
+    def _bound(self, x):
+        return int(round(x * self.spb))
+
+    def _emit(self, x_end, avail):
+        x0 = self._x
+        if x_end <= x0:
+            return x0, []
+        bounds = [min(self._bound(x), avail) - self._base for x in range(x0, x_end + 1)]
+        used = bounds[-1]
+        samples = _samples_from_bytes(bytes(self._buf[:used * 2]))
+        bins = block_amplitudes(samples, bounds, self.metric)
+        del self._buf[:used * 2]
+        self._base += used
+        self._x = x_end
+        return x0, bins
+
+    def feed(self, raw):
+        if self._x >= self.n_bins:
+            self._dropped += len(raw)
+            self.total_samples = self._base + (self._dropped + len(self._buf)) // 2
+            return self._x, []
+        self._buf.extend(raw)
+        avail = self._base + len(self._buf) // 2
+        self.total_samples = avail
+        # бин x готов, когда пришёл его последний сэмпл: bound(x+1) <= avail
+        x_end = self._x
+        while x_end < self.n_bins and self._bound(x_end + 1) <= avail:
+            x_end += 1
+        out = self._emit(x_end, avail)
+        if self._x >= self.n_bins:
+            # все бины готовы — остаток буфера больше не нужен
+            self._dropped += len(self._buf)
+            self._buf.clear()
+        return out
+
+    def finish(self):
+        avail = self._base + len(self._buf) // 2
+        if self._x >= self.n_bins or avail <= self._base:
+            return self._x, []
+        return self._emit(min(self.n_bins, self._x + int(math.ceil((avail - self._base) / self.spb))), avail)
+
+
+def stream_pcm(ffmpeg, src, on_chunk, stream_global=-1, sr=SAMPLE_RATE, stop_evt=None):
+    """
+    Один проход ffmpeg: выбранная дорожка -> PCM s16le кусками в on_chunk(raw).
+    Возвращает (ok, err_text, total_samples).
+    Если -map по глобальному индексу не сработал — повторяем без -map (первая аудиодорожка).
+    """
+    ok, err, total = _stream_pcm_once(ffmpeg, src, on_chunk, stream_global, sr, stop_evt)
+    if (not ok and total == 0 and stream_global is not None and int(stream_global) >= 0
+            and (("matches no streams" in err) or ("stream specifier" in err.lower()))):
+        ok, err, total = _stream_pcm_once(ffmpeg, src, on_chunk, -1, sr, stop_evt)
+    return ok, err, total
+
+
+def _stream_pcm_once(ffmpeg, src, on_chunk, stream_global, sr, stop_evt):
+    try:
+        proc = subprocess.Popen(pcm_command(ffmpeg, src, stream_global, sr),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except Exception as e:
+        return False, str(e), 0
+
+    chunk = max(4096, int(sr) * 2 // 4)   # ~0.25 с звука за чтение
+    nbytes = 0
+    try:
+        while True:
+            if stop_evt is not None and stop_evt.is_set():
+                break
+            raw = proc.stdout.read(chunk)
+            if not raw:
+                break
+            nbytes += len(raw)
+            on_chunk(raw)
+    finally:
+        try: proc.stdout.close()
+        except Exception: pass
+        if proc.poll() is None and stop_evt is not None and stop_evt.is_set():
+            try: proc.kill()
+            except Exception: pass
+        try:
+            err = (proc.stderr.read() or b"").decode("utf-8", "ignore")
+        except Exception:
+            err = ""
+        rc = proc.wait()
+
+    total = nbytes // 2
+    if rc != 0 and total == 0:
+        return False, err or f"ffmpeg rc={rc}", 0
+    return True, err, total
+
+
+def stream_bins(ffmpeg, src, n_bins, sec_per_bin, metric="peak", stream_global=-1,
+                sr=SAMPLE_RATE, on_bins=None, stop_evt=None, min_interval=0.2, tee=None):
+    """
+    Один проход ffmpeg: PCM из pipe -> бины. on_bins(x0, bins) вызывается по мере готовности
+    (не чаще, чем раз в min_interval сек) — для прогрессивной отрисовки.
+    tee(raw) — дополнительный получатель тех же кусков PCM (например, построитель пирамиды).
+    Возвращает (ok, err_text, total_samples).
+    """
+    builder = BinBuilder(n_bins, sec_per_bin * sr, metric)
+    pending_x0 = 0; pending = []; last_emit = 0.0
+
+    def collect(x0, bins):
+        nonlocal pending_x0
+        if bins:
+            if not pending:
+                pending_x0 = x0
+            pending.extend(bins)
+
+    def flush(force=False):
+        nonlocal pending_x0, pending, last_emit
+        if not pending or on_bins is None:
+            return
+        now = time.monotonic()
+        if force or now - last_emit >= min_interval:
+            on_bins(pending_x0, pending)
+            pending_x0 += len(pending); pending = []; last_emit = now
+
+    def on_chunk(raw):
+        if tee is not None:
+            tee(raw)
+        collect(*builder.feed(raw))
+        flush()
+
+    ok, err, total = stream_pcm(ffmpeg, src, on_chunk, stream_global, sr, stop_evt)
+    if ok:
+        collect(*builder.finish())
+        flush(force=True)
+    return ok, err, total
+
+
+def smooth_bins(bins, radius):
+    """Скользящее среднее радиуса r через префиксные суммы (O(n) вместо O(n*r))."""
+    r = int(max(0, radius))
+    if r == 0 or not bins:
+        return bins
+    n = len(bins)
+    pref = [0.0]
+    pref.extend(accumulate(bins))
+    out = [0.0] * n
+    for i in range(n):
+        a = max(0, i - r); b = min(n, i + r + 1)
+        out[i] = (pref[b] - pref[a]) / (b - a)
+    return out